@@ -79,6 +79,9 @@ class Settings(BaseSettings):
     MAX_UPLOAD_SIZE: int = int(os.getenv("MAX_UPLOAD_SIZE", "10485760"))  # 10MB
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "uploads")
     
+    # Telemetry storage settings
+    TELEMETRY_STORAGE_PATH: str = os.getenv("TELEMETRY_STORAGE_PATH", "data/telemetry")
+    
     # OCPP Firmware update settings
     FIRMWARE_UPLOAD_DIR: str = os.getenv("FIRMWARE_UPLOAD_DIR", "uploads/firmware")
     FIRMWARE_MAX_SIZE: int = int(os.getenv("FIRMWARE_MAX_SIZE", "104857600"))  # 100MB
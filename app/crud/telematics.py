@@ -3,7 +3,9 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
 from fastapi import HTTPException
+import pandas as pd
 
+from app.ml.data_pipeline.telemetry_codec import write_encoded
 from app.models.telematics import VehicleTelematicsLive, VehicleTelematicsHistory
 from app.schemas.vehicle import VehicleTelematicsLive as VehicleTelematicsLiveSchema
 from app.schemas.vehicle import VehicleTelematicsHistory as VehicleTelematicsHistorySchema
@@ -214,6 +216,69 @@ class CRUDTelematics:
                 detail="Error retrieving telematics history"
             )
 
+    def export_telematics_history(
+        self,
+        db: Session,
+        vehicle_id: int,
+        path: str,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> int:
+        """
+        Export historical telematics data for a vehicle to a compact file.
+
+        Records are written with the columnar telemetry codec (delta-of-delta
+        timestamps, scaled-int/XOR floats, dictionary-encoded strings) and can
+        be read back with app.ml.data_pipeline.telemetry_codec.read_encoded.
+
+        Args:
+            db: Database session
+            vehicle_id: ID of the vehicle
+            path: Destination file path
+            start_time: Optional start time filter
+            end_time: Optional end time filter
+
+        Returns:
+            int: Number of exported records
+
+        Raises:
+            HTTPException: If database error occurs
+        """
+        try:
+            query = db.query(VehicleTelematicsHistory).filter(
+                VehicleTelematicsHistory.vehicle_id == vehicle_id
+            )
+
+            if start_time:
+                query = query.filter(
+                    VehicleTelematicsHistory.timestamp >= start_time)
+            if end_time:
+                query = query.filter(
+                    VehicleTelematicsHistory.timestamp <= end_time)
+
+            columns = [
+                column.name for column in VehicleTelematicsHistory.__table__.columns
+                if column.name != "id"
+            ]
+            records = query.order_by(VehicleTelematicsHistory.timestamp.asc()).all()
+            df = pd.DataFrame(
+                [{name: getattr(record, name) for name in columns} for record in records],
+                columns=columns
+            )
+            if not df.empty:
+                df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+
+            write_encoded(path, df)
+            return len(df)
+
+        except SQLAlchemyError as e:
+            logger.error(
+                f"Database error exporting history for vehicle {vehicle_id}: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail="Error exporting telematics history"
+            )
+
     def process_incoming_telematics_data(
         self,
         db: Session,
@@ -23,6 +23,8 @@ from sklearn.cluster import DBSCAN
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent))
 
 from app.ml.preprocessing.feature_engineering import extract_time_features, detect_anomalies
+from app.ml.anomaly_detection.streaming_statistics import OnlineStatisticalDetector
+from app.ml.anomaly_detection.fleet_model import FLEET_METHODS, FleetAnomalyModel
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -37,6 +39,9 @@ class BatteryAnomalyDetector:
     using various statistical and machine learning techniques.
     """
     
+    # Numeric telemetry columns used as detection features
+    FEATURE_COLUMNS = ['state_of_charge', 'battery_temp', 'voltage', 'current']
+    
     def __init__(
         self,
         detection_methods: List[str] = None,
@@ -69,6 +74,12 @@ class BatteryAnomalyDetector:
         self.dbscan_eps = 0.5
         self.dbscan_min_samples = 5
         
+        # Per-vehicle streaming statistics for online scoring
+        self.online_detector = OnlineStatisticalDetector(self.FEATURE_COLUMNS, std_threshold=self.std_threshold)
+        
+        # Fleet-wide scaler and models, set by fit_fleet
+        self.fleet_model: Optional[FleetAnomalyModel] = None
+        
         # Load model if provided
         if model_path:
             self.load_model(model_path)
@@ -152,26 +163,110 @@ class BatteryAnomalyDetector:
         if 'dbscan' in self.detection_methods:
             data = self._detect_dbscan_anomalies(data)
         
-        if 'lof' in self.detection_methods and 'lof' in self.models:
-            data = self._detect_lof_anomalies(data)
+        if 'lof' in self.detection_methods:
+            lof_flags = self._fleet_flags(data, 'lof')
+            if 'lof' in self.models or lof_flags is not None:
+                data = self._detect_lof_anomalies(data, lof_flags)
         
         # Aggregate anomaly results
         data['anomaly_count'] = sum(data[f'anomaly_{method}'] for method in self.detection_methods)
+        data['is_anomaly'], data['anomaly_severity'] = self._aggregate(data['anomaly_count'].to_numpy())
         
-        # Add an overall anomaly flag if detected by multiple methods
+        return data
+    
+    def _aggregate(self, anomaly_count: np.ndarray, n_methods: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Turn per-row method hit counts into an overall flag and severity
+        
+        Args:
+            anomaly_count: Number of methods flagging each row
+            n_methods: Number of methods applied (all detection methods if None)
+            
+        Returns:
+            Tuple of (is_anomaly, anomaly_severity) arrays
+        """
+        # Overall anomaly flag if detected by multiple methods
         min_methods = 2 if not self.strict_mode else 1
-        data['is_anomaly'] = (data['anomaly_count'] >= min_methods).astype(int)
+        is_anomaly = (anomaly_count >= min_methods).astype(int)
         
-        # Add severity based on how many methods detected the anomaly
+        # Severity based on how many methods detected the anomaly
+        n_methods = n_methods if n_methods is not None else len(self.detection_methods)
         conditions = [
-            (data['anomaly_count'] >= len(self.detection_methods) - 1),
-            (data['anomaly_count'] >= len(self.detection_methods) // 2),
-            (data['anomaly_count'] >= min_methods)
+            (anomaly_count >= n_methods - 1),
+            (anomaly_count >= n_methods // 2),
+            (anomaly_count >= min_methods)
         ]
         choices = ['high', 'medium', 'low']
-        data['anomaly_severity'] = np.select(conditions, choices, default='none')
+        return is_anomaly, np.select(conditions, choices, default='none')
+    
+    def score_points(
+        self,
+        points: np.ndarray,
+        charging_status: Optional[np.ndarray],
+        window_mean: np.ndarray,
+        window_std: np.ndarray,
+        statistical: Optional[np.ndarray] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Score new points against maintained window statistics
         
-        return data
+        Used by the streaming pipeline: the cost depends only on the number of
+        new points, not on the window length. Statistical z-scores are taken
+        against the trailing window (the batch path uses a centered one),
+        threshold checks are vectorized, and the fleet model methods (see
+        fit_fleet) score points independently. Without a fleet model, Isolation
+        Forest is applied to window-scaled points if it has already been fitted
+        by batch detection; DBSCAN and LOF would need the whole window and are
+        skipped.
+        
+        Args:
+            points: Array of shape (n, 4) in FEATURE_COLUMNS order
+            charging_status: Charging status per point, or None
+            window_mean: Per-feature mean of the trailing window
+            window_std: Per-feature standard deviation of the trailing window
+            statistical: Precomputed statistical flags per point (e.g. from the
+                online detector) used instead of window z-scores
+            
+        Returns:
+            Dictionary with per-method flags, anomaly_count, is_anomaly and
+            anomaly_severity arrays
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+        flags = {method: np.zeros(len(points), dtype=int) for method in self.detection_methods}
+        
+        if 'statistical' in self.detection_methods and statistical is not None:
+            flags['statistical'] = np.asarray(statistical, dtype=int)
+        elif 'statistical' in self.detection_methods:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                z_scores = np.abs(points - window_mean) / window_std
+            flags['statistical'] = (np.nan_to_num(z_scores, nan=0.0) > self.std_threshold).any(axis=1).astype(int)
+        
+        if 'threshold' in self.detection_methods:
+            flags['threshold'] = self._threshold_mask(points, charging_status).astype(int)
+        
+        fleet_methods = [
+            m for m in self.detection_methods
+            if self.fleet_model is not None and m in self.fleet_model.models
+        ]
+        if fleet_methods:
+            flags.update(self.fleet_model.predict(points, fleet_methods))
+        
+        model = self.models.get('isolation_forest')
+        if 'isolation_forest' in self.detection_methods and 'isolation_forest' not in fleet_methods \
+                and model is not None and hasattr(model, 'estimators_'):
+            # Scale with the window statistics, as the batch path scales with the buffer's
+            scale = np.where(np.isfinite(window_std) & (window_std > 0), window_std, 1.0)
+            window_points = np.where(np.isnan(points), window_mean, points)
+            flags['isolation_forest'] = (model.predict(np.nan_to_num((window_points - window_mean) / scale)) == -1).astype(int)
+        
+        anomaly_count = sum(flags.values())
+        is_anomaly, severity = self._aggregate(anomaly_count)
+        return {
+            **{f'anomaly_{method}': values for method, values in flags.items()},
+            'anomaly_count': anomaly_count,
+            'is_anomaly': is_anomaly,
+            'anomaly_severity': severity
+        }
     
     def _detect_statistical_anomalies(self, data: pd.DataFrame) -> pd.DataFrame:
         """
@@ -224,19 +319,135 @@ class BatteryAnomalyDetector:
         
         return result
     
-    def _detect_threshold_anomalies(self, data: pd.DataFrame) -> pd.DataFrame:
+    def score_online(
+        self,
+        vehicle_id: Any,
+        point: np.ndarray,
+        charging_status: Optional[int] = None
+    ) -> Dict[str, np.ndarray]:
         """
-        Detect anomalies using domain-specific thresholds
+        Score one point with the per-vehicle streaming statistics
+        
+        The point is scored against the vehicle's running mean/variance
+        (Welford) and streaming quartiles (P²) and then folded into them, so
+        no history is kept. Threshold and Isolation Forest checks are the same
+        as in score_points.
         
         Args:
-            data: DataFrame with battery telemetry data
+            vehicle_id: ID of the vehicle
+            point: Feature values in FEATURE_COLUMNS order
+            charging_status: Charging status of the point
             
         Returns:
-            DataFrame with threshold anomaly flags
+            Dictionary in the score_points layout for a single point
         """
-        result = data.copy()
+        online = self.online_detector.score(vehicle_id, point)
+        charging = np.array([charging_status]) if charging_status is not None else None
+        return self.score_points(
+            np.asarray(point, dtype=np.float64)[np.newaxis, :],
+            charging,
+            online['mean'],
+            online['std'],
+            statistical=np.array([online['is_anomaly']])
+        )
+    
+    def _threshold_mask(self, points: np.ndarray, charging_status: Optional[np.ndarray]) -> np.ndarray:
+        """Vectorized threshold check of points in FEATURE_COLUMNS order"""
+        outside = np.zeros(len(points), dtype=bool)
+        for col, limits in self._threshold_limits().items():
+            values = points[:, self.FEATURE_COLUMNS.index(col)]
+            outside |= (values < limits['min']) | (values > limits['max'])
+        if charging_status is not None:
+            current = points[:, self.FEATURE_COLUMNS.index('current')]
+            outside |= ((charging_status == 1) & (current < 0)) | ((charging_status == 0) & (current > 0))
+        return outside
+    
+    def _feature_matrix(self, data: pd.DataFrame) -> np.ndarray:
+        """FEATURE_COLUMNS of a DataFrame as a float matrix (NaN where missing)"""
+        return np.column_stack([
+            data[col].to_numpy(dtype=np.float64) if col in data.columns else np.full(len(data), np.nan)
+            for col in self.FEATURE_COLUMNS
+        ])
+    
+    def _fleet_flags(self, data: pd.DataFrame, method: str) -> Optional[np.ndarray]:
+        """Flags from the fleet model for one method, or None if it was not fitted"""
+        if self.fleet_model is None or method not in self.fleet_model.models:
+            return None
+        return self.fleet_model.predict(self._feature_matrix(data), [method])[method]
+    
+    def fit_fleet(
+        self,
+        telemetry_data: pd.DataFrame,
+        sample_size: Optional[int] = 100000
+    ) -> FleetAnomalyModel:
+        """
+        Fit the scaler and the Isolation Forest / LOF / DBSCAN models once on a
+        representative fleet sample
+        
+        After this, batch detection and score_fleet only transform and predict
+        instead of refitting on every call. Save with save_model.
         
-        # Define thresholds (these should be adjusted based on the actual battery specs)
+        Args:
+            telemetry_data: Fleet telemetry with the feature columns
+            sample_size: Rows sampled for fitting (all rows if None)
+            
+        Returns:
+            The fitted FleetAnomalyModel
+        """
+        self.fleet_model = FleetAnomalyModel(
+            methods=[m for m in self.detection_methods if m in FLEET_METHODS],
+            contamination=self.contamination,
+            lof_n_neighbors=self.lof_n_neighbors,
+            dbscan_eps=self.dbscan_eps,
+            dbscan_min_samples=self.dbscan_min_samples
+        ).fit(self._feature_matrix(telemetry_data), sample_size=sample_size)
+        return self.fleet_model
+    
+    def score_fleet(
+        self,
+        telemetry_data: pd.DataFrame,
+        chunk_size: int = 100000,
+        n_jobs: int = 1
+    ) -> pd.DataFrame:
+        """
+        Score fleet telemetry with the fitted fleet model
+        
+        Rows are scored independently in chunks, optionally across a process
+        pool. The per-vehicle statistical method is not applied here (use
+        detect_anomalies or score_online for it); severity is based on the
+        threshold and fleet model methods that were applied.
+        
+        Args:
+            telemetry_data: Telemetry with the feature columns
+            chunk_size: Rows per chunk
+            n_jobs: Number of worker processes (-1 for all CPUs)
+            
+        Returns:
+            DataFrame aligned with the input with anomaly_<method> flags,
+            anomaly_count, is_anomaly and anomaly_severity
+        """
+        if self.fleet_model is None:
+            raise ValueError("No fleet model fitted. Call fit_fleet first.")
+        
+        features = self._feature_matrix(telemetry_data)
+        flags = self.fleet_model.predict_chunked(features, chunk_size=chunk_size, n_jobs=n_jobs)
+        
+        if 'threshold' in self.detection_methods:
+            charging = telemetry_data['charging_status'].to_numpy() if 'charging_status' in telemetry_data.columns else None
+            flags['threshold'] = self._threshold_mask(features, charging).astype(int)
+        
+        result = telemetry_data[[c for c in ('vehicle_id', 'timestamp') if c in telemetry_data.columns]].copy()
+        methods = [m for m in self.detection_methods if m in flags]
+        for method in methods:
+            result[f'anomaly_{method}'] = flags[method]
+        anomaly_count = sum(flags[m] for m in methods) if methods else np.zeros(len(result), dtype=int)
+        result['anomaly_count'] = anomaly_count
+        result['is_anomaly'], result['anomaly_severity'] = self._aggregate(np.asarray(anomaly_count), len(methods))
+        return result
+    
+    def _threshold_limits(self) -> Dict[str, Dict[str, float]]:
+        """Domain thresholds per column"""
+        # These should be adjusted based on the actual battery specs
         thresholds = {
             'battery_temp': {'min': 0, 'max': 45},  # in °C
             'voltage': {'min': 300, 'max': 420},    # in V
@@ -250,6 +461,20 @@ class BatteryAnomalyDetector:
             thresholds['voltage']['min'] = 350
             thresholds['current']['min'] = -100
             thresholds['current']['max'] = 100
+        return thresholds
+    
+    def _detect_threshold_anomalies(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Detect anomalies using domain-specific thresholds
+        
+        Args:
+            data: DataFrame with battery telemetry data
+            
+        Returns:
+            DataFrame with threshold anomaly flags
+        """
+        result = data.copy()
+        thresholds = self._threshold_limits()
         
         # Check each column against thresholds
         for col, limits in thresholds.items():
@@ -293,6 +518,12 @@ class BatteryAnomalyDetector:
             logger.warning("No usable feature columns for Isolation Forest")
             return result
         
+        # Score with the fleet model when one has been fitted
+        fleet_flags = self._fleet_flags(data, 'isolation_forest')
+        if fleet_flags is not None:
+            result['anomaly_isolation_forest'] = fleet_flags
+            return result
+        
         # Handle missing values
         features = data[feature_cols].copy()
         features = features.fillna(features.mean())
@@ -338,6 +569,12 @@ class BatteryAnomalyDetector:
             logger.warning("No usable feature columns for DBSCAN")
             return result
         
+        # Score with the fleet model when one has been fitted
+        fleet_flags = self._fleet_flags(data, 'dbscan')
+        if fleet_flags is not None:
+            result['anomaly_dbscan'] = fleet_flags
+            return result
+        
         # Handle missing values
         features = data[feature_cols].copy()
         features = features.fillna(features.mean())
@@ -360,12 +597,13 @@ class BatteryAnomalyDetector:
         
         return result
     
-    def _detect_lof_anomalies(self, data: pd.DataFrame) -> pd.DataFrame:
+    def _detect_lof_anomalies(self, data: pd.DataFrame, fleet_flags: Optional[np.ndarray] = None) -> pd.DataFrame:
         """
         Detect anomalies using Local Outlier Factor
         
         Args:
             data: DataFrame with battery telemetry data
+            fleet_flags: LOF flags already computed by the fleet model, if any
             
         Returns:
             DataFrame with LOF anomaly flags
@@ -378,6 +616,11 @@ class BatteryAnomalyDetector:
         ]
         feature_cols = [col for col in feature_cols if col in data.columns]
         
+        # Score with the fleet model when one has been fitted
+        if fleet_flags is not None:
+            result['anomaly_lof'] = fleet_flags
+            return result
+        
         if not feature_cols or len(data) < self.lof_n_neighbors:
             logger.warning("Not enough data or feature columns for LOF")
             return result
@@ -491,7 +734,9 @@ class BatteryAnomalyDetector:
             'std_threshold': self.std_threshold,
             'lof_n_neighbors': self.lof_n_neighbors,
             'dbscan_eps': self.dbscan_eps,
-            'dbscan_min_samples': self.dbscan_min_samples
+            'dbscan_min_samples': self.dbscan_min_samples,
+            'online_state': self.online_detector.get_state(),
+            'fleet_model': self.fleet_model
         }
         
         # Create directory if it doesn't exist
@@ -521,6 +766,12 @@ class BatteryAnomalyDetector:
         self.dbscan_eps = model_data.get('dbscan_eps', self.dbscan_eps)
         self.dbscan_min_samples = model_data.get('dbscan_min_samples', self.dbscan_min_samples)
         
+        # Restore streaming statistics so scoring resumes without a warm-up
+        self.online_detector.std_threshold = self.std_threshold
+        if 'online_state' in model_data:
+            self.online_detector.set_state(model_data['online_state'])
+        self.fleet_model = model_data.get('fleet_model')
+        
         logger.info(f"Anomaly detection model loaded from {model_path}")
 
 
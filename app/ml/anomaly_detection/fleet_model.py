@@ -0,0 +1,201 @@
+"""
+Fleet Anomaly Model
+
+This module provides the fit-once, score-many model behind the Isolation
+Forest, LOF and DBSCAN detection methods of BatteryAnomalyDetector. The scaler
+and models are fitted once on a representative fleet sample; scoring only
+transforms and predicts, so it can run over millions of rows in chunks and
+across a process pool.
+
+LOF is fitted in novelty mode so new points can be scored. DBSCAN has no
+predict step; a new point is treated as noise when it is farther than eps from
+every core sample of the fitted clustering, which is how DBSCAN labels
+border and noise points.
+"""
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Any
+
+import numpy as np
+from sklearn.cluster import DBSCAN
+from sklearn.ensemble import IsolationForest
+from sklearn.neighbors import LocalOutlierFactor, NearestNeighbors
+from sklearn.preprocessing import StandardScaler
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+FLEET_METHODS = ['isolation_forest', 'lof', 'dbscan']
+
+# Model used by process pool workers, set once per worker by the initializer
+_worker_model: Optional['FleetAnomalyModel'] = None
+
+
+def _init_worker(model: 'FleetAnomalyModel') -> None:
+    """Process pool initializer: receive the fitted model once per worker"""
+    global _worker_model
+    _worker_model = model
+
+
+def _predict_chunk(features: np.ndarray) -> Dict[str, np.ndarray]:
+    """Process pool task: score one chunk with the worker's model"""
+    return _worker_model.predict(features)
+
+
+class FleetAnomalyModel:
+    """
+    Scaler and unsupervised models fitted once on a fleet sample
+    """
+
+    def __init__(
+        self,
+        methods: Optional[List[str]] = None,
+        contamination: float = 0.05,
+        lof_n_neighbors: int = 20,
+        dbscan_eps: float = 0.5,
+        dbscan_min_samples: int = 5,
+        random_state: int = 42
+    ):
+        """
+        Initialize the fleet model
+
+        Args:
+            methods: Methods to fit (subset of FLEET_METHODS)
+            contamination: Expected proportion of anomalies
+            lof_n_neighbors: Number of neighbors for LOF
+            dbscan_eps: DBSCAN neighborhood radius in scaled units
+            dbscan_min_samples: DBSCAN core point density
+            random_state: Random seed for sampling and Isolation Forest
+        """
+        self.methods = [m for m in (methods or FLEET_METHODS) if m in FLEET_METHODS]
+        self.contamination = contamination
+        self.lof_n_neighbors = lof_n_neighbors
+        self.dbscan_eps = dbscan_eps
+        self.dbscan_min_samples = dbscan_min_samples
+        self.random_state = random_state
+
+        self.fill_values: Optional[np.ndarray] = None
+        self.scaler: Optional[StandardScaler] = None
+        self.models: Dict[str, Any] = {}
+        self.n_samples = 0
+
+    @property
+    def is_fitted(self) -> bool:
+        """Whether fit has been called"""
+        return self.scaler is not None
+
+    def _transform(self, features: np.ndarray) -> np.ndarray:
+        """Fill missing values with the training means and scale"""
+        features = np.asarray(features, dtype=np.float64)
+        features = np.where(np.isnan(features), self.fill_values, features)
+        return self.scaler.transform(features)
+
+    def fit(self, features: np.ndarray, sample_size: Optional[int] = 100000) -> 'FleetAnomalyModel':
+        """
+        Fit the scaler and models on a fleet sample
+
+        Args:
+            features: Feature matrix of shape (n, n_features)
+            sample_size: Rows sampled for fitting (all rows if None). LOF and
+                DBSCAN are quadratic in the worst case, so keep this moderate.
+
+        Returns:
+            The fitted model
+        """
+        features = np.asarray(features, dtype=np.float64)
+        if sample_size is not None and len(features) > sample_size:
+            rng = np.random.default_rng(self.random_state)
+            features = features[rng.choice(len(features), sample_size, replace=False)]
+
+        self.fill_values = np.nan_to_num(np.nanmean(features, axis=0))
+        self.scaler = StandardScaler()
+        self.scaler.fit(np.where(np.isnan(features), self.fill_values, features))
+        scaled = self._transform(features)
+        self.n_samples = len(scaled)
+        self.models = {}
+
+        if 'isolation_forest' in self.methods:
+            self.models['isolation_forest'] = IsolationForest(
+                contamination=self.contamination,
+                random_state=self.random_state,
+                n_estimators=100
+            ).fit(scaled)
+
+        if 'lof' in self.methods and len(scaled) > 1:
+            self.models['lof'] = LocalOutlierFactor(
+                n_neighbors=min(self.lof_n_neighbors, len(scaled) - 1),
+                contamination=self.contamination,
+                novelty=True
+            ).fit(scaled)
+
+        if 'dbscan' in self.methods:
+            clustering = DBSCAN(eps=self.dbscan_eps, min_samples=self.dbscan_min_samples).fit(scaled)
+            core = scaled[clustering.core_sample_indices_]
+            if len(core):
+                self.models['dbscan'] = NearestNeighbors(n_neighbors=1).fit(core)
+            else:
+                logger.warning("DBSCAN found no core samples in the fleet sample; DBSCAN scoring disabled")
+
+        logger.info(f"Fleet anomaly model fitted on {self.n_samples} samples with {list(self.models)}")
+        return self
+
+    def predict(self, features: np.ndarray, methods: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Score rows with the fitted models
+
+        Args:
+            features: Feature matrix of shape (n, n_features)
+            methods: Methods to score (all fitted methods if None)
+
+        Returns:
+            Dictionary of method -> 0/1 anomaly flags
+        """
+        if not self.is_fitted:
+            raise ValueError("Fleet anomaly model is not fitted")
+
+        scaled = self._transform(features)
+        flags = {}
+        for method in methods or list(self.models):
+            model = self.models.get(method)
+            if model is None:
+                continue
+            if method == 'dbscan':
+                distances, _ = model.kneighbors(scaled)
+                flags[method] = (distances[:, 0] > self.dbscan_eps).astype(int)
+            else:
+                flags[method] = (model.predict(scaled) == -1).astype(int)
+        return flags
+
+    def predict_chunked(
+        self,
+        features: np.ndarray,
+        chunk_size: int = 100000,
+        n_jobs: int = 1
+    ) -> Dict[str, np.ndarray]:
+        """
+        Score many rows in chunks, optionally across a process pool
+
+        Args:
+            features: Feature matrix of shape (n, n_features)
+            chunk_size: Rows per chunk
+            n_jobs: Number of worker processes (-1 for all CPUs, 1 for in-process)
+
+        Returns:
+            Dictionary of method -> 0/1 anomaly flags
+        """
+        features = np.asarray(features, dtype=np.float64)
+        chunks = [features[start:start + chunk_size] for start in range(0, len(features), chunk_size)]
+        if not chunks:
+            return {method: np.zeros(0, dtype=int) for method in self.models}
+
+        workers = (os.cpu_count() or 1) if n_jobs == -1 else n_jobs
+        workers = min(workers, len(chunks))
+        if workers <= 1:
+            results = [self.predict(chunk) for chunk in chunks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,)) as executor:
+                results = list(executor.map(_predict_chunk, chunks))
+
+        return {method: np.concatenate([r[method] for r in results]) for method in results[0]}
@@ -0,0 +1,296 @@
+"""
+Streaming Statistics for Battery Anomaly Detection
+
+This module provides constant-memory statistics for scoring battery telemetry
+one point at a time: Welford running mean/variance and P² (Jain & Chlamtac)
+streaming quantile estimates, both vectorized over the telemetry signals.
+OnlineStatisticalDetector keeps one set of them per vehicle and flags points
+by z-score and by Tukey fences on the streaming quartiles, without holding
+any history. Its state is plain NumPy arrays so it can be saved with the
+detector's models.
+"""
+import logging
+from typing import Dict, List, Any
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class WelfordAccumulator:
+    """
+    Running mean and variance of several signals (Welford's algorithm)
+
+    NaN values are skipped per signal.
+    """
+
+    def __init__(self, n_signals: int):
+        """
+        Initialize the accumulator
+
+        Args:
+            n_signals: Number of signals tracked
+        """
+        self.count = np.zeros(n_signals, dtype=np.int64)
+        self.mean = np.zeros(n_signals, dtype=np.float64)
+        self.m2 = np.zeros(n_signals, dtype=np.float64)
+
+    def update(self, x: np.ndarray) -> None:
+        """
+        Add one observation per signal
+
+        Args:
+            x: Values of shape (n_signals,)
+        """
+        valid = np.isfinite(x)
+        x = np.where(valid, x, 0.0)
+        self.count += valid
+        delta = x - self.mean
+        self.mean += np.divide(delta, self.count, out=np.zeros_like(delta), where=valid)
+        self.m2 += np.where(valid, delta * (x - self.mean), 0.0)
+
+    def variance(self) -> np.ndarray:
+        """Sample variance per signal (NaN with fewer than two observations)"""
+        return np.divide(self.m2, self.count - 1, out=np.full_like(self.m2, np.nan), where=self.count > 1)
+
+    def std(self) -> np.ndarray:
+        """Sample standard deviation per signal"""
+        return np.sqrt(self.variance())
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        """Get the accumulator state"""
+        return {'count': self.count.copy(), 'mean': self.mean.copy(), 'm2': self.m2.copy()}
+
+    def set_state(self, state: Dict[str, np.ndarray]) -> None:
+        """Restore the accumulator state"""
+        self.count = np.asarray(state['count'], dtype=np.int64).copy()
+        self.mean = np.asarray(state['mean'], dtype=np.float64).copy()
+        self.m2 = np.asarray(state['m2'], dtype=np.float64).copy()
+
+
+class P2Quantile:
+    """
+    Streaming estimate of one quantile of several signals (P² algorithm)
+
+    Keeps five markers per signal and adjusts them with piecewise-parabolic
+    interpolation, so memory and update cost are constant. NaN values are
+    skipped per signal.
+    """
+
+    def __init__(self, p: float, n_signals: int):
+        """
+        Initialize the estimator
+
+        Args:
+            p: Quantile to estimate, in (0, 1)
+            n_signals: Number of signals tracked
+        """
+        self.p = p
+        self.count = np.zeros(n_signals, dtype=np.int64)
+        self.heights = np.zeros((n_signals, 5), dtype=np.float64)
+        self.positions = np.tile(np.arange(5, dtype=np.float64), (n_signals, 1))
+        self.desired = np.tile(np.array([0, 2 * p, 4 * p, 2 + 2 * p, 4]), (n_signals, 1))
+        self._increments = np.array([0, p / 2, p, (1 + p) / 2, 1])
+
+    def update(self, x: np.ndarray) -> None:
+        """
+        Add one observation per signal
+
+        Args:
+            x: Values of shape (n_signals,)
+        """
+        valid = np.isfinite(x)
+
+        # The first five observations become the initial markers
+        warming = valid & (self.count < 5)
+        for s in np.flatnonzero(warming):
+            self.heights[s, self.count[s]] = x[s]
+            self.count[s] += 1
+            if self.count[s] == 5:
+                self.heights[s].sort()
+
+        rows = np.flatnonzero(valid & ~warming)
+        if not len(rows):
+            return
+        self.count[rows] += 1
+
+        xs = x[rows]
+        q = self.heights[rows]
+        n = self.positions[rows]
+        desired = self.desired[rows] + self._increments
+
+        q[:, 0] = np.minimum(q[:, 0], xs)
+        q[:, 4] = np.maximum(q[:, 4], xs)
+        cell = (xs[:, np.newaxis] >= q[:, 1:4]).sum(axis=1)
+        n += np.arange(5)[np.newaxis, :] > cell[:, np.newaxis]
+
+        for i in (1, 2, 3):
+            d = desired[:, i] - n[:, i]
+            move = ((d >= 1) & (n[:, i + 1] - n[:, i] > 1)) | ((d <= -1) & (n[:, i - 1] - n[:, i] < -1))
+            if not move.any():
+                continue
+            step = np.sign(d)
+
+            parabolic = q[:, i] + step / (n[:, i + 1] - n[:, i - 1]) * (
+                (n[:, i] - n[:, i - 1] + step) * (q[:, i + 1] - q[:, i]) / (n[:, i + 1] - n[:, i]) +
+                (n[:, i + 1] - n[:, i] - step) * (q[:, i] - q[:, i - 1]) / (n[:, i] - n[:, i - 1])
+            )
+            neighbor_q = np.where(step > 0, q[:, i + 1], q[:, i - 1])
+            neighbor_n = np.where(step > 0, n[:, i + 1], n[:, i - 1])
+            with np.errstate(divide='ignore', invalid='ignore'):
+                linear = q[:, i] + step * (neighbor_q - q[:, i]) / (neighbor_n - n[:, i])
+            adjusted = np.where((q[:, i - 1] < parabolic) & (parabolic < q[:, i + 1]), parabolic, linear)
+
+            q[:, i] = np.where(move, adjusted, q[:, i])
+            n[:, i] = np.where(move, n[:, i] + step, n[:, i])
+
+        self.heights[rows] = q
+        self.positions[rows] = n
+        self.desired[rows] = desired
+
+    def value(self) -> np.ndarray:
+        """Current quantile estimate per signal (NaN before any observation)"""
+        result = self.heights[:, 2].copy()
+        for s in np.flatnonzero(self.count < 5):
+            seen = self.heights[s, :self.count[s]]
+            result[s] = np.quantile(seen, self.p) if len(seen) else np.nan
+        return result
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        """Get the estimator state"""
+        return {
+            'p': self.p,
+            'count': self.count.copy(),
+            'heights': self.heights.copy(),
+            'positions': self.positions.copy(),
+            'desired': self.desired.copy()
+        }
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        """Restore the estimator state"""
+        self.__init__(state['p'], len(state['count']))
+        self.count = np.asarray(state['count'], dtype=np.int64).copy()
+        self.heights = np.asarray(state['heights'], dtype=np.float64).copy()
+        self.positions = np.asarray(state['positions'], dtype=np.float64).copy()
+        self.desired = np.asarray(state['desired'], dtype=np.float64).copy()
+
+
+class OnlineStatisticalDetector:
+    """
+    Per-vehicle streaming z-score and IQR detector
+
+    Each point is scored against the statistics of the points before it and
+    then folded into them, in O(1) time and memory per vehicle.
+    """
+
+    def __init__(
+        self,
+        signals: List[str],
+        std_threshold: float = 2.5,
+        iqr_multiplier: float = 3.0,
+        min_points: int = 10
+    ):
+        """
+        Initialize the detector
+
+        Args:
+            signals: Names of the signals, in the order points are given
+            std_threshold: Z-score above which a point is anomalous
+            iqr_multiplier: Tukey fence width in interquartile ranges
+            min_points: Observations needed before a vehicle's points are scored
+        """
+        self.signals = list(signals)
+        self.std_threshold = std_threshold
+        self.iqr_multiplier = iqr_multiplier
+        self.min_points = min_points
+        self.vehicles: Dict[Any, Dict[str, Any]] = {}
+
+    def _vehicle_state(self, vehicle_id: Any) -> Dict[str, Any]:
+        """Get or create the statistics of a vehicle"""
+        state = self.vehicles.get(vehicle_id)
+        if state is None:
+            n_signals = len(self.signals)
+            state = {
+                'moments': WelfordAccumulator(n_signals),
+                'q1': P2Quantile(0.25, n_signals),
+                'q3': P2Quantile(0.75, n_signals)
+            }
+            self.vehicles[vehicle_id] = state
+        return state
+
+    def score(self, vehicle_id: Any, point: np.ndarray, update: bool = True) -> Dict[str, Any]:
+        """
+        Score a point and fold it into the vehicle's statistics
+
+        Args:
+            vehicle_id: ID of the vehicle
+            point: Values of shape (n_signals,) in self.signals order
+            update: Whether to add the point to the statistics after scoring
+
+        Returns:
+            Dictionary with the overall flag, per-signal z-scores, the
+            per-signal IQR outlier mask and the pre-update mean and std
+        """
+        point = np.asarray(point, dtype=np.float64)
+        state = self._vehicle_state(vehicle_id)
+        moments = state['moments']
+
+        mean = moments.mean.copy()
+        std = moments.std()
+        z_scores = np.full(len(point), np.nan)
+        iqr_outlier = np.zeros(len(point), dtype=bool)
+
+        ready = moments.count >= self.min_points
+        if ready.any():
+            with np.errstate(divide='ignore', invalid='ignore'):
+                z_scores = np.where(ready, np.abs(point - mean) / std, np.nan)
+            q1, q3 = state['q1'].value(), state['q3'].value()
+            fence = self.iqr_multiplier * (q3 - q1)
+            iqr_outlier = ready & ((point < q1 - fence) | (point > q3 + fence))
+
+        z_outlier = np.nan_to_num(z_scores, nan=0.0, posinf=0.0) > self.std_threshold
+        if update:
+            moments.update(point)
+            state['q1'].update(point)
+            state['q3'].update(point)
+
+        return {
+            'is_anomaly': bool((z_outlier | iqr_outlier).any()),
+            'z_scores': z_scores,
+            'iqr_outlier': iqr_outlier,
+            'mean': mean,
+            'std': std
+        }
+
+    def get_state(self) -> Dict[str, Any]:
+        """
+        Get the detector state for persistence
+
+        Returns:
+            Dictionary of plain NumPy arrays per vehicle
+        """
+        return {
+            'signals': self.signals,
+            'vehicles': {
+                vehicle_id: {name: stat.get_state() for name, stat in state.items()}
+                for vehicle_id, state in self.vehicles.items()
+            }
+        }
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        """
+        Restore a state returned by get_state
+
+        Args:
+            state: Saved detector state
+        """
+        if list(state.get('signals', self.signals)) != self.signals:
+            logger.warning(f"Ignoring online detector state for signals {state.get('signals')}")
+            return
+        self.vehicles = {}
+        for vehicle_id, saved in state.get('vehicles', {}).items():
+            restored = self._vehicle_state(vehicle_id)
+            for name, stat_state in saved.items():
+                restored[name].set_state(stat_state)
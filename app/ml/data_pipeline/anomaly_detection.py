@@ -3,13 +3,15 @@ Real-time Anomaly Detection Pipeline
 
 This module implements a real-time anomaly detection pipeline that integrates
 with the BatteryAnomalyDetector to process telemetry data streams and detect
-anomalies in EV battery and charging systems.
+anomalies in EV battery and charging systems. Each vehicle has a fixed-size
+ring buffer with running window statistics, and every arriving record is scored
+on its own against them, so the per-record cost does not grow with the buffer.
+Detected anomalies are kept in an indexed AnomalyStore under the storage path.
 """
 import os
 import sys
 import logging
 import asyncio
-import json
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Any, Union, Callable
 from pathlib import Path
@@ -21,6 +23,8 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent))
 
 from app.ml.anomaly_detection.battery_anomaly_detector import BatteryAnomalyDetector
 from app.ml.data_pipeline.telemetry_ingestion import TelemetryProcessor
+from app.ml.data_pipeline.vehicle_buffer import VehicleRingBuffer
+from app.ml.data_pipeline.anomaly_store import AnomalyStore
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -36,6 +40,9 @@ class AnomalyDetectionPipeline:
     charging patterns, and vehicle operation.
     """
     
+    # Minimum window size before records are scored (needed for statistics)
+    MIN_WINDOW_POINTS = 10
+    
     def __init__(
         self,
         model_path: Optional[str] = None,
@@ -45,7 +52,8 @@ class AnomalyDetectionPipeline:
         alert_threshold: float = 0.7,
         storage_path: str = 'data/anomalies',
         strict_mode: bool = False,
-        notification_callbacks: List[Callable] = None
+        notification_callbacks: List[Callable] = None,
+        online_statistics: bool = False
     ):
         """
         Initialize the anomaly detection pipeline
@@ -53,12 +61,15 @@ class AnomalyDetectionPipeline:
         Args:
             model_path: Path to a trained anomaly detection model
             detection_methods: List of detection methods to use
-            buffer_size: Number of data points to buffer for analysis
+            buffer_size: Number of data points kept per vehicle for window statistics
             sliding_window: Size of the sliding window for detection (hours)
             alert_threshold: Threshold for triggering alerts (0-1)
             storage_path: Path to store detected anomalies
             strict_mode: Whether to use strict detection thresholds
             notification_callbacks: Callbacks for alerts
+            online_statistics: Score records with the detector's per-vehicle
+                streaming statistics (Welford / P² quantiles) instead of
+                keeping ring buffers
         """
         # Initialize parameters
         self.buffer_size = buffer_size
@@ -66,6 +77,7 @@ class AnomalyDetectionPipeline:
         self.alert_threshold = alert_threshold
         self.storage_path = storage_path
         self.notification_callbacks = notification_callbacks or []
+        self.online_statistics = online_statistics
         
         # Set default detection methods if not provided
         detection_methods = detection_methods or [
@@ -81,12 +93,14 @@ class AnomalyDetectionPipeline:
         )
         
         # Initialize data buffers
-        self.telemetry_buffer = {}  # Dict of vehicle_id -> DataFrame
-        self.detected_anomalies = {}  # Dict of vehicle_id -> List of anomalies
+        self.telemetry_buffer: Dict[str, VehicleRingBuffer] = {}
         
         # Ensure storage directory exists
         os.makedirs(storage_path, exist_ok=True)
         
+        # Detected anomalies, indexed by vehicle, time and type
+        self.anomaly_store = AnomalyStore(os.path.join(storage_path, 'anomalies.db'))
+        
         logger.info(f"Anomaly detection pipeline initialized with {len(detection_methods)} methods")
     
     def connect_to_telemetry_processor(self, processor: TelemetryProcessor) -> None:
@@ -120,22 +134,26 @@ class AnomalyDetectionPipeline:
         if not vehicle_id:
             return
         
-        # Add data to buffer
-        if vehicle_id not in self.telemetry_buffer:
-            self.telemetry_buffer[vehicle_id] = pd.DataFrame([data])
-        else:
-            self.telemetry_buffer[vehicle_id] = pd.concat([
-                self.telemetry_buffer[vehicle_id],
-                pd.DataFrame([data])
-            ])
-        
-        # Limit buffer size
-        if len(self.telemetry_buffer[vehicle_id]) > self.buffer_size:
-            self.telemetry_buffer[vehicle_id] = self.telemetry_buffer[vehicle_id].iloc[-self.buffer_size:]
-        
-        # Only run detection when we have enough data
-        if len(self.telemetry_buffer[vehicle_id]) >= 10:  # Minimum required for statistical methods
-            self._detect_anomalies(vehicle_id)
+        point = np.array([
+            data.get(col) if data.get(col) is not None else np.nan
+            for col in self.detector.FEATURE_COLUMNS
+        ], dtype=np.float64)
+        timestamp = pd.Timestamp(data.get('timestamp') or datetime.now())
+        
+        if self.online_statistics:
+            self._score_point(vehicle_id, None, timestamp, point, data.get('charging_status'))
+            return
+        
+        buffer = self.telemetry_buffer.get(vehicle_id)
+        if buffer is None:
+            buffer = VehicleRingBuffer(self.buffer_size, self.detector.FEATURE_COLUMNS)
+            self.telemetry_buffer[vehicle_id] = buffer
+        
+        # Score the new point against the window before it joins it
+        if len(buffer) >= self.MIN_WINDOW_POINTS:
+            self._score_point(vehicle_id, buffer, timestamp, point, data.get('charging_status'))
+        
+        buffer.append(timestamp.value, point)
     
     def _handle_telemetry_anomaly(self, anomaly: Dict) -> None:
         """
@@ -149,10 +167,7 @@ class AnomalyDetectionPipeline:
             return
         
         # Add to detected anomalies
-        if vehicle_id not in self.detected_anomalies:
-            self.detected_anomalies[vehicle_id] = []
-        
-        self.detected_anomalies[vehicle_id].append({
+        self._save_anomaly({
             **anomaly,
             'detection_source': 'telemetry_processor',
             'detection_time': datetime.now().isoformat()
@@ -161,77 +176,78 @@ class AnomalyDetectionPipeline:
         # Send notifications
         self._send_notifications(vehicle_id, anomaly)
     
-    def _detect_anomalies(self, vehicle_id: str) -> None:
+    def _score_point(
+        self,
+        vehicle_id: str,
+        buffer: Optional[VehicleRingBuffer],
+        timestamp: pd.Timestamp,
+        point: np.ndarray,
+        charging_status: Optional[int]
+    ) -> None:
         """
-        Run anomaly detection for a specific vehicle
+        Score a newly arrived point against a vehicle's window statistics
         
         Args:
-            vehicle_id: ID of the vehicle to analyze
+            vehicle_id: ID of the vehicle
+            buffer: Ring buffer of the vehicle (not yet containing the point),
+                or None to use the detector's streaming statistics
+            timestamp: Timestamp of the point
+            point: Feature values in BatteryAnomalyDetector.FEATURE_COLUMNS order
+            charging_status: Charging status of the point
         """
-        # Get buffer data for the vehicle
-        vehicle_data = self.telemetry_buffer[vehicle_id].copy()
-        
-        # Ensure timestamp is datetime
-        if 'timestamp' in vehicle_data.columns and not pd.api.types.is_datetime64_dtype(vehicle_data['timestamp']):
-            vehicle_data['timestamp'] = pd.to_datetime(vehicle_data['timestamp'])
-        
-        # Sort by timestamp
-        if 'timestamp' in vehicle_data.columns:
-            vehicle_data = vehicle_data.sort_values('timestamp')
-        
-        # Run detection
         try:
-            result = self.detector.detect_anomalies(vehicle_data)
-            
-            # Extract anomalies
-            anomalies = result[result['is_anomaly'] == 1]
-            
-            if len(anomalies) > 0:
-                # Process new anomalies
-                self._process_detected_anomalies(vehicle_id, anomalies)
+            if buffer is None:
+                result = self.detector.score_online(vehicle_id, point, charging_status)
+            else:
+                charging = np.array([charging_status]) if charging_status is not None else None
+                result = self.detector.score_points(point[np.newaxis, :], charging, buffer.mean(), buffer.std())
         except Exception as e:
             logger.error(f"Error detecting anomalies for vehicle {vehicle_id}: {str(e)}")
+            return
+        
+        if result['is_anomaly'][0] != 1:
+            return
+        
+        row = {col: value for col, value in zip(self.detector.FEATURE_COLUMNS, point)}
+        row['timestamp'] = timestamp
+        if charging_status is not None:
+            row['charging_status'] = charging_status
+        row['anomaly_severity'] = str(result['anomaly_severity'][0])
+        for method in self.detector.detection_methods:
+            row[f'anomaly_{method}'] = int(result[f'anomaly_{method}'][0])
+        self._record_anomaly(vehicle_id, row)
     
-    def _process_detected_anomalies(self, vehicle_id: str, anomalies: pd.DataFrame) -> None:
+    def _record_anomaly(self, vehicle_id: str, row: Union[Dict, pd.Series]) -> None:
         """
-        Process detected anomalies
+        Record, store and notify a single detected anomaly
         
         Args:
             vehicle_id: ID of the vehicle
-            anomalies: DataFrame with detected anomalies
+            row: Detection result row with telemetry values and anomaly flags
         """
-        # Initialize anomalies list if needed
-        if vehicle_id not in self.detected_anomalies:
-            self.detected_anomalies[vehicle_id] = []
-        
-        # Process each anomaly
-        for _, row in anomalies.iterrows():
-            # Create anomaly record
-            anomaly_record = {
-                'vehicle_id': vehicle_id,
-                'timestamp': row['timestamp'].isoformat() if 'timestamp' in row else datetime.now().isoformat(),
-                'anomaly_type': 'battery_anomaly',
-                'severity': row['anomaly_severity'] if 'anomaly_severity' in row else 'medium',
-                'detection_methods': [method for method in self.detector.detection_methods
-                                     if f'anomaly_{method}' in row and row[f'anomaly_{method}'] == 1],
-                'detection_source': 'battery_anomaly_detector',
-                'detection_time': datetime.now().isoformat(),
-                'metrics': {}
-            }
-            
-            # Add metrics
-            for col in ['state_of_charge', 'battery_temp', 'voltage', 'current', 'charging_status']:
-                if col in row:
-                    anomaly_record['metrics'][col] = float(row[col])
-            
-            # Add to detected anomalies
-            self.detected_anomalies[vehicle_id].append(anomaly_record)
-            
-            # Save anomaly to storage
-            self._save_anomaly(anomaly_record)
-            
-            # Send notifications
-            self._send_notifications(vehicle_id, anomaly_record)
+        # Create anomaly record
+        anomaly_record = {
+            'vehicle_id': vehicle_id,
+            'timestamp': row['timestamp'].isoformat() if 'timestamp' in row else datetime.now().isoformat(),
+            'anomaly_type': 'battery_anomaly',
+            'severity': row['anomaly_severity'] if 'anomaly_severity' in row else 'medium',
+            'detection_methods': [method for method in self.detector.detection_methods
+                                 if f'anomaly_{method}' in row and row[f'anomaly_{method}'] == 1],
+            'detection_source': 'battery_anomaly_detector',
+            'detection_time': datetime.now().isoformat(),
+            'metrics': {}
+        }
+        
+        # Add metrics
+        for col in ['state_of_charge', 'battery_temp', 'voltage', 'current', 'charging_status']:
+            if col in row:
+                anomaly_record['metrics'][col] = float(row[col])
+        
+        # Save anomaly to storage
+        self._save_anomaly(anomaly_record)
+        
+        # Send notifications
+        self._send_notifications(vehicle_id, anomaly_record)
     
     def _save_anomaly(self, anomaly: Dict) -> None:
         """
@@ -241,18 +257,7 @@ class AnomalyDetectionPipeline:
             anomaly: Anomaly information
         """
         try:
-            # Create filename based on timestamp and vehicle
-            timestamp = anomaly.get('detection_time', datetime.now().isoformat())
-            timestamp = timestamp.replace(':', '-').replace('.', '-')
-            vehicle_id = anomaly.get('vehicle_id', 'unknown')
-            
-            filename = f"{timestamp}_{vehicle_id}.json"
-            filepath = os.path.join(self.storage_path, filename)
-            
-            # Save to file
-            with open(filepath, 'w') as f:
-                json.dump(anomaly, f, indent=2)
-                
+            self.anomaly_store.add(anomaly)
         except Exception as e:
             logger.error(f"Error saving anomaly: {str(e)}")
     
@@ -314,32 +319,14 @@ class AnomalyDetectionPipeline:
         Returns:
             List of anomaly records
         """
-        if vehicle_id not in self.detected_anomalies:
-            return []
-        
-        anomalies = self.detected_anomalies[vehicle_id]
-        
-        # Apply time range filter
-        if time_range:
-            start_time, end_time = time_range
-            anomalies = [
-                a for a in anomalies
-                if start_time <= datetime.fromisoformat(a['timestamp'].replace('Z', '+00:00')) <= end_time
-            ]
-        
-        # Apply severity filter
-        if severity:
-            anomalies = [a for a in anomalies if a.get('severity') == severity]
-        
-        # Sort by timestamp (most recent first)
-        anomalies = sorted(
-            anomalies,
-            key=lambda a: a.get('timestamp', ''),
-            reverse=True
+        start_time, end_time = time_range if time_range else (None, None)
+        return self.anomaly_store.query(
+            vehicle_id=vehicle_id,
+            start_time=start_time,
+            end_time=end_time,
+            severity=severity,
+            limit=limit
         )
-        
-        # Apply limit
-        return anomalies[:limit]
     
     def get_anomaly_stats(self) -> Dict[str, Any]:
         """
@@ -348,41 +335,21 @@ class AnomalyDetectionPipeline:
         Returns:
             Dictionary with anomaly statistics
         """
-        total_anomalies = sum(len(anomalies) for anomalies in self.detected_anomalies.values())
-        
-        # Count by severity
         severity_counts = {'high': 0, 'medium': 0, 'low': 0, 'unknown': 0}
-        for vehicle_anomalies in self.detected_anomalies.values():
-            for anomaly in vehicle_anomalies:
-                severity = anomaly.get('severity', 'unknown')
-                severity_counts[severity] = severity_counts.get(severity, 0) + 1
-        
-        # Count by vehicle
-        vehicle_counts = {
-            vehicle_id: len(anomalies)
-            for vehicle_id, anomalies in self.detected_anomalies.items()
-        }
+        vehicle_counts: Dict[str, int] = {}
+        for vehicle_id, _, severity, count in self.anomaly_store.counts():
+            severity_counts[severity] = severity_counts.get(severity, 0) + count
+            vehicle_counts[vehicle_id] = vehicle_counts.get(vehicle_id, 0) + count
         
         # Get recent anomalies (last 24 hours)
-        now = datetime.now()
-        day_ago = now - timedelta(hours=24)
-        
-        recent_count = 0
-        for vehicle_anomalies in self.detected_anomalies.values():
-            for anomaly in vehicle_anomalies:
-                try:
-                    anomaly_time = datetime.fromisoformat(anomaly['timestamp'].replace('Z', '+00:00'))
-                    if anomaly_time >= day_ago:
-                        recent_count += 1
-                except (ValueError, KeyError):
-                    pass
+        day_ago = datetime.now() - timedelta(hours=24)
         
         return {
-            'total_anomalies': total_anomalies,
+            'total_anomalies': sum(vehicle_counts.values()),
             'by_severity': severity_counts,
             'by_vehicle': vehicle_counts,
-            'recent_24h': recent_count,
-            'vehicle_count': len(self.detected_anomalies)
+            'recent_24h': self.anomaly_store.count(since=day_ago),
+            'vehicle_count': len(vehicle_counts)
         }
     
     def analyze_vehicle_anomalies(self, vehicle_id: str) -> Dict[str, Any]:
@@ -395,75 +362,43 @@ class AnomalyDetectionPipeline:
         Returns:
             Dictionary with analysis results
         """
-        if vehicle_id not in self.detected_anomalies or not self.detected_anomalies[vehicle_id]:
+        counts = self.anomaly_store.counts(vehicle_id)
+        if not counts:
             return {
                 'vehicle_id': vehicle_id,
                 'anomaly_count': 0,
                 'analysis': 'No anomalies detected for this vehicle'
             }
         
-        anomalies = self.detected_anomalies[vehicle_id]
-        
-        # Count by type
+        # Count by type and severity
         type_counts = {}
-        for anomaly in anomalies:
-            anomaly_type = anomaly.get('anomaly_type', 'unknown')
-            type_counts[anomaly_type] = type_counts.get(anomaly_type, 0) + 1
-        
-        # Find most common metrics involved
-        metrics_involved = {}
-        for anomaly in anomalies:
-            metrics = anomaly.get('metrics', {})
-            for metric, value in metrics.items():
-                if metric not in metrics_involved:
-                    metrics_involved[metric] = []
-                metrics_involved[metric].append(value)
-        
-        # Calculate statistics for each metric
-        metric_stats = {}
-        for metric, values in metrics_involved.items():
-            if values:
-                metric_stats[metric] = {
-                    'mean': np.mean(values),
-                    'min': np.min(values),
-                    'max': np.max(values),
-                    'std': np.std(values) if len(values) > 1 else 0
-                }
+        severity_distribution = {'high': 0, 'medium': 0, 'low': 0}
+        for _, anomaly_type, severity, count in counts:
+            type_counts[anomaly_type] = type_counts.get(anomaly_type, 0) + count
+            if severity in severity_distribution:
+                severity_distribution[severity] += count
         
         # Analyze trends over time
-        timestamps = []
-        for anomaly in anomalies:
-            try:
-                timestamps.append(datetime.fromisoformat(anomaly['timestamp'].replace('Z', '+00:00')))
-            except (ValueError, KeyError):
-                pass
-        
         timestamp_trend = None
-        if timestamps:
-            timestamps.sort()
-            first_time = timestamps[0]
-            last_time = timestamps[-1]
-            duration = (last_time - first_time).total_seconds() / 3600  # hours
-            
-            if duration > 0:
-                frequency = len(timestamps) / duration  # anomalies per hour
-                timestamp_trend = {
-                    'first_anomaly': first_time.isoformat(),
-                    'last_anomaly': last_time.isoformat(),
-                    'duration_hours': duration,
-                    'frequency': frequency
-                }
+        first_time, last_time = self.anomaly_store.time_range(vehicle_id)
+        duration = (last_time - first_time).total_seconds() / 3600  # hours
+        anomaly_count = sum(type_counts.values())
+        
+        if duration > 0:
+            timestamp_trend = {
+                'first_anomaly': first_time.isoformat(),
+                'last_anomaly': last_time.isoformat(),
+                'duration_hours': duration,
+                'frequency': anomaly_count / duration  # anomalies per hour
+            }
         
         return {
             'vehicle_id': vehicle_id,
-            'anomaly_count': len(anomalies),
+            'anomaly_count': anomaly_count,
             'by_type': type_counts,
-            'metric_stats': metric_stats,
+            'metric_stats': self.anomaly_store.metric_stats(vehicle_id),
             'time_trend': timestamp_trend,
-            'severity_distribution': {
-                severity: len([a for a in anomalies if a.get('severity') == severity])
-                for severity in ['high', 'medium', 'low']
-            }
+            'severity_distribution': severity_distribution
         }
     
     def clear_old_anomalies(self, days_to_keep: int = 30) -> int:
@@ -477,20 +412,7 @@ class AnomalyDetectionPipeline:
             Number of anomalies cleared
         """
         cutoff_date = datetime.now() - timedelta(days=days_to_keep)
-        cleared_count = 0
-        
-        for vehicle_id in self.detected_anomalies:
-            old_count = len(self.detected_anomalies[vehicle_id])
-            
-            self.detected_anomalies[vehicle_id] = [
-                a for a in self.detected_anomalies[vehicle_id]
-                if 'timestamp' in a and 
-                datetime.fromisoformat(a['timestamp'].replace('Z', '+00:00')) >= cutoff_date
-            ]
-            
-            cleared_count += old_count - len(self.detected_anomalies[vehicle_id])
-        
-        return cleared_count
+        return self.anomaly_store.prune(cutoff_date)
 
 
 # Example usage
@@ -0,0 +1,256 @@
+"""
+Threshold Anomaly Rules
+
+This module implements the rule-based anomaly checks of the telemetry
+ingestion path. Rules are plain config dicts (loadable from JSON) and are
+evaluated over a whole column batch with NumPy boolean masks; only rows that
+trip a rule are turned into anomaly dicts. Logging is rate limited so a burst
+of anomalies from a faulty sensor does not flood the log or stall ingestion.
+
+A rule looks like
+
+    {
+        'anomaly_type': 'high_temperature',
+        'column': 'battery_temp',
+        'op': '>',
+        'threshold': 50,
+        'severity': 'medium',
+        'escalate': {'op': '>', 'threshold': 60, 'severity': 'high'},  # optional
+        'when': {'charging_status': 1}                                 # optional
+    }
+"""
+import json
+import time
+import logging
+import threading
+from typing import Dict, List, Optional, Any, Union
+
+import numpy as np
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+RULE_OPERATORS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+}
+
+# Same checks as the original per-record implementation
+DEFAULT_BATTERY_ANOMALY_RULES: List[Dict[str, Any]] = [
+    {
+        'anomaly_type': 'high_temperature',
+        'column': 'battery_temp',
+        'op': '>',
+        'threshold': 50,
+        'severity': 'medium',
+        'escalate': {'op': '>', 'threshold': 60, 'severity': 'high'}
+    },
+    {
+        'anomaly_type': 'low_temperature',
+        'column': 'battery_temp',
+        'op': '<',
+        'threshold': 0,
+        'severity': 'medium',
+        'escalate': {'op': '<', 'threshold': -10, 'severity': 'high'}
+    },
+    {
+        # Depends on battery configuration
+        'anomaly_type': 'low_voltage',
+        'column': 'voltage',
+        'op': '<',
+        'threshold': 300,
+        'severity': 'medium'
+    },
+    {
+        'anomaly_type': 'negative_charging_current',
+        'column': 'current',
+        'op': '<',
+        'threshold': 0,
+        'severity': 'high',
+        'when': {'charging_status': 1}
+    },
+    {
+        'anomaly_type': 'positive_discharging_current',
+        'column': 'current',
+        'op': '>',
+        'threshold': 0,
+        'severity': 'high',
+        'when': {'charging_status': 0}
+    },
+]
+
+
+def load_anomaly_rules(source: Union[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Load and validate anomaly rules
+
+    Args:
+        source: Path to a JSON file holding a list of rules (or an object with
+            a 'rules' key), or the list of rules itself
+
+    Returns:
+        List of validated rules
+    """
+    if isinstance(source, str):
+        with open(source, 'r') as f:
+            source = json.load(f)
+        if isinstance(source, dict):
+            source = source.get('rules', [])
+
+    rules = []
+    for rule in source:
+        for key in ('anomaly_type', 'column', 'op', 'threshold'):
+            if key not in rule:
+                raise ValueError(f"Anomaly rule is missing '{key}': {rule}")
+        for op in [rule['op']] + ([rule['escalate']['op']] if 'escalate' in rule else []):
+            if op not in RULE_OPERATORS:
+                raise ValueError(f"Unknown rule operator: {op}. Available operators: {list(RULE_OPERATORS)}")
+        rules.append(dict(rule, severity=rule.get('severity', 'medium')))
+    return rules
+
+
+class AnomalyRuleEngine:
+    """
+    Vectorized evaluator for threshold anomaly rules
+
+    Evaluates every rule over a column batch at once and logs detected
+    anomalies with a per-interval cap, summarizing what was suppressed.
+    """
+
+    def __init__(
+        self,
+        rules: Optional[List[Dict[str, Any]]] = None,
+        log_interval: float = 60.0,  # seconds
+        max_logs_per_interval: int = 10
+    ):
+        """
+        Initialize the rule engine
+
+        Args:
+            rules: Anomaly rules (defaults to DEFAULT_BATTERY_ANOMALY_RULES)
+            log_interval: Length of the log rate-limiting window
+            max_logs_per_interval: Anomalies logged individually per window
+        """
+        self.rules = load_anomaly_rules(rules if rules is not None else DEFAULT_BATTERY_ANOMALY_RULES)
+        self.log_interval = log_interval
+        self.max_logs_per_interval = max_logs_per_interval
+
+        self.counts: Dict[str, int] = {rule['anomaly_type']: 0 for rule in self.rules}
+        self._window_start = time.time()
+        self._window_logged = 0
+        self._window_suppressed = 0
+        self._lock = threading.Lock()
+
+    def evaluate(self, columns: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+        """
+        Evaluate all rules over a column batch
+
+        Args:
+            columns: Typed telemetry columns (vehicle_id, timestamp and the
+                columns referenced by the rules)
+
+        Returns:
+            Anomaly dicts ordered by row, then by rule
+        """
+        row_hits = []
+        rule_hits = []
+        severities = []
+        for index, rule in enumerate(self.rules):
+            values = columns.get(rule['column'])
+            if values is None:
+                continue
+            mask = RULE_OPERATORS[rule['op']](values, rule['threshold'])
+            for column, expected in rule.get('when', {}).items():
+                if column not in columns:
+                    mask = np.zeros_like(mask)
+                    break
+                mask &= columns[column] == expected
+
+            rows = np.flatnonzero(mask)
+            if not len(rows):
+                continue
+
+            severity = np.full(len(rows), rule['severity'], dtype=object)
+            escalate = rule.get('escalate')
+            if escalate is not None:
+                severity[RULE_OPERATORS[escalate['op']](values[rows], escalate['threshold'])] = escalate['severity']
+
+            row_hits.append(rows)
+            rule_hits.append(np.full(len(rows), index))
+            severities.append(severity)
+
+        if not row_hits:
+            return []
+
+        rows = np.concatenate(row_hits)
+        rule_indices = np.concatenate(rule_hits)
+        severity = np.concatenate(severities)
+        order = np.lexsort((rule_indices, rows))
+        rows, rule_indices, severity = rows[order], rule_indices[order], severity[order]
+
+        vehicle_ids = np.asarray(columns['vehicle_id'])[rows].tolist()
+        timestamps = pd.to_datetime(columns['timestamp'][rows]).to_pydatetime()
+
+        anomalies = []
+        for i, (row, index) in enumerate(zip(rows.tolist(), rule_indices.tolist())):
+            rule = self.rules[index]
+            value = columns[rule['column']][row]
+            anomalies.append({
+                'vehicle_id': vehicle_ids[i],
+                'timestamp': timestamps[i],
+                'anomaly_type': rule['anomaly_type'],
+                'value': value.item() if isinstance(value, np.generic) else value,
+                'threshold': rule['threshold'],
+                'severity': severity[i]
+            })
+
+        with self._lock:
+            for index, count in zip(*np.unique(rule_indices, return_counts=True)):
+                self.counts[self.rules[index]['anomaly_type']] += int(count)
+        return anomalies
+
+    def log(self, anomalies: List[Dict[str, Any]]) -> None:
+        """
+        Log anomalies, at most max_logs_per_interval per log_interval
+
+        Args:
+            anomalies: Anomalies returned by evaluate
+        """
+        if not anomalies:
+            return
+
+        with self._lock:
+            now = time.time()
+            if now - self._window_start >= self.log_interval:
+                if self._window_suppressed:
+                    logger.warning(f"Suppressed {self._window_suppressed} anomaly log messages "
+                                   f"in the last {now - self._window_start:.0f}s")
+                self._window_start = now
+                self._window_logged = 0
+                self._window_suppressed = 0
+
+            allowed = max(0, self.max_logs_per_interval - self._window_logged)
+            self._window_logged += min(allowed, len(anomalies))
+            self._window_suppressed += max(0, len(anomalies) - allowed)
+
+        for anomaly in anomalies[:allowed]:
+            logger.warning(f"Anomaly detected: {anomaly}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get rule engine statistics
+
+        Returns:
+            Dictionary with anomaly counts per type and the suppressed log count
+        """
+        with self._lock:
+            return {
+                'counts': dict(self.counts),
+                'suppressed_logs': self._window_suppressed
+            }
@@ -0,0 +1,342 @@
+"""
+Anomaly Store
+
+This module implements the embedded store for anomalies detected by the
+anomaly detection pipeline. Anomalies are kept in a SQLite database in WAL mode
+with indexes on (vehicle, time), (vehicle, severity, time), (type, time) and
+time, so vehicle and time-range queries and retention pruning are index range
+scans rather than passes over the whole history. Counts by vehicle, type and
+severity are maintained in a summary table as anomalies are added and pruned,
+and the battery metrics are stored as columns so per-vehicle metric statistics
+are computed by SQL aggregates.
+"""
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Metrics stored as columns for SQL aggregates
+METRIC_COLUMNS = ['state_of_charge', 'battery_temp', 'voltage', 'current', 'charging_status']
+
+_SCHEMA = [
+    f"""
+    CREATE TABLE IF NOT EXISTS anomalies (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        vehicle_id TEXT NOT NULL,
+        ts INTEGER NOT NULL,
+        anomaly_type TEXT NOT NULL,
+        severity TEXT NOT NULL,
+        {', '.join(f'{col} REAL' for col in METRIC_COLUMNS)},
+        record TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_anomalies_vehicle_ts ON anomalies (vehicle_id, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_anomalies_vehicle_severity_ts ON anomalies (vehicle_id, severity, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_anomalies_type_ts ON anomalies (anomaly_type, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_anomalies_ts ON anomalies (ts)",
+    """
+    CREATE TABLE IF NOT EXISTS anomaly_counts (
+        vehicle_id TEXT NOT NULL,
+        anomaly_type TEXT NOT NULL,
+        severity TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (vehicle_id, anomaly_type, severity)
+    )
+    """,
+]
+
+
+def _to_epoch_us(value: Any) -> Optional[int]:
+    """Convert a timestamp (ISO string, datetime) to naive-UTC epoch microseconds"""
+    if value is None:
+        return None
+    try:
+        ts = pd.Timestamp(value.replace('Z', '+00:00') if isinstance(value, str) else value)
+    except (ValueError, TypeError):
+        return None
+    if ts is pd.NaT:
+        return None
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return ts.value // 1000
+
+
+def _json_default(value: Any) -> Any:
+    """JSON encoder for NumPy scalars and timestamps in anomaly records"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return value.isoformat()
+    return str(value)
+
+
+class AnomalyStore:
+    """
+    Indexed, persistent store of detected anomalies
+
+    One connection is shared behind a lock; WAL mode lets other processes read
+    the database while the pipeline writes to it.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Open (or create) the anomaly store
+
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+
+        self.added_count = 0
+        self.pruned_count = 0
+
+    def _row(self, anomaly: Dict[str, Any]) -> Tuple:
+        """Build the table row for an anomaly record"""
+        ts = _to_epoch_us(anomaly.get('timestamp'))
+        if ts is None:
+            ts = _to_epoch_us(anomaly.get('detection_time')) or _to_epoch_us(datetime.now())
+        metrics = anomaly.get('metrics') or {}
+        return (
+            str(anomaly.get('vehicle_id')),
+            ts,
+            anomaly.get('anomaly_type', 'unknown'),
+            anomaly.get('severity') or 'unknown',
+            *[metrics.get(col) for col in METRIC_COLUMNS],
+            json.dumps(anomaly, default=_json_default)
+        )
+
+    def add_many(self, anomalies: List[Dict[str, Any]]) -> None:
+        """
+        Add anomaly records in one transaction
+
+        Args:
+            anomalies: Anomaly records (vehicle_id, timestamp, anomaly_type,
+                severity and optional metrics)
+        """
+        if not anomalies:
+            return
+        rows = [self._row(anomaly) for anomaly in anomalies]
+        counts: Dict[Tuple[str, str, str], int] = {}
+        for row in rows:
+            key = (row[0], row[2], row[3])
+            counts[key] = counts.get(key, 0) + 1
+
+        columns = ['vehicle_id', 'ts', 'anomaly_type', 'severity'] + METRIC_COLUMNS + ['record']
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO anomalies ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                rows
+            )
+            self._conn.executemany(
+                "INSERT INTO anomaly_counts (vehicle_id, anomaly_type, severity, count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (vehicle_id, anomaly_type, severity) DO UPDATE SET count = count + excluded.count",
+                [(*key, count) for key, count in counts.items()]
+            )
+            self.added_count += len(rows)
+
+    def add(self, anomaly: Dict[str, Any]) -> None:
+        """
+        Add a single anomaly record
+
+        Args:
+            anomaly: Anomaly record
+        """
+        self.add_many([anomaly])
+
+    def query(
+        self,
+        vehicle_id: Optional[str] = None,
+        start_time: Optional[Any] = None,
+        end_time: Optional[Any] = None,
+        severity: Optional[str] = None,
+        anomaly_type: Optional[str] = None,
+        limit: Optional[int] = 100
+    ) -> List[Dict[str, Any]]:
+        """
+        Get anomaly records, most recent first
+
+        Args:
+            vehicle_id: Optional vehicle filter
+            start_time: Optional inclusive start of the time range
+            end_time: Optional inclusive end of the time range
+            severity: Optional severity filter
+            anomaly_type: Optional anomaly type filter
+            limit: Maximum number of records (all if None)
+
+        Returns:
+            List of anomaly records
+        """
+        conditions = []
+        params: List[Any] = []
+        for column, value in (('vehicle_id', vehicle_id), ('severity', severity), ('anomaly_type', anomaly_type)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if start_time is not None:
+            conditions.append("ts >= ?")
+            params.append(_to_epoch_us(start_time))
+        if end_time is not None:
+            conditions.append("ts <= ?")
+            params.append(_to_epoch_us(end_time))
+
+        sql = "SELECT record FROM anomalies"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY ts DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(record) for (record,) in rows]
+
+    def count(self, since: Optional[Any] = None) -> int:
+        """
+        Count anomalies, optionally only those at or after a time
+
+        Args:
+            since: Optional start time
+
+        Returns:
+            Number of anomalies
+        """
+        with self._lock:
+            if since is None:
+                (total,) = self._conn.execute("SELECT COALESCE(SUM(count), 0) FROM anomaly_counts").fetchone()
+            else:
+                (total,) = self._conn.execute(
+                    "SELECT COUNT(*) FROM anomalies WHERE ts >= ?", (_to_epoch_us(since),)
+                ).fetchone()
+        return int(total)
+
+    def counts(self, vehicle_id: Optional[str] = None) -> List[Tuple[str, str, str, int]]:
+        """
+        Get the precomputed counts
+
+        Args:
+            vehicle_id: Optional vehicle filter
+
+        Returns:
+            List of (vehicle_id, anomaly_type, severity, count)
+        """
+        sql = "SELECT vehicle_id, anomaly_type, severity, count FROM anomaly_counts WHERE count > 0"
+        params: Tuple = ()
+        if vehicle_id is not None:
+            sql += " AND vehicle_id = ?"
+            params = (vehicle_id,)
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def metric_stats(self, vehicle_id: str) -> Dict[str, Dict[str, float]]:
+        """
+        Get mean/min/max/std of the stored metrics of a vehicle's anomalies
+
+        Args:
+            vehicle_id: ID of the vehicle
+
+        Returns:
+            Dictionary of metric -> statistics (metrics never recorded are omitted)
+        """
+        selects = ', '.join(
+            f"COUNT({col}), AVG({col}), MIN({col}), MAX({col}), SUM({col} * {col})" for col in METRIC_COLUMNS
+        )
+        with self._lock:
+            row = self._conn.execute(f"SELECT {selects} FROM anomalies WHERE vehicle_id = ?", (vehicle_id,)).fetchone()
+
+        stats = {}
+        for i, col in enumerate(METRIC_COLUMNS):
+            n, mean, low, high, sumsq = row[5 * i:5 * i + 5]
+            if not n:
+                continue
+            # Population standard deviation, as np.std
+            std = float(np.sqrt(max(sumsq / n - mean * mean, 0.0))) if n > 1 else 0
+            stats[col] = {'mean': mean, 'min': low, 'max': high, 'std': std}
+        return stats
+
+    def time_range(self, vehicle_id: str) -> Optional[Tuple[datetime, datetime]]:
+        """
+        Get the first and last anomaly time of a vehicle
+
+        Args:
+            vehicle_id: ID of the vehicle
+
+        Returns:
+            Tuple of (first, last) or None if the vehicle has no anomalies
+        """
+        with self._lock:
+            first, last = self._conn.execute(
+                "SELECT MIN(ts), MAX(ts) FROM anomalies WHERE vehicle_id = ?", (vehicle_id,)
+            ).fetchone()
+        if first is None:
+            return None
+        return (pd.Timestamp(first, unit='us').to_pydatetime(), pd.Timestamp(last, unit='us').to_pydatetime())
+
+    def prune(self, before: Any) -> int:
+        """
+        Delete anomalies older than a time
+
+        Uses the time index, so the cost depends on the number of deleted
+        records rather than the size of the history.
+
+        Args:
+            before: Anomalies with a timestamp before this are deleted
+
+        Returns:
+            Number of anomalies deleted
+        """
+        cutoff = _to_epoch_us(before)
+        with self._lock, self._conn:
+            removed = self._conn.execute(
+                "SELECT vehicle_id, anomaly_type, severity, COUNT(*) FROM anomalies WHERE ts < ? "
+                "GROUP BY vehicle_id, anomaly_type, severity",
+                (cutoff,)
+            ).fetchall()
+            if not removed:
+                return 0
+            self._conn.execute("DELETE FROM anomalies WHERE ts < ?", (cutoff,))
+            self._conn.executemany(
+                "UPDATE anomaly_counts SET count = count - ? "
+                "WHERE vehicle_id = ? AND anomaly_type = ? AND severity = ?",
+                [(count, vehicle_id, anomaly_type, severity) for vehicle_id, anomaly_type, severity, count in removed]
+            )
+            self._conn.execute("DELETE FROM anomaly_counts WHERE count <= 0")
+
+            deleted = sum(count for *_, count in removed)
+            self.pruned_count += deleted
+        return deleted
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get store statistics
+
+        Returns:
+            Dictionary with stored, added and pruned counts
+        """
+        return {
+            'db_path': self.db_path,
+            'stored': self.count(),
+            'added': self.added_count,
+            'pruned': self.pruned_count
+        }
@@ -0,0 +1,316 @@
+"""
+Columnar Batch Ingestion
+
+This module provides the vectorized validation and preallocated column buffers
+used by the batch ingestion API of the telemetry pipeline. Payloads can be given
+as a list of record dicts, a dict of columns, or a pyarrow Table, and are
+validated with NumPy masks against the same range constraints as the pydantic
+telemetry schemas.
+"""
+import logging
+from typing import Dict, List, Optional, Any, Union, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+# Column specifications mirroring the Field constraints of BatteryTelemetry and
+# VehicleTelemetry: name -> (kind, required, ge, le)
+BATTERY_COLUMN_SPECS: Dict[str, Tuple[str, bool, Optional[float], Optional[float]]] = {
+    'vehicle_id': ('str', True, None, None),
+    'timestamp': ('datetime', True, None, None),
+    'state_of_charge': ('float', True, 0, 100),
+    'battery_temp': ('float', True, -20, 80),
+    'voltage': ('float', True, 0, None),
+    'current': ('float', True, None, None),
+    'charging_status': ('int', True, 0, 1),
+}
+
+VEHICLE_COLUMN_SPECS: Dict[str, Tuple[str, bool, Optional[float], Optional[float]]] = {
+    'vehicle_id': ('str', True, None, None),
+    'timestamp': ('datetime', True, None, None),
+    'odometer': ('float', True, 0, None),
+    'speed': ('float', True, 0, None),
+    'location_lat': ('float', False, -90, 90),
+    'location_lon': ('float', False, -180, 180),
+    'tire_pressure_fl': ('float', False, 0, None),
+    'tire_pressure_fr': ('float', False, 0, None),
+    'tire_pressure_rl': ('float', False, 0, None),
+    'tire_pressure_rr': ('float', False, 0, None),
+    'ambient_temp': ('float', False, None, None),
+}
+
+_DTYPES = {
+    'str': object,
+    'datetime': 'datetime64[ns]',
+    'float': np.float64,
+    'int': np.int64,
+}
+
+
+class BatchResult:
+    """
+    Outcome of a batch ingestion call
+
+    Attributes:
+        data_type: Type of data ('battery' or 'vehicle')
+        total: Number of rows in the submitted batch
+        accepted: Number of rows that passed validation
+        rejected: List of {'row': index, 'errors': [reason, ...]} entries
+    """
+
+    def __init__(self, data_type: str, total: int, accepted: int, rejected: List[Dict[str, Any]]):
+        self.data_type = data_type
+        self.total = total
+        self.accepted = accepted
+        self.rejected = rejected
+
+    @property
+    def rejected_rows(self) -> List[int]:
+        """Indices of the rejected rows in the submitted batch"""
+        return [r['row'] for r in self.rejected]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the result to a dictionary"""
+        return {
+            'data_type': self.data_type,
+            'total': self.total,
+            'accepted': self.accepted,
+            'rejected_count': len(self.rejected),
+            'rejected': self.rejected
+        }
+
+    def __repr__(self) -> str:
+        return (f"BatchResult(data_type={self.data_type!r}, total={self.total}, "
+                f"accepted={self.accepted}, rejected={len(self.rejected)})")
+
+
+def to_columns(payloads: Union[List[Dict], Dict[str, Any], Any]) -> Dict[str, Any]:
+    """
+    Normalize a batch payload to a dict of columns
+
+    Args:
+        payloads: List of record dicts, dict of columns, pandas DataFrame or pyarrow Table
+
+    Returns:
+        Dictionary mapping column name to a sequence of values
+    """
+    if isinstance(payloads, dict):
+        return payloads
+
+    if isinstance(payloads, pd.DataFrame):
+        return {col: payloads[col].to_numpy() for col in payloads.columns}
+
+    # pyarrow Table (duck-typed so pyarrow stays an optional import)
+    if hasattr(payloads, 'column_names') and hasattr(payloads, 'column'):
+        return {
+            name: payloads.column(name).to_numpy(zero_copy_only=False)
+            for name in payloads.column_names
+        }
+
+    if isinstance(payloads, (list, tuple)):
+        keys: Dict[str, None] = {}
+        for record in payloads:
+            keys.update(dict.fromkeys(record))
+        return {key: [record.get(key) for record in payloads] for key in keys}
+
+    raise TypeError(f"Unsupported batch payload type: {type(payloads).__name__}")
+
+
+def _batch_length(columns: Dict[str, Any]) -> int:
+    """Get the number of rows in a column dict, checking all columns agree"""
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"Columns have inconsistent lengths: {sorted(lengths)}")
+    return lengths.pop() if lengths else 0
+
+
+def _coerce_column(kind: str, values: Any, n_rows: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Coerce a raw column to its target dtype
+
+    Returns:
+        Tuple of (array, missing mask, unparseable mask)
+    """
+    if values is None:
+        missing = np.ones(n_rows, dtype=bool)
+        arr = np.empty(n_rows, dtype=_DTYPES[kind])
+        if kind == 'float':
+            arr.fill(np.nan)
+        elif kind == 'datetime':
+            arr.fill(np.datetime64('NaT'))
+        elif kind == 'int':
+            arr.fill(0)
+        return arr, missing, np.zeros(n_rows, dtype=bool)
+
+    series = pd.Series(values) if not isinstance(values, pd.Series) else values
+    missing = series.isna().to_numpy()
+
+    if kind == 'str':
+        arr = series.astype(object).to_numpy()
+        bad = ~missing & ~np.fromiter((isinstance(v, str) for v in arr), dtype=bool, count=n_rows)
+        return arr, missing, bad
+
+    if kind == 'datetime':
+        # Same normalization as the record path: ISO strings with a trailing Z
+        if series.dtype == object:
+            series = series.map(lambda v: v.replace('Z', '+00:00') if isinstance(v, str) else v)
+        # Offsets are normalized to UTC so the column has a single dtype
+        parsed = pd.to_datetime(series, errors='coerce', utc=True, format='ISO8601').dt.tz_localize(None)
+        arr = parsed.to_numpy(dtype='datetime64[ns]')
+        return arr, missing, ~missing & np.isnat(arr)
+
+    numeric = pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64)
+    bad = ~missing & np.isnan(numeric)
+    if kind == 'int':
+        bad |= ~missing & ~bad & (numeric != np.round(numeric))
+        return np.where(missing | bad, 0, numeric).astype(np.int64), missing, bad
+    return numeric, missing, bad
+
+
+def validate_columns(
+    columns: Dict[str, Any],
+    specs: Dict[str, Tuple[str, bool, Optional[float], Optional[float]]]
+) -> Tuple[Dict[str, np.ndarray], np.ndarray, List[Dict[str, Any]]]:
+    """
+    Validate a column batch against a set of column specifications
+
+    Args:
+        columns: Dictionary of raw columns
+        specs: Column specifications (see BATTERY_COLUMN_SPECS)
+
+    Returns:
+        Tuple of (typed columns, valid row mask, rejection records)
+    """
+    n_rows = _batch_length(columns)
+    valid = np.ones(n_rows, dtype=bool)
+    typed: Dict[str, np.ndarray] = {}
+    reasons: Dict[int, List[str]] = {}
+
+    def reject(mask: np.ndarray, message: str) -> None:
+        for row in np.flatnonzero(mask):
+            reasons.setdefault(int(row), []).append(message)
+        valid[mask] = False
+
+    for name, (kind, required, ge, le) in specs.items():
+        arr, missing, bad = _coerce_column(kind, columns.get(name), n_rows)
+        typed[name] = arr
+
+        if required and missing.any():
+            reject(missing, f"{name}: field required")
+        if bad.any():
+            reject(bad, f"{name}: invalid {kind} value")
+
+        if ge is not None or le is not None:
+            checked = ~missing & ~bad
+            values = arr.astype(np.float64, copy=False)
+            if ge is not None:
+                reject(checked & (values < ge), f"{name}: must be greater than or equal to {ge}")
+            if le is not None:
+                reject(checked & (values > le), f"{name}: must be less than or equal to {le}")
+
+    rejected = [{'row': row, 'errors': errors} for row, errors in sorted(reasons.items())]
+    return typed, valid, rejected
+
+
+class ColumnBuffer:
+    """
+    Preallocated column-oriented buffer for validated telemetry
+
+    Columns are stored as NumPy arrays that grow geometrically, so appending a
+    batch is a slice assignment per column instead of one dict per record.
+    """
+
+    def __init__(self, specs: Dict[str, Tuple[str, bool, Optional[float], Optional[float]]], capacity: int = 1024):
+        """
+        Initialize the column buffer
+
+        Args:
+            specs: Column specifications defining names and dtypes
+            capacity: Initial number of rows to preallocate
+        """
+        self.specs = specs
+        self.capacity = max(int(capacity), 1)
+        self.size = 0
+        self.columns = {
+            name: np.empty(self.capacity, dtype=_DTYPES[kind])
+            for name, (kind, _, _, _) in specs.items()
+        }
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _reserve(self, n_rows: int) -> None:
+        """Grow the buffers so that n_rows more rows fit"""
+        required = self.size + n_rows
+        if required <= self.capacity:
+            return
+
+        new_capacity = self.capacity
+        while new_capacity < required:
+            new_capacity *= 2
+
+        for name, arr in self.columns.items():
+            grown = np.empty(new_capacity, dtype=arr.dtype)
+            grown[:self.size] = arr[:self.size]
+            self.columns[name] = grown
+        self.capacity = new_capacity
+
+    def append(self, columns: Dict[str, np.ndarray], mask: Optional[np.ndarray] = None) -> int:
+        """
+        Append rows to the buffer
+
+        Args:
+            columns: Typed columns as returned by validate_columns
+            mask: Optional boolean mask selecting the rows to append
+
+        Returns:
+            Number of rows appended
+        """
+        if mask is not None:
+            columns = {name: values[mask] for name, values in columns.items()}
+        n_rows = len(next(iter(columns.values()))) if columns else 0
+        if n_rows == 0:
+            return 0
+
+        self._reserve(n_rows)
+        end = self.size + n_rows
+        for name, arr in self.columns.items():
+            arr[self.size:end] = columns[name]
+        self.size = end
+        return n_rows
+
+    def view(self) -> Dict[str, np.ndarray]:
+        """Get views of the filled part of every column"""
+        return {name: arr[:self.size] for name, arr in self.columns.items()}
+
+    def to_frame(self) -> pd.DataFrame:
+        """Copy the buffered rows into a DataFrame"""
+        return pd.DataFrame({name: arr[:self.size].copy() for name, arr in self.columns.items()})
+
+    def rows(self, start: int = 0, end: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Materialize buffered rows as record dicts
+
+        Args:
+            start: First row to include
+            end: Row to stop at (defaults to the buffer size)
+
+        Returns:
+            List of record dicts in the same shape as the pydantic path
+        """
+        end = self.size if end is None else end
+        frame = pd.DataFrame({name: arr[start:end] for name, arr in self.columns.items()})
+        records = frame.astype(object).where(frame.notna(), None).to_dict('records')
+        for record in records:
+            if 'timestamp' in record and isinstance(record['timestamp'], pd.Timestamp):
+                record['timestamp'] = record['timestamp'].to_pydatetime()
+        return records
+
+    def clear(self) -> None:
+        """Reset the buffer without releasing the preallocated arrays"""
+        self.size = 0
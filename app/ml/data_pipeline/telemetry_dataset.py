@@ -0,0 +1,558 @@
+"""
+Partitioned Telemetry Dataset
+
+This module implements an append-only, partitioned Parquet dataset for telemetry
+storage. Data is laid out as
+
+    <root>/<data_type>/date=YYYY-MM-DD/bucket=NN/part-<seq>.parquet
+
+where the bucket is a stable hash of the vehicle ID. Flushes append row groups to
+open files, files roll over at a target size, and a manifest keeps the row count
+and min/max timestamp per file so readers can skip whole files. With the 'tsc'
+codec, closed files are re-encoded with the compact telemetry codec.
+
+Writes can carry the write-ahead log LSN covering their rows. Rows in an open
+file are lost if the process dies (the file has no footer yet), so commit
+callbacks only report an LSN once every row up to it is in a closed, synced
+file recorded in the manifest. The manifest on disk is rewritten when files are
+opened or closed, not on every append; files still open when a process died
+are deleted by the next writer.
+"""
+import os
+import json
+import time
+import zlib
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Any, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.ml.data_pipeline.telemetry_codec import CODEC_EXTENSION, write_encoded
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Check pyarrow availability
+PYARROW_AVAILABLE = False
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    logger.warning("pyarrow is not available. Partitioned telemetry datasets will be disabled.")
+
+MANIFEST_FILENAME = '_manifest.json'
+
+
+def vehicle_shard(vehicle_id: Any, num_shards: int) -> int:
+    """
+    Map a single vehicle ID to a hash bucket
+
+    Args:
+        vehicle_id: Vehicle ID
+        num_shards: Number of buckets
+
+    Returns:
+        Bucket number
+    """
+    return zlib.crc32(str(vehicle_id).encode('utf-8')) % num_shards
+
+
+def vehicle_bucket(vehicle_ids: Any, num_buckets: int) -> np.ndarray:
+    """
+    Map vehicle IDs to hash buckets
+
+    Uses CRC32 so bucket assignment is stable across processes and restarts.
+
+    Args:
+        vehicle_ids: Sequence of vehicle IDs
+        num_buckets: Number of hash buckets
+
+    Returns:
+        Array of bucket numbers
+    """
+    ids = pd.Series(vehicle_ids, dtype=object)
+    codes, uniques = pd.factorize(ids)
+    unique_buckets = np.array(
+        [vehicle_shard(v, num_buckets) for v in uniques],
+        dtype=np.int64
+    )
+    return unique_buckets[codes] if len(uniques) else np.zeros(len(ids), dtype=np.int64)
+
+
+class DatasetManifest:
+    """
+    Manifest of the files in a telemetry dataset
+
+    Each entry records the partition, row count, size and min/max timestamp of a
+    file. The manifest is persisted as JSON with an atomic rename.
+    """
+
+    def __init__(self, root: str):
+        """
+        Initialize the manifest
+
+        Args:
+            root: Root directory of the dataset
+        """
+        self.root = root
+        self.path = os.path.join(root, MANIFEST_FILENAME)
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.metadata: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._loaded_mtime: Optional[float] = None
+        self.load()
+
+    def load(self) -> None:
+        """Load the manifest from disk if it exists"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, 'r') as f:
+                payload = json.load(f)
+            self.files = payload.get('files', {})
+            self.metadata = payload.get('metadata', {})
+            self._loaded_mtime = mtime
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading dataset manifest {self.path}: {str(e)}")
+            self.files = {}
+
+    def refresh(self) -> None:
+        """Reload the manifest if another process has rewritten it"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self._loaded_mtime:
+            with self._lock:
+                self.load()
+
+    def save(self, sync: bool = False) -> None:
+        """
+        Persist the manifest atomically
+
+        Args:
+            sync: Whether to fsync the manifest before it replaces the old one
+        """
+        with self._lock:
+            payload = {
+                'updated_at': datetime.now().isoformat(),
+                'metadata': self.metadata,
+                'files': self.files
+            }
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(payload, f, indent=2)
+                if sync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+    def update(self, rel_path: str, entry: Dict[str, Any]) -> None:
+        """
+        Merge statistics for a file into the manifest
+
+        Args:
+            rel_path: File path relative to the dataset root
+            entry: Statistics for the rows just written
+        """
+        with self._lock:
+            current = self.files.get(rel_path)
+            if current is None:
+                self.files[rel_path] = dict(entry)
+                return
+            current['rows'] += entry['rows']
+            current['min_timestamp'] = min(current['min_timestamp'], entry['min_timestamp'])
+            current['max_timestamp'] = max(current['max_timestamp'], entry['max_timestamp'])
+            current['size_bytes'] = entry['size_bytes']
+            current['open'] = entry['open']
+
+    def rename(self, rel_path: str, new_rel_path: str, **changes: Any) -> None:
+        """Move a file's entry to a new path, optionally updating fields"""
+        with self._lock:
+            entry = self.files.pop(rel_path, None)
+            if entry is not None:
+                entry.update(changes)
+                self.files[new_rel_path] = entry
+
+    def mark_closed(self, rel_path: str, size_bytes: int) -> None:
+        """Mark a file as closed (complete and readable)"""
+        with self._lock:
+            if rel_path in self.files:
+                self.files[rel_path]['open'] = False
+                self.files[rel_path]['size_bytes'] = size_bytes
+
+    def select(
+        self,
+        data_type: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        buckets: Optional[List[int]] = None,
+        include_open: bool = False
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Select files that may contain rows in a time range
+
+        Args:
+            data_type: Type of data ('battery' or 'vehicle')
+            start: Inclusive start of the time range
+            end: Inclusive end of the time range
+            buckets: Optional list of vehicle hash buckets
+            include_open: Whether to include files still being written
+
+        Returns:
+            List of (relative path, entry) tuples
+        """
+        start_iso = start.isoformat() if start is not None else None
+        end_iso = end.isoformat() if end is not None else None
+        bucket_set = set(buckets) if buckets is not None else None
+
+        with self._lock:
+            selected = []
+            for rel_path, entry in self.files.items():
+                if entry['data_type'] != data_type:
+                    continue
+                if entry.get('open') and not include_open:
+                    continue
+                if bucket_set is not None and entry['bucket'] not in bucket_set:
+                    continue
+                if start_iso is not None and entry['max_timestamp'] < start_iso:
+                    continue
+                if end_iso is not None and entry['min_timestamp'] > end_iso:
+                    continue
+                selected.append((rel_path, dict(entry)))
+        return sorted(selected)
+
+
+class _OpenFile:
+    """Bookkeeping for a Parquet file that is still accepting row groups"""
+
+    def __init__(self, rel_path: str, abs_path: str, writer: Any, schema: Any):
+        self.rel_path = rel_path
+        self.abs_path = abs_path
+        self.writer = writer
+        self.schema = schema
+        self.opened_at = time.time()
+        self.last_write = self.opened_at
+        # Lowest write-ahead log LSN with rows in the file
+        self.min_lsn: Optional[int] = None
+
+
+def _fsync_path(path: str) -> None:
+    """Flush a written file to stable storage"""
+    with open(path, 'rb') as f:
+        os.fsync(f.fileno())
+
+
+class TelemetryDatasetWriter:
+    """
+    Append-only writer for the partitioned telemetry dataset
+
+    Keeps one open Parquet file per partition (data type, date, bucket). Each
+    write appends a row group; a file is closed when it reaches the target size,
+    when too many files are open, or when it has been open for max_file_age.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        num_buckets: int = 16,
+        target_file_size: int = 128 * 1024 * 1024,
+        max_open_files: int = 64,
+        max_file_age: int = 3600,  # seconds
+        compression: str = 'snappy',
+        codec: Optional[str] = None
+    ):
+        """
+        Initialize the dataset writer
+
+        Args:
+            root: Root directory of the dataset
+            num_buckets: Number of vehicle-ID hash buckets per date
+            target_file_size: File size in bytes at which a file is rolled over
+            max_open_files: Maximum number of files kept open at once
+            max_file_age: Maximum time a file stays open before being closed
+            compression: Parquet compression codec
+            codec: Storage codec for closed files (None keeps Parquet, 'tsc'
+                re-encodes them with the compact telemetry codec)
+        """
+        if not PYARROW_AVAILABLE:
+            raise ImportError("pyarrow is required for TelemetryDatasetWriter")
+        if codec not in (None, 'tsc'):
+            raise ValueError(f"Unknown storage codec: {codec}")
+
+        self.root = root
+        self.num_buckets = num_buckets
+        self.target_file_size = target_file_size
+        self.max_open_files = max_open_files
+        self.max_file_age = max_file_age
+        self.compression = compression
+        self.codec = codec
+
+        self.manifest = DatasetManifest(root)
+        if self.manifest.metadata.get('num_buckets', num_buckets) != num_buckets:
+            raise ValueError(f"Dataset at {root} uses {self.manifest.metadata['num_buckets']} "
+                             f"buckets, got num_buckets={num_buckets}")
+        self.manifest.metadata['num_buckets'] = num_buckets
+        self._open_files: Dict[Tuple[str, str, int], _OpenFile] = {}
+        self._lock = threading.RLock()
+        # Whether files were opened, closed or renamed since the manifest was saved
+        self._manifest_dirty = False
+        
+        # Write-ahead log LSNs written and committed (in closed files) per data type
+        self._written_lsn: Dict[str, int] = {}
+        self._committed_lsn: Dict[str, int] = {}
+        self.commit_callbacks: List[Callable[[str, int], None]] = []
+
+        # Files left open by a previous process have no footer and cannot be read
+        for rel_path, entry in list(self.manifest.files.items()):
+            if entry.get('open'):
+                logger.warning(f"Deleting incomplete dataset file: {rel_path}")
+                try:
+                    os.remove(os.path.join(root, rel_path))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.error(f"Error deleting incomplete dataset file {rel_path}: {str(e)}")
+                del self.manifest.files[rel_path]
+                self._manifest_dirty = True
+
+        os.makedirs(root, exist_ok=True)
+        if self._manifest_dirty:
+            self.manifest.save()
+            self._manifest_dirty = False
+
+    def partition_dir(self, data_type: str, date: str, bucket: int) -> str:
+        """Get the relative directory of a partition"""
+        return os.path.join(data_type, f"date={date}", f"bucket={bucket:02d}")
+
+    def register_commit_callback(self, callback: Callable[[str, int], None]) -> None:
+        """
+        Register a callback for rows that became durable
+
+        The callback is called with a data type and a write-ahead log LSN once
+        all rows written with an LSN up to it are in closed, synced files.
+
+        Args:
+            callback: Function that takes data_type and the committed LSN
+        """
+        self.commit_callbacks.append(callback)
+
+    def write(self, data_type: str, df: pd.DataFrame, lsn: Optional[int] = None) -> int:
+        """
+        Append a DataFrame to the dataset
+
+        Args:
+            data_type: Type of data ('battery' or 'vehicle')
+            df: DataFrame with at least 'vehicle_id' and 'timestamp' columns
+            lsn: Highest write-ahead log LSN covering the rows, if logged
+
+        Returns:
+            Number of rows written
+        """
+        if df.empty:
+            return 0
+
+        df = df.reset_index(drop=True)
+        # Partitions and manifest bounds are in naive UTC
+        df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True).dt.tz_localize(None)
+
+        dates = df['timestamp'].dt.strftime('%Y-%m-%d').to_numpy()
+        buckets = vehicle_bucket(df['vehicle_id'].to_numpy(), self.num_buckets)
+
+        with self._lock:
+            # Flushes arrive in LSN order, so the rows start after the last written LSN
+            first_lsn = self._written_lsn.get(data_type, 0) + 1 if lsn is not None else None
+            written = 0
+            for (date, bucket), index in pd.Series(range(len(df))).groupby([dates, buckets]).groups.items():
+                part = df.iloc[np.asarray(index)].sort_values('timestamp', kind='stable')
+                self._append(data_type, date, int(bucket), part, first_lsn)
+                written += len(part)
+            if lsn is not None:
+                self._written_lsn[data_type] = max(self._written_lsn.get(data_type, 0), lsn)
+
+            self._close_stale_files()
+            self._save_and_commit()
+        return written
+
+    def _save_and_commit(self) -> None:
+        """
+        Persist the manifest and report newly committed LSNs (lock held)
+
+        The LSN of a data type is committed up to just below the lowest LSN
+        still held by one of its open files, or fully when none is open. The
+        manifest is only rewritten when files were opened, closed or renamed,
+        as row counts of open files are not needed after a restart.
+        """
+        committed = {}
+        for data_type, written in self._written_lsn.items():
+            open_lsns = [
+                f.min_lsn for key, f in self._open_files.items()
+                if key[0] == data_type and f.min_lsn is not None
+            ]
+            lsn = min(open_lsns) - 1 if open_lsns else written
+            if lsn > self._committed_lsn.get(data_type, 0):
+                committed[data_type] = lsn
+
+        # The closed files must be in the manifest on disk before they count
+        if self._manifest_dirty or committed:
+            self.manifest.save(sync=bool(committed))
+            self._manifest_dirty = False
+        for data_type, lsn in committed.items():
+            self._committed_lsn[data_type] = lsn
+            for callback in self.commit_callbacks:
+                try:
+                    callback(data_type, lsn)
+                except Exception as e:
+                    logger.error(f"Error in dataset commit callback: {str(e)}")
+
+    def _append(
+        self,
+        data_type: str,
+        date: str,
+        bucket: int,
+        df: pd.DataFrame,
+        lsn: Optional[int] = None
+    ) -> None:
+        """Append a single-partition DataFrame as a row group"""
+        key = (data_type, date, bucket)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+        open_file = self._open_files.get(key)
+        if open_file is not None and not table.schema.equals(open_file.schema):
+            try:
+                table = table.cast(open_file.schema)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, ValueError):
+                # Schema changed (e.g. a new optional column); start a new file
+                self._close_file(key)
+                open_file = None
+
+        new_file = open_file is None
+        if new_file:
+            open_file = self._open_file(key, table.schema)
+
+        open_file.writer.write_table(table)
+        open_file.last_write = time.time()
+        if lsn is not None and open_file.min_lsn is None:
+            open_file.min_lsn = lsn
+
+        size_bytes = os.path.getsize(open_file.abs_path)
+        timestamps = df['timestamp']
+        self.manifest.update(open_file.rel_path, {
+            'data_type': data_type,
+            'date': date,
+            'bucket': bucket,
+            'rows': len(df),
+            'min_timestamp': timestamps.min().isoformat(),
+            'max_timestamp': timestamps.max().isoformat(),
+            'size_bytes': size_bytes,
+            'open': True
+        })
+        if new_file:
+            # Record the file right away so a crash leaves no untracked file behind
+            self.manifest.save()
+
+        if size_bytes >= self.target_file_size:
+            self._close_file(key)
+
+    def _open_file(self, key: Tuple[str, str, int], schema: Any) -> _OpenFile:
+        """Open a new part file for a partition"""
+        if len(self._open_files) >= self.max_open_files:
+            oldest = min(self._open_files, key=lambda k: self._open_files[k].last_write)
+            self._close_file(oldest)
+
+        rel_dir = self.partition_dir(*key)
+        abs_dir = os.path.join(self.root, rel_dir)
+        os.makedirs(abs_dir, exist_ok=True)
+
+        # Sequence numbers keep names unique even within the same second
+        seq = 0
+        prefix = f"part-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        while True:
+            filename = f"{prefix}-{os.getpid()}-{seq:04d}.parquet"
+            rel_path = os.path.join(rel_dir, filename)
+            if rel_path not in self.manifest.files and not os.path.exists(os.path.join(abs_dir, filename)):
+                break
+            seq += 1
+
+        abs_path = os.path.join(self.root, rel_path)
+        writer = pq.ParquetWriter(abs_path, schema, compression=self.compression)
+        open_file = _OpenFile(rel_path, abs_path, writer, schema)
+        self._open_files[key] = open_file
+        return open_file
+
+    def _close_file(self, key: Tuple[str, str, int]) -> None:
+        """Close the open file of a partition and finalize its manifest entry"""
+        open_file = self._open_files.pop(key, None)
+        if open_file is None:
+            return
+        try:
+            open_file.writer.close()
+            _fsync_path(open_file.abs_path)
+        except Exception as e:
+            logger.error(f"Error closing dataset file {open_file.rel_path}: {str(e)}")
+        self.manifest.mark_closed(open_file.rel_path, os.path.getsize(open_file.abs_path))
+        self._manifest_dirty = True
+
+        if self.codec == 'tsc':
+            self._encode_file(open_file)
+
+    def _encode_file(self, open_file: _OpenFile) -> None:
+        """Re-encode a closed Parquet file with the compact telemetry codec"""
+        rel_path = os.path.splitext(open_file.rel_path)[0] + CODEC_EXTENSION
+        abs_path = os.path.join(self.root, rel_path)
+        try:
+            size_bytes = write_encoded(abs_path, pq.read_table(open_file.abs_path).to_pandas())
+            _fsync_path(abs_path)
+        except Exception as e:
+            # The Parquet file stays in place and readable
+            logger.error(f"Error encoding dataset file {open_file.rel_path}: {str(e)}")
+            return
+        self.manifest.rename(open_file.rel_path, rel_path, size_bytes=size_bytes, format='tsc')
+        self.manifest.save()
+        os.remove(open_file.abs_path)
+
+    def _close_stale_files(self) -> None:
+        """Close files that have been open longer than max_file_age"""
+        now = time.time()
+        for key in [k for k, f in self._open_files.items() if now - f.opened_at >= self.max_file_age]:
+            self._close_file(key)
+
+    def close_partitions_before(self, date: str) -> None:
+        """
+        Close all open files for dates before the given date
+
+        Args:
+            date: Date string in YYYY-MM-DD format
+        """
+        with self._lock:
+            for key in [k for k in self._open_files if k[1] < date]:
+                self._close_file(key)
+            self._save_and_commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get dataset statistics
+
+        Returns:
+            Dictionary with file and row counts
+        """
+        files = self.manifest.files
+        return {
+            'open_files': len(self._open_files),
+            'total_files': len(files),
+            'total_rows': sum(entry['rows'] for entry in files.values()),
+            'total_bytes': sum(entry['size_bytes'] for entry in files.values())
+        }
+
+    def close(self) -> None:
+        """Close all open files and persist the manifest"""
+        with self._lock:
+            for key in list(self._open_files):
+                self._close_file(key)
+            self._save_and_commit()
@@ -0,0 +1,285 @@
+"""
+Telemetry Database Sink
+
+This module implements a long-lived database sink for telemetry flushes. It owns
+a pooled SQLAlchemy engine and a background writer thread, and writes each batch
+through the fastest bulk path of the backend: COPY FROM STDIN on PostgreSQL,
+large executemany batches on SQLite, and multi-row INSERTs elsewhere.
+"""
+import io
+import time
+import queue
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Tuple
+
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class TelemetryDatabaseSink:
+    """
+    Background bulk writer for telemetry DataFrames
+
+    Batches are handed over with submit() and written by a single worker thread,
+    so callers never wait on the database while it keeps up. The queue is
+    bounded; when it is full submit() waits for room, so flushed telemetry is
+    not lost. With block_when_full=False (or once submit_timeout expires) the
+    batch is dropped, counted and reported to the caller instead.
+    """
+
+    def __init__(
+        self,
+        connection_string: str,
+        table_suffix: str = '_telemetry',
+        pool_size: int = 5,
+        max_queue_size: int = 1000,
+        executemany_batch_size: int = 10000,
+        block_when_full: bool = True,
+        submit_timeout: Optional[float] = None
+    ):
+        """
+        Initialize the database sink
+
+        Args:
+            connection_string: SQLAlchemy connection string
+            table_suffix: Suffix appended to the data type to form the table name
+            pool_size: Size of the connection pool
+            max_queue_size: Maximum number of batches waiting to be written
+            executemany_batch_size: Rows per executemany call
+            block_when_full: Whether submit() waits for room instead of dropping
+            submit_timeout: Maximum time submit() waits for room (None waits
+                indefinitely)
+        """
+        # Import here to avoid dependency issues if not using DB
+        from sqlalchemy import create_engine
+
+        self.connection_string = connection_string
+        self.table_suffix = table_suffix
+        self.executemany_batch_size = executemany_batch_size
+        self.block_when_full = block_when_full
+        self.submit_timeout = submit_timeout
+
+        engine_kwargs: Dict[str, Any] = {'pool_pre_ping': True}
+        if not connection_string.startswith('sqlite'):
+            engine_kwargs.update(pool_size=pool_size, max_overflow=pool_size)
+        self.engine = create_engine(connection_string, **engine_kwargs)
+        self.dialect = self.engine.dialect.name
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._created_tables = set()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.rows_written = 0
+        self.batches_written = 0
+        self.batches_dropped = 0
+        self.error_count = 0
+        self.write_seconds = 0.0
+        self.last_error: Optional[str] = None
+        self.last_write_time: Optional[float] = None
+
+    def start(self) -> None:
+        """Start the background writer thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='telemetry-db-sink', daemon=True)
+        self._thread.start()
+        logger.info(f"Telemetry database sink started ({self.dialect})")
+
+    def submit(self, data_type: str, df: pd.DataFrame) -> bool:
+        """
+        Queue a DataFrame for writing
+
+        Args:
+            data_type: Type of data ('battery' or 'vehicle')
+            df: DataFrame to write
+
+        Returns:
+            True if the batch was queued, False if it was dropped (the caller
+            still holds the batch and may retry)
+        """
+        if df.empty:
+            return True
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put((data_type, df), block=self.block_when_full, timeout=self.submit_timeout)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.batches_dropped += 1
+            logger.error(f"Database sink queue full, dropped {len(df)} {data_type} records")
+            return False
+
+    def _run(self) -> None:
+        """Worker loop writing queued batches"""
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                data_type, df = item
+                self.write(data_type, df)
+            finally:
+                self._queue.task_done()
+
+    def write(self, data_type: str, df: pd.DataFrame) -> None:
+        """
+        Write a DataFrame synchronously using the bulk path of the backend
+
+        Args:
+            data_type: Type of data ('battery' or 'vehicle')
+            df: DataFrame to write
+        """
+        table_name = f"{data_type}{self.table_suffix}"
+        start = time.perf_counter()
+        try:
+            self._ensure_table(table_name, df)
+            if self.dialect == 'postgresql':
+                self._write_copy(table_name, df)
+            elif self.dialect == 'sqlite':
+                self._write_executemany(table_name, df)
+            else:
+                df.to_sql(table_name, self.engine, if_exists='append', index=False,
+                          method='multi', chunksize=1000)
+        except Exception as e:
+            with self._lock:
+                self.error_count += 1
+                self.last_error = str(e)
+            logger.error(f"Error writing to database: {str(e)}")
+            return
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.rows_written += len(df)
+            self.batches_written += 1
+            self.write_seconds += elapsed
+            self.last_write_time = time.time()
+
+    def _ensure_table(self, table_name: str, df: pd.DataFrame) -> None:
+        """Create the table from the DataFrame schema on first use"""
+        if table_name in self._created_tables:
+            return
+        df.head(0).to_sql(table_name, self.engine, if_exists='append', index=False)
+        self._created_tables.add(table_name)
+
+    def _quote(self, name: str) -> str:
+        """Quote an identifier for the current dialect"""
+        return self.engine.dialect.identifier_preparer.quote(name)
+
+    def _write_copy(self, table_name: str, df: pd.DataFrame) -> None:
+        """Write a DataFrame with PostgreSQL COPY FROM STDIN"""
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False, date_format='%Y-%m-%d %H:%M:%S.%f')
+        buffer.seek(0)
+
+        columns = ', '.join(self._quote(c) for c in df.columns)
+        sql = f"COPY {self._quote(table_name)} ({columns}) FROM STDIN WITH (FORMAT csv)"
+
+        raw = self.engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            if hasattr(cursor, 'copy_expert'):
+                # psycopg2
+                cursor.copy_expert(sql, buffer)
+            else:
+                # psycopg 3
+                with cursor.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+            raw.commit()
+        except Exception:
+            raw.rollback()
+            raise
+        finally:
+            raw.close()
+
+    def _write_executemany(self, table_name: str, df: pd.DataFrame) -> None:
+        """Write a DataFrame with large executemany batches on a DBAPI connection"""
+        rows = self._to_rows(df)
+        columns = ', '.join(self._quote(c) for c in df.columns)
+        placeholders = ', '.join('?' for _ in df.columns)
+        sql = f"INSERT INTO {self._quote(table_name)} ({columns}) VALUES ({placeholders})"
+
+        raw = self.engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            for i in range(0, len(rows), self.executemany_batch_size):
+                cursor.executemany(sql, rows[i:i + self.executemany_batch_size])
+            raw.commit()
+        except Exception:
+            raw.rollback()
+            raise
+        finally:
+            raw.close()
+
+    @staticmethod
+    def _to_rows(df: pd.DataFrame) -> List[Tuple]:
+        """Convert a DataFrame to DBAPI-friendly row tuples"""
+        df = df.copy()
+        for col in df.columns:
+            if pd.api.types.is_datetime64_any_dtype(df[col]):
+                # Same text format pandas.to_sql uses for SQLite
+                df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+        df = df.astype(object).where(df.notna(), None)
+        return list(df.itertuples(index=False, name=None))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until all queued batches have been written
+
+        Args:
+            timeout: Maximum time to wait in seconds
+
+        Returns:
+            True if the queue drained within the timeout
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get sink statistics
+
+        Returns:
+            Dictionary with throughput, queue depth and error counts
+        """
+        with self._lock:
+            return {
+                'dialect': self.dialect,
+                'queue_depth': self._queue.qsize(),
+                'rows_written': self.rows_written,
+                'batches_written': self.batches_written,
+                'batches_dropped': self.batches_dropped,
+                'error_count': self.error_count,
+                'rows_per_second': self.rows_written / self.write_seconds if self.write_seconds > 0 else 0.0,
+                'last_error': self.last_error,
+                'last_write_time': (datetime.fromtimestamp(self.last_write_time).isoformat()
+                                    if self.last_write_time else None)
+            }
+
+    def close(self, timeout: Optional[float] = 30) -> None:
+        """
+        Drain the queue, stop the worker and dispose of the connection pool
+
+        Args:
+            timeout: Maximum time to wait for queued batches
+        """
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.warning("Database sink worker did not stop before the timeout")
+        self._thread = None
+        self.engine.dispose()
@@ -9,9 +9,12 @@ import sys
 import json
 import logging
 import asyncio
+import threading
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Union, Any, Callable
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, List, Optional, Union, Any, Callable, Tuple
 from pathlib import Path
 import pandas as pd
 import numpy as np
@@ -20,6 +23,19 @@ from pydantic import BaseModel, Field, validator
 # Ensure app is in the Python path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent))
 
+from app.ml.data_pipeline.anomaly_rules import AnomalyRuleEngine, load_anomaly_rules
+from app.ml.data_pipeline.columnar_batch import (
+    BATTERY_COLUMN_SPECS,
+    VEHICLE_COLUMN_SPECS,
+    BatchResult,
+    ColumnBuffer,
+    to_columns,
+    validate_columns
+)
+from app.ml.data_pipeline.telemetry_dataset import PYARROW_AVAILABLE, TelemetryDatasetWriter, vehicle_shard
+from app.ml.data_pipeline.telemetry_db_sink import TelemetryDatabaseSink
+from app.ml.data_pipeline.telemetry_wal import TelemetryWAL
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -91,7 +107,15 @@ class TelemetryProcessor:
         storage_path: str = 'data/telemetry',
         db_connection_string: Optional[str] = None,
         enable_streaming: bool = False,
-        enable_anomaly_detection: bool = True
+        enable_anomaly_detection: bool = True,
+        partitioned_storage: bool = False,
+        dataset_options: Optional[Dict[str, Any]] = None,
+        enable_wal: bool = False,
+        wal_options: Optional[Dict[str, Any]] = None,
+        wal_sync_records: bool = False,
+        anomaly_rules: Optional[Union[str, List[Dict[str, Any]]]] = None,
+        anomaly_log_options: Optional[Dict[str, Any]] = None,
+        flush_callbacks: Optional[List[Callable[[str, pd.DataFrame], None]]] = None
     ):
         """
         Initialize the telemetry processor
@@ -103,6 +127,25 @@ class TelemetryProcessor:
             db_connection_string: Connection string for database storage
             enable_streaming: Whether to enable real-time data streaming
             enable_anomaly_detection: Whether to enable anomaly detection
+            partitioned_storage: Whether to append to a partitioned Parquet dataset
+                instead of writing one file per flush. Rows in open dataset files
+                are not readable until the files close (see the writer's
+                max_file_age) and are lost on a crash unless enable_wal is set
+            dataset_options: Extra keyword arguments for TelemetryDatasetWriter
+            enable_wal: Whether to log records to a write-ahead log before
+                acknowledging them, replaying unflushed records on startup
+            wal_options: Extra keyword arguments for TelemetryWAL
+            wal_sync_records: Whether the per-record path waits for an fsync of
+                every record in the WAL's 'commit' mode (by default records
+                are synced in the background within the WAL's sync_interval;
+                batches always wait)
+            anomaly_rules: Threshold anomaly rules, or a path to a JSON file with
+                them (defaults to DEFAULT_BATTERY_ANOMALY_RULES)
+            anomaly_log_options: Extra keyword arguments for AnomalyRuleEngine
+                (log_interval, max_logs_per_interval)
+            flush_callbacks: Callbacks called with every flushed batch, registered
+                before the write-ahead log is replayed so replayed records reach
+                them too (see register_flush_callback)
         """
         self.batch_size = batch_size
         self.buffer_timeout = buffer_timeout
@@ -115,18 +158,62 @@ class TelemetryProcessor:
         self.battery_data_buffer = []
         self.vehicle_data_buffer = []
         
+        # Column buffers for the batch ingestion path
+        self.battery_column_buffer = ColumnBuffer(BATTERY_COLUMN_SPECS, capacity=batch_size)
+        self.vehicle_column_buffer = ColumnBuffer(VEHICLE_COLUMN_SPECS, capacity=batch_size)
+        
         # Tracking
         self.last_flush_time = time.time()
         self.processed_count = 0
         self.error_count = 0
+        # Flushed batches the database sink could not queue (they are only in file storage)
+        self.db_dropped_batches = 0
+        self.db_dropped_records = 0
+        
+        # Threshold anomaly rules
+        self.anomaly_engine = AnomalyRuleEngine(
+            load_anomaly_rules(anomaly_rules) if anomaly_rules is not None else None,
+            **(anomaly_log_options or {})
+        )
         
         # Callbacks
         self.anomaly_callbacks = []
+        self.anomaly_batch_callbacks = []
         self.processing_callbacks = []
+        self.flush_callbacks = list(flush_callbacks or [])
         
         # Ensure storage directory exists
         os.makedirs(storage_path, exist_ok=True)
         
+        # Partitioned dataset writer
+        self.dataset_writer = None
+        if partitioned_storage:
+            if PYARROW_AVAILABLE:
+                self.dataset_writer = TelemetryDatasetWriter(storage_path, **(dataset_options or {}))
+            else:
+                logger.warning("pyarrow not available, falling back to one Parquet file per flush")
+        
+        # Long-lived database sink with a connection pool and background writer
+        self.db_sink = None
+        if db_connection_string:
+            try:
+                self.db_sink = TelemetryDatabaseSink(db_connection_string)
+                self.db_sink.start()
+            except Exception as e:
+                logger.error(f"Error initializing database sink: {str(e)}")
+        
+        # Write-ahead log for buffered records
+        self.wal = None
+        self.wal_sync_records = wal_sync_records
+        self._wal_lsn = {'battery': 0, 'vehicle': 0}
+        if enable_wal:
+            self.wal = TelemetryWAL(os.path.join(storage_path, 'wal'), **(wal_options or {}))
+            # Rows in open dataset files are lost on a crash; only checkpoint
+            # the log once the files holding them are closed
+            if self.dataset_writer is not None:
+                self.dataset_writer.register_commit_callback(self.wal.mark_flushed)
+            self._replay_wal()
+        
         logger.info(f"Telemetry processor initialized with batch size {batch_size}, "
                    f"buffer timeout {buffer_timeout}s")
     
@@ -147,9 +234,16 @@ class TelemetryProcessor:
             
             # Validate data using the schema
             validated_data = BatteryTelemetry(**data)
+            record = validated_data.dict()
+            
+            # Log before acknowledging
+            if self.wal is not None:
+                self._wal_lsn['battery'] = self.wal.append(
+                    'battery', {k: [v] for k, v in record.items()}, wait=self.wal_sync_records
+                )
             
             # Add to buffer
-            self.battery_data_buffer.append(validated_data.dict())
+            self.battery_data_buffer.append(record)
             self.processed_count += 1
             
             # Check if buffer needs to be flushed
@@ -187,9 +281,16 @@ class TelemetryProcessor:
             
             # Validate data using the schema
             validated_data = VehicleTelemetry(**data)
+            record = validated_data.dict()
+            
+            # Log before acknowledging
+            if self.wal is not None:
+                self._wal_lsn['vehicle'] = self.wal.append(
+                    'vehicle', {k: [v] for k, v in record.items()}, wait=self.wal_sync_records
+                )
             
             # Add to buffer
-            self.vehicle_data_buffer.append(validated_data.dict())
+            self.vehicle_data_buffer.append(record)
             self.processed_count += 1
             
             # Check if buffer needs to be flushed
@@ -206,105 +307,333 @@ class TelemetryProcessor:
             self.error_count += 1
             return None
     
+    def process_battery_batch(self, payloads: Union[List[Dict], Dict[str, Any], Any]) -> BatchResult:
+        """
+        Process and validate a batch of battery telemetry records
+        
+        Validation is vectorized over columns and accepted rows are appended to
+        a preallocated column buffer, avoiding the per-record pydantic round trip.
+        
+        Args:
+            payloads: List of record dicts, dict of columns, DataFrame or pyarrow Table
+            
+        Returns:
+            BatchResult with accepted count and per-row rejection reasons
+        """
+        return self._process_batch('battery', payloads, BATTERY_COLUMN_SPECS, self.battery_column_buffer)
+    
+    def process_vehicle_batch(self, payloads: Union[List[Dict], Dict[str, Any], Any]) -> BatchResult:
+        """
+        Process and validate a batch of vehicle telemetry records
+        
+        Args:
+            payloads: List of record dicts, dict of columns, DataFrame or pyarrow Table
+            
+        Returns:
+            BatchResult with accepted count and per-row rejection reasons
+        """
+        return self._process_batch('vehicle', payloads, VEHICLE_COLUMN_SPECS, self.vehicle_column_buffer)
+    
+    def _process_batch(
+        self,
+        data_type: str,
+        payloads: Union[List[Dict], Dict[str, Any], Any],
+        specs: Dict[str, Any],
+        buffer: ColumnBuffer
+    ) -> BatchResult:
+        """
+        Validate a column batch and append the accepted rows to a column buffer
+        
+        Args:
+            data_type: Type of data ('battery' or 'vehicle')
+            payloads: Batch payload in any format accepted by to_columns
+            specs: Column specifications to validate against
+            buffer: Column buffer receiving the accepted rows
+            
+        Returns:
+            BatchResult for the batch
+        """
+        try:
+            columns, valid, rejected = validate_columns(to_columns(payloads), specs)
+        except Exception as e:
+            return self._batch_error(data_type, e)
+        
+        result = self._buffer_batch(data_type, columns, valid, rejected, buffer)
+        
+        # Check if buffer needs to be flushed
+        self._check_flush_buffers()
+        
+        return result
+    
+    def _batch_error(self, data_type: str, error: Exception) -> BatchResult:
+        """
+        Record a batch that could not be validated at all
+        
+        Args:
+            data_type: Type of data ('battery' or 'vehicle')
+            error: Exception raised while validating the batch
+            
+        Returns:
+            BatchResult rejecting the whole batch
+        """
+        logger.error(f"Error processing {data_type} telemetry batch: {str(error)}")
+        self.error_count += 1
+        return BatchResult(data_type, 0, 0, [{'row': None, 'errors': [str(error)]}])
+    
+    def _buffer_batch(
+        self,
+        data_type: str,
+        columns: Dict[str, np.ndarray],
+        valid: np.ndarray,
+        rejected: List[Dict[str, Any]],
+        buffer: ColumnBuffer,
+        sync_wal: bool = True
+    ) -> BatchResult:
+        """
+        Log and buffer the accepted rows of a validated batch
+        
+        Args:
+            data_type: Type of data ('battery' or 'vehicle')
+            columns: Typed columns as returned by validate_columns
+            valid: Mask of the accepted rows
+            rejected: Rejection reasons of the other rows
+            buffer: Column buffer receiving the accepted rows
+            sync_wal: Whether to wait for the logged batch to be durable; callers
+                holding the buffer lock pass False and wait once they release it
+            
+        Returns:
+            BatchResult for the batch
+        """
+        accepted_columns = {name: values[valid] for name, values in columns.items()}
+        
+        # Log before acknowledging
+        if self.wal is not None and valid.any():
+            self._wal_lsn[data_type] = self.wal.append(data_type, accepted_columns, wait=sync_wal)
+        
+        accepted = buffer.append(accepted_columns)
+        self.processed_count += accepted
+        self.error_count += len(rejected)
+        
+        if rejected:
+            logger.error(f"Rejected {len(rejected)} of {len(valid)} {data_type} telemetry records, "
+                         f"first: {rejected[0]}")
+        
+        # Run processing callbacks on materialized records only when someone listens
+        if self.processing_callbacks and accepted:
+            start = len(buffer) - accepted
+            for record in buffer.rows(start):
+                for callback in self.processing_callbacks:
+                    callback(data_type, record)
+        
+        # Check for anomalies
+        if data_type == 'battery' and self.enable_anomaly_detection and accepted:
+            self._check_batch_for_battery_anomalies(accepted_columns)
+        
+        return BatchResult(data_type, len(valid), accepted, rejected)
+    
     def _check_flush_buffers(self) -> None:
         """Check if buffers need to be flushed based on size or timeout"""
-        current_time = time.time()
-        battery_buffer_size = len(self.battery_data_buffer)
-        vehicle_buffer_size = len(self.vehicle_data_buffer)
+        for data_type in self._due_flushes():
+            self._flush_data(data_type)
+    
+    def _due_flushes(self) -> List[str]:
+        """
+        Get the data types whose buffers are due for a flush
         
-        # Flush if batch size reached
-        if battery_buffer_size >= self.batch_size:
-            self._flush_battery_data()
+        A buffer is due when it reached the batch size, or when it holds any
+        rows once the buffer timeout has passed.
         
-        if vehicle_buffer_size >= self.batch_size:
-            self._flush_vehicle_data()
+        Returns:
+            List of data types to flush
+        """
+        current_time = time.time()
+        sizes = {
+            'battery': len(self.battery_data_buffer) + len(self.battery_column_buffer),
+            'vehicle': len(self.vehicle_data_buffer) + len(self.vehicle_column_buffer)
+        }
         
-        # Flush if timeout reached
         if current_time - self.last_flush_time >= self.buffer_timeout:
-            if battery_buffer_size > 0:
-                self._flush_battery_data()
-            
-            if vehicle_buffer_size > 0:
-                self._flush_vehicle_data()
-            
             self.last_flush_time = current_time
+            return [data_type for data_type, size in sizes.items() if size > 0]
+        return [data_type for data_type, size in sizes.items() if size >= self.batch_size]
     
     def _flush_battery_data(self) -> None:
         """Flush battery data buffer to storage"""
-        if not self.battery_data_buffer:
-            return
-        
-        try:
-            # Convert to DataFrame for easier processing
-            df = pd.DataFrame(self.battery_data_buffer)
-            
-            # Store data
-            self._store_data('battery', df)
-            
-            # Clear buffer
-            buffer_size = len(self.battery_data_buffer)
-            self.battery_data_buffer = []
-            
-            logger.info(f"Flushed {buffer_size} battery telemetry records")
-            
-        except Exception as e:
-            logger.error(f"Error flushing battery data: {str(e)}")
+        self._flush_data('battery')
     
     def _flush_vehicle_data(self) -> None:
         """Flush vehicle data buffer to storage"""
-        if not self.vehicle_data_buffer:
+        self._flush_data('vehicle')
+    
+    def _flush_data(self, data_type: str) -> None:
+        """
+        Flush the buffers of a data type to storage
+        
+        The buffers are only cleared once the data is stored, so a failed
+        flush is retried with the next one.
+        
+        Args:
+            data_type: Type of data ('battery' or 'vehicle')
+        """
+        records, column_buffer = self._buffers(data_type)
+        if not records and not len(column_buffer):
             return
         
         try:
             # Convert to DataFrame for easier processing
-            df = pd.DataFrame(self.vehicle_data_buffer)
-            
-            # Store data
-            self._store_data('vehicle', df)
-            
-            # Clear buffer
-            buffer_size = len(self.vehicle_data_buffer)
+            df = self._buffered_frame(records, column_buffer)
+            self._write_flushed(data_type, df, self._wal_lsn[data_type])
+            self._clear_buffers(data_type)
+        except Exception as e:
+            logger.error(f"Error flushing {data_type} data: {str(e)}")
+    
+    def _buffers(self, data_type: str) -> Tuple[List[Dict], ColumnBuffer]:
+        """Get the record and column buffers of a data type"""
+        if data_type == 'battery':
+            return self.battery_data_buffer, self.battery_column_buffer
+        return self.vehicle_data_buffer, self.vehicle_column_buffer
+    
+    def _clear_buffers(self, data_type: str) -> None:
+        """Empty the record and column buffers of a data type"""
+        if data_type == 'battery':
+            self.battery_data_buffer = []
+            self.battery_column_buffer.clear()
+        else:
             self.vehicle_data_buffer = []
+            self.vehicle_column_buffer.clear()
+    
+    def _take_buffers(self, data_type: str) -> Optional[Tuple[pd.DataFrame, int]]:
+        """
+        Detach the buffered rows of a data type
+        
+        Args:
+            data_type: Type of data ('battery' or 'vehicle')
             
-            logger.info(f"Flushed {buffer_size} vehicle telemetry records")
+        Returns:
+            Tuple of (DataFrame, WAL LSN covering its rows), or None if the
+            buffers are empty
+        """
+        records, column_buffer = self._buffers(data_type)
+        if not records and not len(column_buffer):
+            return None
+        df = self._buffered_frame(records, column_buffer)
+        wal_lsn = self._wal_lsn[data_type]
+        self._clear_buffers(data_type)
+        return df, wal_lsn
+    
+    def _write_flushed(self, data_type: str, df: pd.DataFrame, wal_lsn: int, notify: bool = True) -> None:
+        """
+        Store flushed rows and advance the write-ahead log checkpoint
+        
+        Args:
+            data_type: Type of data ('battery' or 'vehicle')
+            df: Flushed rows
+            wal_lsn: Highest WAL LSN covering the rows
+            notify: Whether to pass the rows to the flush callbacks
+        """
+        self._store_data(data_type, df, wal_lsn, notify=notify)
+        if self.wal is not None and self.dataset_writer is None:
+            # Per-flush files are complete once written; the dataset writer
+            # checkpoints through its commit callback instead
+            self.wal.mark_flushed(data_type, wal_lsn)
+        elif self.wal is not None and notify and self.flush_callbacks:
+            # Rows replayed after a crash skip the callbacks that saw them
+            self.wal.mark_delivered(data_type, wal_lsn)
+        
+        logger.info(f"Flushed {len(df)} {data_type} telemetry records")
+    
+    def _replay_wal(self) -> None:
+        """Write records left in the write-ahead log by a previous run to storage"""
+        pending: Dict[str, List[Any]] = {}
+        for lsn, data_type, columns in self.wal.pending():
+            pending.setdefault(data_type, []).append((lsn, columns))
+        
+        for data_type, frames in pending.items():
+            # Records flushed before the crash but not yet durable were already
+            # passed to the flush callbacks
+            delivered = self.wal.delivered_lsn.get(data_type, 0)
+            for notify, group in [
+                (False, [f for f in frames if f[0] <= delivered]),
+                (True, [f for f in frames if f[0] > delivered])
+            ]:
+                if not group:
+                    continue
+                try:
+                    df = pd.concat([pd.DataFrame(columns) for _, columns in group], ignore_index=True)
+                    df['timestamp'] = pd.to_datetime(
+                        df['timestamp'], utc=True, format='ISO8601'
+                    ).dt.tz_localize(None)
+                    self._write_flushed(data_type, df, max(lsn for lsn, _ in group), notify=notify)
+                    logger.info(f"Replayed {len(df)} {data_type} telemetry records from the write-ahead log")
+                except Exception as e:
+                    logger.error(f"Error replaying {data_type} write-ahead log: {str(e)}")
+    
+    @staticmethod
+    def _buffered_frame(records: List[Dict], column_buffer: ColumnBuffer) -> pd.DataFrame:
+        """
+        Combine record and column buffers into a single DataFrame
+        
+        Args:
+            records: Buffered record dicts from the per-record path
+            column_buffer: Column buffer from the batch path
             
-        except Exception as e:
-            logger.error(f"Error flushing vehicle data: {str(e)}")
+        Returns:
+            DataFrame with all buffered rows
+        """
+        if not len(column_buffer):
+            return pd.DataFrame(records)
+        if not records:
+            return column_buffer.to_frame()
+        
+        # Column buffers hold naive UTC timestamps; align the record rows with them
+        record_df = pd.DataFrame(records)
+        if 'timestamp' in record_df.columns:
+            record_df['timestamp'] = pd.to_datetime(record_df['timestamp'], utc=True).dt.tz_localize(None)
+        return pd.concat([record_df, column_buffer.to_frame()], ignore_index=True)
     
-    def _store_data(self, data_type: str, df: pd.DataFrame) -> None:
+    def _store_data(
+        self,
+        data_type: str,
+        df: pd.DataFrame,
+        wal_lsn: Optional[int] = None,
+        notify: bool = True
+    ) -> None:
         """
         Store data to file and/or database
         
         Args:
             data_type: Type of data ('battery' or 'vehicle')
             df: DataFrame containing the data
+            wal_lsn: Highest write-ahead log LSN covering the rows, if logged
+            notify: Whether to pass the rows to the flush callbacks
         """
-        # File storage
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        file_path = os.path.join(self.storage_path, f"{data_type}_{timestamp}.parquet")
-        
         # Ensure timestamp is in the correct format for Parquet
         if 'timestamp' in df.columns:
             if not pd.api.types.is_datetime64_dtype(df['timestamp']):
                 df['timestamp'] = pd.to_datetime(df['timestamp'])
         
-        # Write to Parquet file
-        df.to_parquet(file_path, index=False)
+        # File storage
+        if self.dataset_writer is not None:
+            self.dataset_writer.write(data_type, df, lsn=wal_lsn if self.wal is not None else None)
+        else:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+            file_path = os.path.join(self.storage_path, f"{data_type}_{timestamp}.parquet")
+            df.to_parquet(file_path, index=False)
+        
+        # Database storage (written by the sink's background thread)
+        if self.db_sink is not None and not self.db_sink.submit(data_type, df):
+            # File storage already holds the rows; retrying the flush would duplicate them there
+            self.db_dropped_batches += 1
+            self.db_dropped_records += len(df)
+            logger.warning(f"{len(df)} flushed {data_type} records were stored to files but not "
+                           f"to the database ({self.db_dropped_batches} batches dropped so far)")
         
-        # Database storage
-        if self.db_connection_string:
+        # Flush callbacks (e.g. incremental rollups)
+        for callback in self.flush_callbacks if notify else []:
             try:
-                # Import here to avoid dependency issues if not using DB
-                from sqlalchemy import create_engine
-                
-                engine = create_engine(self.db_connection_string)
-                table_name = f"{data_type}_telemetry"
-                
-                # Write to database
-                df.to_sql(table_name, engine, if_exists='append', index=False)
-                
+                callback(data_type, df)
             except Exception as e:
-                logger.error(f"Error writing to database: {str(e)}")
+                logger.error(f"Error in flush callback: {str(e)}")
     
     def _check_for_battery_anomalies(self, data: BatteryTelemetry) -> None:
         """
@@ -313,65 +642,44 @@ class TelemetryProcessor:
         Args:
             data: Validated battery telemetry data
         """
-        anomalies = []
-        
-        # Temperature anomalies
-        if data.battery_temp > 50:
-            anomalies.append({
-                'vehicle_id': data.vehicle_id,
-                'timestamp': data.timestamp,
-                'anomaly_type': 'high_temperature',
-                'value': data.battery_temp,
-                'threshold': 50,
-                'severity': 'high' if data.battery_temp > 60 else 'medium'
-            })
-        elif data.battery_temp < 0:
-            anomalies.append({
-                'vehicle_id': data.vehicle_id,
-                'timestamp': data.timestamp,
-                'anomaly_type': 'low_temperature',
-                'value': data.battery_temp,
-                'threshold': 0,
-                'severity': 'high' if data.battery_temp < -10 else 'medium'
-            })
-        
-        # Voltage anomalies
-        if data.voltage < 300:  # Depends on battery configuration
-            anomalies.append({
-                'vehicle_id': data.vehicle_id,
-                'timestamp': data.timestamp,
-                'anomaly_type': 'low_voltage',
-                'value': data.voltage,
-                'threshold': 300,
-                'severity': 'medium'
-            })
-        
-        # Current anomalies (depends on whether charging or discharging)
-        if data.charging_status == 1 and data.current < 0:
-            anomalies.append({
-                'vehicle_id': data.vehicle_id,
-                'timestamp': data.timestamp,
-                'anomaly_type': 'negative_charging_current',
-                'value': data.current,
-                'threshold': 0,
-                'severity': 'high'
-            })
-        elif data.charging_status == 0 and data.current > 0:
-            anomalies.append({
-                'vehicle_id': data.vehicle_id,
-                'timestamp': data.timestamp,
-                'anomaly_type': 'positive_discharging_current',
-                'value': data.current,
-                'threshold': 0,
-                'severity': 'high'
-            })
-        
-        # Process anomalies
-        for anomaly in anomalies:
-            logger.warning(f"Anomaly detected: {anomaly}")
-            # Trigger callbacks
-            for callback in self.anomaly_callbacks:
-                callback(anomaly)
+        columns = {name: np.asarray([value]) for name, value in vars(data).items()}
+        self._emit_anomalies(self.anomaly_engine.evaluate(columns))
+    
+    def _check_batch_for_battery_anomalies(self, columns: Dict[str, np.ndarray]) -> None:
+        """
+        Check a validated battery column batch for anomalies
+        
+        All rules are evaluated over the whole batch with vectorized masks.
+        
+        Args:
+            columns: Typed battery columns of the accepted rows
+        """
+        self._emit_anomalies(self.anomaly_engine.evaluate(columns))
+    
+    def _emit_anomalies(self, anomalies: List[Dict]) -> None:
+        """
+        Log anomalies (rate limited) and pass them to the anomaly callbacks
+        
+        Args:
+            anomalies: Detected anomalies
+        """
+        if not anomalies:
+            return
+        
+        self.anomaly_engine.log(anomalies)
+        
+        for callback in self.anomaly_batch_callbacks:
+            try:
+                callback(anomalies)
+            except Exception as e:
+                logger.error(f"Error in anomaly batch callback: {str(e)}")
+        
+        for callback in self.anomaly_callbacks:
+            for anomaly in anomalies:
+                try:
+                    callback(anomaly)
+                except Exception as e:
+                    logger.error(f"Error in anomaly callback: {str(e)}")
     
     def register_anomaly_callback(self, callback: Callable[[Dict], None]) -> None:
         """
@@ -382,6 +690,15 @@ class TelemetryProcessor:
         """
         self.anomaly_callbacks.append(callback)
     
+    def register_anomaly_batch_callback(self, callback: Callable[[List[Dict]], None]) -> None:
+        """
+        Register a callback function receiving all anomalies of a check at once
+        
+        Args:
+            callback: Function that takes a list of anomaly dicts as parameter
+        """
+        self.anomaly_batch_callbacks.append(callback)
+    
     def register_processing_callback(self, callback: Callable[[str, Dict], None]) -> None:
         """
         Register a callback function for processing
@@ -391,6 +708,15 @@ class TelemetryProcessor:
         """
         self.processing_callbacks.append(callback)
     
+    def register_flush_callback(self, callback: Callable[[str, pd.DataFrame], None]) -> None:
+        """
+        Register a callback function called with every flushed batch
+        
+        Args:
+            callback: Function that takes data_type and the flushed DataFrame as parameters
+        """
+        self.flush_callbacks.append(callback)
+    
     def get_stats(self) -> Dict[str, Any]:
         """
         Get processing statistics
@@ -401,9 +727,15 @@ class TelemetryProcessor:
         return {
             'processed_count': self.processed_count,
             'error_count': self.error_count,
-            'battery_buffer_size': len(self.battery_data_buffer),
-            'vehicle_buffer_size': len(self.vehicle_data_buffer),
-            'last_flush_time': datetime.fromtimestamp(self.last_flush_time).isoformat()
+            'db_dropped_batches': self.db_dropped_batches,
+            'db_dropped_records': self.db_dropped_records,
+            'battery_buffer_size': len(self.battery_data_buffer) + len(self.battery_column_buffer),
+            'vehicle_buffer_size': len(self.vehicle_data_buffer) + len(self.vehicle_column_buffer),
+            'last_flush_time': datetime.fromtimestamp(self.last_flush_time).isoformat(),
+            'storage': self.dataset_writer.get_stats() if self.dataset_writer is not None else None,
+            'database': self.db_sink.get_stats() if self.db_sink is not None else None,
+            'wal': self.wal.get_stats() if self.wal is not None else None,
+            'anomalies': self.anomaly_engine.get_stats()
         }
     
     def flush_all(self) -> None:
@@ -411,6 +743,16 @@ class TelemetryProcessor:
         self._flush_battery_data()
         self._flush_vehicle_data()
         self.last_flush_time = time.time()
+    
+    def close(self) -> None:
+        """Flush all buffers and finalize open storage files"""
+        self.flush_all()
+        if self.dataset_writer is not None:
+            self.dataset_writer.close()
+        if self.db_sink is not None:
+            self.db_sink.close()
+        if self.wal is not None:
+            self.wal.close()
 
 
 class AsyncTelemetryProcessor(TelemetryProcessor):
@@ -418,14 +760,76 @@ class AsyncTelemetryProcessor(TelemetryProcessor):
     Asynchronous version of the telemetry processor
     
     Extends the base TelemetryProcessor with async capabilities for 
-    high-throughput data ingestion.
+    high-throughput data ingestion. Records are routed to worker shards by a
+    hash of the vehicle ID, so per-vehicle ordering is kept, and each shard has
+    a bounded queue. Validation, flushes and file I/O run in a thread pool so the
+    event loop stays responsive under burst load.
+    
+    Shards validate their micro-batches in parallel and only take the shared
+    buffer lock to append the accepted rows. Buffers that are due for a flush
+    are detached under that lock and written outside it, one flush at a time
+    and in the order they were detached.
     """
     
-    def __init__(self, *args, **kwargs):
-        """Initialize the async telemetry processor"""
+    OVERFLOW_POLICIES = ('block', 'drop_oldest', 'spill')
+    
+    def __init__(
+        self,
+        *args,
+        num_shards: int = 4,
+        max_queue_size: int = 10000,
+        overflow_policy: str = 'block',
+        spill_path: Optional[str] = None,
+        max_batch_size: int = 500,
+        executor_workers: Optional[int] = None,
+        **kwargs
+    ):
+        """
+        Initialize the async telemetry processor
+        
+        Args:
+            num_shards: Number of worker shards
+            max_queue_size: Maximum number of queued records per shard
+            overflow_policy: What to do when a shard queue is full: 'block' waits
+                for room, 'drop_oldest' discards the oldest queued record, 'spill'
+                appends records to a file on disk until the shard catches up
+            spill_path: Directory for spill files (defaults to <storage_path>/spill)
+            max_batch_size: Maximum number of records a shard validates at once
+            executor_workers: Number of threads for validation, flushes and I/O
+                (defaults to num_shards)
+        """
         super().__init__(*args, **kwargs)
-        self.processing_queue = asyncio.Queue()
+        if overflow_policy not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}. "
+                             f"Available policies: {self.OVERFLOW_POLICIES}")
+        
+        self.num_shards = num_shards
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = overflow_policy
+        self.spill_path = spill_path or os.path.join(self.storage_path, 'spill')
+        self.max_batch_size = max_batch_size
+        self.executor_workers = executor_workers or num_shards
+        
+        self.shard_queues = [asyncio.Queue(maxsize=max_queue_size) for _ in range(num_shards)]
+        self.dropped_count = 0
+        self.spilled_count = [0] * num_shards
         self.is_running = False
+        
+        # Buffers and counters are shared between shards; detached buffers wait
+        # in _pending_flushes and are written in order under _flush_lock
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._pending_flushes: Deque[Tuple[str, pd.DataFrame, int]] = deque()
+        self._spill_locks = [asyncio.Lock() for _ in range(num_shards)]
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+        
+        if overflow_policy == 'spill':
+            os.makedirs(self.spill_path, exist_ok=True)
+    
+    def _shard_for(self, data: Dict) -> int:
+        """Get the shard index for a record"""
+        return vehicle_shard(data.get('vehicle_id'), self.num_shards)
     
     async def process_battery_telemetry_async(self, data: Dict) -> Optional[BatteryTelemetry]:
         """
@@ -438,7 +842,7 @@ class AsyncTelemetryProcessor(TelemetryProcessor):
             Validated BatteryTelemetry object or None if validation fails
         """
         # Put data in queue for processing
-        await self.processing_queue.put(('battery', data))
+        await self._enqueue('battery', data)
         return None  # Actual processing happens in the worker
     
     async def process_vehicle_telemetry_async(self, data: Dict) -> Optional[VehicleTelemetry]:
@@ -452,63 +856,293 @@ class AsyncTelemetryProcessor(TelemetryProcessor):
             Validated VehicleTelemetry object or None if validation fails
         """
         # Put data in queue for processing
-        await self.processing_queue.put(('vehicle', data))
+        await self._enqueue('vehicle', data)
         return None  # Actual processing happens in the worker
     
+    async def _enqueue(self, data_type: str, data: Dict) -> None:
+        """
+        Route a record to its shard, applying the overflow policy
+        
+        Args:
+            data_type: Type of data ('battery' or 'vehicle')
+            data: Raw telemetry data
+        """
+        shard = self._shard_for(data)
+        shard_queue = self.shard_queues[shard]
+        
+        if self.overflow_policy == 'block':
+            await shard_queue.put((data_type, data))
+            return
+        
+        if self.overflow_policy == 'spill':
+            # Once a shard has spilled, keep spilling until the backlog is
+            # replayed so records of a vehicle stay in order
+            if self.spilled_count[shard] > 0 or shard_queue.full():
+                # Count the record before writing it, so later records of the
+                # shard spill behind it while the write is in flight
+                self.spilled_count[shard] += 1
+                async with self._spill_locks[shard]:
+                    await asyncio.get_running_loop().run_in_executor(
+                        self._executor, self._spill, shard, data_type, data
+                    )
+            else:
+                shard_queue.put_nowait((data_type, data))
+            return
+        
+        # drop_oldest
+        if shard_queue.full():
+            try:
+                shard_queue.get_nowait()
+                shard_queue.task_done()
+                self.dropped_count += 1
+            except asyncio.QueueEmpty:
+                pass
+        shard_queue.put_nowait((data_type, data))
+    
+    def _spill_file(self, shard: int) -> str:
+        """Get the spill file path of a shard"""
+        return os.path.join(self.spill_path, f"shard_{shard:02d}.jsonl")
+    
+    def _spill(self, shard: int, data_type: str, data: Dict) -> None:
+        """Append a record to the spill file of a shard (runs in the executor)"""
+        with open(self._spill_file(shard), 'a') as f:
+            f.write(json.dumps({'type': data_type, 'data': data}, default=str) + '\n')
+    
+    def _read_spill(self, path: str) -> List[Tuple[str, Dict]]:
+        """Read and remove a detached spill file"""
+        items = []
+        with open(path, 'r') as f:
+            for line in f:
+                record = json.loads(line)
+                items.append((record['type'], record['data']))
+        os.remove(path)
+        return items
+    
+    async def _drain_spill(self, shard: int) -> None:
+        """Replay spilled records of a shard once its queue is empty"""
+        if self.spilled_count[shard] == 0:
+            return
+        
+        # Detach the current spill file once in-flight spill writes are done;
+        # new overflow goes to a fresh one
+        path = self._spill_file(shard)
+        draining_path = f"{path}.draining"
+        loop = asyncio.get_running_loop()
+        async with self._spill_locks[shard]:
+            if not os.path.exists(path):
+                return
+            os.replace(path, draining_path)
+            items = await loop.run_in_executor(self._executor, self._read_spill, draining_path)
+        for start in range(0, len(items), self.max_batch_size):
+            await loop.run_in_executor(
+                self._executor, self._process_items, items[start:start + self.max_batch_size]
+            )
+        self.spilled_count[shard] -= len(items)
+    
+    def _process_items(self, items: List[Tuple[str, Dict]]) -> None:
+        """
+        Validate and buffer a micro-batch of queued records
+        
+        Runs in the executor. Records are split by type and validated without
+        holding the buffer lock; the lock is only taken to buffer the accepted
+        rows, preserving their queue order within each type.
+        
+        Args:
+            items: List of (data_type, data) tuples
+        """
+        batches = [
+            ('battery', BATTERY_COLUMN_SPECS, self.battery_column_buffer),
+            ('vehicle', VEHICLE_COLUMN_SPECS, self.vehicle_column_buffer)
+        ]
+        for data_type, specs, buffer in batches:
+            records = [data for item_type, data in items if item_type == data_type]
+            if not records:
+                continue
+            
+            try:
+                columns, valid, rejected = validate_columns(to_columns(records), specs)
+            except Exception as e:
+                with self._lock:
+                    self._batch_error(data_type, e)
+                continue
+            
+            with self._lock:
+                self._buffer_batch(data_type, columns, valid, rejected, buffer, sync_wal=False)
+                wal_lsn = self._wal_lsn[data_type]
+                self._detach_flushes(self._due_flushes())
+            
+            # Wait for the log outside the lock so shards share fsyncs instead of queueing
+            if self.wal is not None and valid.any():
+                self.wal.wait_durable(wal_lsn)
+        
+        self._write_pending_flushes()
+    
+    def _detach_flushes(self, data_types: List[str]) -> None:
+        """
+        Queue the buffers of data types for writing (buffer lock held)
+        
+        Args:
+            data_types: Data types whose buffers to detach
+        """
+        for data_type in data_types:
+            taken = self._take_buffers(data_type)
+            if taken is not None:
+                self._pending_flushes.append((data_type, *taken))
+    
+    def _write_pending_flushes(self) -> None:
+        """
+        Write detached buffers in the order they were detached
+        
+        Only one thread writes at a time, so flushes and write-ahead log
+        checkpoints stay ordered. A failed write stays queued and is retried
+        by the next flush.
+        """
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    if not self._pending_flushes:
+                        return
+                    data_type, df, wal_lsn = self._pending_flushes[0]
+                try:
+                    self._write_flushed(data_type, df, wal_lsn)
+                except Exception as e:
+                    logger.error(f"Error flushing {data_type} data: {str(e)}")
+                    return
+                with self._lock:
+                    self._pending_flushes.popleft()
+    
     async def start_processing(self) -> None:
-        """Start asynchronous processing worker"""
+        """Start asynchronous processing workers"""
         self.is_running = True
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.executor_workers, thread_name_prefix='telemetry'
+        )
         
-        # Start worker task
-        asyncio.create_task(self._processing_worker())
+        # Start one worker task per shard
+        self._tasks = [
+            asyncio.create_task(self._processing_worker(shard))
+            for shard in range(self.num_shards)
+        ]
         
         # Start periodic flush task
-        asyncio.create_task(self._periodic_flush())
+        self._tasks.append(asyncio.create_task(self._periodic_flush()))
         
-        logger.info("Async telemetry processor started")
+        logger.info(f"Async telemetry processor started with {self.num_shards} shards")
     
-    async def stop_processing(self) -> None:
-        """Stop asynchronous processing"""
+    async def stop_processing(self, timeout: float = 30.0) -> None:
+        """
+        Stop asynchronous processing
+        
+        Args:
+            timeout: Maximum time to wait for queued records to be processed
+        """
+        # Allow workers to finish queued and spilled records
+        try:
+            await asyncio.wait_for(self._wait_until_drained(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Timed out waiting for telemetry queues to drain")
+        
         self.is_running = False
-        await asyncio.sleep(0.1)  # Allow workers to finish
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
         
-        # Flush remaining data
-        self.flush_all()
+        # Flush remaining data and close storage files
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._close_locked)
+        self._executor.shutdown(wait=True)
+        self._executor = None
         
         logger.info("Async telemetry processor stopped")
     
-    async def _processing_worker(self) -> None:
-        """Worker function to process queued telemetry data"""
+    async def _wait_until_drained(self) -> None:
+        """Wait until all shard queues and spill files are empty"""
+        for shard_queue in self.shard_queues:
+            await shard_queue.join()
+        while any(self.spilled_count):
+            await asyncio.sleep(0.05)
+            for shard_queue in self.shard_queues:
+                await shard_queue.join()
+    
+    def _close_locked(self) -> None:
+        """Write all buffered data, then close the processor"""
+        with self._lock:
+            self._detach_flushes(['battery', 'vehicle'])
+        self._write_pending_flushes()
+        with self._lock:
+            self.close()
+    
+    async def _processing_worker(self, shard: int) -> None:
+        """
+        Worker function to process the queued telemetry data of one shard
+        
+        Args:
+            shard: Index of the shard to serve
+        """
+        shard_queue = self.shard_queues[shard]
+        loop = asyncio.get_running_loop()
+        
         while self.is_running:
             try:
                 # Get data from queue with timeout
                 try:
-                    data_type, data = await asyncio.wait_for(
-                        self.processing_queue.get(), timeout=1.0
-                    )
+                    item = await asyncio.wait_for(shard_queue.get(), timeout=1.0)
                 except asyncio.TimeoutError:
+                    await self._drain_spill(shard)
                     continue
                 
-                # Process data based on type
-                if data_type == 'battery':
-                    super().process_battery_telemetry(data)
-                elif data_type == 'vehicle':
-                    super().process_vehicle_telemetry(data)
+                # Take whatever else is already queued, up to the batch size
+                items = [item]
+                while len(items) < self.max_batch_size and not shard_queue.empty():
+                    items.append(shard_queue.get_nowait())
                 
-                # Mark task as done
-                self.processing_queue.task_done()
+                try:
+                    await loop.run_in_executor(self._executor, self._process_items, items)
+                finally:
+                    # Mark tasks as done
+                    for _ in items:
+                        shard_queue.task_done()
+                
+                if shard_queue.empty():
+                    await self._drain_spill(shard)
                 
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                logger.error(f"Error in processing worker: {str(e)}")
+                logger.error(f"Error in processing worker {shard}: {str(e)}")
                 await asyncio.sleep(1)  # Prevent tight loop on persistent errors
     
     async def _periodic_flush(self) -> None:
         """Periodically flush data buffers"""
+        loop = asyncio.get_running_loop()
         while self.is_running:
             await asyncio.sleep(self.buffer_timeout)
             
             # Current time check is done in the method
-            self._check_flush_buffers()
+            await loop.run_in_executor(self._executor, self._check_flush_locked)
+    
+    def _check_flush_locked(self) -> None:
+        """Check the flush conditions and write the buffers that are due"""
+        with self._lock:
+            self._detach_flushes(self._due_flushes())
+        self._write_pending_flushes()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get processing statistics, including shard queue depths
+        
+        Returns:
+            Dictionary with processing statistics
+        """
+        stats = super().get_stats()
+        stats.update({
+            'queue_depths': [shard_queue.qsize() for shard_queue in self.shard_queues],
+            'dropped_count': self.dropped_count,
+            'spilled_count': sum(self.spilled_count),
+            'overflow_policy': self.overflow_policy
+        })
+        return stats
 
 
 # Example implementation of database storage and testing
@@ -0,0 +1,607 @@
+"""
+Telemetry Rollups
+
+This module maintains materialized min/max/mean aggregates of battery telemetry
+per vehicle at several resolutions (1 minute, 1 hour and 1 day by default).
+Rollups are updated incrementally from TelemetryProcessor flushes. Aggregates
+are stored as count/sum/min/max, which merge exactly, so a late-arriving record
+only touches the buckets it falls into. Coarser resolutions are derived from
+the finest partial aggregates rather than from raw records.
+
+Each vehicle's current bucket stays open in a small indexed frame that updates
+merge into. Buckets the vehicle has moved past, and late records for them, are
+appended as finalized parts that are only merged when read, so an update costs
+time proportional to its own records rather than to the stored history. With
+a storage path, every update is persisted as a delta file and save() compacts
+the deltas into one file per resolution.
+"""
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Union
+
+import numpy as np
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Resolution name -> bucket width in seconds
+DEFAULT_RESOLUTIONS = {'1min': 60, '1h': 3600, '1d': 86400}
+
+# Resolution name -> how long buckets are kept, in seconds (None keeps everything)
+DEFAULT_RETENTION = {'1min': 7 * 86400, '1h': 400 * 86400, '1d': None}
+
+# Share of the retention the cutoff moves before old buckets are pruned again
+RETENTION_SLACK = 0.1
+
+STATE_FILENAME = 'rollup_state.json'
+
+ROLLUP_SIGNALS = ['state_of_charge', 'battery_temp', 'voltage', 'current']
+
+_NS_PER_SECOND = 1_000_000_000
+
+
+def parse_interval(interval: Union[str, int, float, pd.Timedelta]) -> int:
+    """
+    Convert an interval to whole seconds
+
+    Args:
+        interval: Resolution name, seconds, or anything pandas.Timedelta accepts
+
+    Returns:
+        Interval length in seconds
+    """
+    if isinstance(interval, str) and interval in DEFAULT_RESOLUTIONS:
+        return DEFAULT_RESOLUTIONS[interval]
+    if isinstance(interval, (int, float, np.integer, np.floating)):
+        return int(interval)
+    return int(pd.Timedelta(interval).total_seconds())
+
+
+def _partial_aggregates(
+    vehicle_ids: np.ndarray,
+    buckets: np.ndarray,
+    values: pd.DataFrame,
+    counts: Optional[np.ndarray] = None
+) -> pd.DataFrame:
+    """
+    Group values into (vehicle_id, bucket) partial aggregates
+
+    Args:
+        vehicle_ids: Vehicle ID per row
+        buckets: Bucket start (ns since epoch) per row
+        values: Either raw signal columns, or the count/sum/min/max columns of
+            finer aggregates when counts is given
+        counts: Row counts of finer aggregates
+
+    Returns:
+        DataFrame indexed by (vehicle_id, bucket) with count/sum/min/max columns
+    """
+    keys = [pd.Index(vehicle_ids, name='vehicle_id'), pd.Index(buckets, name='bucket')]
+
+    if counts is None:
+        grouped = values[ROLLUP_SIGNALS].groupby(keys, sort=False)
+        result = pd.concat(
+            {
+                'sum': grouped.sum(),
+                'min': grouped.min(),
+                'max': grouped.max()
+            },
+            axis=1
+        )
+        result.columns = [f"{signal}_{stat}" for stat, signal in result.columns]
+        result.insert(0, 'count', grouped.size())
+        return result
+
+    frame = values.copy()
+    frame['count'] = counts
+    return frame.groupby(keys, sort=False).agg(_AGGREGATIONS)
+
+
+# How count/sum/min/max columns of partial aggregates combine
+_AGGREGATIONS = {'count': 'sum'}
+for _signal in ROLLUP_SIGNALS:
+    _AGGREGATIONS[f"{_signal}_sum"] = 'sum'
+    _AGGREGATIONS[f"{_signal}_min"] = 'min'
+    _AGGREGATIONS[f"{_signal}_max"] = 'max'
+
+
+def _merge(existing: pd.DataFrame, partial: pd.DataFrame) -> pd.DataFrame:
+    """Merge partial aggregates into existing ones, touching only shared buckets"""
+    if existing.empty:
+        return partial.copy()
+
+    common = existing.index.intersection(partial.index)
+    if len(common):
+        old = existing.loc[common]
+        new = partial.loc[common]
+        merged = old.copy()
+        for column in existing.columns:
+            if column == 'count' or column.endswith('_sum'):
+                merged[column] = old[column].to_numpy() + new[column].to_numpy()
+            elif column.endswith('_min'):
+                merged[column] = np.fmin(old[column].to_numpy(), new[column].to_numpy())
+            elif column.endswith('_max'):
+                merged[column] = np.fmax(old[column].to_numpy(), new[column].to_numpy())
+        existing.loc[common] = merged
+
+    fresh = partial.index.difference(existing.index)
+    if len(fresh):
+        existing = pd.concat([existing, partial.loc[fresh]])
+    return existing
+
+
+def _combine(parts: List[pd.DataFrame]) -> pd.DataFrame:
+    """Merge partial aggregates that may share buckets into one frame"""
+    parts = [part for part in parts if not part.empty]
+    if not parts:
+        return pd.DataFrame()
+    combined = pd.concat(parts) if len(parts) > 1 else parts[0]
+    if combined.index.is_unique:
+        return combined
+    return combined.groupby(level=['vehicle_id', 'bucket'], sort=False).agg(_AGGREGATIONS)
+
+
+def _latest(latest: Dict[Any, int], vehicle_ids: pd.Index, width: int) -> np.ndarray:
+    """Start of the bucket holding each vehicle's newest record (0 if unseen)"""
+    newest = np.fromiter((latest.get(v, 0) for v in vehicle_ids), dtype=np.int64, count=len(vehicle_ids))
+    return newest // width * width
+
+
+def finalize_aggregates(aggregates: pd.DataFrame) -> pd.DataFrame:
+    """
+    Turn count/sum/min/max aggregates into min/max/mean output columns
+
+    Args:
+        aggregates: DataFrame indexed by (vehicle_id, bucket)
+
+    Returns:
+        DataFrame with vehicle_id, timestamp, count and per-signal min/max/mean
+    """
+    result = pd.DataFrame({
+        'vehicle_id': aggregates.index.get_level_values('vehicle_id'),
+        'timestamp': pd.to_datetime(aggregates.index.get_level_values('bucket').to_numpy(dtype=np.int64)),
+        'count': aggregates['count'].to_numpy()
+    })
+    counts = aggregates['count'].to_numpy(dtype=np.float64)
+    for signal in ROLLUP_SIGNALS:
+        result[f"{signal}_min"] = aggregates[f"{signal}_min"].to_numpy()
+        result[f"{signal}_max"] = aggregates[f"{signal}_max"].to_numpy()
+        result[f"{signal}_mean"] = aggregates[f"{signal}_sum"].to_numpy() / counts
+    return result.sort_values(['vehicle_id', 'timestamp'], kind='stable').reset_index(drop=True)
+
+
+def aggregate_raw(df: pd.DataFrame, interval: Union[str, int]) -> pd.DataFrame:
+    """
+    Aggregate raw battery telemetry to a fixed interval
+
+    Args:
+        df: Raw telemetry with vehicle_id, timestamp and the rollup signals
+        interval: Bucket width (resolution name, seconds or Timedelta string)
+
+    Returns:
+        DataFrame in the finalize_aggregates layout
+    """
+    width = parse_interval(interval) * _NS_PER_SECOND
+    ts = pd.to_datetime(df['timestamp']).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    partial = _partial_aggregates(df['vehicle_id'].to_numpy(), ts // width * width, df)
+    return finalize_aggregates(partial)
+
+
+class TelemetryRollup:
+    """
+    Incrementally maintained multi-resolution telemetry aggregates
+
+    Connect it to a TelemetryProcessor to be fed by every battery flush, and use
+    query() to read aggregates at the coarsest stored resolution that divides
+    the requested interval.
+    """
+
+    def __init__(
+        self,
+        storage_path: Optional[str] = None,
+        resolutions: Optional[Dict[str, int]] = None,
+        retention: Optional[Dict[str, Optional[int]]] = None,
+        max_deltas: int = 64
+    ):
+        """
+        Initialize the rollup
+
+        Args:
+            storage_path: Directory where materialized rollups are persisted
+            resolutions: Resolution name -> bucket width in seconds
+            retention: Resolution name -> seconds of buckets to keep
+            max_deltas: Number of persisted updates after which they are
+                compacted into the per-resolution files
+        """
+        self.storage_path = storage_path
+        self.resolutions = dict(sorted((resolutions or DEFAULT_RESOLUTIONS).items(), key=lambda kv: kv[1]))
+        self.retention = dict(DEFAULT_RETENTION)
+        self.retention.update(retention or {})
+        self.max_deltas = max_deltas
+
+        # Buckets still receiving records, and finalized parts merged on read
+        self._open: Dict[str, pd.DataFrame] = {name: pd.DataFrame() for name in self.resolutions}
+        self._closed: Dict[str, List[pd.DataFrame]] = {name: [] for name in self.resolutions}
+        # Vehicle ID -> timestamp (ns) of its newest record
+        self.latest_bucket: Dict[str, int] = {}
+        # Resolution name -> bucket start (ns) before which buckets were pruned
+        self.pruned_before: Dict[str, int] = {}
+        self._retention_cutoff: Dict[str, int] = {}
+        self.updated_records = 0
+        self.late_records = 0
+        self._lock = threading.Lock()
+
+        # Persisted state: compacted files up to a delta sequence number, plus later deltas
+        self._state: Dict[str, Any] = {'seq': 0, 'files': {}}
+        self._delta_seq = 0
+        self._deltas: List[str] = []
+
+        if storage_path:
+            os.makedirs(storage_path, exist_ok=True)
+            self.load()
+
+    def connect_to_telemetry_processor(self, processor: Any) -> None:
+        """
+        Connect to a telemetry processor to be updated on every flush
+
+        Records the processor replays from its write-ahead log at startup only
+        reach callbacks registered before that; pass handle_flush in the
+        processor's flush_callbacks to have them rolled up too.
+
+        Args:
+            processor: TelemetryProcessor instance to connect to
+        """
+        processor.register_flush_callback(self.handle_flush)
+        logger.info("Telemetry rollup connected to telemetry processor")
+
+    def handle_flush(self, data_type: str, df: pd.DataFrame) -> None:
+        """
+        Flush callback: only battery telemetry is rolled up
+
+        Args:
+            data_type: Type of the flushed data
+            df: Flushed rows
+        """
+        if data_type == 'battery':
+            self.update(df)
+
+    def update(self, df: pd.DataFrame) -> None:
+        """
+        Merge raw battery telemetry into all resolutions
+
+        Args:
+            df: Raw telemetry with vehicle_id, timestamp and the rollup signals
+        """
+        if df.empty:
+            return
+
+        vehicle_ids = df['vehicle_id'].to_numpy()
+        ts = pd.to_datetime(df['timestamp'], utc=True).dt.tz_localize(None)
+        ts = ts.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+        width = next(iter(self.resolutions.values())) * _NS_PER_SECOND
+        partial = _partial_aggregates(vehicle_ids, ts // width * width, df)
+        newest = pd.Series(ts).groupby(vehicle_ids).max()
+
+        with self._lock:
+            # Count records older than the newest already seen for their vehicle
+            codes, uniques = pd.factorize(vehicle_ids)
+            previous = np.fromiter(
+                (self.latest_bucket.get(v, -1) for v in uniques), dtype=np.int64, count=len(uniques)
+            )
+            self.late_records += int((ts < previous[codes]).sum())
+
+            self._apply(partial, newest)
+            self.updated_records += len(df)
+            if self.storage_path:
+                self._persist_delta(partial)
+
+    def _apply(self, partial: pd.DataFrame, newest: pd.Series) -> None:
+        """
+        Merge finest-resolution partial aggregates into all resolutions (lock held)
+
+        Args:
+            partial: Partial aggregates at the finest resolution
+            newest: Newest timestamp (ns) per vehicle in the update
+        """
+        latest_before = {v: self.latest_bucket.get(v, 0) for v in newest.index}
+        for vehicle_id, ts in newest.items():
+            self.latest_bucket[vehicle_id] = max(latest_before[vehicle_id], int(ts))
+
+        for name, seconds in self.resolutions.items():
+            width = seconds * _NS_PER_SECOND
+            if name != next(iter(self.resolutions)):
+                # Coarser resolutions are derived from the finer partials
+                finer_buckets = partial.index.get_level_values('bucket').to_numpy(dtype=np.int64)
+                partial = _partial_aggregates(
+                    partial.index.get_level_values('vehicle_id').to_numpy(),
+                    finer_buckets // width * width,
+                    partial.drop(columns='count').reset_index(drop=True),
+                    counts=partial['count'].to_numpy()
+                )
+
+            # Records for buckets the vehicle had already moved past are late
+            vehicles = partial.index.get_level_values('vehicle_id')
+            buckets = partial.index.get_level_values('bucket').to_numpy(dtype=np.int64)
+            late = buckets < _latest(latest_before, vehicles, width)
+            if late.any():
+                self._closed[name].append(partial[late])
+            open_buckets = _merge(self._open[name], partial[~late])
+
+            # Finalize open buckets of the updated vehicles that they moved past
+            touched = open_buckets.index.get_level_values('vehicle_id').isin(newest.index)
+            if touched.any():
+                candidates = open_buckets[touched]
+                done = candidates.index.get_level_values('bucket').to_numpy(dtype=np.int64) < _latest(
+                    self.latest_bucket, candidates.index.get_level_values('vehicle_id'), width
+                )
+                if done.any():
+                    self._closed[name].append(candidates[done])
+                    open_buckets = open_buckets.drop(candidates.index[done])
+            self._open[name] = open_buckets
+
+        self._apply_retention()
+
+    def _apply_retention(self) -> None:
+        """
+        Drop buckets older than the retention of their resolution (lock held)
+
+        Pruning scans the stored parts, so it only runs again once the cutoff
+        has moved RETENTION_SLACK of the retention since the last run.
+        """
+        if not self.latest_bucket:
+            return
+        newest = max(self.latest_bucket.values())
+        for name, keep_seconds in self.retention.items():
+            if keep_seconds is None or name not in self.resolutions:
+                continue
+            cutoff = newest - keep_seconds * _NS_PER_SECOND
+            last = self._retention_cutoff.get(name)
+            if last is not None and cutoff - last < keep_seconds * _NS_PER_SECOND * RETENTION_SLACK:
+                continue
+            self._retention_cutoff[name] = cutoff
+
+            pruned = False
+            frames = self._closed[name] + [self._open[name]]
+            kept = []
+            for frame in frames:
+                if frame.empty:
+                    kept.append(frame)
+                    continue
+                keep = frame.index.get_level_values('bucket').to_numpy(dtype=np.int64) >= cutoff
+                pruned |= not keep.all()
+                kept.append(frame if keep.all() else frame[keep])
+            self._closed[name] = [frame for frame in kept[:-1] if not frame.empty]
+            self._open[name] = kept[-1]
+            if pruned:
+                self.pruned_before[name] = max(self.pruned_before.get(name, cutoff), cutoff)
+
+    def _aggregates(self, name: str) -> pd.DataFrame:
+        """All aggregates of a resolution, merging the finalized parts (lock held)"""
+        closed = _combine(self._closed[name])
+        self._closed[name] = [closed] if not closed.empty else []
+        return _combine([closed, self._open[name]])
+
+    def choose_resolution(
+        self,
+        interval: Union[str, int],
+        start: Optional[Union[datetime, str]] = None
+    ) -> Optional[str]:
+        """
+        Pick the coarsest stored resolution that can answer a request
+
+        A resolution qualifies if it divides the requested interval and none of
+        its buckets from the start of the window on have been pruned.
+
+        Args:
+            interval: Requested bucket width
+            start: Start of the requested window
+
+        Returns:
+            Resolution name, or None if no resolution qualifies
+        """
+        seconds = parse_interval(interval)
+        start_ns = pd.Timestamp(start).value if start is not None else None
+
+        for name, width in sorted(self.resolutions.items(), key=lambda kv: kv[1], reverse=True):
+            if width > seconds or seconds % width:
+                continue
+            cutoff = self.pruned_before.get(name)
+            if cutoff is not None and (start_ns is None or start_ns < cutoff):
+                continue
+            return name
+        return None
+
+    def query(
+        self,
+        vehicle_ids: Optional[List[str]] = None,
+        start: Optional[Union[datetime, str]] = None,
+        end: Optional[Union[datetime, str]] = None,
+        interval: Union[str, int] = '1h'
+    ) -> Optional[pd.DataFrame]:
+        """
+        Read aggregates for a set of vehicles and a time range
+
+        Args:
+            vehicle_ids: Vehicles to include (all vehicles if None)
+            start: Inclusive start of the time range (aligned down to the interval)
+            end: Inclusive end of the time range
+            interval: Requested bucket width
+
+        Returns:
+            DataFrame in the finalize_aggregates layout, or None if no stored
+            resolution can answer the request or nothing has been rolled up yet
+        """
+        resolution = self.choose_resolution(interval, start)
+        if resolution is None:
+            return None
+
+        width = parse_interval(interval) * _NS_PER_SECOND
+        with self._lock:
+            aggregates = self._aggregates(resolution)
+            if aggregates.empty:
+                return None
+
+            buckets = aggregates.index.get_level_values('bucket').to_numpy(dtype=np.int64)
+            mask = np.ones(len(aggregates), dtype=bool)
+            if vehicle_ids is not None:
+                mask &= aggregates.index.get_level_values('vehicle_id').isin(list(vehicle_ids))
+            if start is not None:
+                start_ns = pd.Timestamp(start).value
+                mask &= buckets >= start_ns // width * width
+            if end is not None:
+                mask &= buckets <= pd.Timestamp(end).value
+            selected = aggregates[mask]
+
+        if parse_interval(interval) != self.resolutions[resolution] and not selected.empty:
+            # Re-bucket to the requested interval
+            selected_buckets = selected.index.get_level_values('bucket').to_numpy(dtype=np.int64)
+            selected = _partial_aggregates(
+                selected.index.get_level_values('vehicle_id').to_numpy(),
+                selected_buckets // width * width,
+                selected.drop(columns='count').reset_index(drop=True),
+                counts=selected['count'].to_numpy()
+            )
+        return finalize_aggregates(selected)
+
+    def _persist_delta(self, partial: pd.DataFrame) -> None:
+        """Persist one update's finest partial aggregates (lock held)"""
+        self._delta_seq += 1
+        path = os.path.join(self.storage_path, f"rollup_delta_{self._delta_seq:08d}.parquet")
+        tmp_path = f"{path}.tmp"
+        partial.reset_index().to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        self._deltas.append(path)
+
+        if len(self._deltas) >= self.max_deltas:
+            self._save_locked()
+
+    def save(self) -> None:
+        """Compact persisted deltas into one file per resolution"""
+        if not self.storage_path:
+            return
+        with self._lock:
+            self._save_locked()
+
+    def _save_locked(self) -> None:
+        """
+        Write one file per resolution covering all deltas so far (lock held)
+
+        The state file naming the new files is replaced last, so a crash
+        leaves either the old files and all deltas or the new files.
+        """
+        seq = self._delta_seq
+        if seq == self._state['seq'] and self._state['files']:
+            return
+
+        files = {}
+        for name in self.resolutions:
+            aggregates = self._aggregates(name)
+            if aggregates.empty:
+                continue
+            files[name] = f"rollup_{name}.{seq:08d}.parquet"
+            path = os.path.join(self.storage_path, files[name])
+            tmp_path = f"{path}.tmp"
+            aggregates.reset_index().to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+
+        state_path = os.path.join(self.storage_path, STATE_FILENAME)
+        tmp_path = f"{state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'seq': seq, 'files': files}, f)
+        os.replace(tmp_path, state_path)
+
+        stale = set(self._state['files'].values()) - set(files.values())
+        self._state = {'seq': seq, 'files': files}
+        for filename in stale:
+            os.remove(os.path.join(self.storage_path, filename))
+        for path in self._deltas:
+            os.remove(path)
+        self._deltas = []
+
+    def load(self) -> None:
+        """Load persisted aggregates and replay the deltas written after them"""
+        state_path = os.path.join(self.storage_path, STATE_FILENAME)
+        if os.path.exists(state_path):
+            try:
+                with open(state_path, 'r') as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error loading rollup state: {str(e)}")
+        self._delta_seq = self._state['seq']
+
+        loaded = {}
+        for name, filename in self._state['files'].items():
+            if name not in self.resolutions:
+                continue
+            path = os.path.join(self.storage_path, filename)
+            try:
+                loaded[name] = pd.read_parquet(path).set_index(['vehicle_id', 'bucket'])
+            except Exception as e:
+                logger.error(f"Error loading rollup {path}: {str(e)}")
+                continue
+            latest = loaded[name].reset_index().groupby('vehicle_id')['bucket'].max()
+            for vehicle_id, bucket in latest.items():
+                self.latest_bucket[vehicle_id] = max(self.latest_bucket.get(vehicle_id, 0), int(bucket))
+
+        # Each vehicle's newest bucket is still open
+        for name, aggregates in loaded.items():
+            width = self.resolutions[name] * _NS_PER_SECOND
+            buckets = aggregates.index.get_level_values('bucket').to_numpy(dtype=np.int64)
+            current = buckets >= _latest(self.latest_bucket, aggregates.index.get_level_values('vehicle_id'), width)
+            self._closed[name] = [aggregates[~current]]
+            self._open[name] = aggregates[current]
+
+        # Assume everything outside the retention was pruned before the restart
+        if self.latest_bucket:
+            newest = max(self.latest_bucket.values())
+            for name, keep_seconds in self.retention.items():
+                if keep_seconds is not None and name in self.resolutions:
+                    self.pruned_before[name] = newest - keep_seconds * _NS_PER_SECOND
+
+        deltas = sorted(
+            filename for filename in os.listdir(self.storage_path)
+            if filename.startswith('rollup_delta_') and filename.endswith('.parquet')
+        )
+        for filename in deltas:
+            seq = int(filename[len('rollup_delta_'):-len('.parquet')])
+            path = os.path.join(self.storage_path, filename)
+            if seq <= self._state['seq']:
+                # Already compacted before a restart
+                os.remove(path)
+                continue
+            try:
+                partial = pd.read_parquet(path).set_index(['vehicle_id', 'bucket'])
+                newest = partial.reset_index().groupby('vehicle_id')['bucket'].max()
+                self._apply(partial, newest)
+            except Exception as e:
+                logger.error(f"Error loading rollup delta {path}: {str(e)}")
+            self._delta_seq = max(self._delta_seq, seq)
+            self._deltas.append(path)
+
+    def close(self) -> None:
+        """Compact the persisted deltas"""
+        self.save()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get rollup statistics
+
+        Returns:
+            Dictionary with bucket counts per resolution and record counters
+        """
+        with self._lock:
+            buckets = {name: len(self._aggregates(name)) for name in self.resolutions}
+            return {
+                'buckets': buckets,
+                'open_buckets': {name: len(frame) for name, frame in self._open.items()},
+                'pending_deltas': len(self._deltas),
+                'updated_records': self.updated_records,
+                'late_records': self.late_records,
+                'vehicles': len(self.latest_bucket)
+            }
@@ -0,0 +1,370 @@
+"""
+Telemetry Store
+
+This module implements the query side of the partitioned telemetry dataset
+written by TelemetryDatasetWriter. Scans prune whole files with the dataset
+manifest (time range and vehicle hash bucket) and row groups with Parquet
+column statistics, read only the requested columns, and read files in
+parallel. A streaming variant yields record batches for windows that do not
+fit in memory. Files re-encoded with the compact telemetry codec are decoded
+column by column and filtered the same way. Aggregate queries are answered
+from materialized rollups when one of their resolutions fits the request.
+"""
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Iterator, Union
+
+import pandas as pd
+
+from app.ml.data_pipeline.telemetry_dataset import (
+    PYARROW_AVAILABLE,
+    DatasetManifest,
+    vehicle_bucket
+)
+from app.ml.data_pipeline.telemetry_codec import CODEC_EXTENSION, read_encoded
+from app.ml.data_pipeline.telemetry_rollup import ROLLUP_SIGNALS, TelemetryRollup, aggregate_raw
+
+if PYARROW_AVAILABLE:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def _to_naive_utc(value: Optional[Union[datetime, str]]) -> Optional[pd.Timestamp]:
+    """Normalize a time bound to a naive UTC timestamp"""
+    if value is None:
+        return None
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return ts
+
+
+class TelemetryStore:
+    """
+    Reader for the partitioned telemetry dataset
+
+    Only closed files are visible; rows still buffered by the processor or in a
+    file that is being appended to appear once that file is rolled over or the
+    writer is closed.
+    """
+
+    def __init__(self, root: str, max_workers: int = 4, rollup: Optional[TelemetryRollup] = None):
+        """
+        Initialize the telemetry store
+
+        Args:
+            root: Root directory of the dataset (the processor's storage_path)
+            max_workers: Number of threads used to read files
+            rollup: Rollups used to answer aggregate queries (raw scans if None)
+        """
+        if not PYARROW_AVAILABLE:
+            raise ImportError("pyarrow is required for TelemetryStore")
+
+        self.root = root
+        self.max_workers = max_workers
+        self.manifest = DatasetManifest(root)
+        self.rollup = rollup
+
+    @property
+    def num_buckets(self) -> int:
+        """Number of vehicle hash buckets used by the writer"""
+        return int(self.manifest.metadata.get('num_buckets', 16))
+
+    def _select_files(
+        self,
+        data_type: str,
+        vehicle_ids: Optional[List[str]],
+        start: Optional[pd.Timestamp],
+        end: Optional[pd.Timestamp]
+    ) -> List[str]:
+        """Select the files that may hold matching rows, ordered by time"""
+        self.manifest.refresh()
+        buckets = None
+        if vehicle_ids is not None:
+            buckets = sorted(set(vehicle_bucket(list(vehicle_ids), self.num_buckets).tolist()))
+
+        selected = self.manifest.select(
+            data_type,
+            start=start.to_pydatetime() if start is not None else None,
+            end=end.to_pydatetime() if end is not None else None,
+            buckets=buckets
+        )
+        selected.sort(key=lambda item: (item[1]['min_timestamp'], item[0]))
+        return [os.path.join(self.root, rel_path) for rel_path, _ in selected]
+
+    @staticmethod
+    def _select_row_groups(
+        parquet_file: Any,
+        vehicle_ids: Optional[List[str]],
+        start: Optional[pd.Timestamp],
+        end: Optional[pd.Timestamp]
+    ) -> List[int]:
+        """Select the row groups of a file whose statistics may match"""
+        metadata = parquet_file.metadata
+        names = parquet_file.schema_arrow.names
+        ts_index = names.index('timestamp') if 'timestamp' in names else None
+        id_index = names.index('vehicle_id') if 'vehicle_id' in names else None
+        id_min = min(vehicle_ids) if vehicle_ids else None
+        id_max = max(vehicle_ids) if vehicle_ids else None
+
+        row_groups = []
+        for i in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i)
+
+            if ts_index is not None and (start is not None or end is not None):
+                stats = row_group.column(ts_index).statistics
+                if stats is not None and stats.has_min_max:
+                    if start is not None and pd.Timestamp(stats.max) < start:
+                        continue
+                    if end is not None and pd.Timestamp(stats.min) > end:
+                        continue
+
+            if id_index is not None and vehicle_ids:
+                stats = row_group.column(id_index).statistics
+                if stats is not None and stats.has_min_max:
+                    if stats.max < id_min or stats.min > id_max:
+                        continue
+
+            row_groups.append(i)
+        return row_groups
+
+    @staticmethod
+    def _filter(
+        table: Any,
+        vehicle_ids: Optional[List[str]],
+        start: Optional[pd.Timestamp],
+        end: Optional[pd.Timestamp],
+        columns: Optional[List[str]]
+    ) -> Any:
+        """Apply row filters and column projection to an Arrow table or batch"""
+        mask = None
+        if vehicle_ids is not None:
+            mask = pc.is_in(table['vehicle_id'], value_set=pa.array(list(vehicle_ids), type=pa.string()))
+        if start is not None or end is not None:
+            ts_type = table.schema.field('timestamp').type
+            if start is not None:
+                cond = pc.greater_equal(table['timestamp'], pa.scalar(start.to_pydatetime(), type=ts_type))
+                mask = cond if mask is None else pc.and_(mask, cond)
+            if end is not None:
+                cond = pc.less_equal(table['timestamp'], pa.scalar(end.to_pydatetime(), type=ts_type))
+                mask = cond if mask is None else pc.and_(mask, cond)
+
+        if mask is not None:
+            table = table.filter(mask)
+        if columns is not None:
+            table = table.select([c for c in columns if c in table.schema.names])
+        return table
+
+    @staticmethod
+    def _read_columns(columns: Optional[List[str]], vehicle_ids: Optional[List[str]], timed: bool) -> Optional[List[str]]:
+        """Columns to read: the requested ones plus those needed for filtering"""
+        if columns is None:
+            return None
+        needed = list(columns)
+        if vehicle_ids is not None and 'vehicle_id' not in needed:
+            needed.append('vehicle_id')
+        if timed and 'timestamp' not in needed:
+            needed.append('timestamp')
+        return needed
+
+    def _scan_file(
+        self,
+        path: str,
+        vehicle_ids: Optional[List[str]],
+        start: Optional[pd.Timestamp],
+        end: Optional[pd.Timestamp],
+        columns: Optional[List[str]]
+    ) -> Optional[Any]:
+        """Read the matching rows of a single file"""
+        if path.endswith(CODEC_EXTENSION):
+            return self._scan_encoded_file(path, vehicle_ids, start, end, columns)
+
+        parquet_file = pq.ParquetFile(path)
+        row_groups = self._select_row_groups(parquet_file, vehicle_ids, start, end)
+        if not row_groups:
+            return None
+
+        read_columns = self._read_columns(columns, vehicle_ids, start is not None or end is not None)
+        if read_columns is not None:
+            read_columns = [c for c in read_columns if c in parquet_file.schema_arrow.names]
+        table = parquet_file.read_row_groups(row_groups, columns=read_columns, use_threads=False)
+        # Projection happens after the merged table has been sorted
+        return self._filter(table, vehicle_ids, start, end, None)
+
+    def _scan_encoded_file(
+        self,
+        path: str,
+        vehicle_ids: Optional[List[str]],
+        start: Optional[pd.Timestamp],
+        end: Optional[pd.Timestamp],
+        columns: Optional[List[str]]
+    ) -> Any:
+        """Read the matching rows of a file written with the telemetry codec"""
+        read_columns = self._read_columns(columns, vehicle_ids, start is not None or end is not None)
+        df = read_encoded(path, columns=read_columns)
+        if 'timestamp' in df.columns:
+            # Encoded files are ordered by vehicle; restore time order
+            df = df.sort_values('timestamp', kind='stable')
+        return self._filter(pa.Table.from_pandas(df, preserve_index=False), vehicle_ids, start, end, None)
+
+    def scan(
+        self,
+        vehicle_ids: Optional[List[str]] = None,
+        start: Optional[Union[datetime, str]] = None,
+        end: Optional[Union[datetime, str]] = None,
+        columns: Optional[List[str]] = None,
+        data_type: str = 'battery',
+        as_arrow: bool = False
+    ) -> Union[pd.DataFrame, Any]:
+        """
+        Read telemetry for a set of vehicles and a time range
+
+        Args:
+            vehicle_ids: Vehicles to include (all vehicles if None)
+            start: Inclusive start of the time range
+            end: Inclusive end of the time range
+            columns: Columns to return (all columns if None)
+            data_type: Type of data ('battery' or 'vehicle')
+            as_arrow: Return a pyarrow Table instead of a DataFrame
+
+        Returns:
+            Matching rows sorted by timestamp
+        """
+        start_ts, end_ts = _to_naive_utc(start), _to_naive_utc(end)
+        vehicle_ids = list(vehicle_ids) if vehicle_ids is not None else None
+        paths = self._select_files(data_type, vehicle_ids, start_ts, end_ts)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            tables = [
+                t for t in executor.map(
+                    lambda p: self._scan_file(p, vehicle_ids, start_ts, end_ts, columns), paths
+                )
+                if t is not None and t.num_rows > 0
+            ]
+
+        if not tables:
+            empty = pd.DataFrame(columns=columns or [])
+            return pa.Table.from_pandas(empty, preserve_index=False) if as_arrow else empty
+
+        table = pa.concat_tables(tables, promote_options='default')
+        if 'timestamp' in table.schema.names:
+            table = table.sort_by('timestamp')
+        if columns is not None:
+            table = table.select([c for c in columns if c in table.schema.names])
+
+        return table if as_arrow else table.to_pandas()
+
+    def iter_scan(
+        self,
+        vehicle_ids: Optional[List[str]] = None,
+        start: Optional[Union[datetime, str]] = None,
+        end: Optional[Union[datetime, str]] = None,
+        columns: Optional[List[str]] = None,
+        data_type: str = 'battery',
+        batch_size: int = 65536,
+        as_arrow: bool = False
+    ) -> Iterator[Union[pd.DataFrame, Any]]:
+        """
+        Stream telemetry for a set of vehicles and a time range
+
+        Files are visited in order of their first timestamp and read batch by
+        batch, so memory use is bounded by batch_size rather than the window.
+
+        Args:
+            vehicle_ids: Vehicles to include (all vehicles if None)
+            start: Inclusive start of the time range
+            end: Inclusive end of the time range
+            columns: Columns to return (all columns if None)
+            data_type: Type of data ('battery' or 'vehicle')
+            batch_size: Maximum number of rows per read batch
+            as_arrow: Yield pyarrow RecordBatches instead of DataFrames
+
+        Yields:
+            Non-empty batches of matching rows
+        """
+        start_ts, end_ts = _to_naive_utc(start), _to_naive_utc(end)
+        vehicle_ids = list(vehicle_ids) if vehicle_ids is not None else None
+
+        for path in self._select_files(data_type, vehicle_ids, start_ts, end_ts):
+            if path.endswith(CODEC_EXTENSION):
+                table = self._scan_encoded_file(path, vehicle_ids, start_ts, end_ts, None)
+                if columns is not None:
+                    table = table.select([c for c in columns if c in table.schema.names])
+                for batch in table.to_batches(max_chunksize=batch_size):
+                    if batch.num_rows:
+                        yield batch if as_arrow else batch.to_pandas()
+                continue
+
+            parquet_file = pq.ParquetFile(path)
+            row_groups = self._select_row_groups(parquet_file, vehicle_ids, start_ts, end_ts)
+            if not row_groups:
+                continue
+
+            read_columns = self._read_columns(columns, vehicle_ids, start_ts is not None or end_ts is not None)
+            if read_columns is not None:
+                read_columns = [c for c in read_columns if c in parquet_file.schema_arrow.names]
+
+            for batch in parquet_file.iter_batches(batch_size=batch_size, row_groups=row_groups,
+                                                   columns=read_columns):
+                batch = self._filter(batch, vehicle_ids, start_ts, end_ts, columns)
+                if batch.num_rows:
+                    yield batch if as_arrow else batch.to_pandas()
+
+    def aggregate(
+        self,
+        vehicle_ids: Optional[List[str]] = None,
+        start: Optional[Union[datetime, str]] = None,
+        end: Optional[Union[datetime, str]] = None,
+        interval: Union[str, int] = '1h'
+    ) -> pd.DataFrame:
+        """
+        Read min/max/mean battery telemetry per vehicle and interval
+
+        The coarsest rollup resolution that divides the interval and still
+        covers the window is used; without one, the raw rows are scanned and
+        aggregated.
+
+        Args:
+            vehicle_ids: Vehicles to include (all vehicles if None)
+            start: Inclusive start of the time range
+            end: Inclusive end of the time range
+            interval: Bucket width (resolution name, seconds or Timedelta string)
+
+        Returns:
+            DataFrame with vehicle_id, timestamp, count and per-signal min/max/mean
+        """
+        start_ts, end_ts = _to_naive_utc(start), _to_naive_utc(end)
+        if self.rollup is not None:
+            result = self.rollup.query(vehicle_ids, start_ts, end_ts, interval)
+            if result is not None:
+                return result
+
+        raw = self.scan(vehicle_ids, start_ts, end_ts, columns=['vehicle_id', 'timestamp'] + ROLLUP_SIGNALS)
+        if raw.empty:
+            return pd.DataFrame()
+        return aggregate_raw(raw, interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get statistics about the stored dataset
+
+        Returns:
+            Dictionary with file and row counts per data type
+        """
+        self.manifest.refresh()
+        stats: Dict[str, Any] = {}
+        for entry in self.manifest.files.values():
+            if entry.get('open'):
+                continue
+            data_stats = stats.setdefault(entry['data_type'], {'files': 0, 'rows': 0, 'bytes': 0})
+            data_stats['files'] += 1
+            data_stats['rows'] += entry['rows']
+            data_stats['bytes'] += entry['size_bytes']
+        return stats
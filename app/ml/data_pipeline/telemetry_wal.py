@@ -0,0 +1,411 @@
+"""
+Telemetry Write-Ahead Log
+
+This module implements a segmented, checksummed write-ahead log for buffered
+telemetry. Validated batches are appended to the log before they are
+acknowledged, so a restart can replay everything that had not been flushed to
+storage yet. Segments are deleted once all their records have been flushed.
+
+Each frame is laid out as
+
+    [payload length: uint32][crc32 of payload: uint32][payload: JSON]
+
+and the payload holds a log sequence number (LSN), the data type and the batch
+as a dict of columns. Replay stops at the first torn or corrupt frame of a
+segment.
+
+Besides the flushed LSN, the checkpoint keeps the LSN up to which records were
+delivered downstream (e.g. to flush callbacks) while still awaiting a durable
+flush, so a replay can skip consumers that have already seen them.
+"""
+import os
+import json
+import zlib
+import struct
+import logging
+import threading
+from typing import Dict, List, Any, Iterator, Tuple
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+FRAME_HEADER = struct.Struct('<II')
+CHECKPOINT_FILENAME = 'checkpoint.json'
+
+
+def columns_to_json(columns: Dict[str, Any]) -> Dict[str, List[Any]]:
+    """
+    Convert a dict of columns to JSON-serializable lists
+
+    Args:
+        columns: Dictionary of NumPy arrays or sequences
+
+    Returns:
+        Dictionary of plain lists, with datetimes as ISO strings
+    """
+    converted = {}
+    for name, values in columns.items():
+        arr = np.asarray(values)
+        if np.issubdtype(arr.dtype, np.datetime64):
+            converted[name] = [None if v == 'NaT' else v for v in np.datetime_as_string(arr, unit='us')]
+        elif arr.dtype == object:
+            converted[name] = [v.isoformat() if hasattr(v, 'isoformat') else v for v in arr]
+        else:
+            converted[name] = arr.tolist()
+    return converted
+
+
+class _Segment:
+    """Bookkeeping for one log segment"""
+
+    def __init__(self, seq: int, path: str):
+        self.seq = seq
+        self.path = path
+        self.size = 0
+        # Highest LSN per data type contained in the segment
+        self.max_lsn: Dict[str, int] = {}
+
+
+class TelemetryWAL:
+    """
+    Segmented write-ahead log with group-commit fsync
+
+    With sync_mode='commit', append() returns only once its frame is on stable
+    storage. Concurrent appenders share fsync calls: one thread syncs on behalf
+    of every frame written so far while the others wait. With 'interval' a
+    background thread syncs every sync_interval seconds and appends return once
+    the frame reached the OS, which still survives a process crash. 'none'
+    leaves syncing to the OS. In 'commit' mode, append(wait=False) skips the
+    wait for a single frame and leaves it to the background sync thread, for
+    callers that log one small record at a time.
+    """
+
+    SYNC_MODES = ('commit', 'interval', 'none')
+
+    def __init__(
+        self,
+        path: str,
+        segment_size: int = 64 * 1024 * 1024,
+        sync_mode: str = 'commit',
+        sync_interval: float = 0.05
+    ):
+        """
+        Initialize the write-ahead log
+
+        Args:
+            path: Directory holding the log segments
+            segment_size: Segment size in bytes at which a new segment is started
+            sync_mode: Durability mode ('commit', 'interval' or 'none')
+            sync_interval: Seconds between background syncs in 'interval' mode
+        """
+        if sync_mode not in self.SYNC_MODES:
+            raise ValueError(f"Unknown sync mode: {sync_mode}. Available modes: {self.SYNC_MODES}")
+
+        self.path = path
+        self.segment_size = segment_size
+        self.sync_mode = sync_mode
+        self.sync_interval = sync_interval
+        os.makedirs(path, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._sync_cond = threading.Condition()
+        self._syncing = False
+        self._written_lsn = 0
+        self._synced_lsn = 0
+
+        self.flushed_lsn, self.delivered_lsn = self._load_checkpoint()
+        self._segments: List[_Segment] = []
+        self._file = None
+        self._next_lsn = max(self.flushed_lsn.values(), default=0) + 1
+
+        # Statistics
+        self.appended_frames = 0
+        self.sync_count = 0
+
+        # Segments left by a previous process are kept until their records are flushed
+        for seq, segment_path in self._list_segments():
+            segment = _Segment(seq, segment_path)
+            segment.size = os.path.getsize(segment_path)
+            for lsn, data_type, _ in self._read_segment(segment_path):
+                segment.max_lsn[data_type] = max(segment.max_lsn.get(data_type, 0), lsn)
+                self._next_lsn = max(self._next_lsn, lsn + 1)
+            self._segments.append(segment)
+        self._written_lsn = self._synced_lsn = self._next_lsn - 1
+
+        self._open_new_segment()
+
+        self._stop_event = threading.Event()
+        self._sync_thread = None
+        if sync_mode == 'interval':
+            self._start_sync_thread()
+
+    def _list_segments(self) -> List[Tuple[int, str]]:
+        """List existing segment files in sequence order"""
+        segments = []
+        for filename in os.listdir(self.path):
+            if filename.startswith('wal-') and filename.endswith('.log'):
+                segments.append((int(filename[4:-4]), os.path.join(self.path, filename)))
+        return sorted(segments)
+
+    def _load_checkpoint(self) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """Load the flushed and delivered LSNs per data type"""
+        checkpoint_path = os.path.join(self.path, CHECKPOINT_FILENAME)
+        if not os.path.exists(checkpoint_path):
+            return {}, {}
+        try:
+            with open(checkpoint_path, 'r') as f:
+                payload = json.load(f)
+            delivered = {k: int(v) for k, v in payload.pop('delivered', {}).items()}
+            return {k: int(v) for k, v in payload.items()}, delivered
+        except (OSError, ValueError, AttributeError) as e:
+            logger.error(f"Error loading WAL checkpoint: {str(e)}")
+            return {}, {}
+
+    def _save_checkpoint(self) -> None:
+        """Persist the flushed and delivered LSNs per data type atomically"""
+        checkpoint_path = os.path.join(self.path, CHECKPOINT_FILENAME)
+        tmp_path = f"{checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(dict(self.flushed_lsn, delivered=self.delivered_lsn), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, checkpoint_path)
+
+    def _open_new_segment(self) -> None:
+        """Start a new segment file"""
+        seq = self._segments[-1].seq + 1 if self._segments else 1
+        segment_path = os.path.join(self.path, f"wal-{seq:08d}.log")
+        self._file = open(segment_path, 'ab')
+        self._segments.append(_Segment(seq, segment_path))
+
+    @staticmethod
+    def _read_segment(segment_path: str) -> Iterator[Tuple[int, str, Dict[str, List[Any]]]]:
+        """
+        Read the valid frames of a segment
+
+        Yields:
+            Tuples of (lsn, data_type, columns)
+        """
+        with open(segment_path, 'rb') as f:
+            data = f.read()
+
+        offset = 0
+        while offset + FRAME_HEADER.size <= len(data):
+            length, checksum = FRAME_HEADER.unpack_from(data, offset)
+            start = offset + FRAME_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                logger.warning(f"Stopping WAL replay of {segment_path} at torn frame (offset {offset})")
+                return
+            record = json.loads(payload)
+            yield record['lsn'], record['type'], record['columns']
+            offset = start + length
+
+    def append(self, data_type: str, columns: Dict[str, Any], wait: bool = True) -> int:
+        """
+        Append a batch to the log
+
+        Args:
+            data_type: Type of data ('battery' or 'vehicle')
+            columns: Batch as a dict of columns
+            wait: In 'commit' mode, whether to return only once the frame is
+                synced (otherwise it is synced within sync_interval)
+
+        Returns:
+            LSN assigned to the batch
+        """
+        with self._lock:
+            lsn = self._next_lsn
+            self._next_lsn += 1
+            payload = json.dumps(
+                {'lsn': lsn, 'type': data_type, 'columns': columns_to_json(columns)}
+            ).encode('utf-8')
+
+            self._file.write(FRAME_HEADER.pack(len(payload), zlib.crc32(payload)))
+            self._file.write(payload)
+            # Hand the frame to the OS so it survives a process crash
+            self._file.flush()
+
+            segment = self._segments[-1]
+            segment.size += FRAME_HEADER.size + len(payload)
+            segment.max_lsn[data_type] = lsn
+            self._written_lsn = lsn
+            self.appended_frames += 1
+
+            if segment.size >= self.segment_size:
+                self._rotate()
+
+        if self.sync_mode == 'commit':
+            if wait:
+                self.wait_durable(lsn)
+            else:
+                self._start_sync_thread()
+        return lsn
+
+    def _start_sync_thread(self) -> None:
+        """Start the background sync thread if it is not running"""
+        with self._lock:
+            if self._sync_thread is None and not self._stop_event.is_set():
+                self._sync_thread = threading.Thread(
+                    target=self._sync_loop, name='telemetry-wal-sync', daemon=True
+                )
+                self._sync_thread.start()
+
+    def _rotate(self) -> None:
+        """Sync and close the current segment and start a new one (lock held)"""
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._open_new_segment()
+
+    def wait_durable(self, lsn: int) -> None:
+        """
+        In 'commit' mode, block until a frame is on stable storage, sharing fsync calls
+
+        Lets callers append with wait=False while holding their own locks and
+        wait for durability once they released them.
+
+        Args:
+            lsn: LSN of the frame to wait for
+        """
+        if self.sync_mode != 'commit':
+            return
+        with self._sync_cond:
+            while self._synced_lsn < lsn:
+                if self._syncing:
+                    # Another thread is syncing; its fsync may cover this frame
+                    self._sync_cond.wait()
+                    continue
+                self._syncing = True
+                break
+            else:
+                return
+
+        try:
+            self.sync()
+        finally:
+            with self._sync_cond:
+                self._syncing = False
+                self._sync_cond.notify_all()
+
+    def sync(self) -> None:
+        """Sync every frame written so far to stable storage"""
+        with self._lock:
+            target = self._written_lsn
+            if target <= self._synced_lsn:
+                return
+            # A duplicate descriptor stays valid if the segment rotates meanwhile
+            fd = os.dup(self._file.fileno())
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        with self._sync_cond:
+            self._synced_lsn = max(self._synced_lsn, target)
+        self.sync_count += 1
+
+    def _sync_loop(self) -> None:
+        """Background sync loop for 'interval' mode"""
+        while not self._stop_event.wait(self.sync_interval):
+            try:
+                self.sync()
+            except (OSError, ValueError) as e:
+                logger.error(f"Error syncing WAL: {str(e)}")
+
+    def pending(self) -> Iterator[Tuple[int, str, Dict[str, List[Any]]]]:
+        """
+        Iterate over logged batches that have not been flushed to storage
+
+        Yields:
+            Tuples of (lsn, data_type, columns)
+        """
+        with self._lock:
+            segments = [s for s in self._segments if s.size > 0 and s is not self._segments[-1]]
+        for segment in segments:
+            for lsn, data_type, columns in self._read_segment(segment.path):
+                if lsn > self.flushed_lsn.get(data_type, 0):
+                    yield lsn, data_type, columns
+
+    def last_lsn(self) -> int:
+        """Get the LSN of the most recently appended batch"""
+        with self._lock:
+            return self._next_lsn - 1
+
+    def mark_flushed(self, data_type: str, lsn: int) -> None:
+        """
+        Record that all batches of a data type up to an LSN are in storage
+
+        Segments whose records are all flushed are deleted.
+
+        Args:
+            data_type: Type of data ('battery' or 'vehicle')
+            lsn: Highest LSN of the flushed data
+        """
+        with self._lock:
+            if lsn <= self.flushed_lsn.get(data_type, 0):
+                return
+            self.flushed_lsn[data_type] = lsn
+            self._save_checkpoint()
+
+            def fully_flushed(segment: _Segment) -> bool:
+                return all(
+                    max_lsn <= self.flushed_lsn.get(t, 0) for t, max_lsn in segment.max_lsn.items()
+                )
+
+            current = self._segments[-1]
+            if current.size > 0 and fully_flushed(current):
+                self._rotate()
+
+            remaining = []
+            for segment in self._segments:
+                if segment is not self._segments[-1] and fully_flushed(segment):
+                    os.remove(segment.path)
+                else:
+                    remaining.append(segment)
+            self._segments = remaining
+
+    def mark_delivered(self, data_type: str, lsn: int) -> None:
+        """
+        Record that all batches of a data type up to an LSN were delivered
+        downstream, even if they are not durably flushed yet
+
+        Args:
+            data_type: Type of data ('battery' or 'vehicle')
+            lsn: Highest LSN of the delivered data
+        """
+        with self._lock:
+            if lsn <= self.delivered_lsn.get(data_type, 0):
+                return
+            self.delivered_lsn[data_type] = lsn
+            self._save_checkpoint()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get log statistics
+
+        Returns:
+            Dictionary with segment, frame and sync counts
+        """
+        with self._lock:
+            return {
+                'segments': len(self._segments),
+                'bytes': sum(s.size for s in self._segments),
+                'appended_frames': self.appended_frames,
+                'sync_count': self.sync_count,
+                'last_lsn': self._next_lsn - 1,
+                'flushed_lsn': dict(self.flushed_lsn),
+                'delivered_lsn': dict(self.delivered_lsn)
+            }
+
+    def close(self) -> None:
+        """Sync and close the log"""
+        self._stop_event.set()
+        if self._sync_thread is not None:
+            self._sync_thread.join()
+        with self._lock:
+            if self._file is not None and not self._file.closed:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
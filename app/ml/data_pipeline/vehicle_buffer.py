@@ -0,0 +1,132 @@
+"""
+Per-Vehicle Ring Buffers
+
+This module implements the fixed-size NumPy ring buffers the anomaly detection
+pipeline keeps per vehicle. Appending a point overwrites the oldest one and
+updates running sums, so the window mean and standard deviation are available
+in constant time per record.
+"""
+import logging
+from typing import Dict, List, Optional, Any
+
+import numpy as np
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class VehicleRingBuffer:
+    """
+    Fixed-size window of the most recent telemetry points of one vehicle
+
+    Values are kept in a (capacity, n_columns) float array with a parallel
+    int64 array of timestamps (ns). Missing values stay NaN; running counts,
+    sums and sums of squares of the present values give the window
+    statistics, and are recomputed from the array once per full rotation to
+    keep floating-point drift bounded.
+    """
+
+    def __init__(self, capacity: int, columns: List[str]):
+        """
+        Initialize the ring buffer
+
+        Args:
+            capacity: Number of points kept
+            columns: Names of the numeric columns stored per point
+        """
+        self.capacity = capacity
+        self.columns = list(columns)
+        self.values = np.zeros((capacity, len(columns)), dtype=np.float64)
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.size = 0
+        self.head = 0  # Index the next point is written to
+        self.appended = 0
+
+        self._count = np.zeros(len(columns), dtype=np.int64)
+        self._sum = np.zeros(len(columns), dtype=np.float64)
+        self._sumsq = np.zeros(len(columns), dtype=np.float64)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, timestamp: int, row: np.ndarray) -> None:
+        """
+        Append a point, evicting the oldest one when full
+
+        Args:
+            timestamp: Timestamp in ns since epoch
+            row: Values in the order of self.columns (NaN for missing)
+        """
+        row = np.asarray(row, dtype=np.float64)
+        if self.size == self.capacity:
+            old = self.values[self.head]
+            present = ~np.isnan(old)
+            self._count -= present
+            self._sum -= np.where(present, old, 0.0)
+            self._sumsq -= np.where(present, old * old, 0.0)
+        else:
+            self.size += 1
+
+        self.values[self.head] = row
+        self.timestamps[self.head] = timestamp
+        present = ~np.isnan(row)
+        self._count += present
+        self._sum += np.where(present, row, 0.0)
+        self._sumsq += np.where(present, row * row, 0.0)
+        self.head = (self.head + 1) % self.capacity
+        self.appended += 1
+
+        if self.appended % self.capacity == 0:
+            window = self.values[:self.size]
+            self._count = (~np.isnan(window)).sum(axis=0)
+            self._sum = np.nansum(window, axis=0)
+            self._sumsq = np.nansum(window * window, axis=0)
+
+    def mean(self) -> np.ndarray:
+        """Per-column mean of the present values in the window"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self._count > 0, self._sum / self._count, np.nan)
+
+    def std(self) -> np.ndarray:
+        """Per-column sample standard deviation of the present values in the window"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = (self._sumsq - self._sum * self._sum / self._count) / (self._count - 1)
+        return np.where(self._count > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+
+    def ordered(self) -> np.ndarray:
+        """Indices of the stored points from oldest to newest"""
+        start = self.head if self.size == self.capacity else 0
+        return (start + np.arange(self.size)) % self.capacity
+
+    def to_frame(self, vehicle_id: Optional[Any] = None) -> pd.DataFrame:
+        """
+        Materialize the window as a DataFrame, oldest point first
+
+        Args:
+            vehicle_id: Optional vehicle ID column value
+
+        Returns:
+            DataFrame with timestamp and the stored columns
+        """
+        order = self.ordered()
+        df = pd.DataFrame(self.values[order], columns=self.columns)
+        df.insert(0, 'timestamp', pd.to_datetime(self.timestamps[order]))
+        if vehicle_id is not None:
+            df.insert(0, 'vehicle_id', vehicle_id)
+        return df
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get buffer statistics
+
+        Returns:
+            Dictionary with size and per-column window mean and std
+        """
+        return {
+            'size': self.size,
+            'capacity': self.capacity,
+            'mean': dict(zip(self.columns, self.mean().tolist())),
+            'std': dict(zip(self.columns, self.std().tolist()))
+        }
@@ -5,18 +5,26 @@ This package provides time series forecasting capabilities for the EV charging i
 """
 
 from .base_forecaster import BaseForecaster
-from .statistical_forecaster import ARIMAForecaster, ExponentialSmoothingForecaster
+from .forecast_cache import ForecastCache
+from .statistical_forecaster import (
+    ARIMAForecaster,
+    ExponentialSmoothingForecaster,
+    MultiSeriesExponentialSmoothingForecaster
+)
 from .deep_forecaster import LSTMForecaster
 from .ensemble_forecaster import EnsembleForecaster, ModelSelector
-from .online_learning import OnlineForecaster, DriftDetector
+from .online_learning import OnlineForecaster, DriftDetector, MultiStreamDriftDetector
 
 __all__ = [
     'BaseForecaster',
+    'ForecastCache',
     'ARIMAForecaster',
     'ExponentialSmoothingForecaster',
+    'MultiSeriesExponentialSmoothingForecaster',
     'LSTMForecaster',
     'EnsembleForecaster',
     'ModelSelector',
     'OnlineForecaster',
-    'DriftDetector'
+    'DriftDetector',
+    'MultiStreamDriftDetector'
 ] 
\ No newline at end of file
@@ -5,7 +5,10 @@ This module defines the base abstract class for time series forecasting
 in the EV charging infrastructure.
 """
 import abc
+import uuid
+import inspect
 import logging
+import functools
 import numpy as np
 import pandas as pd
 from typing import Dict, List, Optional, Any, Union, Tuple
@@ -13,18 +16,71 @@ from pathlib import Path
 import joblib
 import matplotlib.pyplot as plt
 
+from .forecast_cache import ForecastCache
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+
+def _invalidating(method):
+    """Wrap a fitting method so it renews the fitted-state token"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._invalidate_forecasts()
+    return wrapper
+
+
+def _cached_predict(method):
+    """Wrap predict so it goes through the forecaster's cache when enabled"""
+    signature = inspect.signature(method)
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = getattr(self, 'forecast_cache', None)
+        if cache is None or not self.is_fitted:
+            return method(self, *args, **kwargs)
+        
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        arguments.pop('self')
+        arguments.update(arguments.pop('kwargs', {}))
+        
+        token = self._state_token()
+        key = cache.make_key(f"{self.__class__.__name__}:{self.name}", token, arguments)
+        forecast = cache.get(key)
+        if forecast is None:
+            forecast = method(self, *args, **kwargs)
+            cache.put(key, token, forecast)
+        return forecast
+    return wrapper
+
+
 class BaseForecaster(abc.ABC):
     """
     Abstract base class for time series forecasting models
     
     Provides a common interface for various forecasting models
     including statistical models, machine learning models, and deep learning models.
+    
+    Subclass fit/update/partial_fit methods renew a token of the fitted state,
+    and predict is served from a ForecastCache once enable_forecast_cache()
+    has been called, keyed by that token and the predict arguments.
     """
     
+    def __init_subclass__(cls, **kwargs):
+        """Hook fitting methods and predict of subclasses into the forecast cache"""
+        super().__init_subclass__(**kwargs)
+        for name in ('fit', 'update', 'partial_fit'):
+            if name in cls.__dict__:
+                setattr(cls, name, _invalidating(cls.__dict__[name]))
+        if 'predict' in cls.__dict__:
+            setattr(cls, 'predict', _cached_predict(cls.__dict__['predict']))
+    
     def __init__(
         self,
         name: str,
@@ -48,6 +104,10 @@ class BaseForecaster(abc.ABC):
         self.model = None
         self.is_fitted = False
         
+        # Forecast cache (disabled by default) and fitted-state token
+        self.forecast_cache: Optional[ForecastCache] = None
+        self._fit_token = uuid.uuid4().hex
+        
         # Create model directory if it doesn't exist
         self.model_dir.mkdir(parents=True, exist_ok=True)
         
@@ -90,6 +150,42 @@ class BaseForecaster(abc.ABC):
         """
         pass
     
+    def enable_forecast_cache(
+        self,
+        cache: Optional[ForecastCache] = None,
+        max_entries: int = 256,
+        cache_dir: Optional[str] = None
+    ) -> ForecastCache:
+        """
+        Serve repeated predict calls from a forecast cache
+        
+        Args:
+            cache: Cache to use, e.g. one shared by several forecasters
+                (a new one is created if None)
+            max_entries: Maximum forecasts kept in memory by a new cache
+            cache_dir: Shared on-disk tier directory of a new cache
+            
+        Returns:
+            The cache in use
+        """
+        self.forecast_cache = cache or ForecastCache(max_entries=max_entries, cache_dir=cache_dir)
+        return self.forecast_cache
+    
+    def disable_forecast_cache(self) -> None:
+        """Stop caching forecasts"""
+        self.forecast_cache = None
+    
+    def _state_token(self) -> str:
+        """Token identifying the current fitted state"""
+        return getattr(self, '_fit_token', '')
+    
+    def _invalidate_forecasts(self) -> None:
+        """Renew the fitted-state token, making cached forecasts unreachable"""
+        cache = getattr(self, 'forecast_cache', None)
+        if cache is not None:
+            cache.invalidate(self._state_token())
+        self._fit_token = uuid.uuid4().hex
+    
     def save(self, filepath: Optional[str] = None) -> str:
         """
         Save the forecaster to disk
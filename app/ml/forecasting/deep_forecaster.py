@@ -3,7 +3,10 @@ Deep Learning Forecaster Module
 
 This module provides deep learning-based forecasting for the EV charging infrastructure.
 It includes fallback mechanisms for environments where TensorFlow isn't available.
+Fitted networks can be exported to ONNX and served through ONNX Runtime, which
+also lets saved models be loaded in workers without TensorFlow.
 """
+import shutil
 import logging
 import numpy as np
 import pandas as pd
@@ -37,6 +40,9 @@ from .base_forecaster import BaseForecaster
 # Import fallback forecaster
 from .statistical_forecaster import ExponentialSmoothingForecaster
 
+# ONNX export and CPU inference runtime
+from ..inference.onnx_runtime import ONNXRUNTIME_AVAILABLE, OnnxInferenceSession, export_keras_to_onnx
+
 class DeepLearningUnavailableError(Exception):
     """Exception raised when TensorFlow is not available"""
     pass
@@ -48,6 +54,10 @@ class LSTMForecaster(BaseForecaster):
     If TensorFlow is not available, this will raise an exception during initialization
     unless fallback_on_import_error is set to True, in which case it will return a
     fallback forecaster.
+    
+    After export_onnx() (or loading a model saved with one) predictions run
+    through an ONNX Runtime session instead of Keras; fit() and update()
+    change the weights and detach it again.
     """
     
     @classmethod
@@ -150,6 +160,9 @@ class LSTMForecaster(BaseForecaster):
         self.model = None
         self.scaler = None
         self.history = None
+        self.target_col = None
+        self.training_data = None
+        self.runtime = None
         
         logger.info(f"Initialized LSTM forecaster with {len(hidden_units)} layers")
     
@@ -219,6 +232,10 @@ class LSTMForecaster(BaseForecaster):
         val_split = kwargs.get('val_split', 0.2)
         verbose = kwargs.get('verbose', 1)
         
+        self.target_col = target_col
+        self.training_data = data.copy()
+        self.runtime = None
+        
         # Prepare data
         X, y = self._prepare_data(data, target_col)
         
@@ -247,13 +264,58 @@ class LSTMForecaster(BaseForecaster):
         
         return self
     
-    def _prepare_data(self, data: pd.DataFrame, target_col: str) -> Tuple[np.ndarray, np.ndarray]:
+    def update(self, new_data: pd.DataFrame, **kwargs) -> 'LSTMForecaster':
+        """
+        Fine-tune the fitted network on new data, starting from its current weights
+        
+        The scaler and architecture are kept; training continues with the
+        compiled optimizer on the sequences that end in the new data. Only
+        the last sequence_length + forecast_horizon rows are kept as
+        training_data, so repeated updates do not accumulate history.
+        
+        Args:
+            new_data: New data points following the training data
+            **kwargs: Additional parameters
+                - fine_tune_epochs: Training epochs (default: epochs // 10, at least 1)
+                - verbose: Verbosity level for training (default: 0)
+                
+        Returns:
+            Self for method chaining
+        """
+        if not self.is_fitted:
+            raise ValueError("Model must be fitted before updating")
+        
+        epochs = kwargs.get('fine_tune_epochs', max(1, self.epochs // 10))
+        
+        # Include enough history for the first new value to be a target
+        context = self.sequence_length + self.forecast_horizon - 1
+        history = self.training_data.iloc[-context:] if self.training_data is not None else new_data.iloc[:0]
+        data = pd.concat([history, new_data])
+        X, y = self._prepare_data(data, self.target_col, fit_scaler=False)
+        
+        if len(X):
+            self.model.fit(
+                X, y,
+                epochs=epochs,
+                batch_size=self.batch_size,
+                verbose=kwargs.get('verbose', 0)
+            )
+            self.runtime = None
+        
+        # Keep only the history the next predict() and update() need
+        self.training_data = data.iloc[-(self.sequence_length + self.forecast_horizon):]
+        logger.info(f"Fine-tuned LSTM model on {len(X)} sequences for {epochs} epochs")
+        
+        return self
+    
+    def _prepare_data(self, data: pd.DataFrame, target_col: str, fit_scaler: bool = True) -> Tuple[np.ndarray, np.ndarray]:
         """
         Prepare data for LSTM model
         
         Args:
             data: Input data
             target_col: Target column
+            fit_scaler: Whether to fit a new scaler (False reuses the fitted one)
             
         Returns:
             Tuple of (X, y) for model training
@@ -264,8 +326,11 @@ class LSTMForecaster(BaseForecaster):
         series = data[target_col].values
         
         # Scale data
-        self.scaler = StandardScaler()
-        scaled_series = self.scaler.fit_transform(series.reshape(-1, 1)).flatten()
+        if fit_scaler or self.scaler is None:
+            self.scaler = StandardScaler()
+            scaled_series = self.scaler.fit_transform(series.reshape(-1, 1)).flatten()
+        else:
+            scaled_series = self.scaler.transform(series.reshape(-1, 1)).flatten()
         
         # Create sequences
         X, y = [], []
@@ -332,7 +397,7 @@ class LSTMForecaster(BaseForecaster):
         model_input = scaled_input.reshape(1, self.sequence_length, 1)
         
         # Generate prediction
-        scaled_forecast = self.model.predict(model_input)[0]
+        scaled_forecast = self._run_model(model_input)[0]
         
         # Inverse transform the forecast
         forecast = self.scaler.inverse_transform(scaled_forecast.reshape(-1, 1)).flatten()
@@ -346,6 +411,97 @@ class LSTMForecaster(BaseForecaster):
         
         return forecast_df
     
+    def _run_model(self, X: np.ndarray) -> np.ndarray:
+        """
+        Run the network on a batch of scaled input sequences
+        
+        Args:
+            X: Input of shape [samples, sequence_length, 1]
+            
+        Returns:
+            Scaled forecasts of shape [samples, forecast_horizon]
+        """
+        if self.runtime is not None:
+            return self.runtime.run(X)[self.runtime.output_names[0]]
+        return self.model.predict(X, verbose=0)
+    
+    def predict_batch(self, windows: Union[np.ndarray, List[np.ndarray]]) -> np.ndarray:
+        """
+        Forecast from many input windows in one model call
+        
+        Args:
+            windows: Recent target values, one window of sequence_length
+                values per row (e.g. rolling backtest origins)
+            
+        Returns:
+            Forecasts of shape [windows, forecast_horizon]
+        """
+        if not self.is_fitted:
+            raise ValueError("Model must be fitted before prediction")
+        
+        windows = np.asarray(windows, dtype=np.float64)
+        if windows.ndim != 2 or windows.shape[1] != self.sequence_length:
+            raise ValueError(f"Expected windows of shape [n, {self.sequence_length}], got {windows.shape}")
+        
+        scaled = self.scaler.transform(windows.reshape(-1, 1)).reshape(len(windows), self.sequence_length, 1)
+        scaled_forecast = self._run_model(scaled)
+        
+        return self.scaler.inverse_transform(scaled_forecast.reshape(-1, 1)).reshape(scaled_forecast.shape)
+    
+    def export_onnx(
+        self,
+        filepath: Optional[str] = None,
+        intra_op_threads: int = 1,
+        inter_op_threads: int = 1,
+        max_batch_size: int = 1024
+    ) -> str:
+        """
+        Convert the fitted network to ONNX and serve predictions through it
+        
+        Args:
+            filepath: Path of the ONNX file (if None, uses the default path)
+            intra_op_threads: ONNX Runtime threads within an operator
+            inter_op_threads: ONNX Runtime threads across operators
+            max_batch_size: Maximum samples per runtime call
+            
+        Returns:
+            Path to the ONNX file
+        """
+        if not self.is_fitted or self.model is None:
+            raise ValueError("Model must be fitted before exporting")
+        
+        if filepath is None:
+            filepath = os.path.join(self.model_dir, f"{self.name}_lstm.onnx")
+        
+        export_keras_to_onnx(self.model, filepath, (self.sequence_length, 1))
+        self.use_onnx_runtime(filepath, intra_op_threads, inter_op_threads, max_batch_size)
+        
+        return filepath
+    
+    def use_onnx_runtime(
+        self,
+        filepath: str,
+        intra_op_threads: int = 1,
+        inter_op_threads: int = 1,
+        max_batch_size: int = 1024
+    ) -> None:
+        """
+        Serve predictions through an exported ONNX model
+        
+        Args:
+            filepath: Path to the ONNX file
+            intra_op_threads: ONNX Runtime threads within an operator
+            inter_op_threads: ONNX Runtime threads across operators
+            max_batch_size: Maximum samples per runtime call
+        """
+        self.runtime = OnnxInferenceSession(
+            filepath,
+            intra_op_threads=intra_op_threads,
+            inter_op_threads=inter_op_threads,
+            max_batch_size=max_batch_size
+        )
+        logger.info(f"Serving {self.name} predictions through ONNX Runtime")
+    
     def evaluate(
         self, 
         data: pd.DataFrame, 
@@ -373,7 +529,7 @@ class LSTMForecaster(BaseForecaster):
         X_eval, y_eval = self._prepare_data(data, target_col)
         
         # Get predictions
-        y_pred = self.model.predict(X_eval)
+        y_pred = self._run_model(X_eval)
         
         # Inverse transform for metric calculation
         y_true_inv = self.scaler.inverse_transform(y_eval.reshape(-1, self.forecast_horizon))
@@ -411,12 +567,24 @@ class LSTMForecaster(BaseForecaster):
         # Create directory if it doesn't exist
         os.makedirs(filepath, exist_ok=True)
         
-        # Save Keras model
-        self.model.save(os.path.join(filepath, "model"))
+        # Save Keras model (runtime-only instances have none)
+        if self.model is not None:
+            self.model.save(os.path.join(filepath, "model"))
+        
+        # Save the exported ONNX model alongside
+        if self.runtime is not None:
+            onnx_path = os.path.join(filepath, "model.onnx")
+            if os.path.abspath(self.runtime.model_path) != os.path.abspath(onnx_path):
+                shutil.copyfile(self.runtime.model_path, onnx_path)
         
         # Save scaler and other attributes
         joblib.dump(self.scaler, os.path.join(filepath, "scaler.joblib"))
         
+        # Save the last input window so loaded models can forecast
+        if self.training_data is not None:
+            joblib.dump(self.training_data.iloc[-self.sequence_length:],
+                        os.path.join(filepath, "recent_data.joblib"))
+        
         # Save hyperparameters
         params = {
             "name": self.name,
@@ -425,7 +593,8 @@ class LSTMForecaster(BaseForecaster):
             "sequence_length": self.sequence_length,
             "hidden_units": self.hidden_units,
             "dropout_rate": self.dropout_rate,
-            "learning_rate": self.learning_rate
+            "learning_rate": self.learning_rate,
+            "target_col": self.target_col
         }
         
         with open(os.path.join(filepath, "params.json"), "w") as f:
@@ -436,16 +605,48 @@ class LSTMForecaster(BaseForecaster):
         return filepath
     
     @classmethod
-    def load(cls, filepath: str) -> 'LSTMForecaster':
+    def load(cls, filepath: str, use_onnx: bool = True, intra_op_threads: int = 1) -> 'LSTMForecaster':
         """
         Load the model from disk
         
         Args:
             filepath: Path to the saved model directory
+            use_onnx: Whether to serve through a saved ONNX model when
+                ONNX Runtime is available
+            intra_op_threads: ONNX Runtime threads within an operator
             
         Returns:
             Loaded LSTM forecaster
         """
+        onnx_path = os.path.join(filepath, "model.onnx")
+        use_onnx = use_onnx and ONNXRUNTIME_AVAILABLE and os.path.exists(onnx_path)
+        
+        if not TENSORFLOW_AVAILABLE and use_onnx:
+            # Serve the exported network without TensorFlow
+            with open(os.path.join(filepath, "params.json"), "r") as f:
+                params = json.load(f)
+            
+            forecaster = object.__new__(cls)
+            BaseForecaster.__init__(
+                forecaster,
+                name=params["name"],
+                forecast_horizon=params["forecast_horizon"],
+                frequency=params["frequency"]
+            )
+            forecaster.sequence_length = params["sequence_length"]
+            forecaster.hidden_units = params["hidden_units"]
+            forecaster.dropout_rate = params["dropout_rate"]
+            forecaster.learning_rate = params["learning_rate"]
+            forecaster.epochs = 0
+            forecaster.batch_size = 32
+            forecaster.history = None
+            forecaster._load_state(filepath, params)
+            forecaster.use_onnx_runtime(onnx_path, intra_op_threads=intra_op_threads)
+            forecaster.is_fitted = True
+            
+            logger.info(f"Loaded LSTM model from {filepath} for ONNX Runtime inference")
+            return forecaster
+        
         if not TENSORFLOW_AVAILABLE:
             logger.warning("TensorFlow not available. Cannot load LSTM model.")
             
@@ -474,16 +675,28 @@ class LSTMForecaster(BaseForecaster):
             learning_rate=params["learning_rate"]
         )
         
+        # Load scaler and recent data
+        forecaster._load_state(filepath, params)
+        
         # Load model
         forecaster.model = load_model(os.path.join(filepath, "model"))
-        
-        # Load scaler
-        forecaster.scaler = joblib.load(os.path.join(filepath, "scaler.joblib"))
+        if use_onnx:
+            forecaster.use_onnx_runtime(onnx_path, intra_op_threads=intra_op_threads)
         
         forecaster.is_fitted = True
         
         logger.info(f"Loaded LSTM model from {filepath}")
         
         return forecaster
+    
+    def _load_state(self, filepath: str, params: Dict[str, Any]) -> None:
+        """Load the scaler and the last input window of a saved model"""
+        self.model = None
+        self.runtime = None
+        self.scaler = joblib.load(os.path.join(filepath, "scaler.joblib"))
+        self.target_col = params.get("target_col")
+        
+        recent_path = os.path.join(filepath, "recent_data.joblib")
+        self.training_data = joblib.load(recent_path) if os.path.exists(recent_path) else None
 
 # Additional deep learning forecaster implementations could go here 
\ No newline at end of file
@@ -4,7 +4,14 @@ Ensemble Forecaster Module
 This module implements ensemble methods combining statistical and deep learning
 forecasters for improved prediction accuracy in the EV charging infrastructure.
 """
+import os
+import copy
+import time
+import pickle
 import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -20,6 +27,34 @@ from .deep_forecaster import LSTMForecaster
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+
+def _fit_member(forecaster: BaseForecaster, data: pd.DataFrame, target_col: str,
+                kwargs: Dict[str, Any]) -> Tuple[BaseForecaster, float]:
+    """Fit one ensemble member and time it (runs in a worker process when parallel)"""
+    start = time.perf_counter()
+    forecaster.fit(data, target_col, **kwargs)
+    return forecaster, time.perf_counter() - start
+
+
+def _picklable(obj: Any) -> bool:
+    """Whether an object can be shipped to a worker process"""
+    try:
+        pickle.dumps(obj)
+        return True
+    except (pickle.PicklingError, TypeError, AttributeError):
+        # e.g. "cannot pickle '_thread.lock' object", or local classes
+        return False
+
+
+def _predict_member(forecaster: BaseForecaster, kwargs: Dict[str, Any]) -> Tuple[pd.DataFrame, float]:
+    """Generate one member's forecast and time it (runs in a worker process when parallel)"""
+    start = time.perf_counter()
+    forecast = forecaster.predict(**kwargs)
+    if not np.all(np.isfinite(forecast['forecast'].values)):
+        raise ValueError("Forecast contains non-finite values")
+    return forecast, time.perf_counter() - start
+
+
 class EnsembleForecaster(BaseForecaster):
     """
     Ensemble forecasting model that combines multiple forecasters
@@ -28,6 +63,12 @@ class EnsembleForecaster(BaseForecaster):
     - Simple averaging
     - Weighted averaging based on historical performance
     - Stacked ensemble (meta-learner)
+    
+    With n_jobs other than 1 (or an executor) members are fitted and predict
+    in a process pool; results keep the member order. Members are isolated
+    from each other in either mode: a member that raises, times out or
+    forecasts non-finite values is left out and the remaining members are
+    reweighted. Per-member status and timings are kept in member_stats.
     """
     
     def __init__(
@@ -37,7 +78,10 @@ class EnsembleForecaster(BaseForecaster):
         frequency: str = 'H',
         forecasters: Optional[List[BaseForecaster]] = None,
         ensemble_method: str = "weighted",
-        model_dir: str = 'app/ml/models/forecasting'
+        model_dir: str = 'app/ml/models/forecasting',
+        n_jobs: int = 1,
+        executor: Optional[Executor] = None,
+        member_timeout: Optional[float] = None
     ):
         """
         Initialize ensemble forecaster
@@ -49,6 +93,10 @@ class EnsembleForecaster(BaseForecaster):
             forecasters: List of forecaster instances to ensemble
             ensemble_method: Method for combining forecasts ('simple', 'weighted', 'stacked')
             model_dir: Directory to store models
+            n_jobs: Worker processes for fitting and predicting members
+                (1 runs them in-process, -1 uses all CPUs)
+            executor: Executor to run members in (overrides n_jobs)
+            member_timeout: Seconds to wait for each member's fit or forecast
         """
         super().__init__(name=name, forecast_horizon=forecast_horizon, 
                          frequency=frequency, model_dir=model_dir)
@@ -60,6 +108,14 @@ class EnsembleForecaster(BaseForecaster):
         self.target_col = None
         self.training_data = None
         
+        # Parallel execution and per-member bookkeeping
+        self.n_jobs = n_jobs
+        self.executor = executor
+        self._owns_executor = False
+        self.member_timeout = member_timeout
+        self.member_stats: List[Dict[str, Any]] = []
+        self.stack_members: List[int] = []
+        
         logger.info(f"Initialized EnsembleForecaster with {len(self.forecasters)} forecasters "
                     f"using {ensemble_method} ensemble method")
     
@@ -146,9 +202,22 @@ class EnsembleForecaster(BaseForecaster):
         val_data = data.iloc[train_size:]
         
         # Fit each forecaster on the training data
-        for forecaster in self.forecasters:
-            logger.info(f"Fitting {forecaster.__class__.__name__} in ensemble")
-            forecaster.fit(train_data, target_col, **kwargs)
+        self.member_stats = [
+            {'name': f.name, 'type': f.__class__.__name__, 'status': 'ok', 'error': None,
+             'fit_seconds': None, 'predict_seconds': None}
+            for f in self.forecasters
+        ]
+        logger.info(f"Fitting {len(self.forecasters)} forecasters in ensemble")
+        results = self._run_members(
+            _fit_member, [(f, train_data, target_col, kwargs) for f in self.forecasters], 'fit'
+        )
+        for i, result in enumerate(results):
+            if result is not None:
+                # Members fitted in worker processes come back as fitted copies
+                self.forecasters[i], self.member_stats[i]['fit_seconds'] = result
+        
+        if not self._active_members():
+            raise RuntimeError("All forecasters in the ensemble failed to fit")
         
         # Calculate weights based on validation performance if using weighted ensemble
         if self.ensemble_method == "weighted" and len(val_data) > 0:
@@ -157,13 +226,152 @@ class EnsembleForecaster(BaseForecaster):
             self._fit_stacking_model(val_data, target_col)
         else:
             # Use equal weights for simple ensemble
-            self.weights = np.ones(len(self.forecasters)) / len(self.forecasters)
+            self.weights = self._equal_weights(self._active_members())
         
         self.is_fitted = True
-        logger.info(f"Fitted ensemble with {len(self.forecasters)} forecasters")
+        logger.info(f"Fitted ensemble with {len(self._active_members())} of {len(self.forecasters)} forecasters")
         
         return self
     
+    def _parallel(self) -> bool:
+        """Whether members run in an executor"""
+        return self.executor is not None or self.n_jobs != 1
+    
+    def _get_executor(self) -> Executor:
+        """Executor for member tasks, creating a process pool if needed"""
+        if self.executor is None:
+            workers = (os.cpu_count() or 1) if self.n_jobs == -1 else self.n_jobs
+            self.executor = ProcessPoolExecutor(max_workers=max(1, min(workers, len(self.forecasters))))
+            self._owns_executor = True
+        return self.executor
+    
+    def _discard_broken_executor(self) -> None:
+        """Drop an owned process pool after a worker died so the next task gets a new one"""
+        if self._owns_executor and self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+    
+    def _record_failure(self, index: int, stage: str, error: Exception) -> None:
+        """Mark a member as failed"""
+        self.member_stats[index]['status'] = f"{stage}_failed"
+        self.member_stats[index]['error'] = f"{error.__class__.__name__}: {error}"
+        logger.warning(f"{self.member_stats[index]['type']} '{self.member_stats[index]['name']}' "
+                       f"failed to {stage}, continuing without it: {error}")
+    
+    def _run_members(self, function, member_args: List[Optional[Tuple]], stage: str) -> List[Optional[Any]]:
+        """
+        Run a task for each member, isolating failures
+        
+        Args:
+            function: Module-level task function
+            member_args: Arguments per member (None skips the member)
+            stage: Name of the stage for failure records ('fit' or 'predict')
+            
+        Returns:
+            Task results in member order, None for skipped or failed members
+        """
+        results: List[Optional[Any]] = [None] * len(member_args)
+        
+        def run_in_process(index: int, args: Tuple) -> None:
+            try:
+                results[index] = function(*args)
+            except Exception as e:
+                self._record_failure(index, stage, e)
+        
+        if not self._parallel():
+            for i, args in enumerate(member_args):
+                if args is not None:
+                    run_in_process(i, args)
+            return results
+        
+        executor = self._get_executor()
+        futures = {}
+        local = []
+        for i, args in enumerate(member_args):
+            if args is None:
+                continue
+            if _picklable(args[0]):
+                futures[i] = executor.submit(function, *args)
+            else:
+                # Members that cannot be shipped to a worker run here instead
+                logger.warning(f"Running {self.member_stats[i]['type']} in-process: member cannot be pickled")
+                local.append(i)
+        
+        broken = []
+        for i, future in futures.items():
+            try:
+                results[i] = future.result(timeout=self.member_timeout)
+            except pickle.PicklingError as e:
+                # Members that cannot be shipped to a worker run here instead
+                logger.warning(f"Running {self.member_stats[i]['type']} in-process: {e}")
+                run_in_process(i, member_args[i])
+            except BrokenProcessPool:
+                broken.append(i)
+            except Exception as e:
+                future.cancel()
+                self._record_failure(i, stage, e)
+        
+        if broken:
+            # A worker died and took every pending task with it; retry the
+            # affected members one at a time in a fresh pool so only the
+            # member that kills its worker is recorded as failed
+            self._discard_broken_executor()
+            for i in broken:
+                if len(broken) == 1 or not self._owns_executor:
+                    self._record_failure(i, stage, BrokenProcessPool("worker process terminated abruptly"))
+                    continue
+                try:
+                    results[i] = self._get_executor().submit(function, *member_args[i]).result(
+                        timeout=self.member_timeout)
+                except BrokenProcessPool as e:
+                    self._discard_broken_executor()
+                    self._record_failure(i, stage, e)
+                except Exception as e:
+                    self._record_failure(i, stage, e)
+        
+        for i in local:
+            run_in_process(i, member_args[i])
+        
+        return results
+    
+    def _active_members(self) -> List[int]:
+        """Indices of members that fitted successfully"""
+        return [i for i, stats in enumerate(self.member_stats) if stats['status'] != 'fit_failed']
+    
+    def _equal_weights(self, members: List[int]) -> np.ndarray:
+        """Equal weights over the given members, zero for the others"""
+        weights = np.zeros(len(self.forecasters))
+        weights[members] = 1.0 / len(members)
+        return weights
+    
+    def _member_forecasts(self, members: List[int], **predict_kwargs) -> List[Optional[pd.DataFrame]]:
+        """
+        Forecast with the given members in parallel when enabled
+        
+        Args:
+            members: Indices of the members to run
+            **predict_kwargs: Arguments for predict()
+            
+        Returns:
+            Forecast DataFrames in member order, None where a member was
+            skipped or failed
+        """
+        member_args = [
+            (forecaster, predict_kwargs) if i in members else None
+            for i, forecaster in enumerate(self.forecasters)
+        ]
+        forecasts = []
+        for i, result in enumerate(self._run_members(_predict_member, member_args, 'predict')):
+            if result is None:
+                forecasts.append(None)
+                continue
+            forecast, seconds = result
+            self.member_stats[i]['predict_seconds'] = seconds
+            if self.member_stats[i]['status'] == 'predict_failed':
+                self.member_stats[i]['status'], self.member_stats[i]['error'] = 'ok', None
+            forecasts.append(forecast)
+        return forecasts
+    
     def _calculate_weights(self, val_data: pd.DataFrame, target_col: str) -> None:
         """
         Calculate weights for each forecaster based on validation performance
@@ -172,24 +380,25 @@ class EnsembleForecaster(BaseForecaster):
             val_data: Validation data
             target_col: Target column
         """
-        forecaster_errors = []
-        
         # Generate forecasts for validation period with each forecaster
-        for forecaster in self.forecasters:
-            forecasts = forecaster.predict(
-                start_date=val_data.index[0],
-                n_periods=len(val_data)
-            )
-            
-            # Calculate MSE
-            y_true = val_data[target_col].values
-            y_pred = forecasts['forecast'].values
-            mse = np.mean((y_true - y_pred) ** 2)
-            forecaster_errors.append(mse)
+        all_forecasts = self._member_forecasts(
+            self._active_members(), start_date=val_data.index[0], n_periods=len(val_data)
+        )
+        
+        # Inverse MSE per member, zero for members without a forecast
+        inverse_errors = np.zeros(len(self.forecasters))
+        y_true = val_data[target_col].values
+        for i, forecasts in enumerate(all_forecasts):
+            if forecasts is not None:
+                # Calculate MSE
+                y_pred = forecasts['forecast'].values
+                mse = np.mean((y_true - y_pred) ** 2)
+                # Add small epsilon to avoid division by zero
+                inverse_errors[i] = 1.0 / (mse + 1e-10)
         
         # Convert errors to weights (smaller error -> larger weight)
-        # Add small epsilon to avoid division by zero
-        inverse_errors = 1.0 / (np.array(forecaster_errors) + 1e-10)
+        if inverse_errors.sum() == 0:
+            raise RuntimeError("No forecaster in the ensemble produced a validation forecast")
         self.weights = inverse_errors / np.sum(inverse_errors)
         
         # Log the weights
@@ -207,15 +416,13 @@ class EnsembleForecaster(BaseForecaster):
         from sklearn.linear_model import Ridge
         
         # Generate forecasts for validation period with each forecaster
-        forecaster_preds = []
-        
-        for forecaster in self.forecasters:
-            forecasts = forecaster.predict(
-                start_date=val_data.index[0],
-                n_periods=len(val_data)
-            )
-            
-            forecaster_preds.append(forecasts['forecast'].values)
+        all_forecasts = self._member_forecasts(
+            self._active_members(), start_date=val_data.index[0], n_periods=len(val_data)
+        )
+        self.stack_members = [i for i, forecasts in enumerate(all_forecasts) if forecasts is not None]
+        if not self.stack_members:
+            raise RuntimeError("No forecaster in the ensemble produced a validation forecast")
+        forecaster_preds = [all_forecasts[i]['forecast'].values for i in self.stack_members]
         
         # Create feature matrix for stacking
         X_stack = np.column_stack(forecaster_preds)
@@ -226,7 +433,8 @@ class EnsembleForecaster(BaseForecaster):
         self.meta_model.fit(X_stack, y_stack)
         
         # Get meta-model coefficients as weights
-        self.weights = self.meta_model.coef_
+        self.weights = np.zeros(len(self.forecasters))
+        self.weights[self.stack_members] = self.meta_model.coef_
         self.weights = self.weights / np.sum(np.abs(self.weights))  # Normalize weights
         
         logger.info(f"Fitted stacking meta-model with coefficients: {self.weights}")
@@ -264,48 +472,52 @@ class EnsembleForecaster(BaseForecaster):
         forecast_dates = pd.date_range(start=start_date, periods=n_periods, freq=self.frequency)
         
         # Generate forecasts from each forecaster
-        forecaster_preds = []
-        lower_bounds = []
-        upper_bounds = []
-        
-        for forecaster in self.forecasters:
-            forecasts = forecaster.predict(
-                start_date=start_date,
-                n_periods=n_periods,
-                exogenous_data=exogenous_data,
-                **kwargs
-            )
-            
-            forecaster_preds.append(forecasts['forecast'].values)
-            
-            if 'lower_bound' in forecasts.columns:
-                lower_bounds.append(forecasts['lower_bound'].values)
-            
-            if 'upper_bound' in forecasts.columns:
-                upper_bounds.append(forecasts['upper_bound'].values)
+        all_forecasts = self._member_forecasts(
+            [i for i in self._active_members() if self.weights[i] != 0],
+            start_date=start_date,
+            n_periods=n_periods,
+            exogenous_data=exogenous_data,
+            **kwargs
+        )
+        members = [i for i, forecasts in enumerate(all_forecasts) if forecasts is not None]
+        if not members:
+            raise RuntimeError("All forecasters in the ensemble failed to predict")
+        
+        forecaster_preds = [all_forecasts[i]['forecast'].values for i in members]
+        lower_bounds = [all_forecasts[i]['lower_bound'].values for i in members
+                        if 'lower_bound' in all_forecasts[i].columns]
+        upper_bounds = [all_forecasts[i]['upper_bound'].values for i in members
+                        if 'upper_bound' in all_forecasts[i].columns]
+        
+        # Weights of the members that forecast, renormalized if any are missing
+        weights = self.weights[members]
+        if weights.sum() > 0:
+            weights = weights / weights.sum()
+        else:
+            weights = np.ones(len(members)) / len(members)
         
         # Combine forecasts based on ensemble method
-        if self.ensemble_method == "stacked" and self.meta_model is not None:
+        if self.ensemble_method == "stacked" and self.meta_model is not None and members == self.stack_members:
             # Use meta-model for prediction
             X_stack = np.column_stack([pred[:min(n_periods, len(pred))] for pred in forecaster_preds])
             ensemble_forecast = self.meta_model.predict(X_stack)
         else:
             # Use weighted average
             forecaster_preds = np.array(forecaster_preds)
-            ensemble_forecast = np.sum(forecaster_preds * self.weights.reshape(-1, 1), axis=0)
+            ensemble_forecast = np.sum(forecaster_preds * weights.reshape(-1, 1), axis=0)
         
         # Create forecast DataFrame
         forecast_df = pd.DataFrame({'forecast': ensemble_forecast}, index=forecast_dates)
         
         # Add confidence intervals if available from all forecasters
-        if lower_bounds and len(lower_bounds) == len(self.forecasters):
+        if lower_bounds and len(lower_bounds) == len(members):
             lower_bounds = np.array(lower_bounds)
-            weighted_lower = np.sum(lower_bounds * self.weights.reshape(-1, 1), axis=0)
+            weighted_lower = np.sum(lower_bounds * weights.reshape(-1, 1), axis=0)
             forecast_df['lower_bound'] = weighted_lower
         
-        if upper_bounds and len(upper_bounds) == len(self.forecasters):
+        if upper_bounds and len(upper_bounds) == len(members):
             upper_bounds = np.array(upper_bounds)
-            weighted_upper = np.sum(upper_bounds * self.weights.reshape(-1, 1), axis=0)
+            weighted_upper = np.sum(upper_bounds * weights.reshape(-1, 1), axis=0)
             forecast_df['upper_bound'] = weighted_upper
         
         logger.info(f"Generated ensemble forecast for {n_periods} periods starting from {start_date}")
@@ -331,6 +543,7 @@ class EnsembleForecaster(BaseForecaster):
             'ensemble_method': self.ensemble_method,
             'forecasters': [f.__class__.__name__ for f in self.forecasters],
             'weights': self.weights.tolist() if self.weights is not None else None,
+            'members': self.member_stats,
         }
         
         # Plot diagnostics if requested
@@ -354,6 +567,206 @@ class EnsembleForecaster(BaseForecaster):
             plt.close()
         
         return diagnostics
+    
+    def _state_token(self) -> str:
+        """Token of the ensemble's and its members' fitted states"""
+        return ':'.join([super()._state_token()] + [f._state_token() for f in self.forecasters])
+    
+    def get_member_timings(self) -> pd.DataFrame:
+        """
+        Get the status and fit/predict timings of each member
+        
+        Returns:
+            DataFrame with one row per member, in ensemble order
+        """
+        return pd.DataFrame(self.member_stats, columns=[
+            'name', 'type', 'status', 'error', 'fit_seconds', 'predict_seconds'
+        ])
+    
+    def close(self) -> None:
+        """Shut down the process pool created by the ensemble"""
+        if self._owns_executor and self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+            self._owns_executor = False
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        """Exclude the executor from pickling"""
+        state = self.__dict__.copy()
+        state['executor'] = None
+        state['_owns_executor'] = False
+        return state
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Restore a pickled ensemble"""
+        state.setdefault('n_jobs', 1)
+        state.setdefault('executor', None)
+        state.setdefault('_owns_executor', False)
+        state.setdefault('member_timeout', None)
+        state.setdefault('member_stats', [
+            {'name': f.name, 'type': f.__class__.__name__, 'status': 'ok', 'error': None,
+             'fit_seconds': None, 'predict_seconds': None}
+            for f in state.get('forecasters', [])
+        ])
+        state.setdefault('stack_members', list(range(len(state.get('forecasters', [])))))
+        self.__dict__.update(state)
+
+
+# Frames attached to shared memory in this (worker) process, by segment name.
+# An attachment keeps its segment mapped after the parent unlinks it, so the
+# cache is bounded by the bytes it maps.
+_ATTACHED_FRAMES: Dict[str, Tuple[shared_memory.SharedMemory, pd.DataFrame]] = {}
+_MAX_ATTACHED_BYTES = 256 * 1024 * 1024
+
+
+def _share_frame(data: pd.DataFrame) -> Optional[Tuple[shared_memory.SharedMemory, Dict[str, Any]]]:
+    """
+    Copy a time series frame into a shared memory segment
+    
+    Args:
+        data: Frame with numeric columns and a naive datetime or numeric index
+        
+    Returns:
+        The segment and a picklable handle for _attach_frame, or None if the
+        frame cannot be shared this way
+    """
+    index = data.index
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in data.dtypes):
+        return None
+    if not isinstance(index.dtype, np.dtype) or index.dtype.kind not in 'Mif' or index.dtype.itemsize != 8:
+        return None
+    
+    rows, cols = data.shape
+    segment = shared_memory.SharedMemory(create=True, size=max(1, 8 * rows * (cols + 1)))
+    np.ndarray((rows, cols), dtype=np.float64, buffer=segment.buf)[:] = data.to_numpy(dtype=np.float64)
+    np.ndarray(rows, dtype=index.dtype, buffer=segment.buf, offset=8 * rows * cols)[:] = index.values
+    handle = {
+        'name': segment.name,
+        'rows': rows,
+        'columns': list(data.columns),
+        'index_dtype': index.dtype.str,
+        'index_name': index.name,
+        'freq': getattr(index, 'freqstr', None)
+    }
+    return segment, handle
+
+
+def _attach_frame(handle: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Zero-copy DataFrame over a segment created by _share_frame
+    
+    Frames are cached per process, so every fold evaluated in a worker
+    slices the same attached frame. The earliest attached frames are
+    detached once the cache maps more than _MAX_ATTACHED_BYTES.
+    """
+    if handle['name'] in _ATTACHED_FRAMES:
+        return _ATTACHED_FRAMES[handle['name']][1]
+    
+    segment = shared_memory.SharedMemory(name=handle['name'])
+    attached_bytes = sum(cached.size for cached, _ in _ATTACHED_FRAMES.values())
+    while _ATTACHED_FRAMES and attached_bytes + segment.size > _MAX_ATTACHED_BYTES:
+        cached, _ = _ATTACHED_FRAMES.pop(next(iter(_ATTACHED_FRAMES)))
+        attached_bytes -= cached.size
+        try:
+            cached.close()
+        except BufferError:
+            pass  # Still referenced; unmapped when the frame is collected
+    
+    rows, cols = handle['rows'], len(handle['columns'])
+    values = np.ndarray((rows, cols), dtype=np.float64, buffer=segment.buf)
+    index = pd.Index(
+        np.ndarray(rows, dtype=np.dtype(handle['index_dtype']), buffer=segment.buf, offset=8 * rows * cols),
+        name=handle['index_name']
+    )
+    if handle['freq']:
+        index = pd.DatetimeIndex(index, freq=handle['freq'])
+    frame = pd.DataFrame(values, index=index, columns=handle['columns'], copy=False)
+    _ATTACHED_FRAMES[handle['name']] = (segment, frame)
+    return frame
+
+
+def _evaluate_fold(model: BaseForecaster, data: Union[pd.DataFrame, Dict[str, Any]], target_col: str,
+                   test_start: int, test_end: int, metric: str) -> Tuple[float, float]:
+    """Fit a candidate on one CV fold and score it (runs in a worker process when parallel)"""
+    start = time.perf_counter()
+    if isinstance(data, dict):
+        data = _attach_frame(data)
+    model.fit(data.iloc[:test_start], target_col)
+    metrics = model.evaluate(data.iloc[test_start:test_end], target_col, metrics=[metric])
+    return float(metrics.get(metric, float('inf'))), time.perf_counter() - start
+
+
+class _CVSearch:
+    """
+    Cross-validation state of the candidate models for one series
+    
+    Fold scores are non-negative, so the mean over all folds is at least the
+    sum of the scores so far divided by the number of folds; a candidate is
+    pruned once that bound reaches the best complete mean.
+    """
+    
+    def __init__(self, models: List[BaseForecaster], data: pd.DataFrame, target_col: str,
+                 folds: List[Tuple[int, int]], early_stopping: bool = True):
+        self.models = models
+        self.data = data
+        self.target_col = target_col
+        self.folds = folds
+        self.early_stopping = early_stopping
+        self.scores: List[List[float]] = [[] for _ in models]
+        self.pruned = [False] * len(models)
+        self.futures: List[List[Any]] = [[] for _ in models]
+        self.best = float('inf')
+        self.fold_data: Union[pd.DataFrame, Dict[str, Any]] = data
+        self.segment: Optional[shared_memory.SharedMemory] = None
+    
+    def active(self, index: int) -> bool:
+        """Whether a candidate still has folds to evaluate"""
+        return not self.pruned[index] and len(self.scores[index]) < len(self.folds)
+    
+    def record(self, index: int, score: float) -> List[int]:
+        """
+        Add a fold score of a candidate
+        
+        Returns:
+            Indices of candidates pruned by this score
+        """
+        self.scores[index].append(score)
+        if len(self.scores[index]) == len(self.folds):
+            self.best = min(self.best, float(np.mean(self.scores[index])))
+        if not self.early_stopping:
+            return []
+        
+        pruned = [
+            i for i in range(len(self.models))
+            if self.active(i) and self.scores[i] and np.sum(self.scores[i]) / len(self.folds) >= self.best
+        ]
+        for i in pruned:
+            self.pruned[i] = True
+            for future in self.futures[i]:
+                future.cancel()
+        return pruned
+    
+    def performances(self) -> Dict[str, float]:
+        """Mean fold score per candidate (inf if pruned or without folds)"""
+        return {
+            model.name: float(np.mean(scores)) if scores and not pruned and len(scores) == len(self.folds)
+            else float('inf')
+            for model, scores, pruned in zip(self.models, self.scores, self.pruned)
+        }
+    
+    def share(self) -> None:
+        """Put the series in shared memory for worker processes"""
+        shared = _share_frame(self.data)
+        if shared is not None:
+            self.segment, self.fold_data = shared
+    
+    def release(self) -> None:
+        """Free the shared memory segment"""
+        if self.segment is not None:
+            self.segment.close()
+            self.segment.unlink()
+            self.segment = None
+            self.fold_data = self.data
 
 
 class ModelSelector:
@@ -367,7 +780,10 @@ class ModelSelector:
         models_to_try: Optional[List[str]] = None,
         evaluation_metric: str = 'rmse',
         cross_validation: bool = True,
-        cv_folds: int = 3
+        cv_folds: int = 3,
+        n_jobs: int = 1,
+        executor: Optional[Executor] = None,
+        early_stopping: bool = True
     ):
         """
         Initialize model selector
@@ -377,13 +793,26 @@ class ModelSelector:
             evaluation_metric: Metric for model selection ('rmse', 'mse', 'mae', 'mape')
             cross_validation: Whether to use cross-validation
             cv_folds: Number of cross-validation folds
+            n_jobs: Worker processes for (model, fold) evaluations
+                (1 runs them in-process, -1 uses all CPUs)
+            executor: Executor to run evaluations in (overrides n_jobs)
+            early_stopping: Stop evaluating a candidate once it cannot beat
+                the best complete candidate
         """
         self.models_to_try = models_to_try or ['arima', 'expsm', 'lstm', 'ensemble']
         self.evaluation_metric = evaluation_metric
         self.cross_validation = cross_validation
         self.cv_folds = cv_folds
+        self.n_jobs = n_jobs
+        self.executor = executor
+        self._owns_executor = False
+        self.early_stopping = early_stopping
         self.best_model = None
         self.model_performances = {}
+        self.pruned_models: List[str] = []
+        self.best_models: Dict[Any, BaseForecaster] = {}
+        self.series_performances: Dict[Any, Dict[str, float]] = {}
+        self.failed_series: Dict[Any, str] = {}
         
         logger.info(f"Initialized ModelSelector with models: {self.models_to_try}")
     
@@ -470,6 +899,132 @@ class ModelSelector:
         Returns:
             Best forecasting model
         """
+        candidate_models = self._create_candidates(data, target_col, forecast_horizon, frequency)
+        
+        # Evaluate candidate models
+        if self.cross_validation:
+            self._evaluate_with_cv(candidate_models, data, target_col, forecast_horizon, self.cv_folds)
+        else:
+            self._evaluate_with_validation(candidate_models, data, target_col, validation_ratio)
+        
+        # Select best model
+        best_model_name = min(self.model_performances.items(), key=lambda x: x[1])[0]
+        self.best_model = next(model for model in candidate_models if model.name == best_model_name)
+        
+        # Fit the best model on the entire dataset
+        self.best_model.fit(data, target_col)
+        
+        logger.info(f"Selected {self.best_model.__class__.__name__} as best model with "
+                   f"{self.evaluation_metric}={self.model_performances[best_model_name]:.4f}")
+        
+        return self.best_model
+    
+    def select_best_model_many(
+        self,
+        series_dict: Dict[Any, pd.DataFrame],
+        target_col: str,
+        forecast_horizon: int = 24,
+        frequency: str = 'H',
+        validation_ratio: float = 0.2
+    ) -> Dict[Any, BaseForecaster]:
+        """
+        Select and fit the best forecasting model for each of many series
+        
+        With cross-validation, the (model, fold) evaluations of all series
+        share one pool, and the best models are fitted in it as well.
+        
+        Args:
+            series_dict: Time series data per series ID (e.g. station)
+            target_col: Target column
+            forecast_horizon: Forecast horizon
+            frequency: Time series frequency
+            validation_ratio: Ratio of data to use for validation
+            
+        Returns:
+            Fitted best model per series ID (series whose best model failed
+            to fit are left out and recorded in failed_series)
+        """
+        self.best_models = {}
+        self.series_performances = {}
+        self.failed_series = {}
+        
+        if not self.cross_validation:
+            for series_id, data in series_dict.items():
+                self.model_performances = {}
+                try:
+                    self.best_models[series_id] = self.select_best_model(
+                        data, target_col, forecast_horizon, frequency, validation_ratio
+                    )
+                except Exception as e:
+                    self._record_series_failure(series_id, e)
+                self.series_performances[series_id] = dict(self.model_performances)
+            return self.best_models
+        
+        searches = {
+            series_id: _CVSearch(
+                self._create_candidates(data, target_col, forecast_horizon, frequency),
+                data, target_col,
+                self._cv_fold_bounds(len(data), forecast_horizon, self.cv_folds),
+                self.early_stopping
+            )
+            for series_id, data in series_dict.items()
+        }
+        self._run_cv(list(searches.values()))
+        
+        best = {}
+        for series_id, search in searches.items():
+            performances = search.performances()
+            self.series_performances[series_id] = performances
+            best_model_name = min(performances.items(), key=lambda x: x[1])[0]
+            best[series_id] = next(model for model in search.models if model.name == best_model_name)
+        
+        # Fit the best models on their entire series
+        if self._parallel():
+            executor = self._get_executor()
+            futures = {
+                series_id: executor.submit(_fit_member, model, series_dict[series_id], target_col, {})
+                for series_id, model in best.items()
+            }
+            for series_id, future in futures.items():
+                try:
+                    self.best_models[series_id] = future.result()[0]
+                except Exception as e:
+                    self._record_series_failure(series_id, e)
+        else:
+            for series_id, model in best.items():
+                try:
+                    self.best_models[series_id] = model.fit(series_dict[series_id], target_col)
+                except Exception as e:
+                    self._record_series_failure(series_id, e)
+        
+        logger.info(f"Selected best models for {len(self.best_models)} series "
+                    f"({len(self.failed_series)} failed)")
+        return self.best_models
+    
+    def _record_series_failure(self, series_id: Any, error: Exception) -> None:
+        """Record a series whose best model could not be selected or fitted"""
+        self.failed_series[series_id] = f"{error.__class__.__name__}: {error}"
+        logger.error(f"Error fitting best model for series {series_id}: {str(error)}")
+    
+    def _create_candidates(
+        self,
+        data: pd.DataFrame,
+        target_col: str,
+        forecast_horizon: int,
+        frequency: str
+    ) -> List[BaseForecaster]:
+        """
+        Create unfitted candidate models suited to the data characteristics
+        
+        Args:
+            data: Time series data
+            target_col: Target column
+            forecast_horizon: Forecast horizon
+            frequency: Time series frequency
+            
+        Returns:
+            List of candidate models
+        """
         # Analyze data
         characteristics = self.analyze_data(data, target_col)
         
@@ -574,23 +1129,7 @@ class ModelSelector:
                 )
                 candidate_models.append(ensemble)
         
-        # Evaluate candidate models
-        if self.cross_validation:
-            self._evaluate_with_cv(candidate_models, data, target_col, forecast_horizon, self.cv_folds)
-        else:
-            self._evaluate_with_validation(candidate_models, data, target_col, validation_ratio)
-        
-        # Select best model
-        best_model_name = min(self.model_performances.items(), key=lambda x: x[1])[0]
-        self.best_model = next(model for model in candidate_models if model.name == best_model_name)
-        
-        # Fit the best model on the entire dataset
-        self.best_model.fit(data, target_col)
-        
-        logger.info(f"Selected {self.best_model.__class__.__name__} as best model with "
-                   f"{self.evaluation_metric}={self.model_performances[best_model_name]:.4f}")
-        
-        return self.best_model
+        return candidate_models
     
     def _evaluate_with_validation(
         self, 
@@ -639,52 +1178,112 @@ class ModelSelector:
             forecast_horizon: Forecast horizon
             cv_folds: Number of CV folds
         """
-        # Time series cross-validation
-        fold_size = min(len(data) // cv_folds, forecast_horizon * 3)
+        search = _CVSearch(
+            models, data, target_col,
+            self._cv_fold_bounds(len(data), forecast_horizon, cv_folds),
+            self.early_stopping
+        )
+        self._run_cv([search])
+        
+        self.model_performances.update(search.performances())
+        self.pruned_models = [model.name for model, pruned in zip(models, search.pruned) if pruned]
+        if self.pruned_models:
+            logger.info(f"Stopped cross-validation early for {self.pruned_models}")
+    
+    @staticmethod
+    def _cv_fold_bounds(n_rows: int, forecast_horizon: int, cv_folds: int) -> List[Tuple[int, int]]:
+        """
+        Test (start, end) positions of the time series CV folds, latest first
         
-        for model in models:
-            model_metrics = []
-            
-            # Iterate through CV folds
-            for i in range(cv_folds):
-                # Define train/test splits
-                test_end = len(data) - i * fold_size
-                test_start = test_end - fold_size
-                
-                if test_start <= forecast_horizon:
-                    continue  # Skip fold if there's not enough training data
-                
-                train_data = data.iloc[:test_start]
-                test_data = data.iloc[test_start:test_end]
-                
-                # Fit and evaluate
-                model_copy = type(model)(
-                    name=model.name,
-                    forecast_horizon=model.forecast_horizon,
-                    frequency=model.frequency
-                )
-                
-                # Handle special case for ensemble
-                if isinstance(model, EnsembleForecaster) and hasattr(model, 'forecasters'):
-                    model_copy.forecasters = [
-                        type(f)(
-                            name=f.name,
-                            forecast_horizon=f.forecast_horizon,
-                            frequency=f.frequency
+        Folds without enough training data are left out.
+        """
+        fold_size = min(n_rows // cv_folds, forecast_horizon * 3)
+        folds = []
+        for i in range(cv_folds):
+            test_end = n_rows - i * fold_size
+            test_start = test_end - fold_size
+            if test_start > forecast_horizon:
+                folds.append((test_start, test_end))
+        return folds
+    
+    def _parallel(self) -> bool:
+        """Whether evaluations run in an executor"""
+        return self.executor is not None or self.n_jobs != 1
+    
+    def _get_executor(self) -> Executor:
+        """Executor for evaluations, creating a process pool if needed"""
+        if self.executor is None:
+            workers = (os.cpu_count() or 1) if self.n_jobs == -1 else self.n_jobs
+            self.executor = ProcessPoolExecutor(max_workers=max(1, workers))
+            self._owns_executor = True
+        return self.executor
+    
+    def _run_cv(self, searches: List[_CVSearch]) -> None:
+        """
+        Evaluate every (model, fold) pair of the searches
+        
+        A fold that fails scores inf for its candidate. In parallel, each
+        series is put in shared memory once and workers slice the folds
+        from it; evaluations of pruned candidates that have not started
+        are cancelled.
+        
+        Args:
+            searches: CV state per series
+        """
+        if not self._parallel():
+            for search in searches:
+                for i, model in enumerate(search.models):
+                    for test_start, test_end in search.folds:
+                        if not search.active(i):
+                            break
+                        try:
+                            score, _ = _evaluate_fold(
+                                copy.deepcopy(model), search.data, search.target_col,
+                                test_start, test_end, self.evaluation_metric
+                            )
+                        except Exception as e:
+                            logger.warning(f"Cross-validation fold failed for {model.name}: {str(e)}")
+                            score = float('inf')
+                        search.record(i, score)
+            return
+        
+        executor = self._get_executor()
+        futures = {}
+        try:
+            for search in searches:
+                search.share()
+                for i, model in enumerate(search.models):
+                    for test_start, test_end in search.folds:
+                        future = executor.submit(
+                            _evaluate_fold, model, search.fold_data, search.target_col,
+                            test_start, test_end, self.evaluation_metric
                         )
-                        for f in model.forecasters
-                    ]
-                    model_copy.ensemble_method = model.ensemble_method
-                
-                model_copy.fit(train_data, target_col)
-                metrics = model_copy.evaluate(test_data, target_col, metrics=[self.evaluation_metric])
-                model_metrics.append(metrics.get(self.evaluation_metric, float('inf')))
+                        search.futures[i].append(future)
+                        futures[future] = (search, i)
             
-            # Calculate average metric across folds
-            if model_metrics:
-                self.model_performances[model.name] = np.mean(model_metrics)
-            else:
-                self.model_performances[model.name] = float('inf')
+            for future in as_completed(futures):
+                search, i = futures[future]
+                if future.cancelled() or not search.active(i):
+                    continue
+                try:
+                    score, _ = future.result()
+                except Exception as e:
+                    logger.warning(f"Cross-validation fold failed for {search.models[i].name}: {str(e)}")
+                    score = float('inf')
+                search.record(i, score)
+        finally:
+            for search in searches:
+                for future in [f for fs in search.futures for f in fs]:
+                    future.cancel()
+                search.futures = [[] for _ in search.models]
+                search.release()
+    
+    def close(self) -> None:
+        """Shut down the process pool created by the selector"""
+        if self._owns_executor and self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+            self._owns_executor = False
 
 
 # Example usage
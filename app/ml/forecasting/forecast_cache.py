@@ -0,0 +1,246 @@
+"""
+Forecast Cache Module
+
+This module implements the forecast result cache used by BaseForecaster.predict.
+Forecasts are keyed by the forecaster identity, a token of its fitted state
+(renewed on every fit/update), and the predict arguments, so refitting a model
+makes its earlier forecasts unreachable without any explicit bookkeeping.
+
+The cache has a size-bounded in-memory LRU tier and an optional on-disk tier
+in a shared directory, which lets several API worker processes that load the
+same saved model reuse each other's forecasts.
+"""
+import os
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Any, Tuple
+
+import joblib
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class ForecastCache:
+    """
+    LRU cache of forecast DataFrames with an optional shared on-disk tier
+
+    Callers get copies of cached forecasts, so modifying a returned frame
+    does not affect the cache. Pickling (and deep copies of forecasters)
+    keeps the configuration but not the in-memory entries.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        cache_dir: Optional[str] = None,
+        max_disk_entries: int = 10000,
+        prune_interval: int = 100
+    ):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of forecasts kept in memory
+            cache_dir: Directory of the shared on-disk tier (None disables it)
+            max_disk_entries: Maximum number of forecast files kept on disk
+            prune_interval: Disk writes between checks of max_disk_entries
+        """
+        self.max_entries = max_entries
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_disk_entries = max_disk_entries
+        self.prune_interval = prune_interval
+
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(identity: str, state_token: str, arguments: Dict[str, Any]) -> str:
+        """
+        Cache key of a forecast
+
+        Args:
+            identity: Forecaster class and name
+            state_token: Token of the forecaster's fitted state
+            arguments: Predict arguments (start date, periods, exogenous data, ...)
+
+        Returns:
+            Hex digest of the key
+        """
+        return joblib.hash((identity, state_token, sorted(arguments.items())))
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """
+        Look up a forecast, trying memory first and then disk
+
+        Args:
+            key: Key from make_key
+
+        Returns:
+            Copy of the cached forecast, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1].copy()
+
+        forecast = self._read_disk(key)
+        with self._lock:
+            if forecast is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store_memory(key, forecast[0], forecast[1])
+            return forecast[1].copy()
+
+    def put(self, key: str, state_token: str, forecast: pd.DataFrame) -> None:
+        """
+        Add a forecast to the cache
+
+        Args:
+            key: Key from make_key
+            state_token: Token of the forecaster's fitted state
+            forecast: Forecast DataFrame
+        """
+        forecast = forecast.copy()
+        with self._lock:
+            self._store_memory(key, state_token, forecast)
+        if self.cache_dir is not None:
+            self._write_disk(key, state_token, forecast)
+
+    def _store_memory(self, key: str, state_token: str, forecast: pd.DataFrame) -> None:
+        """Insert into the LRU tier, evicting the least recently used entries (lock held)"""
+        self._entries[key] = (state_token, forecast)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key: str) -> Path:
+        """File of a key in the on-disk tier"""
+        return self.cache_dir / f"{key}.joblib"
+
+    def _read_disk(self, key: str) -> Optional[Tuple[str, pd.DataFrame]]:
+        """Load a forecast from the on-disk tier"""
+        if self.cache_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            return joblib.load(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable forecast cache file {path}: {str(e)}")
+            path.unlink(missing_ok=True)
+            return None
+
+    def _write_disk(self, key: str, state_token: str, forecast: pd.DataFrame) -> None:
+        """Atomically write a forecast to the on-disk tier"""
+        path = self._disk_path(key)
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            joblib.dump((state_token, forecast), tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            tmp_path.unlink(missing_ok=True)
+            logger.error(f"Error writing forecast cache file {path}: {str(e)}")
+            return
+
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % self.prune_interval == 0
+        if prune:
+            self.prune_disk()
+
+    def prune_disk(self) -> int:
+        """
+        Remove the oldest forecast files beyond max_disk_entries
+
+        Returns:
+            Number of files removed
+        """
+        if self.cache_dir is None:
+            return 0
+        files = []
+        for path in self.cache_dir.glob('*.joblib'):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue  # Removed by another worker
+        excess = len(files) - self.max_disk_entries
+        if excess <= 0:
+            return 0
+        for _, path in sorted(files)[:excess]:
+            path.unlink(missing_ok=True)
+        return excess
+
+    def invalidate(self, state_token: str) -> int:
+        """
+        Drop in-memory forecasts of a fitted state
+
+        Keys of other states never match these entries, so this only frees
+        memory; files on disk age out through max_disk_entries.
+
+        Args:
+            state_token: Token of the superseded fitted state
+
+        Returns:
+            Number of entries dropped
+        """
+        with self._lock:
+            stale = [key for key, (token, _) in self._entries.items() if token == state_token]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        """Remove all forecasts from memory and disk"""
+        with self._lock:
+            self._entries.clear()
+        if self.cache_dir is not None:
+            for path in self.cache_dir.glob('*.joblib'):
+                path.unlink(missing_ok=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'cache_dir': str(self.cache_dir) if self.cache_dir else None
+            }
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Pickle the configuration only"""
+        return {
+            'max_entries': self.max_entries,
+            'cache_dir': str(self.cache_dir) if self.cache_dir else None,
+            'max_disk_entries': self.max_disk_entries,
+            'prune_interval': self.prune_interval
+        }
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Restore an empty cache with the pickled configuration"""
+        self.__init__(**state)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> 'ForecastCache':
+        """Copies of a forecaster share its cache"""
+        return self
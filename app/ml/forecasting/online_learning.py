@@ -4,7 +4,10 @@ Online Learning Module
 This module extends forecasting models with online learning capabilities
 and implements drift detection to trigger retraining when patterns change.
 """
+import copy
 import logging
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -28,6 +31,13 @@ class OnlineForecaster:
     - Concept drift detection
     - Automatic model retraining when drift is detected
     - Performance monitoring over time
+    
+    Scheduled updates use the base forecaster's incremental path when it has
+    one: update(new_data) (state-space updates for the statistical models,
+    fine-tuning for the LSTM) or partial_fit(new_data, target_col) for
+    sklearn-style models. Full retrains fit a copy of the forecaster in a
+    background executor and swap it in once trained, after replaying the data
+    that arrived meanwhile, so predict() never waits for training.
     """
     
     def __init__(
@@ -38,7 +48,9 @@ class OnlineForecaster:
         drift_detection_method: str = 'threshold',
         drift_threshold: float = 0.3,
         performance_metric: str = 'rmse',
-        max_online_window: int = 90
+        max_online_window: int = 90,
+        background_retrain: bool = True,
+        executor: Optional[Executor] = None
     ):
         """
         Initialize online forecaster
@@ -52,6 +64,8 @@ class OnlineForecaster:
             drift_threshold: Threshold for drift detection
             performance_metric: Metric to track for performance ('rmse', 'mse', 'mae')
             max_online_window: Maximum number of periods to store for online learning
+            background_retrain: Whether full retrains run in the background
+            executor: Executor for background retrains (a single-thread pool if None)
         """
         self.base_forecaster = base_forecaster
         self.update_frequency = update_frequency
@@ -60,6 +74,14 @@ class OnlineForecaster:
         self.drift_threshold = drift_threshold
         self.performance_metric = performance_metric
         self.max_online_window = max_online_window
+        self.background_retrain = background_retrain
+        self.executor = executor
+        
+        # Background retraining
+        self._retrain_lock = threading.RLock()
+        self._retrain_future: Optional[Future] = None
+        self._catch_up_data: List[pd.DataFrame] = []
+        self.retrain_count = 0
         
         # Initialize state
         self.is_fitted = False
@@ -202,6 +224,7 @@ class OnlineForecaster:
                 # Retrain the model
                 self._retrain_model(new_data, **kwargs)
                 update_metrics["retrained"] = True
+                update_metrics["retrain_in_background"] = self.retrain_in_progress()
             else:
                 # Check if it's time for a regular update
                 time_for_update = self._is_time_for_update()
@@ -360,6 +383,26 @@ class OnlineForecaster:
             # Default to daily
             return time_diff > timedelta(days=1)
     
+    def _apply_incremental(self, forecaster: BaseForecaster, new_data: pd.DataFrame, **kwargs) -> bool:
+        """
+        Apply new data through a forecaster's incremental update path
+        
+        Args:
+            forecaster: Forecaster to update
+            new_data: New data points
+            **kwargs: Additional parameters for updating
+            
+        Returns:
+            False if the forecaster has no incremental path
+        """
+        if hasattr(forecaster, 'update'):
+            forecaster.update(new_data, **kwargs)
+        elif hasattr(forecaster, 'partial_fit'):
+            forecaster.partial_fit(new_data, self.target_col, **kwargs)
+        else:
+            return False
+        return True
+    
     def _update_model(self, new_data: pd.DataFrame, **kwargs) -> None:
         """
         Incrementally update the model with new data
@@ -368,13 +411,21 @@ class OnlineForecaster:
             new_data: New data points
             **kwargs: Additional parameters for updating
         """
-        # Update the model incrementally if supported
-        if hasattr(self.base_forecaster, 'update'):
-            # If the base model supports incremental updates
-            self.base_forecaster.update(new_data, **kwargs)
-        else:
-            # Otherwise, refit with recent data
-            self._retrain_model(new_data, **kwargs)
+        with self._retrain_lock:
+            try:
+                updated = self._apply_incremental(self.base_forecaster, new_data, **kwargs)
+            except Exception as e:
+                logger.warning(f"Incremental update failed, retraining instead: {str(e)}")
+                updated = False
+            
+            if not updated:
+                # Otherwise, refit with recent data
+                self._retrain_model(new_data, **kwargs)
+                return
+            
+            # A model being retrained gets this data once it is swapped in
+            if self.retrain_in_progress():
+                self._catch_up_data.append(new_data)
         
         self.last_update_time = datetime.now()
         logger.info(f"Updated model with {len(new_data)} new data points")
@@ -383,6 +434,10 @@ class OnlineForecaster:
         """
         Retrain the model from scratch with recent data
         
+        With background_retrain a copy of the forecaster is fitted in the
+        executor and swapped in when done; the current model keeps serving
+        predictions meanwhile.
+        
         Args:
             new_data: New data points
             **kwargs: Additional parameters for retraining
@@ -394,14 +449,94 @@ class OnlineForecaster:
         if self.retraining_window and len(training_data) > self.retraining_window:
             training_data = training_data.iloc[-self.retraining_window:]
         
+        if self.background_retrain:
+            with self._retrain_lock:
+                if self.retrain_in_progress():
+                    # The running retrain gets this data when it is swapped in
+                    self._catch_up_data.append(new_data)
+                    logger.info("Retraining already in progress, queued new data for it")
+                    return
+                
+                try:
+                    candidate = copy.deepcopy(self.base_forecaster)
+                except Exception as e:
+                    logger.warning(f"Cannot copy {self.base_forecaster.__class__.__name__} "
+                                   f"for background retraining, retraining in place: {str(e)}")
+                    candidate = None
+                
+                if candidate is not None:
+                    if self.executor is None:
+                        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='online-retrain')
+                    self._catch_up_data = []
+                    self._retrain_future = self.executor.submit(
+                        self._fit_and_swap, candidate, training_data, kwargs
+                    )
+                    logger.info(f"Started background retraining with {len(training_data)} data points")
+                    return
+        
         # Retrain the base forecaster
         self.base_forecaster.fit(training_data, self.target_col, **kwargs)
+        self.retrain_count += 1
         
         self.last_update_time = datetime.now()
         self.last_retrain_time = datetime.now()
         
         logger.info(f"Retrained model with {len(training_data)} data points")
     
+    def _fit_and_swap(self, candidate: BaseForecaster, training_data: pd.DataFrame, kwargs: Dict[str, Any]) -> None:
+        """
+        Fit a forecaster copy and swap it in (executor thread)
+        
+        Args:
+            candidate: Copy of the base forecaster
+            training_data: Data to fit on
+            kwargs: Additional parameters for retraining
+        """
+        try:
+            candidate.fit(training_data, self.target_col, **kwargs)
+            
+            with self._retrain_lock:
+                # Replay data that arrived while training
+                for chunk in self._catch_up_data:
+                    if not self._apply_incremental(candidate, chunk):
+                        break
+                self._catch_up_data = []
+                
+                self.base_forecaster = candidate
+                self.retrain_count += 1
+                self.last_update_time = datetime.now()
+                self.last_retrain_time = datetime.now()
+            
+            logger.info(f"Retrained model with {len(training_data)} data points in the background")
+        except Exception as e:
+            logger.error(f"Background retraining failed: {str(e)}")
+            raise
+    
+    def retrain_in_progress(self) -> bool:
+        """Whether a background retrain is running"""
+        return self._retrain_future is not None and not self._retrain_future.done()
+    
+    def wait_for_retrain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for a running background retrain to finish
+        
+        Args:
+            timeout: Maximum seconds to wait (no limit if None)
+            
+        Returns:
+            False if a retrain is still running after the timeout
+        """
+        future = self._retrain_future
+        if future is None:
+            return True
+        try:
+            future.result(timeout=timeout)
+        except TimeoutError:
+            return False
+        except Exception:
+            pass
+        return future.done()
+    
     def _update_recent_data(self, new_data: pd.DataFrame) -> None:
         """
         Update the buffer of recent data
@@ -494,6 +629,25 @@ class OnlineForecaster:
         
         plt.close()
     
+    def __getstate__(self) -> Dict[str, Any]:
+        """Exclude the executor and retraining synchronization from pickling"""
+        state = self.__dict__.copy()
+        state['executor'] = None
+        state['_retrain_lock'] = None
+        state['_retrain_future'] = None
+        state['_catch_up_data'] = []
+        return state
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Restore a pickled forecaster"""
+        state.setdefault('background_retrain', False)
+        state.setdefault('executor', None)
+        state.setdefault('retrain_count', 0)
+        self.__dict__.update(state)
+        self._retrain_lock = threading.RLock()
+        self._retrain_future = None
+        self._catch_up_data = []
+    
     def save(self, filepath: Optional[str] = None) -> str:
         """
         Save the online forecaster to disk
@@ -878,6 +1032,310 @@ class DriftDetector:
         plt.close()
 
 
+class MultiStreamDriftDetector:
+    """
+    Drift detector for many independent streams (e.g. per station or vehicle)
+
+    Page-Hinkley and ADWIN state is held in NumPy arrays indexed by stream, and
+    update() processes a batch of (stream, value) observations for all streams
+    at once. Observations of the same stream are applied in batch order: the
+    batch is split into rounds holding at most one observation per stream, and
+    each round updates all its streams with vectorized operations.
+
+    Page-Hinkley is two-sided (detects increases and decreases of the mean).
+    ADWIN keeps the last adwin_window values of each stream, checks every split
+    of the window with the variance-based ADWIN bound and drops the older part
+    when the means differ significantly. As in common ADWIN implementations the
+    window is checked every adwin_clock values; checks are staggered across
+    streams so each batch checks a similar share of them.
+    """
+
+    METHODS = ('page_hinkley', 'adwin')
+
+    def __init__(
+        self,
+        methods: Tuple[str, ...] = ('page_hinkley', 'adwin'),
+        ph_delta: float = 0.005,
+        ph_threshold: float = 50.0,
+        ph_min_instances: int = 30,
+        adwin_delta: float = 0.002,
+        adwin_window: int = 64,
+        adwin_min_window: int = 8,
+        adwin_clock: int = 32,
+        initial_capacity: int = 1024
+    ):
+        """
+        Initialize the detector
+
+        Args:
+            methods: Detection methods to run ('page_hinkley', 'adwin')
+            ph_delta: Magnitude of changes tolerated by Page-Hinkley
+            ph_threshold: Page-Hinkley detection threshold (lambda)
+            ph_min_instances: Observations of a stream before Page-Hinkley can fire
+            adwin_delta: ADWIN confidence parameter
+            adwin_window: Maximum number of values kept per stream for ADWIN
+            adwin_min_window: Minimum size of each ADWIN sub-window
+            adwin_clock: Values added to a stream between ADWIN checks
+            initial_capacity: Number of streams allocated up front
+        """
+        unknown = set(methods) - set(self.METHODS)
+        if unknown:
+            raise ValueError(f"Unknown drift detection methods: {sorted(unknown)}")
+
+        self.methods = tuple(methods)
+        self.ph_delta = ph_delta
+        self.ph_threshold = ph_threshold
+        self.ph_min_instances = ph_min_instances
+        self.adwin_delta = adwin_delta
+        self.adwin_window = adwin_window
+        self.adwin_min_window = adwin_min_window
+        self.adwin_clock = max(1, adwin_clock)
+
+        self.stream_ids: List[Any] = []
+        self._index: Dict[Any, int] = {}
+        self._id_index = pd.Index([])
+        self._capacity = 0
+        self._allocate(initial_capacity)
+
+        # Statistics
+        self.observations = 0
+
+        logger.info(f"Initialized MultiStreamDriftDetector with methods={self.methods}")
+
+    @property
+    def n_streams(self) -> int:
+        """Number of streams seen so far"""
+        return len(self.stream_ids)
+
+    def _allocate(self, capacity: int) -> None:
+        """Grow the per-stream state arrays to capacity"""
+        def grow(array: Optional[np.ndarray], fill: float, dtype=np.float64, width: Optional[int] = None):
+            shape = (capacity,) if width is None else (capacity, width)
+            grown = np.full(shape, fill, dtype=dtype)
+            if array is not None:
+                grown[:len(array)] = array
+            return grown
+
+        existing = self._capacity > 0
+        # Page-Hinkley
+        self.ph_count = grow(self.ph_count if existing else None, 0, np.int64)
+        self.ph_mean = grow(self.ph_mean if existing else None, 0.0)
+        self.ph_sum_up = grow(self.ph_sum_up if existing else None, 0.0)
+        self.ph_min_up = grow(self.ph_min_up if existing else None, 0.0)
+        self.ph_sum_down = grow(self.ph_sum_down if existing else None, 0.0)
+        self.ph_max_down = grow(self.ph_max_down if existing else None, 0.0)
+        # ADWIN ring buffers
+        self.adwin_values = grow(self.adwin_values if existing else None, 0.0, width=self.adwin_window)
+        self.adwin_head = grow(self.adwin_head if existing else None, 0, np.int64)
+        self.adwin_width = grow(self.adwin_width if existing else None, 0, np.int64)
+        self.adwin_seen = grow(self.adwin_seen if existing else None, 0, np.int64)
+        # Detections
+        self.drift_counts = grow(self.drift_counts if existing else None, 0, np.int64)
+        self._capacity = capacity
+
+    def _stream_indices(self, stream_ids: np.ndarray) -> np.ndarray:
+        """Map stream IDs to state indices, registering new streams"""
+        indices = self._id_index.get_indexer(stream_ids)
+        new = indices < 0
+        if new.any():
+            codes, uniques = pd.factorize(stream_ids[new])
+            start = self.n_streams
+            for i, stream_id in enumerate(uniques):
+                self._index[stream_id] = start + i
+            self.stream_ids.extend(uniques)
+            self._id_index = pd.Index(self.stream_ids)
+            indices[new] = start + codes
+
+            if self.n_streams > self._capacity:
+                self._allocate(max(self.n_streams, 2 * self._capacity))
+        return indices
+
+    def _reset_state(self, streams: np.ndarray) -> None:
+        """Reset the detection state of streams after drift"""
+        self.ph_count[streams] = 0
+        self.ph_mean[streams] = 0.0
+        self.ph_sum_up[streams] = 0.0
+        self.ph_min_up[streams] = 0.0
+        self.ph_sum_down[streams] = 0.0
+        self.ph_max_down[streams] = 0.0
+
+    def _update_page_hinkley(self, streams: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Update Page-Hinkley state with one value per stream; returns the drift mask"""
+        count = self.ph_count[streams] + 1
+        mean = self.ph_mean[streams] + (values - self.ph_mean[streams]) / count
+        deviation = values - mean
+
+        sum_up = self.ph_sum_up[streams] + deviation - self.ph_delta
+        min_up = np.minimum(self.ph_min_up[streams], sum_up)
+        sum_down = self.ph_sum_down[streams] + deviation + self.ph_delta
+        max_down = np.maximum(self.ph_max_down[streams], sum_down)
+
+        self.ph_count[streams] = count
+        self.ph_mean[streams] = mean
+        self.ph_sum_up[streams] = sum_up
+        self.ph_min_up[streams] = min_up
+        self.ph_sum_down[streams] = sum_down
+        self.ph_max_down[streams] = max_down
+
+        return (count >= self.ph_min_instances) & (
+            (sum_up - min_up > self.ph_threshold) | (max_down - sum_down > self.ph_threshold)
+        )
+
+    def _update_adwin(self, streams: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Add one value per stream to the ADWIN windows; returns the drift mask"""
+        w = self.adwin_window
+        head = self.adwin_head[streams]
+        self.adwin_values[streams, head] = values
+        self.adwin_head[streams] = (head + 1) % w
+        width = np.minimum(self.adwin_width[streams] + 1, w)
+        self.adwin_width[streams] = width
+        seen = self.adwin_seen[streams] + 1
+        self.adwin_seen[streams] = seen
+
+        drift = np.zeros(len(streams), dtype=bool)
+        check = (width >= 2 * self.adwin_min_window) & ((seen + streams) % self.adwin_clock == 0)
+        if not check.any():
+            return drift
+        rows, width = streams[check], width[check]
+
+        # Windows oldest to newest, right-aligned, with zeros before the first value
+        columns = np.arange(w)
+        ordered = self.adwin_values[rows[:, None], (self.adwin_head[rows, None] + columns) % w]
+        valid = columns >= (w - width)[:, None]
+        ordered = np.where(valid, ordered, 0.0)
+
+        prefix = np.cumsum(ordered, axis=1)[:, :-1]
+        total = prefix[:, -1] + ordered[:, -1]
+        variance = np.maximum(
+            (ordered ** 2).sum(axis=1) / width - (total / width) ** 2, 0.0
+        )
+
+        # Splits after each column: n0 older values, n1 newer values
+        n0 = columns[1:][None, :] - (w - width)[:, None]
+        n1 = width[:, None] - n0
+        usable = (n0 >= self.adwin_min_window) & (n1 >= self.adwin_min_window)
+        n0_safe, n1_safe = np.maximum(n0, 1), np.maximum(n1, 1)
+        mean_diff = np.abs(prefix / n0_safe - (total[:, None] - prefix) / n1_safe)
+
+        m = 1.0 / (1.0 / n0_safe + 1.0 / n1_safe)
+        log_term = np.log(2.0 * np.log(width) / self.adwin_delta)[:, None]
+        epsilon = np.sqrt(2.0 * variance[:, None] * log_term / m) + 2.0 * log_term / (3.0 * m)
+        cuts = usable & (mean_diff > epsilon)
+
+        detected = cuts.any(axis=1)
+        if detected.any():
+            # Keep the values after the newest significant split
+            last_cut = w - 2 - np.argmax(cuts[detected, ::-1], axis=1)
+            self.adwin_width[rows[detected]] = n1[detected, last_cut]
+            drift[np.flatnonzero(check)[detected]] = True
+        return drift
+
+    def update(self, stream_ids: Union[np.ndarray, List, pd.Series], values: Union[np.ndarray, List, pd.Series]) -> np.ndarray:
+        """
+        Add a batch of observations and check every stream for drift
+
+        Args:
+            stream_ids: Stream ID of each observation
+            values: Observed value of each observation
+
+        Returns:
+            Array of the IDs of streams where drift was detected
+        """
+        stream_ids = np.asarray(stream_ids)
+        values = np.asarray(values, dtype=np.float64)
+        if len(stream_ids) != len(values):
+            raise ValueError("stream_ids and values must have the same length")
+
+        keep = ~np.isnan(values)
+        stream_ids, values = stream_ids[keep], values[keep]
+        if not len(values):
+            return stream_ids[:0]
+
+        streams = self._stream_indices(stream_ids)
+        self.observations += len(values)
+
+        # Rank of each observation among those of its stream, in batch order
+        order = np.argsort(streams, kind='stable')
+        sorted_streams = streams[order]
+        starts = np.flatnonzero(np.r_[True, sorted_streams[1:] != sorted_streams[:-1]])
+        group_sizes = np.diff(np.r_[starts, len(order)])
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order)) - np.repeat(starts, group_sizes)
+
+        drifted = np.zeros(self._capacity, dtype=bool)
+        by_round = np.argsort(rank, kind='stable')
+        round_bounds = np.flatnonzero(np.diff(rank[by_round])) + 1
+        for positions in np.split(by_round, round_bounds):
+            round_streams, round_values = streams[positions], values[positions]
+            drift = np.zeros(len(positions), dtype=bool)
+            if 'page_hinkley' in self.methods:
+                drift |= self._update_page_hinkley(round_streams, round_values)
+            if 'adwin' in self.methods:
+                drift |= self._update_adwin(round_streams, round_values)
+            if drift.any():
+                self._reset_state(round_streams[drift])
+                self.drift_counts[round_streams[drift]] += 1
+                drifted[round_streams[drift]] = True
+
+        drifted_streams = np.flatnonzero(drifted)
+        if len(drifted_streams):
+            logger.info(f"Drift detected in {len(drifted_streams)} of {self.n_streams} streams")
+        return np.array([self.stream_ids[i] for i in drifted_streams], dtype=stream_ids.dtype)
+
+    def reset(self, stream_ids: Optional[List[Any]] = None) -> None:
+        """
+        Reset Page-Hinkley and ADWIN state
+
+        Args:
+            stream_ids: Streams to reset (all if None)
+        """
+        if stream_ids is None:
+            streams = np.arange(self.n_streams)
+        else:
+            streams = np.array([self._index[s] for s in stream_ids if s in self._index], dtype=np.int64)
+        self._reset_state(streams)
+        self.adwin_width[streams] = 0
+
+    def get_stream_status(self) -> pd.DataFrame:
+        """
+        Get the detection state of every stream
+
+        Returns:
+            DataFrame indexed by stream ID
+        """
+        n = self.n_streams
+        return pd.DataFrame({
+            'observations': self.ph_count[:n],
+            'mean': self.ph_mean[:n],
+            'ph_statistic': np.maximum(
+                self.ph_sum_up[:n] - self.ph_min_up[:n], self.ph_max_down[:n] - self.ph_sum_down[:n]
+            ),
+            'adwin_width': self.adwin_width[:n],
+            'drift_count': self.drift_counts[:n]
+        }, index=pd.Index(self.stream_ids, name='stream_id'))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get detector statistics
+
+        Returns:
+            Dictionary with stream, observation and drift counts
+        """
+        n = self.n_streams
+        return {
+            'streams': n,
+            'observations': self.observations,
+            'drift_events': int(self.drift_counts[:n].sum()),
+            'streams_with_drift': int((self.drift_counts[:n] > 0).sum()),
+            'memory_bytes': int(sum(
+                a.nbytes for a in (
+                    self.ph_count, self.ph_mean, self.ph_sum_up, self.ph_min_up, self.ph_sum_down,
+                    self.ph_max_down, self.adwin_values, self.adwin_head, self.adwin_width, self.drift_counts
+                )
+            ))
+        }
+
+
 # Example usage
 def main():
     """Example of using the online learning capabilities"""
@@ -22,6 +22,36 @@ from .base_forecaster import BaseForecaster
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def _default_seasonal_periods(frequency: str) -> int:
+    """Default number of periods in a seasonal cycle for a frequency"""
+    if frequency == 'H':
+        return 24  # Daily seasonality for hourly data
+    elif frequency == 'D':
+        return 7   # Weekly seasonality for daily data
+    elif frequency == 'M':
+        return 12  # Yearly seasonality for monthly data
+    return 1
+
+
+def _forecast_metrics(y_true: np.ndarray, y_pred: np.ndarray, metrics: List[str]) -> Dict[str, float]:
+    """Error metrics of aligned actual and forecast values"""
+    results = {}
+    for metric in metrics:
+        if metric.lower() == 'mse':
+            results['mse'] = np.mean((y_true - y_pred) ** 2)
+        elif metric.lower() == 'mae':
+            results['mae'] = np.mean(np.abs(y_true - y_pred))
+        elif metric.lower() == 'rmse':
+            results['rmse'] = np.sqrt(np.mean((y_true - y_pred) ** 2))
+        elif metric.lower() == 'mape':
+            results['mape'] = np.mean(np.abs((y_true - y_pred) / y_true)) * 100
+        elif metric.lower() == 'r2':
+            ss_tot = np.sum((y_true - np.mean(y_true)) ** 2)
+            ss_res = np.sum((y_true - y_pred) ** 2)
+            results['r2'] = 1 - (ss_res / ss_tot)
+    return results
+
+
 class ARIMAForecaster(BaseForecaster):
     """
     ARIMA/SARIMA forecasting model
@@ -147,6 +177,35 @@ class ARIMAForecaster(BaseForecaster):
         
         return self
     
+    def update(self, new_data: pd.DataFrame, **kwargs) -> 'ARIMAForecaster':
+        """
+        Extend the fitted model with new observations without re-estimating it
+        
+        The Kalman filter is run over the new observations only, starting
+        from the state at the end of the previous data, so forecasts continue
+        from the updated state and each update costs time proportional to its
+        own length. Afterwards, the model's residuals and information criteria
+        cover the latest observations only.
+        
+        Args:
+            new_data: New data points following the training data
+            **kwargs: Additional parameters
+                - exog: Exogenous variables for the new data
+                
+        Returns:
+            Self for method chaining
+        """
+        if not self.is_fitted:
+            raise ValueError("Model must be fitted before updating")
+        
+        self.model = self.model.extend(new_data[self.target_col], exog=kwargs.get('exog', None))
+        # Forecasts only need the last timestamp
+        self.training_data = pd.concat([self.training_data, new_data]).iloc[-1:]
+        
+        logger.info(f"Updated ARIMA state with {len(new_data)} new observations")
+        
+        return self
+    
     def predict(
         self, 
         start_date: Optional[pd.Timestamp] = None, 
@@ -194,11 +253,12 @@ class ARIMAForecaster(BaseForecaster):
         pred_mean = forecast.predicted_mean
         pred_ci = forecast.conf_int(alpha=0.05)
         
-        # Create forecast DataFrame
+        # Create forecast DataFrame (positionally: the model's own index may
+        # be a plain range when the training index has no frequency)
         forecast_df = pd.DataFrame({
-            'forecast': pred_mean,
-            'lower_bound': pred_ci.iloc[:, 0],
-            'upper_bound': pred_ci.iloc[:, 1]
+            'forecast': np.asarray(pred_mean),
+            'lower_bound': np.asarray(pred_ci.iloc[:, 0]),
+            'upper_bound': np.asarray(pred_ci.iloc[:, 1])
         }, index=forecast_dates)
         
         logger.info(f"Generated {n_periods} forecasts starting from {start_date}")
@@ -314,21 +374,17 @@ class ExponentialSmoothingForecaster(BaseForecaster):
         self.seasonal = seasonal
         
         # Set default seasonal periods based on frequency if not provided
-        if seasonal_periods is None:
-            if frequency == 'H':
-                self.seasonal_periods = 24  # Daily seasonality for hourly data
-            elif frequency == 'D':
-                self.seasonal_periods = 7   # Weekly seasonality for daily data
-            elif frequency == 'M':
-                self.seasonal_periods = 12  # Yearly seasonality for monthly data
-            else:
-                self.seasonal_periods = 1
-        else:
-            self.seasonal_periods = seasonal_periods
+        self.seasonal_periods = seasonal_periods or _default_seasonal_periods(frequency)
         
         self.model = None
         self.target_col = None
         self.training_data = None
+        self.use_boxcox = False
+        
+        # Smoothing state continued by update()
+        self._state = None
+        # Count, sum and sum of squares of the one-step errors seen by update()
+        self._update_residual_sums = np.zeros(3)
         
         logger.info(f"Initialized ExponentialSmoothingForecaster with trend={trend}, "
                     f"seasonal={seasonal}, seasonal_periods={self.seasonal_periods}")
@@ -347,6 +403,9 @@ class ExponentialSmoothingForecaster(BaseForecaster):
         """
         self.target_col = target_col
         self.training_data = data.copy()
+        self.use_boxcox = kwargs.get('use_boxcox', False)
+        self._state = None
+        self._update_residual_sums = np.zeros(3)
         
         # Extract target series
         y = data[target_col]
@@ -357,7 +416,7 @@ class ExponentialSmoothingForecaster(BaseForecaster):
             trend=self.trend,
             seasonal=self.seasonal,
             seasonal_periods=self.seasonal_periods,
-            use_boxcox=kwargs.get('use_boxcox', False),
+            use_boxcox=self.use_boxcox,
             initialization_method=kwargs.get('initialization_method', 'estimated')
         ).fit(
             smoothing_level=kwargs.get('smoothing_level', None),
@@ -372,6 +431,112 @@ class ExponentialSmoothingForecaster(BaseForecaster):
         
         return self
     
+    def _smoothing_parameters(self) -> Tuple[float, float, float, float]:
+        """Fitted (alpha, beta, gamma, phi) with unused components set to 0 (phi to 1)"""
+        params = self.model.params
+        
+        def value(name: str, default: float) -> float:
+            v = params.get(name)
+            return default if v is None or np.isnan(v) else float(v)
+        
+        phi = value('damping_trend', 1.0) if self.model.model.damped_trend else 1.0
+        return value('smoothing_level', 0.0), value('smoothing_trend', 0.0), value('smoothing_seasonal', 0.0), phi
+    
+    def _initial_state(self) -> Dict[str, Any]:
+        """Level, trend and last seasonal cycle at the end of the training data"""
+        state = {
+            'level': float(np.asarray(self.model.level)[-1]),
+            'trend': float(np.asarray(self.model.trend)[-1]) if self.trend else None,
+            'season': None
+        }
+        if self.seasonal:
+            state['season'] = np.asarray(self.model.season, dtype=np.float64)[-self.seasonal_periods:].copy()
+        return state
+    
+    def update(self, new_data: pd.DataFrame, **kwargs) -> 'ExponentialSmoothingForecaster':
+        """
+        Continue the smoothing recursions over new observations
+        
+        This is the state-space (innovations form) update of the fitted model:
+        level, trend and seasonal states are filtered through the new values
+        with the fitted smoothing parameters, without re-estimating them.
+        Only the last seasonal cycle is kept as training_data. Models fitted
+        with a Box-Cox transform are refitted on the full history instead.
+        
+        Args:
+            new_data: New data points following the training data
+            **kwargs: Additional parameters (used when refitting)
+            
+        Returns:
+            Self for method chaining
+        """
+        if not self.is_fitted:
+            raise ValueError("Model must be fitted before updating")
+        
+        if self.use_boxcox:
+            return self.fit(pd.concat([self.training_data, new_data]), self.target_col,
+                            use_boxcox=True, **kwargs)
+        
+        if self._state is None:
+            self._state = self._initial_state()
+        
+        alpha, beta, gamma, phi = self._smoothing_parameters()
+        level, trend, season = self._state['level'], self._state['trend'], self._state['season']
+        additive_trend, additive_season = self.trend == 'add', self.seasonal == 'add'
+        errors = []
+        
+        for y in new_data[self.target_col].values.astype(np.float64):
+            # Level and trend carried one step ahead
+            if trend is None:
+                base = level
+            elif additive_trend:
+                base = level + phi * trend
+            else:
+                base = level * trend ** phi
+            
+            s = season[0] if season is not None else (0.0 if additive_season else 1.0)
+            one_step = base + s if additive_season or season is None else base * s
+            errors.append(y - one_step)
+            
+            deseasonalized = (y - s if additive_season else y / s) if season is not None else y
+            new_level = alpha * deseasonalized + (1 - alpha) * base
+            if trend is not None:
+                if additive_trend:
+                    trend = beta * (new_level - level) + (1 - beta) * phi * trend
+                else:
+                    trend = beta * (new_level / level) + (1 - beta) * trend ** phi
+            if season is not None:
+                new_season = gamma * (y - base if additive_season else y / base) + (1 - gamma) * s
+                season = np.append(season[1:], new_season)
+            level = new_level
+        
+        self._state = {'level': level, 'trend': trend, 'season': season}
+        errors = np.asarray(errors)
+        self._update_residual_sums += [len(errors), errors.sum(), np.sum(errors ** 2)]
+        self.training_data = pd.concat([self.training_data, new_data]).iloc[-max(1, self.seasonal_periods):]
+        
+        logger.info(f"Updated Exponential Smoothing state with {len(new_data)} new observations")
+        
+        return self
+    
+    def _forecast_from_state(self, n_periods: int) -> np.ndarray:
+        """Forecasts from the state continued by update()"""
+        _, _, _, phi = self._smoothing_parameters()
+        steps = np.arange(1, n_periods + 1)
+        level, trend, season = self._state['level'], self._state['trend'], self._state['season']
+        
+        if trend is None:
+            forecast = np.full(n_periods, level)
+        else:
+            damped_steps = np.cumsum(phi ** steps) if phi != 1.0 else steps.astype(np.float64)
+            forecast = level + damped_steps * trend if self.trend == 'add' else level * trend ** damped_steps
+        
+        if season is not None:
+            cycle = season[(steps - 1) % self.seasonal_periods]
+            forecast = forecast + cycle if self.seasonal == 'add' else forecast * cycle
+        
+        return forecast
+    
     def predict(
         self, 
         start_date: Optional[pd.Timestamp] = None, 
@@ -404,8 +569,22 @@ class ExponentialSmoothingForecaster(BaseForecaster):
         
         forecast_dates = pd.date_range(start=start_date, periods=n_periods, freq=self.frequency)
         
+        if self._state is not None:
+            # Forecast from the state updated since fitting
+            forecast = self._forecast_from_state(n_periods)
+            residuals = np.asarray(self.model.resid)
+            count, total, squares = self._update_residual_sums + [len(residuals), residuals.sum(), np.sum(residuals ** 2)]
+            residuals_std = np.sqrt(max(squares / count - (total / count) ** 2, 0.0))
+            forecast_df = pd.DataFrame({
+                'forecast': forecast,
+                'lower_bound': forecast - 1.96 * residuals_std,
+                'upper_bound': forecast + 1.96 * residuals_std
+            }, index=forecast_dates)
+            logger.info(f"Generated {n_periods} forecasts starting from {start_date}")
+            return forecast_df
+        
         # Generate forecasts
-        forecast = self.model.forecast(steps=n_periods)
+        forecast = np.asarray(self.model.forecast(steps=n_periods))
         
         # Create forecast DataFrame with confidence intervals if available
         forecast_df = pd.DataFrame({'forecast': forecast}, index=forecast_dates)
@@ -414,8 +593,8 @@ class ExponentialSmoothingForecaster(BaseForecaster):
             # Try to get prediction intervals using the forecast method with confidence intervals
             pred_ci = self.model.get_prediction(start=len(self.training_data), 
                                                end=len(self.training_data) + n_periods - 1)
-            forecast_df['lower_bound'] = pred_ci.conf_int(alpha=0.05).iloc[:, 0]
-            forecast_df['upper_bound'] = pred_ci.conf_int(alpha=0.05).iloc[:, 1]
+            forecast_df['lower_bound'] = np.asarray(pred_ci.conf_int(alpha=0.05).iloc[:, 0])
+            forecast_df['upper_bound'] = np.asarray(pred_ci.conf_int(alpha=0.05).iloc[:, 1])
         except:
             # If confidence intervals are not available, estimate them
             residuals_std = np.std(self.model.resid)
@@ -495,4 +674,482 @@ class ExponentialSmoothingForecaster(BaseForecaster):
             
             plt.close()
         
-        return diagnostics 
\ No newline at end of file
+        return diagnostics 
+
+
+def _holt_winters_pass(
+    y: np.ndarray,
+    rows: np.ndarray,
+    params: np.ndarray,
+    level: np.ndarray,
+    trend: Optional[np.ndarray],
+    season: Optional[np.ndarray],
+    multiplicative_season: bool = False,
+    collect_residuals: bool = False
+) -> Dict[str, Any]:
+    """
+    Run Holt-Winters recursions for many (series, parameters) rows at once
+    
+    Args:
+        y: Observations, shape (time, series)
+        rows: Series index of each row
+        params: Smoothing parameters (alpha, beta, gamma) per row, shape (rows, 3)
+        level: Initial level per row
+        trend: Initial additive trend per row (None for no trend)
+        season: Initial seasonal states per row, shape (rows, periods)
+            (None for no seasonality)
+        multiplicative_season: Whether seasonality is multiplicative
+        collect_residuals: Whether to return the one-step residuals
+        
+    Returns:
+        Dictionary with the sum of squared one-step errors per row, the final
+        states (season rotated so column 0 is the next step) and optionally
+        residuals of shape (rows, time)
+    """
+    alpha, beta, gamma = params[:, 0], params[:, 1], params[:, 2]
+    level = level.copy()
+    trend = trend.copy() if trend is not None else None
+    season = season.copy() if season is not None else None
+    periods = season.shape[1] if season is not None else 1
+    sse = np.zeros(len(rows))
+    residuals = np.empty((len(rows), len(y))) if collect_residuals else None
+    
+    with np.errstate(all='ignore'):
+        for t in range(len(y)):
+            yt = y[t][rows]
+            base = level + trend if trend is not None else level
+            if season is None:
+                error = yt - base
+                new_level = alpha * yt + (1 - alpha) * base
+            else:
+                s = season[:, t % periods]
+                if multiplicative_season:
+                    error = yt - base * s
+                    new_level = alpha * (yt / s) + (1 - alpha) * base
+                    season[:, t % periods] = gamma * (yt / base) + (1 - gamma) * s
+                else:
+                    error = yt - base - s
+                    new_level = alpha * (yt - s) + (1 - alpha) * base
+                    season[:, t % periods] = gamma * (yt - base) + (1 - gamma) * s
+            if trend is not None:
+                trend = beta * (new_level - level) + (1 - beta) * trend
+            level = new_level
+            sse += error * error
+            if collect_residuals:
+                residuals[:, t] = error
+    
+    if season is not None:
+        season = np.roll(season, -(len(y) % periods), axis=1)
+    return {'sse': sse, 'level': level, 'trend': trend, 'season': season, 'residuals': residuals}
+
+
+class MultiSeriesExponentialSmoothingForecaster(BaseForecaster):
+    """
+    Holt-Winters Exponential Smoothing for many aligned series at once
+    
+    Smoothing parameters of all series are estimated together: the recursions
+    run over a time-by-series matrix for a grid of parameters and then for a
+    per-series pattern search, so each pass over the time axis scores every
+    series and candidate. Initial states use the classical heuristic over the
+    first two seasonal cycles. Series the batched search does not fit
+    (no convergence, non-finite errors, non-positive values with multiplicative
+    seasonality) fall back to an ExponentialSmoothingForecaster each, as do all
+    series with a multiplicative trend.
+    
+    Data is either long (a series_col column with the series ID, indexed by
+    time) or wide (one column per series). Forecasts are long, with the
+    series ID in series_col ('series' for wide data).
+    """
+    
+    # Coarse parameter grid searched before the pattern search
+    ALPHA_GRID = (0.05, 0.2, 0.4, 0.6, 0.8, 0.95)
+    BETA_GRID = (0.01, 0.1, 0.3)
+    GAMMA_GRID = (0.01, 0.1, 0.3)
+    
+    def __init__(
+        self,
+        name: str = "multi_series_exp_smoothing",
+        forecast_horizon: int = 24,
+        frequency: str = 'H',
+        trend: Optional[str] = None,
+        seasonal: Optional[str] = None,
+        seasonal_periods: Optional[int] = None,
+        series_col: Optional[str] = None,
+        max_iter: int = 50,
+        tol: float = 1e-3,
+        model_dir: str = 'app/ml/models/forecasting'
+    ):
+        """
+        Initialize multi-series Exponential Smoothing forecaster
+        
+        Args:
+            name: Name of the forecaster
+            forecast_horizon: Number of time steps to forecast
+            frequency: Time series frequency (e.g., 'H' for hourly, 'D' for daily)
+            trend: Type of trend ('add', 'mul', None)
+            seasonal: Type of seasonality ('add', 'mul', None)
+            seasonal_periods: Number of periods in a seasonal cycle
+            series_col: Column with the series ID in long data (None for wide data)
+            max_iter: Maximum pattern search iterations
+            tol: Parameter step size at which the pattern search has converged
+            model_dir: Directory to store models
+        """
+        super().__init__(name=name, forecast_horizon=forecast_horizon,
+                         frequency=frequency, model_dir=model_dir)
+        
+        self.trend = trend
+        self.seasonal = seasonal
+        self.seasonal_periods = seasonal_periods or _default_seasonal_periods(frequency)
+        self.series_col = series_col
+        self.max_iter = max_iter
+        self.tol = tol
+        
+        self.target_col = None
+        self.series_ids: List[Any] = []
+        self.last_timestamp = None
+        
+        # Batched fit: parameters, final states and residual std per series
+        self.batch_ids: List[Any] = []
+        self.params = None
+        self.states = None
+        self.residual_std = None
+        self.sse = None
+        
+        # Per-series statsmodels fits and series that could not be fitted
+        self.fallback_models: Dict[Any, ExponentialSmoothingForecaster] = {}
+        self.failed_series: Dict[Any, str] = {}
+        
+        logger.info(f"Initialized MultiSeriesExponentialSmoothingForecaster with trend={trend}, "
+                    f"seasonal={seasonal}, seasonal_periods={self.seasonal_periods}")
+    
+    def _to_wide(self, data: pd.DataFrame, target_col: str) -> pd.DataFrame:
+        """Time-by-series frame of the target"""
+        if self.series_col is not None:
+            data = data.pivot(columns=self.series_col, values=target_col)
+        if data.isnull().values.any():
+            raise ValueError("Series must be aligned and have no missing values")
+        return data.astype(np.float64)
+    
+    def _initial_states(self, y: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        Heuristic initial level, trend and seasonal states
+        
+        Args:
+            y: Observations, shape (time, series)
+        """
+        m = self.seasonal_periods if self.seasonal else 1
+        if self.seasonal:
+            first, second = y[:m].mean(axis=0), y[m:2 * m].mean(axis=0)
+            trend = (second - first) / m if self.trend else None
+        else:
+            first = y[0]
+            trend = y[1] - y[0] if self.trend else None
+        
+        # States at the step before the first observation
+        slope = trend if trend is not None else np.zeros(y.shape[1])
+        level = first - slope * ((m + 1) / 2 if self.seasonal else 1)
+        
+        season = None
+        if self.seasonal:
+            steps = np.arange(1, m + 1)[:, None]
+            cycle = level + slope * steps
+            season = (y[:m] / cycle if self.seasonal == 'mul' else y[:m] - cycle).T
+        return level, trend, season
+    
+    def _clip(self, params: np.ndarray) -> np.ndarray:
+        """Project parameters onto 0 < alpha < 1, 0 <= beta <= alpha, 0 <= gamma <= 1 - alpha"""
+        params[..., 0] = np.clip(params[..., 0], 1e-4, 1 - 1e-4)
+        params[..., 1] = np.clip(params[..., 1], 0, params[..., 0]) if self.trend else 0.0
+        params[..., 2] = np.clip(params[..., 2], 0, 1 - params[..., 0]) if self.seasonal else 0.0
+        return params
+    
+    def _sse(self, y: np.ndarray, init: Tuple, series: np.ndarray, params: np.ndarray) -> np.ndarray:
+        """Sum of squared one-step errors for candidate parameters, shape (series, candidates)"""
+        n, k = params.shape[:2]
+        rows = np.repeat(series, k)
+        level, trend, season = init
+        result = _holt_winters_pass(
+            y, rows, params.reshape(n * k, 3), level[rows],
+            trend[rows] if trend is not None else None,
+            season[rows] if season is not None else None,
+            self.seasonal == 'mul'
+        )
+        return np.where(np.isfinite(result['sse']), result['sse'], np.inf).reshape(n, k)
+    
+    def _batch_fit(self, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Estimate smoothing parameters of all series
+        
+        Args:
+            y: Observations, shape (time, series)
+            
+        Returns:
+            Parameters (series, 3), SSE per series and whether each converged
+        """
+        init = self._initial_states(y)
+        n = y.shape[1]
+        series = np.arange(n)
+        
+        # Coarse grid over the admissible region
+        grid = np.array([
+            (a, b, g)
+            for a in self.ALPHA_GRID
+            for b in (self.BETA_GRID if self.trend else (0.0,))
+            for g in (self.GAMMA_GRID if self.seasonal else (0.0,))
+            if b <= a and g <= 1 - a
+        ])
+        grid_sse = self._sse(y, init, series, np.broadcast_to(grid, (n,) + grid.shape).copy())
+        best = np.argmin(grid_sse, axis=1)
+        params = grid[best].copy()
+        sse = grid_sse[series, best]
+        
+        # Pattern search: move along one parameter at a time, halve the step when nothing improves
+        dims = [0] + ([1] if self.trend else []) + ([2] if self.seasonal else [])
+        step = np.full(n, 0.1)
+        for _ in range(self.max_iter):
+            active = np.flatnonzero((step >= self.tol) & np.isfinite(sse))
+            if not len(active):
+                break
+            candidates = np.repeat(params[active][:, None, :], 2 * len(dims), axis=1)
+            for j, d in enumerate(dims):
+                candidates[:, 2 * j, d] += step[active]
+                candidates[:, 2 * j + 1, d] -= step[active]
+            candidates = self._clip(candidates)
+            candidate_sse = self._sse(y, init, active, candidates)
+            
+            choice = np.argmin(candidate_sse, axis=1)
+            new_sse = candidate_sse[np.arange(len(active)), choice]
+            improved = new_sse < sse[active] * (1 - 1e-12)
+            moved = active[improved]
+            params[moved] = candidates[improved, choice[improved]]
+            sse[moved] = new_sse[improved]
+            step[active[~improved]] /= 2
+        
+        converged = (step < self.tol) & np.isfinite(sse)
+        return params, sse, converged
+    
+    def fit(self, data: pd.DataFrame, target_col: str, **kwargs) -> 'MultiSeriesExponentialSmoothingForecaster':
+        """
+        Fit Exponential Smoothing models to all series
+        
+        Args:
+            data: Training data, long (with series_col) or wide (one column per series)
+            target_col: Target column in long data
+            **kwargs: Additional parameters passed to per-series fallback fits
+            
+        Returns:
+            Self for method chaining
+        """
+        self.target_col = target_col
+        wide = self._to_wide(data, target_col)
+        self.series_ids = list(wide.columns)
+        self.last_timestamp = wide.index[-1]
+        self.fallback_models = {}
+        self.failed_series = {}
+        
+        y = wide.to_numpy()
+        min_length = 2 * self.seasonal_periods if self.seasonal else 2
+        batchable = np.full(y.shape[1], self.trend != 'mul' and len(y) >= min_length)
+        if self.seasonal == 'mul':
+            batchable &= (y > 0).all(axis=0)
+        
+        batch = np.flatnonzero(batchable)
+        self.batch_ids = []
+        if len(batch):
+            params, sse, converged = self._batch_fit(y[:, batch])
+            batch, params, sse = batch[converged], params[converged], sse[converged]
+            batchable[:] = False
+            batchable[batch] = True
+            
+            # Final pass for the states and residuals of the converged series
+            y_batch = y[:, batch]
+            level, trend, season = self._initial_states(y_batch)
+            result = _holt_winters_pass(
+                y_batch, np.arange(len(batch)), params, level, trend, season,
+                self.seasonal == 'mul', collect_residuals=True
+            )
+            self.batch_ids = [self.series_ids[i] for i in batch]
+            self.params = params
+            self.sse = sse
+            self.states = {'level': result['level'], 'trend': result['trend'], 'season': result['season']}
+            self.residual_std = result['residuals'].std(axis=1)
+        
+        # Per-series statsmodels fits for the rest
+        for i in np.flatnonzero(~batchable):
+            series_id = self.series_ids[i]
+            forecaster = ExponentialSmoothingForecaster(
+                name=f"{self.name}_{series_id}",
+                forecast_horizon=self.forecast_horizon,
+                frequency=self.frequency,
+                trend=self.trend,
+                seasonal=self.seasonal,
+                seasonal_periods=self.seasonal_periods,
+                model_dir=str(self.model_dir)
+            )
+            try:
+                self.fallback_models[series_id] = forecaster.fit(
+                    wide[[series_id]].rename(columns={series_id: target_col}), target_col, **kwargs
+                )
+            except Exception as e:
+                self.failed_series[series_id] = str(e)
+                logger.error(f"Error fitting Exponential Smoothing for series {series_id}: {str(e)}")
+        
+        self.is_fitted = True
+        logger.info(f"Fitted Exponential Smoothing for {len(self.series_ids)} series "
+                    f"({len(self.batch_ids)} batched, {len(self.fallback_models)} per-series, "
+                    f"{len(self.failed_series)} failed)")
+        
+        return self
+    
+    def _batch_forecast(self, n_periods: int) -> np.ndarray:
+        """Forecasts of the batched series, shape (series, n_periods)"""
+        steps = np.arange(1, n_periods + 1)
+        level, trend, season = self.states['level'], self.states['trend'], self.states['season']
+        forecast = level[:, None] + (trend[:, None] * steps if trend is not None else 0.0)
+        if season is not None:
+            cycle = season[:, (steps - 1) % self.seasonal_periods]
+            forecast = forecast * cycle if self.seasonal == 'mul' else forecast + cycle
+        return forecast
+    
+    def predict(
+        self, 
+        start_date: Optional[pd.Timestamp] = None, 
+        n_periods: Optional[int] = None,
+        exogenous_data: Optional[pd.DataFrame] = None,
+        **kwargs
+    ) -> pd.DataFrame:
+        """
+        Generate forecasts for all series
+        
+        Args:
+            start_date: Start date for forecasting
+            n_periods: Number of periods to forecast (defaults to forecast_horizon)
+            exogenous_data: Not used for Exponential Smoothing
+            **kwargs: Additional parameters
+            
+        Returns:
+            Long DataFrame with the series ID, forecast and bounds per
+            series and date (NaN for series that failed to fit)
+        """
+        if not self.is_fitted:
+            raise ValueError("Model must be fitted before prediction")
+        
+        # Determine forecast periods
+        if n_periods is None:
+            n_periods = self.forecast_horizon
+        
+        # Generate date range for the forecast
+        if start_date is None:
+            start_date = self.last_timestamp + pd.Timedelta(1, unit=self.frequency)
+        
+        forecast_dates = pd.date_range(start=start_date, periods=n_periods, freq=self.frequency)
+        
+        forecast = np.full((len(self.series_ids), n_periods), np.nan)
+        spread = np.full((len(self.series_ids), 1), np.nan)
+        position = {series_id: i for i, series_id in enumerate(self.series_ids)}
+        
+        if self.batch_ids:
+            rows = [position[series_id] for series_id in self.batch_ids]
+            forecast[rows] = self._batch_forecast(n_periods)
+            spread[rows, 0] = 1.96 * self.residual_std
+        
+        lower = forecast - spread
+        upper = forecast + spread
+        for series_id, model in self.fallback_models.items():
+            series_forecast = model.predict(start_date=start_date, n_periods=n_periods)
+            i = position[series_id]
+            forecast[i] = series_forecast['forecast'].values
+            lower[i] = series_forecast['lower_bound'].values
+            upper[i] = series_forecast['upper_bound'].values
+        
+        forecast_df = pd.DataFrame({
+            self.series_col or 'series': np.repeat(np.asarray(self.series_ids, dtype=object), n_periods),
+            'forecast': forecast.ravel(),
+            'lower_bound': lower.ravel(),
+            'upper_bound': upper.ravel()
+        }, index=np.tile(forecast_dates, len(self.series_ids)))
+        
+        logger.info(f"Generated {n_periods} forecasts for {len(self.series_ids)} series starting from {start_date}")
+        
+        return forecast_df
+    
+    def evaluate(
+        self,
+        test_data: pd.DataFrame,
+        target_col: str,
+        metrics: List[str] = ['mse', 'mae', 'rmse', 'mape']
+    ) -> Dict[str, Any]:
+        """
+        Evaluate forecasts of all series on test data
+        
+        Forecasts are aligned with the actual values by series and timestamp,
+        so test data can be long or wide like the training data and need not
+        cover every series or period.
+        
+        Args:
+            test_data: Test data, long (with series_col) or wide (one column per series)
+            target_col: Target column in long data
+            metrics: List of metrics to compute
+            
+        Returns:
+            Dictionary of metrics over all aligned values, with a DataFrame of
+            metrics per series under 'per_series' (NaN for series without
+            forecasts, e.g. ones that failed to fit)
+        """
+        if not self.is_fitted:
+            raise ValueError("Forecaster must be fitted before evaluation")
+        
+        series_col = self.series_col or 'series'
+        if self.series_col is None:
+            test_data = test_data.melt(ignore_index=False, var_name=series_col, value_name=target_col)
+        actual = test_data[[series_col, target_col]].rename_axis('timestamp').reset_index()
+        
+        # Forecast the whole span of the test data, then align by series and timestamp
+        start, end = actual['timestamp'].min(), actual['timestamp'].max()
+        n_periods = len(pd.date_range(start=start, end=end, freq=self.frequency))
+        forecast = self.predict(start_date=start, n_periods=n_periods)
+        forecast = forecast[[series_col, 'forecast']].rename_axis('timestamp').reset_index()
+        aligned = actual.merge(forecast, on=['timestamp', series_col], how='inner')
+        aligned = aligned.dropna(subset=[target_col, 'forecast'])
+        
+        results = _forecast_metrics(aligned[target_col].to_numpy(), aligned['forecast'].to_numpy(), metrics)
+        logger.info(f"Evaluation results for {self.name}: {results}")
+        
+        per_series = {
+            series_id: _forecast_metrics(group[target_col].to_numpy(), group['forecast'].to_numpy(), metrics)
+            for series_id, group in aligned.groupby(series_col, sort=False)
+        }
+        results['per_series'] = pd.DataFrame.from_dict(per_series, orient='index').reindex(
+            pd.unique(actual[series_col])
+        )
+        return results
+    
+    def get_diagnostics(self) -> Dict[str, Any]:
+        """
+        Get model diagnostics
+        
+        Returns:
+            Dictionary with per-series smoothing parameters of the batched fit
+            and the series that were fitted individually or failed
+        """
+        if not self.is_fitted:
+            raise ValueError("Model must be fitted before diagnostics")
+        
+        params = pd.DataFrame(
+            self.params if self.batch_ids else np.empty((0, 3)),
+            index=self.batch_ids,
+            columns=['smoothing_level', 'smoothing_trend', 'smoothing_seasonal']
+        )
+        if self.batch_ids:
+            params['sse'] = self.sse
+            params['residual_std'] = self.residual_std
+        
+        return {
+            'trend': self.trend,
+            'seasonal': self.seasonal,
+            'seasonal_periods': self.seasonal_periods,
+            'n_series': len(self.series_ids),
+            'params': params,
+            'fallback_series': list(self.fallback_models),
+            'failed_series': dict(self.failed_series)
+        }
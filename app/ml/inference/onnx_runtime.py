@@ -0,0 +1,169 @@
+"""
+ONNX Inference Runtime
+
+This module provides the export-and-serve path for the deep learning models:
+fitted Keras models are converted to ONNX once, and predictions then run
+through ONNX Runtime on the CPU. Serving workers need neither TensorFlow nor
+its import and first-call costs; the runtime only needs onnxruntime, with a
+configurable number of threads per session.
+"""
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Check ONNX Runtime availability
+ONNXRUNTIME_AVAILABLE = False
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    logger.info("ONNX Runtime is not available. Deep learning models will run through TensorFlow.")
+
+
+class OnnxRuntimeUnavailableError(Exception):
+    """Exception raised when ONNX Runtime is not available"""
+    pass
+
+
+def export_keras_to_onnx(
+    model,
+    output_path: Union[str, Path],
+    input_shape: Tuple[int, ...],
+    opset: int = 13
+) -> str:
+    """
+    Convert a Keras model to ONNX
+
+    Args:
+        model: Fitted Keras model
+        output_path: Path of the ONNX file to write
+        input_shape: Shape of one input sample (without the batch dimension)
+        opset: ONNX opset version
+
+    Returns:
+        Path to the ONNX file
+    """
+    try:
+        import tensorflow as tf
+        import tf2onnx
+    except ImportError:
+        logger.error("TensorFlow and tf2onnx are required to export models to ONNX")
+        raise
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Variable batch dimension so the runtime can batch inputs
+    signature = (tf.TensorSpec((None,) + tuple(input_shape), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=signature, opset=opset, output_path=str(output_path))
+
+    logger.info(f"Exported {model.name} to ONNX at {output_path}")
+    return str(output_path)
+
+
+class OnnxInferenceSession:
+    """
+    CPU ONNX Runtime session with batched execution
+
+    Inputs larger than max_batch_size are run in chunks so memory stays
+    bounded, and the session can be shared by the threads of a worker.
+    """
+
+    def __init__(
+        self,
+        model_path: Union[str, Path],
+        intra_op_threads: int = 1,
+        inter_op_threads: int = 1,
+        max_batch_size: int = 1024
+    ):
+        """
+        Load an ONNX model
+
+        Args:
+            model_path: Path to the ONNX file
+            intra_op_threads: Threads used within an operator (0 lets the runtime decide)
+            inter_op_threads: Threads used across operators
+            max_batch_size: Maximum samples per run
+        """
+        if not ONNXRUNTIME_AVAILABLE:
+            raise OnnxRuntimeUnavailableError("ONNX Runtime is not available. Install onnxruntime.")
+
+        self.model_path = str(model_path)
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.max_batch_size = max_batch_size
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.session = ort.InferenceSession(self.model_path, sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_names = [output.name for output in self.session.get_outputs()]
+
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.samples = 0
+
+        logger.info(f"Loaded ONNX model from {self.model_path} with {intra_op_threads} intra-op threads")
+
+    def run(self, inputs: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Run the model on a batch of samples
+
+        Args:
+            inputs: Samples stacked along the first axis
+
+        Returns:
+            Dictionary mapping output names to outputs for all samples
+        """
+        inputs = np.ascontiguousarray(inputs, dtype=np.float32)
+        chunks: List[List[np.ndarray]] = []
+        for start in range(0, max(len(inputs), 1), self.max_batch_size):
+            chunks.append(self.session.run(
+                self.output_names, {self.input_name: inputs[start:start + self.max_batch_size]}
+            ))
+
+        with self._lock:
+            self.calls += 1
+            self.samples += len(inputs)
+
+        return {
+            name: np.concatenate([chunk[i] for chunk in chunks]) if len(chunks) > 1 else chunks[0][i]
+            for i, name in enumerate(self.output_names)
+        }
+
+    def get_stats(self) -> Dict[str, Union[str, int]]:
+        """Get session statistics"""
+        with self._lock:
+            return {
+                'model_path': self.model_path,
+                'intra_op_threads': self.intra_op_threads,
+                'inter_op_threads': self.inter_op_threads,
+                'max_batch_size': self.max_batch_size,
+                'calls': self.calls,
+                'samples': self.samples
+            }
+
+    def __getstate__(self) -> Dict[str, Union[str, int]]:
+        """Pickle the configuration; the session is reloaded from model_path"""
+        return {
+            'model_path': self.model_path,
+            'intra_op_threads': self.intra_op_threads,
+            'inter_op_threads': self.inter_op_threads,
+            'max_batch_size': self.max_batch_size
+        }
+
+    def __setstate__(self, state: Dict[str, Union[str, int]]) -> None:
+        """Reload the session"""
+        self.__init__(**state)
@@ -369,7 +369,147 @@ class VehicleUsagePredictor:
             'next_usage_time': next_usage['next_usage_time'],
             'confidence': next_usage['confidence']
         }
-    
+
+    def predict_fleet(
+        self,
+        usage_history: pd.DataFrame,
+        vehicle_ids: List[str],
+        at_time: Optional[datetime] = None,
+        window_end: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        """
+        Predict next usage, and the trip that follows it, for many vehicles at once
+
+        The history is grouped once, and every model is called once with the
+        feature rows of all vehicles, instead of filtering the history and
+        calling the models per vehicle. The predictions match those of
+        predict_next_usage, predict_trip_duration, predict_trip_distance and
+        predict_vehicle_availability for each vehicle.
+
+        Args:
+            usage_history: DataFrame containing vehicle usage history
+            vehicle_ids: IDs of the vehicles to predict for
+            at_time: Current time (defaults to now)
+            window_end: End of an availability window starting at at_time
+                (if given, adds an 'is_available' column)
+
+        Returns:
+            DataFrame indexed by vehicle_id, in the order of vehicle_ids, with
+            the next usage time, hours until next usage, confidence, predicted
+            trip duration, end time and distance, and an 'error' column set
+            for vehicles that could not be predicted
+        """
+        if 'next_usage_time' not in self.models:
+            raise ValueError("Next usage time model not loaded")
+
+        if at_time is None:
+            at_time = datetime.now()
+        at_time = pd.Timestamp(at_time)
+
+        vehicle_ids = pd.Index(vehicle_ids, name='vehicle_id')
+        predicted = pd.DataFrame({
+            'next_usage_time': pd.Series(dtype='datetime64[ns]'),
+            'hours_until_next_usage': pd.Series(dtype=float),
+            'confidence': pd.Series(dtype=float),
+            'predicted_duration_minutes': pd.Series(dtype=float),
+            'predicted_end_time': pd.Series(dtype='datetime64[ns]'),
+            'predicted_distance': pd.Series(dtype=float)
+        })
+        errors = np.full(len(vehicle_ids), None, dtype=object)
+
+        # Last record of each vehicle, by end time, in one grouped pass
+        history = usage_history[usage_history['vehicle_id'].isin(vehicle_ids)]
+        for col in ['start_time', 'end_time']:
+            if col in history.columns and not pd.api.types.is_datetime64_dtype(history[col]):
+                history = history.assign(**{col: pd.to_datetime(history[col])})
+        last_records = (
+            history.sort_values('end_time', kind='stable')
+            .groupby('vehicle_id', sort=False)
+            .tail(1)
+            .set_index('vehicle_id')
+        )
+
+        has_history = vehicle_ids.isin(last_records.index)
+        errors[~has_history] = [
+            f"No usage history for vehicle {vehicle_id}" for vehicle_id in vehicle_ids[~has_history]
+        ]
+
+        # Next usage, from the last record ending at the current time
+        predicted_ids = vehicle_ids[has_history].unique()
+        current_records = last_records.loc[predicted_ids].reset_index()
+        current_records['end_time'] = at_time
+        features = self._prepare_features(current_records, 'next_usage_time') if len(predicted_ids) else None
+
+        if features is None or features.empty:
+            if features is not None:
+                errors[has_history] = "Failed to prepare features for prediction"
+            return self._fleet_results(predicted, errors, vehicle_ids, at_time, window_end)
+
+        hours = np.asarray(self.models['next_usage_time'].predict(features), dtype=float)
+        if hasattr(self.models['next_usage_time'], 'predict_proba'):
+            confidence = np.asarray(self.models['next_usage_time'].predict_proba(features))[:, 1]
+        else:
+            confidence = np.full(len(hours), 0.8)  # Default confidence
+        next_usage_times = at_time + pd.to_timedelta(hours, unit='h')
+
+        predicted = predicted.reindex(predicted_ids)
+        predicted['next_usage_time'] = next_usage_times
+        predicted['hours_until_next_usage'] = hours
+        predicted['confidence'] = confidence.astype(float)
+
+        # Trip duration and distance for trips starting at the next usage
+        trip_records = pd.DataFrame({
+            'vehicle_id': predicted_ids,
+            'start_time': next_usage_times,
+            'end_time': next_usage_times + pd.Timedelta(minutes=1)  # Placeholder
+        })
+        for target, column in [('trip_duration', 'predicted_duration_minutes'),
+                               ('trip_distance', 'predicted_distance')]:
+            if target not in self.models:
+                continue
+            trip_features = self._prepare_features(trip_records, target)
+            if not trip_features.empty:
+                predicted[column] = np.asarray(self.models[target].predict(trip_features), dtype=float)
+        predicted['predicted_end_time'] = (
+            predicted['next_usage_time'] + pd.to_timedelta(predicted['predicted_duration_minutes'], unit='m')
+        )
+
+        return self._fleet_results(predicted, errors, vehicle_ids, at_time, window_end)
+
+    def _fleet_results(
+        self,
+        predicted: pd.DataFrame,
+        errors: np.ndarray,
+        vehicle_ids: pd.Index,
+        at_time: pd.Timestamp,
+        window_end: Optional[datetime]
+    ) -> pd.DataFrame:
+        """
+        Arrange fleet predictions in the order of the requested vehicles
+
+        Args:
+            predicted: Predictions indexed by unique vehicle ID
+            errors: Error messages per requested vehicle (None if predicted)
+            vehicle_ids: Requested vehicle IDs
+            at_time: Current time
+            window_end: End of the availability window (or None)
+
+        Returns:
+            DataFrame of predictions indexed by vehicle_id
+        """
+        results = predicted.reindex(vehicle_ids)
+        results['error'] = errors
+
+        if window_end is not None:
+            # Default to 1 hour trips where the duration could not be predicted
+            duration = results['predicted_duration_minutes'].fillna(60)
+            trip_end = results['next_usage_time'] + pd.to_timedelta(duration, unit='m')
+            results['is_available'] = results['error'].isna() & (
+                (results['next_usage_time'] >= pd.Timestamp(window_end)) | (trip_end <= at_time)
+            )
+
+        return results
+
     def _prepare_features(
         self, 
         data: pd.DataFrame, 
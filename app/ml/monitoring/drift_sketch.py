@@ -0,0 +1,382 @@
+"""
+Sketch-Based Drift Detection
+
+This module implements the incremental drift engine behind ModelMonitor. Each
+numeric feature gets a fixed-bin histogram sketch whose edges are the baseline
+quantiles; the baseline and the current window are both sketches over the same
+edges, so PSI, the Kolmogorov-Smirnov statistic and the Wasserstein-1 distance
+are computed from a few dozen bin counts instead of the raw values.
+
+The current window is a ring of block sketches (window / n_blocks predictions
+each): recording a prediction updates one block, and the window is the sum of
+the blocks. Sketches over the same edges merge by adding counts, which is what
+lets a registry combine drift statistics from several worker processes.
+"""
+import logging
+from collections import deque
+from typing import Dict, List, Optional, Any
+
+import numpy as np
+from scipy.special import kolmogorov
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Smoothing added to bin fractions in PSI so empty bins stay finite
+PSI_EPSILON = 1e-4
+
+# Baseline values per bin below which fewer bins are used
+MIN_VALUES_PER_BIN = 20
+
+
+def make_edges(values: np.ndarray, bins: int = 32) -> np.ndarray:
+    """
+    Histogram edges at the quantiles of baseline values
+
+    Args:
+        values: Baseline values
+        bins: Number of bins between the smallest and largest value
+
+    Returns:
+        Increasing array of unique edges
+    """
+    return np.unique(np.quantile(np.asarray(values, dtype=np.float64), np.linspace(0, 1, bins + 1)))
+
+
+class HistogramSketch:
+    """
+    Mergeable fixed-bin histogram with running moments
+
+    counts[0] holds values below the first edge and counts[-1] values at or
+    above the last edge.
+    """
+
+    def __init__(self, edges: np.ndarray):
+        """
+        Initialize an empty sketch
+
+        Args:
+            edges: Increasing bin edges
+        """
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, value: float) -> None:
+        """Add one value"""
+        self.counts[np.searchsorted(self.edges, value, side='right')] += 1
+        self.count += 1
+        self.total += value
+        self.total_sq += value * value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def update_many(self, values: np.ndarray) -> None:
+        """Add an array of values"""
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        self.counts += np.bincount(
+            np.searchsorted(self.edges, values, side='right'), minlength=len(self.counts)
+        )
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.total_sq += float((values * values).sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other: 'HistogramSketch') -> 'HistogramSketch':
+        """
+        Add another sketch over the same edges into this one
+
+        Args:
+            other: Sketch to merge
+
+        Returns:
+            This sketch
+        """
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Cannot merge histogram sketches with different edges")
+        self.counts += other.counts
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def mean(self) -> float:
+        """Mean of the added values"""
+        return self.total / self.count if self.count else np.nan
+
+    def std(self) -> float:
+        """Population standard deviation of the added values"""
+        if not self.count:
+            return np.nan
+        return float(np.sqrt(max(self.total_sq / self.count - self.mean() ** 2, 0.0)))
+
+    def _points(self) -> np.ndarray:
+        """Edges with the observed extremes as the outer bounds of the tail bins"""
+        low = min(self.min, self.edges[0]) if self.count else self.edges[0]
+        high = max(self.max, self.edges[-1]) if self.count else self.edges[-1]
+        return np.concatenate([[low], self.edges, [high]])
+
+    def cdf(self) -> np.ndarray:
+        """Fraction of values below each edge"""
+        if not self.count:
+            return np.zeros(len(self.edges))
+        return np.cumsum(self.counts)[:-1] / self.count
+
+    def quantile(self, q: float) -> float:
+        """
+        Approximate quantile, interpolating linearly within bins
+
+        Args:
+            q: Quantile in [0, 1]
+        """
+        if not self.count:
+            return np.nan
+        cumulative = np.concatenate([[0], np.cumsum(self.counts)]) / self.count
+        return float(np.interp(q, cumulative, self._points()))
+
+    def get_state(self) -> Dict[str, Any]:
+        """Get the sketch state as plain lists (JSON serializable)"""
+        return {
+            'edges': self.edges.tolist(),
+            'counts': self.counts.tolist(),
+            'count': self.count,
+            'total': self.total,
+            'total_sq': self.total_sq,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'HistogramSketch':
+        """Restore a sketch from get_state"""
+        sketch = cls(state['edges'])
+        sketch.counts = np.asarray(state['counts'], dtype=np.int64)
+        sketch.count = int(state['count'])
+        sketch.total = float(state['total'])
+        sketch.total_sq = float(state['total_sq'])
+        sketch.min = state['min'] if state.get('min') is not None else np.inf
+        sketch.max = state['max'] if state.get('max') is not None else -np.inf
+        return sketch
+
+
+def compare_sketches(baseline: HistogramSketch, current: HistogramSketch) -> Dict[str, float]:
+    """
+    Distribution distances between two sketches over the same edges
+
+    Args:
+        baseline: Baseline sketch
+        current: Current window sketch
+
+    Returns:
+        Dictionary with psi, ks_statistic, ks_pvalue and wasserstein
+    """
+    p = baseline.counts / baseline.count
+    q = current.counts / current.count
+    psi = float(np.sum((q - p) * np.log((q + PSI_EPSILON) / (p + PSI_EPSILON))))
+
+    cdf_diff = np.abs(baseline.cdf() - current.cdf())
+    ks = float(cdf_diff.max()) if len(cdf_diff) else 0.0
+    effective_n = baseline.count * current.count / (baseline.count + current.count)
+    ks_pvalue = float(kolmogorov(ks * np.sqrt(effective_n)))
+
+    # Area between the piecewise-linear CDFs, tails bounded by the observed extremes
+    points = np.concatenate([
+        [min(baseline._points()[0], current._points()[0])],
+        baseline.edges,
+        [max(baseline._points()[-1], current._points()[-1])]
+    ])
+    diffs = np.concatenate([[0.0], cdf_diff, [0.0]])
+    wasserstein = float(np.sum((diffs[1:] + diffs[:-1]) / 2 * np.diff(points)))
+
+    return {'psi': psi, 'ks_statistic': ks, 'ks_pvalue': ks_pvalue, 'wasserstein': wasserstein}
+
+
+class DriftEngine:
+    """
+    Baseline and sliding-window sketches for a set of numeric features
+    """
+
+    def __init__(self, window: int = 1000, n_blocks: int = 10, bins: int = 32):
+        """
+        Initialize the engine
+
+        Args:
+            window: Number of recent predictions in the current window
+            n_blocks: Number of block sketches the window is made of
+            bins: Maximum number of baseline quantile bins per feature
+        """
+        self.window = window
+        self.n_blocks = n_blocks
+        self.block_size = max(1, window // n_blocks)
+        self.bins = bins
+        self.baseline: Dict[str, HistogramSketch] = {}
+        self.blocks: deque = deque(maxlen=n_blocks)
+        self._block_count = 0
+
+    @property
+    def features(self) -> List[str]:
+        """Names of the features with a baseline"""
+        return list(self.baseline)
+
+    def _new_block(self) -> Dict[str, HistogramSketch]:
+        """Empty sketches for the next block"""
+        block = {name: HistogramSketch(sketch.edges) for name, sketch in self.baseline.items()}
+        self.blocks.append(block)
+        self._block_count = 0
+        return block
+
+    def set_baseline(self, feature_values: Dict[str, np.ndarray]) -> None:
+        """
+        Build baseline sketches and reset the current window
+
+        Args:
+            feature_values: Baseline values per feature
+        """
+        self.baseline = {}
+        for name, values in feature_values.items():
+            # Keep enough baseline values per bin for stable PSI
+            bins = min(self.bins, max(2, len(values) // MIN_VALUES_PER_BIN))
+            sketch = HistogramSketch(make_edges(values, bins))
+            sketch.update_many(values)
+            self.baseline[name] = sketch
+        self.reset_window()
+
+    def set_baseline_sketches(self, sketches: Dict[str, HistogramSketch]) -> None:
+        """
+        Use existing baseline sketches and reset the current window
+
+        Args:
+            sketches: Baseline sketch per feature
+        """
+        self.baseline = dict(sketches)
+        self.reset_window()
+
+    def reset_window(self) -> None:
+        """Empty the current window"""
+        self.blocks.clear()
+        if self.baseline:
+            self._new_block()
+
+    def update(self, features: Dict[str, Any]) -> None:
+        """
+        Add one prediction's features to the current window
+
+        Args:
+            features: Feature values of the prediction (others than baseline
+                features and non-numeric or missing values are ignored)
+        """
+        if not self.baseline:
+            return
+        block = self.blocks[-1] if self._block_count < self.block_size else self._new_block()
+        for name, sketch in block.items():
+            value = features.get(name)
+            if isinstance(value, (int, float, np.number)) and value == value:
+                sketch.update(float(value))
+        self._block_count += 1
+
+    def update_many(self, feature_values: Dict[str, np.ndarray], rows: int) -> None:
+        """
+        Add a run of predictions to the current window, block by block
+
+        Args:
+            feature_values: Values per feature over the run, NaN where missing
+            rows: Number of predictions in the run
+        """
+        if not self.baseline:
+            return
+        start = 0
+        while start < rows:
+            block = self.blocks[-1] if self._block_count < self.block_size else self._new_block()
+            take = min(self.block_size - self._block_count, rows - start)
+            for name, sketch in block.items():
+                values = feature_values.get(name)
+                if values is not None:
+                    values = values[start:start + take]
+                    sketch.update_many(values[~np.isnan(values)])
+            self._block_count += take
+            start += take
+
+    def merge_block(self, sketches: Dict[str, HistogramSketch], rows: int) -> None:
+        """
+        Add sketches of a run of predictions recorded elsewhere to the window
+
+        The run goes into a single block, so runs longer than a block make the
+        window slide in coarser steps.
+
+        Args:
+            sketches: Sketches over the baseline edges per feature
+            rows: Number of predictions in the run
+        """
+        if not self.baseline or rows <= 0:
+            return
+        block = self.blocks[-1] if self._block_count < self.block_size else self._new_block()
+        for name, sketch in sketches.items():
+            if name in block:
+                block[name].merge(sketch)
+        self._block_count += rows
+
+    def current(self, name: str) -> Optional[HistogramSketch]:
+        """
+        Sketch of a feature over the current window
+
+        Args:
+            name: Feature name
+
+        Returns:
+            Merged block sketches, or None if the feature has no baseline
+        """
+        if name not in self.baseline:
+            return None
+        sketch = HistogramSketch(self.baseline[name].edges)
+        for block in self.blocks:
+            if name in block:
+                sketch.merge(block[name])
+        return sketch
+
+    def compare(self, name: str, min_count: int = 30) -> Optional[Dict[str, Any]]:
+        """
+        Drift of a feature between the baseline and the current window
+
+        Args:
+            name: Feature name
+            min_count: Values needed in the current window
+
+        Returns:
+            Dictionary with the distances and both sketches, or None if there
+            is not enough data
+        """
+        current = self.current(name)
+        if current is None or current.count < min_count:
+            return None
+        return dict(compare_sketches(self.baseline[name], current), current=current)
+
+    def get_state(self) -> Dict[str, Any]:
+        """Get the engine state (JSON serializable)"""
+        return {
+            'window': self.window,
+            'n_blocks': self.n_blocks,
+            'bins': self.bins,
+            'baseline': {name: sketch.get_state() for name, sketch in self.baseline.items()},
+            'blocks': [{name: sketch.get_state() for name, sketch in block.items()} for block in self.blocks],
+            'block_count': self._block_count
+        }
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        """Restore a state returned by get_state"""
+        self.__init__(state.get('window', self.window), state.get('n_blocks', self.n_blocks), state.get('bins', self.bins))
+        self.baseline = {name: HistogramSketch.from_state(s) for name, s in state.get('baseline', {}).items()}
+        for block in state.get('blocks', []):
+            self.blocks.append({name: HistogramSketch.from_state(s) for name, s in block.items()})
+        self._block_count = state.get('block_count', 0)
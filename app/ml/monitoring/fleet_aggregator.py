@@ -0,0 +1,713 @@
+"""
+Fleet-Wide Model Monitoring Aggregation
+
+This module lets several API worker processes share one view of model
+monitoring. Each worker's ModelMonitorRegistry publishes compact metric deltas
+(prediction and actual counts, error sums and drift sketch counts) to a local
+MonitorAggregator over a Unix domain socket, and the aggregator merges them
+into fleet-wide performance metrics and drift statistics.
+
+Drift sketches are only mergeable over the same bin edges, so the first
+baseline published for a model becomes the fleet baseline and the aggregator
+returns its edges to every publisher; workers then sketch their recent
+feature values over those edges. Messages are framed like the telemetry
+write-ahead log
+
+    [payload length: uint32][crc32 of payload: uint32][payload: JSON]
+
+The aggregator can run in the gunicorn master (e.g. from an on_starting hook)
+or standalone with `python -m app.ml.monitoring.fleet_aggregator`.
+"""
+import os
+import sys
+import json
+import zlib
+import socket
+import logging
+import argparse
+import threading
+import socketserver
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+import numpy as np
+
+# Ensure app is in the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent))
+
+from app.ml.data_pipeline.telemetry_wal import FRAME_HEADER
+from app.ml.monitoring.drift_sketch import DriftEngine, HistogramSketch
+from app.ml.monitoring.prediction_log import is_tracked_value
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = '/tmp/giu-model-monitor.sock'
+
+
+def send_message(sock: socket.socket, message: Dict[str, Any]) -> None:
+    """
+    Send a framed JSON message
+
+    Args:
+        sock: Connected socket
+        message: JSON-serializable message
+    """
+    payload = json.dumps(message).encode('utf-8')
+    sock.sendall(FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    """Read exactly size bytes, or None if the connection closed first"""
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock: socket.socket) -> Optional[Dict[str, Any]]:
+    """
+    Receive a framed JSON message
+
+    Args:
+        sock: Connected socket
+
+    Returns:
+        The message, or None if the connection closed
+    """
+    header = _recv_exact(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    length, checksum = FRAME_HEADER.unpack(header)
+    payload = _recv_exact(sock, length)
+    if payload is None:
+        return None
+    if zlib.crc32(payload) != checksum:
+        raise ValueError("Corrupt monitoring aggregation frame")
+    return json.loads(payload)
+
+
+class ErrorSums:
+    """
+    Mergeable sums of prediction errors
+
+    Numeric prediction/actual pairs contribute to the regression sums; other
+    pairs (class labels) only to the accuracy counts.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.correct = 0
+        self.numeric = 0
+        self.sum_abs = 0.0
+        self.sum_sq = 0.0
+        self.sum_true = 0.0
+        self.sum_true_sq = 0.0
+        self.sum_ape = 0.0
+        self.nonzero = 0
+
+    def add(self, prediction: Any, actual: Any) -> None:
+        """Add one prediction/actual pair"""
+        self.count += 1
+        self.correct += int(prediction == actual)
+        if is_tracked_value(prediction) and is_tracked_value(actual):
+            error = float(actual) - float(prediction)
+            self.numeric += 1
+            self.sum_abs += abs(error)
+            self.sum_sq += error * error
+            self.sum_true += float(actual)
+            self.sum_true_sq += float(actual) * float(actual)
+            if actual != 0:
+                self.sum_ape += abs(error / float(actual))
+                self.nonzero += 1
+
+    def merge(self, other: 'ErrorSums') -> 'ErrorSums':
+        """Add another set of sums into this one"""
+        for name, value in vars(other).items():
+            setattr(self, name, getattr(self, name) + value)
+        return self
+
+    def metrics(self) -> Dict[str, Optional[float]]:
+        """
+        Performance metrics over all added pairs
+
+        Returns:
+            Dictionary with rmse, mae, r2 and mape for numeric pairs and
+            accuracy over all pairs
+        """
+        result: Dict[str, Optional[float]] = {}
+        if self.numeric:
+            n = self.numeric
+            result['rmse'] = float(np.sqrt(self.sum_sq / n))
+            result['mae'] = self.sum_abs / n
+            total_ss = self.sum_true_sq - self.sum_true ** 2 / n
+            result['r2'] = float(1 - self.sum_sq / total_ss) if total_ss > 0 else None
+            result['mape'] = self.sum_ape / self.nonzero * 100 if self.nonzero else None
+        if self.count:
+            result['accuracy'] = self.correct / self.count
+        return result
+
+    def get_state(self) -> Dict[str, Any]:
+        """Get the sums (JSON serializable)"""
+        return dict(vars(self))
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'ErrorSums':
+        """Restore sums from get_state"""
+        sums = cls()
+        for name, value in state.items():
+            setattr(sums, name, value)
+        return sums
+
+
+class ModelDelta:
+    """
+    Metrics of one model recorded by a worker since its last publish
+    """
+
+    def __init__(self, model_type: str):
+        """
+        Initialize an empty delta
+
+        Args:
+            model_type: Type of the model
+        """
+        self.model_type = model_type
+        self.predictions = 0
+        self.actuals = 0
+        self.errors = ErrorSums()
+        self.sketches: Dict[str, HistogramSketch] = {}
+        self.window_rows = 0
+
+    def merge(self, other: 'ModelDelta') -> None:
+        """Add a delta that could not be published back into this one"""
+        self.predictions += other.predictions
+        self.actuals += other.actuals
+        self.errors.merge(other.errors)
+        for name, sketch in other.sketches.items():
+            if name in self.sketches and np.array_equal(self.sketches[name].edges, sketch.edges):
+                self.sketches[name].merge(sketch)
+            else:
+                self.sketches[name] = sketch
+        self.window_rows += other.window_rows
+
+    def to_message(self) -> Dict[str, Any]:
+        """Get the delta as a message fragment"""
+        return {
+            'model_type': self.model_type,
+            'predictions': self.predictions,
+            'actuals': self.actuals,
+            'errors': self.errors.get_state(),
+            'sketches': {name: sketch.get_state() for name, sketch in self.sketches.items()},
+            'window_rows': self.window_rows
+        }
+
+
+class MetricPublisher:
+    """
+    Worker-side client publishing metric deltas to a MonitorAggregator
+
+    Recording only updates in-memory deltas; a background thread publishes
+    them every publish_interval seconds. Deltas that cannot be delivered are
+    kept and sent with the next publish.
+    """
+
+    def __init__(
+        self,
+        socket_path: str = DEFAULT_SOCKET_PATH,
+        worker_id: Optional[str] = None,
+        publish_interval: float = 1.0,
+        timeout: float = 2.0
+    ):
+        """
+        Initialize the publisher
+
+        Args:
+            socket_path: Path of the aggregator's Unix socket
+            worker_id: Name of this worker (defaults to host and PID)
+            publish_interval: Seconds between publishes
+            timeout: Socket timeout in seconds
+        """
+        self.socket_path = socket_path
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.publish_interval = publish_interval
+        self.timeout = timeout
+
+        self._pending: Dict[str, ModelDelta] = {}
+        self._baselines: Dict[str, Dict[str, HistogramSketch]] = {}
+        self.edges: Dict[str, Dict[str, np.ndarray]] = {}  # Fleet baseline edges per model
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Statistics
+        self.publishes = 0
+        self.failed_publishes = 0
+
+    def _delta(self, model_id: str, model_type: str) -> ModelDelta:
+        """Pending delta of a model (caller holds the lock)"""
+        delta = self._pending.get(model_id)
+        if delta is None:
+            delta = ModelDelta(model_type)
+            self._pending[model_id] = delta
+        return delta
+
+    def record_prediction(
+        self,
+        model_id: str,
+        model_type: str,
+        prediction: Any,
+        features: Dict[str, Any],
+        actual: Any = None,
+        baseline: Optional[Dict[str, HistogramSketch]] = None
+    ) -> None:
+        """
+        Record a prediction
+
+        Args:
+            model_id: ID of the model
+            model_type: Type of the model
+            prediction: The model's prediction
+            features: Features used for the prediction
+            actual: The actual value (if available)
+            baseline: The worker's baseline sketches, offered as fleet baseline
+                until the aggregator has one
+        """
+        with self._lock:
+            delta = self._delta(model_id, model_type)
+            delta.predictions += 1
+            if actual is not None:
+                delta.actuals += 1
+                delta.errors.add(prediction, actual)
+
+            edges = self.edges.get(model_id)
+            if edges is None:
+                if baseline:
+                    self._baselines[model_id] = baseline
+                return
+            for name, feature_edges in edges.items():
+                value = features.get(name)
+                if is_tracked_value(value):
+                    sketch = delta.sketches.get(name)
+                    if sketch is None:
+                        sketch = HistogramSketch(feature_edges)
+                        delta.sketches[name] = sketch
+                    sketch.update(float(value))
+            delta.window_rows += 1
+
+    def record_actual(self, model_id: str, model_type: str, prediction: Any, actual: Any) -> None:
+        """
+        Record the actual value of an earlier prediction
+
+        Args:
+            model_id: ID of the model
+            model_type: Type of the model
+            prediction: The prediction the actual belongs to
+            actual: The actual value
+        """
+        with self._lock:
+            delta = self._delta(model_id, model_type)
+            delta.actuals += 1
+            delta.errors.add(prediction, actual)
+
+    def _request(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a message and wait for the reply, reconnecting once if needed"""
+        with self._send_lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                        sock.settimeout(self.timeout)
+                        sock.connect(self.socket_path)
+                        self._sock = sock
+                    send_message(self._sock, message)
+                    reply = recv_message(self._sock)
+                    if reply is None:
+                        raise ConnectionError("Aggregator closed the connection")
+                    return reply
+                except (OSError, ValueError):
+                    if self._sock is not None:
+                        self._sock.close()
+                        self._sock = None
+                    if attempt:
+                        raise
+
+    def publish(self) -> bool:
+        """
+        Send the pending deltas to the aggregator
+
+        Returns:
+            True if the aggregator received them
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            baselines = {
+                model_id: sketches for model_id, sketches in self._baselines.items()
+                if model_id not in self.edges
+            }
+        if not pending and not baselines:
+            return True
+
+        message = {
+            'op': 'publish',
+            'worker_id': self.worker_id,
+            'models': {model_id: delta.to_message() for model_id, delta in pending.items()},
+            'baselines': {
+                model_id: {name: sketch.get_state() for name, sketch in sketches.items()}
+                for model_id, sketches in baselines.items()
+            }
+        }
+        try:
+            reply = self._request(message)
+        except (OSError, ValueError) as e:
+            self.failed_publishes += 1
+            if self.failed_publishes == 1 or self.failed_publishes % 100 == 0:
+                logger.warning(f"Could not publish monitoring metrics to {self.socket_path}: {str(e)}")
+            with self._lock:
+                for model_id, delta in pending.items():
+                    if model_id in self._pending:
+                        delta.merge(self._pending[model_id])
+                    self._pending[model_id] = delta
+            return False
+
+        with self._lock:
+            for model_id, edges in reply.get('edges', {}).items():
+                self.edges[model_id] = {name: np.asarray(e, dtype=np.float64) for name, e in edges.items()}
+                self._baselines.pop(model_id, None)
+        self.publishes += 1
+        return True
+
+    def fleet_status(self) -> Optional[Dict[str, Any]]:
+        """
+        Publish pending deltas and get the fleet-wide status
+
+        Returns:
+            Aggregated status per model, or None if the aggregator is unreachable
+        """
+        self.publish()
+        try:
+            return self._request({'op': 'status'})
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not get fleet monitoring status: {str(e)}")
+            return None
+
+    def _run(self) -> None:
+        """Publish loop"""
+        while not self._stop.wait(self.publish_interval):
+            self.publish()
+
+    def start(self) -> None:
+        """Start publishing in the background"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='model-monitor-publisher', daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        """Stop the background thread and publish what is pending"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.publish()
+        with self._send_lock:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get publisher statistics
+
+        Returns:
+            Dictionary with publish counts and pending models
+        """
+        return {
+            'worker_id': self.worker_id,
+            'publishes': self.publishes,
+            'failed_publishes': self.failed_publishes,
+            'pending_models': len(self._pending),
+            'fleet_baselines': len(self.edges)
+        }
+
+
+class _FleetModel:
+    """Merged metrics of one model across workers"""
+
+    def __init__(self, model_type: str, window: int, n_blocks: int):
+        self.model_type = model_type
+        self.predictions = 0
+        self.actuals = 0
+        self.errors = ErrorSums()
+        self.drift_engine = DriftEngine(window=window, n_blocks=n_blocks)
+        self.workers: Dict[str, str] = {}  # worker_id -> last publish time
+
+
+class MonitorAggregator:
+    """
+    Local aggregator merging metric deltas from worker processes
+
+    Performance metrics cover every pair published since the aggregator
+    started; drift compares the fleet baseline with the most recent `window`
+    predictions across workers.
+    """
+
+    def __init__(
+        self,
+        socket_path: str = DEFAULT_SOCKET_PATH,
+        window: int = 1000,
+        n_blocks: int = 10,
+        acceptable_drift_threshold: float = 0.1
+    ):
+        """
+        Initialize the aggregator
+
+        Args:
+            socket_path: Path of the Unix socket to listen on
+            window: Number of recent fleet predictions compared for drift
+            n_blocks: Number of blocks the drift window slides by
+            acceptable_drift_threshold: Threshold for acceptable drift
+        """
+        self.socket_path = socket_path
+        self.window = window
+        self.n_blocks = n_blocks
+        self.acceptable_drift_threshold = acceptable_drift_threshold
+        self.models: Dict[str, _FleetModel] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+        # Statistics
+        self.messages_handled = 0
+
+    def _model(self, model_id: str, model_type: str) -> _FleetModel:
+        """Fleet state of a model (caller holds the lock)"""
+        model = self.models.get(model_id)
+        if model is None:
+            model = _FleetModel(model_type, self.window, self.n_blocks)
+            self.models[model_id] = model
+        return model
+
+    def apply(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Merge a published delta
+
+        Args:
+            message: Publish message from a MetricPublisher
+
+        Returns:
+            Reply with the fleet baseline edges of the published models
+        """
+        worker_id = message.get('worker_id', 'unknown')
+        now = datetime.now().isoformat()
+        with self._lock:
+            for model_id, delta in message.get('models', {}).items():
+                model = self._model(model_id, delta.get('model_type'))
+                model.workers[worker_id] = now
+                model.predictions += delta['predictions']
+                model.actuals += delta['actuals']
+                model.errors.merge(ErrorSums.from_state(delta['errors']))
+                sketches = {}
+                for name, state in delta.get('sketches', {}).items():
+                    sketch = HistogramSketch.from_state(state)
+                    baseline = model.drift_engine.baseline.get(name)
+                    if baseline is not None and np.array_equal(baseline.edges, sketch.edges):
+                        sketches[name] = sketch
+                model.drift_engine.merge_block(sketches, delta.get('window_rows', 0))
+
+            # The first baseline published for a model becomes the fleet baseline
+            for model_id, sketches in message.get('baselines', {}).items():
+                model = self.models.get(model_id)
+                if model is not None and not model.drift_engine.baseline and sketches:
+                    model.drift_engine.set_baseline_sketches(
+                        {name: HistogramSketch.from_state(state) for name, state in sketches.items()}
+                    )
+                    logger.info(f"Fleet drift baseline for model {model_id} set by worker {worker_id}")
+
+            edges = {}
+            for model_id in set(message.get('models', {})) | set(message.get('baselines', {})):
+                model = self.models.get(model_id)
+                if model is not None and model.drift_engine.baseline:
+                    edges[model_id] = {
+                        name: sketch.edges.tolist() for name, sketch in model.drift_engine.baseline.items()
+                    }
+            self.messages_handled += 1
+        return {'status': 'ok', 'edges': edges}
+
+    def _drift_status(self, model: _FleetModel) -> Optional[Dict[str, Any]]:
+        """Fleet drift of a model, scored like ModelMonitor's drift check"""
+        if not model.drift_engine.baseline:
+            return None
+        feature_drift = {}
+        for name, baseline in model.drift_engine.baseline.items():
+            distances = model.drift_engine.compare(name)
+            if distances is None:
+                continue
+            current = distances.pop('current')
+            mean_diff = abs(current.mean() - baseline.mean())
+            mean_diff_rel = mean_diff / abs(baseline.mean()) if baseline.mean() != 0 else mean_diff
+            std_diff = abs(current.std() - baseline.std())
+            std_diff_rel = std_diff / baseline.std() if baseline.std() != 0 else std_diff
+            feature_drift[name] = dict(
+                distances,
+                drift_score=float(max(min(mean_diff_rel, 1.0), min(std_diff_rel, 1.0), min(distances['ks_statistic'], 1.0))),
+                mean_diff=float(mean_diff),
+                window_count=current.count
+            )
+        if not feature_drift:
+            return {'status': 'insufficient_data', 'message': 'Not enough data for drift detection'}
+
+        overall_drift = float(np.mean([r['drift_score'] for r in feature_drift.values()]))
+        max_feature = max(feature_drift, key=lambda name: feature_drift[name]['drift_score'])
+        return {
+            'status': 'drift_detected' if overall_drift > self.acceptable_drift_threshold else 'normal',
+            'overall_drift': overall_drift,
+            'max_drift_feature': max_feature,
+            'max_drift_score': feature_drift[max_feature]['drift_score'],
+            'feature_drift': feature_drift
+        }
+
+    @staticmethod
+    def _performance(model: _FleetModel) -> Optional[Dict[str, Optional[float]]]:
+        """Fleet metrics of a model, picked by model type like ModelMonitor's defaults"""
+        if not model.errors.count:
+            return None
+        metrics = model.errors.metrics()
+        if 'classification' in (model.model_type or ''):
+            return {'accuracy': metrics['accuracy']}
+        metrics.pop('accuracy', None)
+        return metrics
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Get the fleet-wide status of every model
+
+        Returns:
+            Dictionary with merged counts, metrics and drift per model
+        """
+        with self._lock:
+            models = {}
+            for model_id, model in self.models.items():
+                models[model_id] = {
+                    'model_id': model_id,
+                    'model_type': model.model_type,
+                    'workers': len(model.workers),
+                    'predictions_tracked': model.predictions,
+                    'actuals_tracked': model.actuals,
+                    'current_performance': self._performance(model),
+                    'drift_status': self._drift_status(model)
+                }
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'models': models,
+            'total_models': len(models),
+            'workers': len({w for model in self.models.values() for w in model.workers})
+        }
+
+    def handle(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Handle a request message
+
+        Args:
+            message: Message with an 'op' of 'publish' or 'status'
+
+        Returns:
+            Reply message
+        """
+        op = message.get('op')
+        if op == 'publish':
+            return self.apply(message)
+        if op == 'status':
+            return self.status()
+        return {'status': 'error', 'message': f"Unknown operation: {op}"}
+
+    def start(self) -> None:
+        """Listen on the Unix socket in a background thread"""
+        if self._server is not None:
+            return
+        if os.path.exists(self.socket_path):
+            # Remove a socket left behind by an aggregator that is gone
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+                raise RuntimeError(f"An aggregator is already listening on {self.socket_path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.remove(self.socket_path)
+            finally:
+                probe.close()
+
+        aggregator = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                while True:
+                    try:
+                        message = recv_message(self.request)
+                        if message is None:
+                            return
+                        send_message(self.request, aggregator.handle(message))
+                    except Exception as e:
+                        logger.error(f"Error handling monitoring aggregation request: {str(e)}")
+                        return
+
+        server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        server.daemon_threads = True
+        self._server = server
+        self._thread = threading.Thread(target=server.serve_forever, name='model-monitor-aggregator', daemon=True)
+        self._thread.start()
+        logger.info(f"Model monitor aggregator listening on {self.socket_path}")
+
+    def close(self) -> None:
+        """Stop listening and remove the socket"""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        self._thread = None
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get aggregator statistics
+
+        Returns:
+            Dictionary with model and message counts
+        """
+        return {
+            'socket_path': self.socket_path,
+            'models': len(self.models),
+            'messages_handled': self.messages_handled,
+            'running': self._server is not None
+        }
+
+
+def main():
+    """Run a standalone aggregator"""
+    parser = argparse.ArgumentParser(description='Fleet-wide model monitoring aggregator')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH, help='Unix socket path')
+    parser.add_argument('--window', type=int, default=1000, help='Predictions in the drift window')
+    args = parser.parse_args()
+
+    aggregator = MonitorAggregator(args.socket, window=args.window)
+    aggregator.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        aggregator.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,10 @@
 Model Monitoring and Observability System
 
 This module provides tools for monitoring ML model performance in production,
-detecting data drift, and triggering model retraining when necessary.
+detecting data drift, and triggering model retraining when necessary. Monitor
+state is persisted off the request path as an append-only event log plus
+periodic snapshots (see monitor_store). Registries in several worker processes
+can publish to a shared aggregator for a fleet-wide view (see fleet_aggregator).
 """
 import os
 import sys
@@ -24,6 +27,11 @@ import joblib
 # Ensure app is in the Python path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent))
 
+from app.ml.monitoring.prediction_log import PredictionLog, is_tracked_value
+from app.ml.monitoring.monitor_store import MonitorLog, PersistenceWorker
+from app.ml.monitoring.drift_sketch import DriftEngine
+from app.ml.monitoring.fleet_aggregator import MetricPublisher
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -47,7 +55,11 @@ class ModelMonitor:
         drift_detection_window: int = 1000,
         alert_callbacks: List[Callable] = None,
         acceptable_drift_threshold: float = 0.1,
-        retraining_frequency_days: int = 30
+        retraining_frequency_days: int = 30,
+        log_capacity: Optional[int] = None,
+        persistence_worker: Optional[PersistenceWorker] = None,
+        snapshot_interval: int = 5000,
+        publisher: Optional[MetricPublisher] = None
     ):
         """
         Initialize the model monitor
@@ -61,6 +73,12 @@ class ModelMonitor:
             alert_callbacks: Functions to call when alerts are triggered
             acceptable_drift_threshold: Threshold for acceptable drift
             retraining_frequency_days: Minimum days between retrainings
+            log_capacity: Number of recent predictions kept in memory
+                (defaults to the drift detection window)
+            persistence_worker: Background worker for writing monitoring data
+                (a private one if None)
+            snapshot_interval: Logged events between state snapshots
+            publisher: Publisher of metric deltas to a fleet aggregator
         """
         self.model_id = model_id
         self.model_type = model_type
@@ -69,6 +87,8 @@ class ModelMonitor:
         self.alert_callbacks = alert_callbacks or []
         self.acceptable_drift_threshold = acceptable_drift_threshold
         self.retraining_frequency_days = retraining_frequency_days
+        self.snapshot_interval = snapshot_interval
+        self.publisher = publisher
         
         # Default metrics based on model type
         if metrics is None:
@@ -81,11 +101,8 @@ class ModelMonitor:
         
         self.metrics = metrics
         
-        # Initialize data structures
-        self.predictions = []
-        self.actuals = []
-        self.features = []
-        self.timestamps = []
+        # Recent predictions, actuals, timestamps and numeric features
+        self.prediction_log = PredictionLog(log_capacity or drift_detection_window)
         
         # Performance history
         self.performance_history = {metric: [] for metric in self.metrics}
@@ -94,11 +111,16 @@ class ModelMonitor:
         # Drift detection
         self.baseline_feature_stats = {}
         self.baseline_set = False
+        self.drift_engine = DriftEngine(window=drift_detection_window)
         
         # Create monitoring directory
         self.model_dir = os.path.join(storage_path, model_id)
         os.makedirs(self.model_dir, exist_ok=True)
         
+        # Event log and snapshots, written by the persistence worker
+        self.store = MonitorLog(self.model_dir, worker=persistence_worker)
+        self._snapshot_lsn = 0
+        
         # Retraining
         self.last_retrain_date = None
         self.last_performance_check = datetime.now()
@@ -112,95 +134,149 @@ class ModelMonitor:
     def _load_monitoring_data(self) -> None:
         """Load existing monitoring data if available"""
         try:
-            # Check for predictions file
-            predictions_file = os.path.join(self.model_dir, 'predictions.json')
-            if os.path.exists(predictions_file):
-                with open(predictions_file, 'r') as f:
-                    data = json.load(f)
-                    self.predictions = data.get('predictions', [])
-                    self.actuals = data.get('actuals', [])
-                    self.timestamps = data.get('timestamps', [])
-                    
-                    # Convert timestamps to datetime
-                    self.timestamps = [datetime.fromisoformat(ts) if ts else None for ts in self.timestamps]
-            
-            # Check for features file
-            features_file = os.path.join(self.model_dir, 'features.joblib')
-            if os.path.exists(features_file):
-                self.features = joblib.load(features_file)
-            
-            # Check for performance history
-            perf_file = os.path.join(self.model_dir, 'performance.json')
-            if os.path.exists(perf_file):
-                with open(perf_file, 'r') as f:
-                    data = json.load(f)
-                    self.performance_history = data.get('metrics', {})
-                    self.performance_timestamps = data.get('timestamps', [])
-                    
-                    # Convert timestamps to datetime
-                    self.performance_timestamps = [datetime.fromisoformat(ts) for ts in self.performance_timestamps]
-            
-            # Check for baseline feature stats
-            baseline_file = os.path.join(self.model_dir, 'baseline.json')
-            if os.path.exists(baseline_file):
-                with open(baseline_file, 'r') as f:
-                    self.baseline_feature_stats = json.load(f)
-                    self.baseline_set = True
+            state, events = self.store.load()
+            if state is not None:
+                self._set_state(state)
+            else:
+                self._load_legacy_files()
             
-            # Check for retraining info
-            retrain_file = os.path.join(self.model_dir, 'retraining.json')
-            if os.path.exists(retrain_file):
-                with open(retrain_file, 'r') as f:
-                    data = json.load(f)
-                    if data.get('last_retrain_date'):
-                        self.last_retrain_date = datetime.fromisoformat(data['last_retrain_date'])
+            # Replay the events logged after the snapshot
+            for event in events:
+                self._apply_event(event)
+            self._snapshot_lsn = state['lsn'] if state is not None else 0
             
-            logger.info(f"Loaded existing monitoring data for model {self.model_id}")
+            logger.info(f"Loaded existing monitoring data for model {self.model_id} "
+                        f"({len(events)} events replayed)")
             
         except Exception as e:
             logger.error(f"Error loading monitoring data: {str(e)}")
     
-    def _save_monitoring_data(self) -> None:
-        """Save monitoring data to files"""
-        try:
-            # Save predictions and actuals
-            predictions_file = os.path.join(self.model_dir, 'predictions.json')
-            with open(predictions_file, 'w') as f:
-                json.dump({
-                    'predictions': self.predictions[-self.drift_detection_window:] if self.predictions else [],
-                    'actuals': self.actuals[-self.drift_detection_window:] if self.actuals else [],
-                    'timestamps': [ts.isoformat() if ts else None for ts in self.timestamps[-self.drift_detection_window:]] if self.timestamps else []
-                }, f)
-            
-            # Save features (using joblib for efficient storage of numpy arrays)
+    def _load_legacy_files(self) -> None:
+        """Load monitoring data saved as whole files before the event log"""
+        predictions_file = os.path.join(self.model_dir, 'predictions.json')
+        if os.path.exists(predictions_file):
+            with open(predictions_file, 'r') as f:
+                data = json.load(f)
             features_file = os.path.join(self.model_dir, 'features.joblib')
-            joblib.dump(self.features[-self.drift_detection_window:] if self.features else [], features_file)
-            
-            # Save performance history
-            perf_file = os.path.join(self.model_dir, 'performance.json')
-            with open(perf_file, 'w') as f:
-                json.dump({
-                    'metrics': self.performance_history,
-                    'timestamps': [ts.isoformat() for ts in self.performance_timestamps]
-                }, f)
-            
-            # Save baseline feature stats
-            if self.baseline_set:
-                baseline_file = os.path.join(self.model_dir, 'baseline.json')
-                with open(baseline_file, 'w') as f:
-                    json.dump(self.baseline_feature_stats, f)
-            
-            # Save retraining info
-            retrain_file = os.path.join(self.model_dir, 'retraining.json')
-            with open(retrain_file, 'w') as f:
-                json.dump({
-                    'last_retrain_date': self.last_retrain_date.isoformat() if self.last_retrain_date else None,
-                    'retrain_requested': self.retrain_requested
-                }, f)
+            features = joblib.load(features_file) if os.path.exists(features_file) else []
+            actuals = data.get('actuals', [])
+            timestamps = data.get('timestamps', [])
+            for i, prediction in enumerate(data.get('predictions', [])):
+                self.prediction_log.append(
+                    prediction,
+                    features[i] if i < len(features) else {},
+                    actuals[i] if i < len(actuals) else None,
+                    datetime.fromisoformat(timestamps[i]) if i < len(timestamps) and timestamps[i] else None
+                )
+        
+        # Check for performance history
+        perf_file = os.path.join(self.model_dir, 'performance.json')
+        if os.path.exists(perf_file):
+            with open(perf_file, 'r') as f:
+                data = json.load(f)
+                self.performance_history = data.get('metrics', {})
+                self.performance_timestamps = data.get('timestamps', [])
                 
+                # Convert timestamps to datetime
+                self.performance_timestamps = [datetime.fromisoformat(ts) for ts in self.performance_timestamps]
+        
+        # Baselines without drift sketches are re-established from the log
+        self.baseline_set = False
+        
+        # Check for retraining info
+        retrain_file = os.path.join(self.model_dir, 'retraining.json')
+        if os.path.exists(retrain_file):
+            with open(retrain_file, 'r') as f:
+                data = json.load(f)
+                if data.get('last_retrain_date'):
+                    self.last_retrain_date = datetime.fromisoformat(data['last_retrain_date'])
+    
+    def _get_state(self) -> Dict[str, Any]:
+        """
+        Get a copy of the monitor state for a snapshot
+        
+        Returns:
+            Dictionary of the monitor state
+        """
+        return {
+            'prediction_log': self.prediction_log.get_state(),
+            'drift_engine': self.drift_engine.get_state(),
+            'baseline_feature_stats': self.baseline_feature_stats,
+            'baseline_set': self.baseline_set,
+            'performance_history': {metric: list(values) for metric, values in self.performance_history.items()},
+            'performance_timestamps': list(self.performance_timestamps),
+            'last_retrain_date': self.last_retrain_date,
+            'retrain_requested': self.retrain_requested
+        }
+    
+    def _set_state(self, state: Dict[str, Any]) -> None:
+        """
+        Restore a state returned by _get_state
+        
+        Args:
+            state: Saved monitor state
+        """
+        self.prediction_log.set_state(state['prediction_log'])
+        self.drift_engine.set_state(state['drift_engine'])
+        self.baseline_feature_stats = state['baseline_feature_stats']
+        self.baseline_set = state['baseline_set']
+        self.performance_history = state['performance_history']
+        self.performance_timestamps = state['performance_timestamps']
+        self.last_retrain_date = state['last_retrain_date']
+        self.retrain_requested = state['retrain_requested']
+    
+    def _apply_event(self, event: Dict[str, Any]) -> None:
+        """
+        Apply a logged event during replay
+        
+        Args:
+            event: Event read from the log
+        """
+        event_type = event['type']
+        if event_type == 'prediction':
+            timestamp = datetime.fromisoformat(event['timestamp']) if event.get('timestamp') else None
+            self._store_prediction(event['prediction'], event['features'], event['actual'], timestamp)
+        elif event_type == 'actual':
+            self.prediction_log.set_actual_by_sequence(event['actual'], event['sequence'])
+        elif event_type == 'performance':
+            self._append_performance(datetime.fromisoformat(event['timestamp']), event['metrics'])
+        elif event_type == 'retrain_requested':
+            self.retrain_requested = True
+    
+    def _save_monitoring_data(self) -> None:
+        """Queue a snapshot of the monitoring state for the persistence worker"""
+        try:
+            self.store.snapshot(self._get_state())
+            self._snapshot_lsn = self.store.last_lsn()
         except Exception as e:
             logger.error(f"Error saving monitoring data: {str(e)}")
     
+    def _log_event(self, event: Dict[str, Any]) -> None:
+        """
+        Append an event to the log and snapshot every snapshot_interval events
+        
+        Args:
+            event: JSON-serializable event
+        """
+        lsn = self.store.append(event)
+        if lsn - self._snapshot_lsn >= self.snapshot_interval:
+            self._save_monitoring_data()
+    
+    def _store_prediction(
+        self,
+        prediction: Any,
+        features: Dict[str, Any],
+        actual: Any,
+        timestamp: Optional[datetime]
+    ) -> None:
+        """Add a prediction to the log and drift window (also used for replay)"""
+        self.prediction_log.append(prediction, features, actual, timestamp)
+        self.drift_engine.update(features)
+        
+        # Check for baseline initialization
+        if not self.baseline_set and len(self.prediction_log) >= min(100, self.drift_detection_window):
+            self._establish_baseline()
+    
     def record_prediction(
         self,
         prediction: Any,
@@ -222,17 +298,23 @@ class ModelMonitor:
             timestamp = datetime.now()
         
         # Store prediction
-        self.predictions.append(prediction)
-        self.actuals.append(actual)
-        self.features.append(features)
-        self.timestamps.append(timestamp)
-        
-        # Check for baseline initialization
-        if not self.baseline_set and len(self.features) >= min(100, self.drift_detection_window):
-            self._establish_baseline()
+        self._store_prediction(prediction, features, actual, timestamp)
+        recorded = self.prediction_log.total
+        self._log_event({
+            'type': 'prediction',
+            'prediction': prediction,
+            'features': {name: value for name, value in features.items() if is_tracked_value(value)},
+            'actual': actual,
+            'timestamp': timestamp.isoformat()
+        })
+        if self.publisher is not None:
+            self.publisher.record_prediction(
+                self.model_id, self.model_type, prediction, features, actual,
+                self.drift_engine.baseline if self.baseline_set else None
+            )
         
         # Check for data drift periodically
-        if len(self.predictions) % (self.drift_detection_window // 10) == 0:
+        if recorded % max(1, self.drift_detection_window // 10) == 0:
             self._check_for_drift()
         
         # Check if it's time to evaluate performance
@@ -240,10 +322,6 @@ class ModelMonitor:
         if time_since_check >= 24:  # Check once per day
             self._calculate_performance_metrics()
             self.last_performance_check = datetime.now()
-        
-        # Save monitoring data periodically
-        if len(self.predictions) % 500 == 0:
-            self._save_monitoring_data()
     
     def record_actual(self, actual: Any, prediction_index: int = -1) -> None:
         """
@@ -253,38 +331,34 @@ class ModelMonitor:
             actual: The actual value
             prediction_index: Index of the prediction (default is latest)
         """
-        if not self.predictions:
+        if not len(self.prediction_log):
             logger.warning("No predictions to update")
             return
         
-        if prediction_index < -len(self.predictions) or prediction_index >= len(self.predictions):
+        # Update actual value (indexes refer to the predictions still in the log)
+        sequence = self.prediction_log.sequence(prediction_index)
+        if sequence is None:
             logger.warning(f"Invalid prediction index: {prediction_index}")
             return
-        
-        # Update actual value
-        self.actuals[prediction_index] = actual
+        self.prediction_log.set_actual_by_sequence(actual, sequence)
+        self._log_event({'type': 'actual', 'sequence': sequence, 'actual': actual})
+        if self.publisher is not None:
+            prediction = self.prediction_log.predictions[self.prediction_log.ordered()[prediction_index]]
+            self.publisher.record_actual(self.model_id, self.model_type, prediction, actual)
         
         # Calculate performance metrics if we have sufficient data
-        recent_actuals = [a for a in self.actuals if a is not None]
-        if len(recent_actuals) >= 100:
+        if self.prediction_log.actual_count() >= 100:
             self._calculate_performance_metrics()
     
     def _establish_baseline(self) -> None:
         """Establish baseline feature statistics for drift detection"""
-        # Collect numerical features
-        feature_data = {}
-        for f in self.features:
-            for key, value in f.items():
-                if isinstance(value, (int, float)) and not pd.isna(value):
-                    if key not in feature_data:
-                        feature_data[key] = []
-                    feature_data[key].append(value)
-        
-        # Calculate statistics for each feature
+        # Calculate statistics for each numerical feature
         self.baseline_feature_stats = {}
-        for feature_name, values in feature_data.items():
-            if len(values) >= 30:  # Need enough data for reliable statistics
-                values_array = np.array(values)
+        baseline_values = {}
+        for feature_name in self.prediction_log.features:
+            values_array = self.prediction_log.feature_values(feature_name)
+            if len(values_array) >= 30:  # Need enough data for reliable statistics
+                baseline_values[feature_name] = values_array
                 self.baseline_feature_stats[feature_name] = {
                     'mean': float(np.mean(values_array)),
                     'std': float(np.std(values_array)),
@@ -296,9 +370,24 @@ class ModelMonitor:
                     'histogram': np.histogram(values_array, bins=10)[0].tolist()
                 }
         
+        # Baseline sketches for drift detection, compared against the recent window
+        self.drift_engine.set_baseline(baseline_values)
+        for feature_name, sketch in self.drift_engine.baseline.items():
+            self.baseline_feature_stats[feature_name]['sketch'] = sketch.get_state()
+        self._fill_drift_window()
+        
         self.baseline_set = True
         logger.info(f"Baseline established for {len(self.baseline_feature_stats)} features")
     
+    def _fill_drift_window(self) -> None:
+        """Rebuild the current drift window from the prediction log"""
+        self.drift_engine.reset_window()
+        order = self.prediction_log.ordered(last=self.drift_detection_window)
+        self.drift_engine.update_many(
+            {name: column[order] for name, column in self.prediction_log.features.items()},
+            len(order)
+        )
+    
     def _check_for_drift(self) -> Dict[str, Any]:
         """
         Check for drift in feature distributions
@@ -309,44 +398,21 @@ class ModelMonitor:
         if not self.baseline_set:
             return {'status': 'no_baseline', 'message': 'Baseline not yet established'}
         
-        # Get recent features
-        recent_features = self.features[-min(len(self.features), self.drift_detection_window):]
-        
-        # Collect feature values
-        current_feature_data = {}
-        for f in recent_features:
-            for key, value in f.items():
-                if isinstance(value, (int, float)) and not pd.isna(value):
-                    if key not in current_feature_data:
-                        current_feature_data[key] = []
-                    current_feature_data[key].append(value)
-        
-        # Calculate drift for each feature
+        # Calculate drift for each feature from the baseline and current window sketches
         drift_results = {}
         for feature_name, baseline in self.baseline_feature_stats.items():
-            if feature_name in current_feature_data and len(current_feature_data[feature_name]) >= 30:
-                current_values = np.array(current_feature_data[feature_name])
-                
-                # Calculate KS test (distribution comparison)
-                try:
-                    ks_statistic, ks_pvalue = stats.ks_2samp(
-                        np.random.choice(current_values, size=1000, replace=True),
-                        np.random.normal(
-                            loc=baseline['mean'],
-                            scale=baseline['std'],
-                            size=1000
-                        )
-                    )
-                except:
-                    ks_statistic, ks_pvalue = np.nan, np.nan
+            distances = self.drift_engine.compare(feature_name)
+            if distances is not None:
+                current = distances.pop('current')
+                ks_statistic = distances['ks_statistic']
                 
                 # Calculate differences in basic statistics
                 current_stats = {
-                    'mean': float(np.mean(current_values)),
-                    'std': float(np.std(current_values)),
-                    'min': float(np.min(current_values)),
-                    'max': float(np.max(current_values)),
-                    'median': float(np.median(current_values))
+                    'mean': float(current.mean()),
+                    'std': float(current.std()),
+                    'min': float(current.min),
+                    'max': float(current.max),
+                    'median': current.quantile(0.5)
                 }
                 
                 # Calculate normalized difference as drift measure
@@ -375,9 +441,11 @@ class ModelMonitor:
                     'mean_diff_rel': float(mean_diff_rel),
                     'std_diff': float(std_diff),
                     'std_diff_rel': float(std_diff_rel),
-                    'ks_statistic': float(ks_statistic) if not np.isnan(ks_statistic) else None,
-                    'ks_pvalue': float(ks_pvalue) if not np.isnan(ks_pvalue) else None,
-                    'baseline': baseline,
+                    'ks_statistic': ks_statistic,
+                    'ks_pvalue': distances['ks_pvalue'],
+                    'psi': distances['psi'],
+                    'wasserstein': distances['wasserstein'],
+                    'baseline': {key: value for key, value in baseline.items() if key != 'sketch'},
                     'current': current_stats
                 }
         
@@ -396,9 +464,7 @@ class ModelMonitor:
             }
             
             # Save drift results
-            drift_file = os.path.join(self.model_dir, 'latest_drift.json')
-            with open(drift_file, 'w') as f:
-                json.dump(drift_status, f, indent=2)
+            self.store.write_json('latest_drift.json', drift_status)
             
             # If significant drift detected, trigger alert and possible retraining
             if overall_drift > self.acceptable_drift_threshold:
@@ -436,18 +502,13 @@ class ModelMonitor:
         Returns:
             Dictionary with performance metrics
         """
-        # Get prediction-actual pairs (excluding None values)
-        valid_pairs = [(p, a) for p, a in zip(self.predictions, self.actuals) if a is not None]
+        # Get prediction-actual pairs (excluding missing actuals)
+        sample_size = self.prediction_log.actual_count()
         
-        if len(valid_pairs) < 30:
+        if sample_size < 30:
             return {'status': 'insufficient_data', 'message': 'Not enough data for performance calculation'}
         
-        # Split into lists
-        y_pred, y_true = zip(*valid_pairs[-min(len(valid_pairs), self.drift_detection_window):])
-        
-        # Convert to numpy arrays for calculation
-        y_pred = np.array(y_pred)
-        y_true = np.array(y_true)
+        y_pred, y_true = self.prediction_log.pairs(last=self.drift_detection_window)
         
         # Calculate metrics
         metrics_result = {}
@@ -480,36 +541,45 @@ class ModelMonitor:
         
         # Store in performance history
         timestamp = datetime.now()
-        self.performance_timestamps.append(timestamp)
-        
-        for metric, value in metrics_result.items():
-            if metric in self.performance_history:
-                self.performance_history[metric].append(value)
-        
-        # Prune history if it gets too long
-        max_history = 1000
-        if len(self.performance_timestamps) > max_history:
-            self.performance_timestamps = self.performance_timestamps[-max_history:]
-            for metric in self.performance_history:
-                self.performance_history[metric] = self.performance_history[metric][-max_history:]
+        self._append_performance(timestamp, metrics_result)
+        self._log_event({'type': 'performance', 'timestamp': timestamp.isoformat(), 'metrics': metrics_result})
         
         # Create performance summary
         performance_summary = {
             'timestamp': timestamp.isoformat(),
             'metrics': metrics_result,
-            'sample_size': len(valid_pairs)
+            'sample_size': sample_size
         }
         
         # Save latest performance
-        perf_file = os.path.join(self.model_dir, 'latest_performance.json')
-        with open(perf_file, 'w') as f:
-            json.dump(performance_summary, f, indent=2)
+        self.store.write_json('latest_performance.json', performance_summary)
         
         # Check if performance degradation requires retraining
         self._check_performance_degradation(metrics_result)
         
         return performance_summary
     
+    def _append_performance(self, timestamp: datetime, metrics_result: Dict[str, Any]) -> None:
+        """
+        Add a performance measurement to the history
+        
+        Args:
+            timestamp: Time of the measurement
+            metrics_result: Metric values
+        """
+        self.performance_timestamps.append(timestamp)
+        
+        for metric, value in metrics_result.items():
+            if metric in self.performance_history:
+                self.performance_history[metric].append(value)
+        
+        # Prune history if it gets too long
+        max_history = 1000
+        if len(self.performance_timestamps) > max_history:
+            self.performance_timestamps = self.performance_timestamps[-max_history:]
+            for metric in self.performance_history:
+                self.performance_history[metric] = self.performance_history[metric][-max_history:]
+    
     def _check_performance_degradation(self, current_metrics: Dict[str, float]) -> bool:
         """
         Check if there's significant performance degradation
@@ -594,41 +664,41 @@ class ModelMonitor:
         """
         # If no previous training or it's been long enough since last training
         if self.last_retrain_date is None:
-            self.retrain_requested = True
-            
-            # Save retraining request
-            retrain_file = os.path.join(self.model_dir, 'retrain_request.json')
-            with open(retrain_file, 'w') as f:
-                json.dump({
-                    'timestamp': datetime.now().isoformat(),
-                    'trigger': trigger_info,
-                    'model_id': self.model_id,
-                    'model_type': self.model_type
-                }, f, indent=2)
-            
+            self._request_retraining({
+                'timestamp': datetime.now().isoformat(),
+                'trigger': trigger_info,
+                'model_id': self.model_id,
+                'model_type': self.model_type
+            })
             return True
             
         # Check if it's been long enough since last retraining
         days_since_retrain = (datetime.now() - self.last_retrain_date).days
         
         if days_since_retrain >= self.retraining_frequency_days:
-            self.retrain_requested = True
-            
-            # Save retraining request
-            retrain_file = os.path.join(self.model_dir, 'retrain_request.json')
-            with open(retrain_file, 'w') as f:
-                json.dump({
-                    'timestamp': datetime.now().isoformat(),
-                    'trigger': trigger_info,
-                    'model_id': self.model_id,
-                    'model_type': self.model_type,
-                    'days_since_retrain': days_since_retrain
-                }, f, indent=2)
-            
+            self._request_retraining({
+                'timestamp': datetime.now().isoformat(),
+                'trigger': trigger_info,
+                'model_id': self.model_id,
+                'model_type': self.model_type,
+                'days_since_retrain': days_since_retrain
+            })
             return True
         
         return False
     
+    def _request_retraining(self, request: Dict[str, Any]) -> None:
+        """
+        Flag the model for retraining and save the request
+        
+        Args:
+            request: Retraining request details
+        """
+        if not self.retrain_requested:
+            self.retrain_requested = True
+            self._log_event({'type': 'retrain_requested'})
+        self.store.write_json('retrain_request.json', request)
+    
     def confirm_retrained(self, training_info: Optional[Dict[str, Any]] = None) -> None:
         """
         Confirm that a model has been retrained
@@ -640,21 +710,20 @@ class ModelMonitor:
         self.retrain_requested = False
         
         # Save confirmation
-        retrain_file = os.path.join(self.model_dir, 'last_retraining.json')
-        with open(retrain_file, 'w') as f:
-            data = {
-                'timestamp': self.last_retrain_date.isoformat(),
-                'model_id': self.model_id,
-                'model_type': self.model_type
-            }
-            
-            if training_info:
-                data['training_info'] = training_info
-                
-            json.dump(data, f, indent=2)
+        data = {
+            'timestamp': self.last_retrain_date.isoformat(),
+            'model_id': self.model_id,
+            'model_type': self.model_type
+        }
+        
+        if training_info:
+            data['training_info'] = training_info
+        
+        self.store.write_json('last_retraining.json', data)
         
         # Reset baseline
         self.baseline_set = False
+        self._save_monitoring_data()
         
         logger.info(f"Retraining confirmed for model {self.model_id}")
     
@@ -687,8 +756,8 @@ class ModelMonitor:
             'performance': current_performance,
             'drift_status': drift_status,
             'data_volume': {
-                'total_predictions': len(self.predictions),
-                'predictions_with_actuals': sum(1 for a in self.actuals if a is not None)
+                'total_predictions': self.prediction_log.total,
+                'predictions_with_actuals': self.prediction_log.actual_count()
             },
             'retraining_status': {
                 'last_retrain_date': self.last_retrain_date.isoformat() if self.last_retrain_date else None,
@@ -739,7 +808,7 @@ class ModelMonitor:
         """
         # Current performance (if we have actuals)
         performance = None
-        if any(a is not None for a in self.actuals):
+        if self.prediction_log.actual_count():
             performance = self._calculate_performance_metrics()
         
         # Drift status if we have baseline
@@ -751,8 +820,8 @@ class ModelMonitor:
             'model_id': self.model_id,
             'model_type': self.model_type,
             'monitoring_since': self.performance_timestamps[0].isoformat() if self.performance_timestamps else None,
-            'predictions_tracked': len(self.predictions),
-            'actuals_tracked': sum(1 for a in self.actuals if a is not None),
+            'predictions_tracked': self.prediction_log.total,
+            'actuals_tracked': self.prediction_log.actual_count(),
             'current_performance': performance,
             'drift_status': drift,
             'retrain_status': {
@@ -772,8 +841,14 @@ class ModelMonitor:
         self.alert_callbacks.append(callback)
     
     def save(self) -> None:
-        """Save all monitoring data"""
+        """Save all monitoring data and wait until it is written"""
         self._save_monitoring_data()
+        self.store.flush()
+    
+    def close(self) -> None:
+        """Save all monitoring data and close the event log"""
+        self._save_monitoring_data()
+        self.store.close()
 
 
 class ModelMonitorRegistry:
@@ -784,17 +859,34 @@ class ModelMonitorRegistry:
     making it easier to track overall system performance.
     """
     
-    def __init__(self, storage_path: str = 'data/monitoring'):
+    def __init__(
+        self,
+        storage_path: str = 'data/monitoring',
+        aggregator_socket: Optional[str] = None,
+        publish_interval: float = 1.0
+    ):
         """
         Initialize the model monitor registry
         
         Args:
             storage_path: Root path for storing monitoring data
+            aggregator_socket: Unix socket of a MonitorAggregator to publish
+                metrics to, for a fleet-wide view across worker processes
+            publish_interval: Seconds between publishes to the aggregator
         """
         self.storage_path = storage_path
         self.monitors = {}  # model_id -> ModelMonitor
         self.global_callbacks = []
         
+        # One background writer shared by all monitors
+        self.persistence_worker = PersistenceWorker()
+        
+        # Metric deltas for the fleet aggregator
+        self.publisher = None
+        if aggregator_socket:
+            self.publisher = MetricPublisher(aggregator_socket, publish_interval=publish_interval)
+            self.publisher.start()
+        
         # Create registry directory
         os.makedirs(storage_path, exist_ok=True)
         
@@ -888,7 +980,9 @@ class ModelMonitorRegistry:
         monitor = ModelMonitor(
             model_id=model_id,
             model_type=model_type,
-            storage_path=self.storage_path
+            storage_path=self.storage_path,
+            persistence_worker=self.persistence_worker,
+            publisher=self.publisher
         )
         
         # Register global alert handler
@@ -985,9 +1079,10 @@ class ModelMonitorRegistry:
         Get status summary for all monitored models
         
         Returns:
-            Dictionary with status for all models
+            Dictionary with status for all models, plus the merged view of
+            all workers under 'fleet' when publishing to an aggregator
         """
-        return {
+        status = {
             'timestamp': datetime.now().isoformat(),
             'models': {
                 model_id: monitor.get_monitoring_summary()
@@ -996,6 +1091,9 @@ class ModelMonitorRegistry:
             'total_models': len(self.monitors),
             'retraining_candidates': len(self.get_retraining_candidates())
         }
+        if self.publisher is not None:
+            status['fleet'] = self.publisher.fleet_status()
+        return status
     
     def generate_all_reports(self, output_dir: Optional[str] = None) -> Dict[str, str]:
         """
@@ -1031,7 +1129,10 @@ class ModelMonitorRegistry:
     def save_all(self) -> None:
         """Save all monitor data"""
         for monitor in self.monitors.values():
-            monitor.save()
+            monitor._save_monitoring_data()
+        self.persistence_worker.flush()
+        if self.publisher is not None:
+            self.publisher.publish()
         
         self._save_registry()
 
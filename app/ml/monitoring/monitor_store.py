@@ -0,0 +1,334 @@
+"""
+Model Monitor Persistence
+
+This module implements append-only, off-thread persistence for ModelMonitor
+state. Recorded predictions and actuals are appended as events to segmented
+log files, and the full monitor state is snapshotted now and then with an
+atomic rename; once a snapshot is on disk the segments it covers are deleted.
+Loading restores the latest snapshot and replays the log tail after it.
+
+All file I/O runs on a PersistenceWorker thread, which a registry shares
+between its monitors, so request threads only enqueue work. Frames use the
+same layout as the telemetry write-ahead log
+
+    [payload length: uint32][crc32 of payload: uint32][payload: JSON]
+
+and replay stops at the first torn or corrupt frame.
+"""
+import os
+import json
+import zlib
+import queue
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Callable, Iterator, Tuple
+
+import joblib
+import numpy as np
+
+from app.ml.data_pipeline.telemetry_wal import FRAME_HEADER
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILENAME = 'snapshot.joblib'
+
+_STOP = object()
+
+
+def _json_default(value: Any) -> Any:
+    """JSON encoder for NumPy scalars and datetimes in monitor events"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class PersistenceWorker:
+    """
+    Background thread running persistence tasks in submission order
+    """
+
+    def __init__(self, name: str = 'model-monitor-persistence'):
+        """
+        Initialize the worker
+
+        Args:
+            name: Name of the worker thread
+        """
+        self.name = name
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.tasks_run = 0
+        self.error_count = 0
+        self.last_error: Optional[str] = None
+
+    def start(self) -> None:
+        """Start the worker thread"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def submit(self, task: Callable, *args: Any) -> None:
+        """
+        Queue a task
+
+        Args:
+            task: Function to call on the worker thread
+            *args: Arguments of the call
+        """
+        if self._thread is None:
+            self.start()
+        self._queue.put((task, args))
+
+    def idle(self) -> bool:
+        """Whether no queued tasks are waiting"""
+        return self._queue.empty()
+
+    def _run(self) -> None:
+        """Worker loop"""
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                task, args = item
+                task(*args)
+                self.tasks_run += 1
+            except Exception as e:
+                self.error_count += 1
+                self.last_error = str(e)
+                logger.error(f"Error in monitor persistence task: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Wait until every queued task has run"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """Run the queued tasks and stop the thread"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get worker statistics
+
+        Returns:
+            Dictionary with queue length and task counts
+        """
+        return {
+            'queued': self._queue.qsize(),
+            'tasks_run': self.tasks_run,
+            'error_count': self.error_count,
+            'last_error': self.last_error
+        }
+
+
+class MonitorLog:
+    """
+    Segmented event log and snapshots of one model monitor
+
+    Events get increasing sequence numbers (LSNs). A snapshot records the LSN
+    of the last event it includes; replay skips events up to it.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        worker: Optional[PersistenceWorker] = None,
+        segment_size: int = 4 * 1024 * 1024
+    ):
+        """
+        Initialize the log
+
+        Args:
+            path: Directory of the monitor's files
+            worker: Worker running the writes (a private one if None)
+            segment_size: Segment size in bytes at which a new segment is started
+        """
+        self.path = path
+        self.segment_size = segment_size
+        self.worker = worker or PersistenceWorker(name=f"model-monitor-{os.path.basename(path)}")
+        self._owns_worker = worker is None
+        os.makedirs(path, exist_ok=True)
+
+        segments = self._list_segments()
+        self._next_seq = segments[-1][0] + 1 if segments else 1
+        self._next_lsn = 1
+        self._file = None
+        self._segment_bytes = 0
+
+        # Statistics
+        self.events_appended = 0
+        self.snapshots_written = 0
+
+    def _list_segments(self) -> List[Tuple[int, str]]:
+        """List existing segment files in sequence order"""
+        segments = []
+        for filename in os.listdir(self.path):
+            if filename.startswith('events-') and filename.endswith('.log'):
+                segments.append((int(filename[7:-4]), os.path.join(self.path, filename)))
+        return sorted(segments)
+
+    @staticmethod
+    def _read_segment(segment_path: str) -> Iterator[Dict[str, Any]]:
+        """Read the valid events of a segment"""
+        with open(segment_path, 'rb') as f:
+            data = f.read()
+
+        offset = 0
+        while offset + FRAME_HEADER.size <= len(data):
+            length, checksum = FRAME_HEADER.unpack_from(data, offset)
+            start = offset + FRAME_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                logger.warning(f"Stopping monitor log replay of {segment_path} at torn frame (offset {offset})")
+                return
+            yield json.loads(payload)
+            offset = start + length
+
+    def load(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Load the latest snapshot and the events logged after it
+
+        Returns:
+            Tuple of (snapshot state or None, events in order)
+        """
+        state = None
+        snapshot_path = os.path.join(self.path, SNAPSHOT_FILENAME)
+        if os.path.exists(snapshot_path):
+            state = joblib.load(snapshot_path)
+        snapshot_lsn = state['lsn'] if state else 0
+
+        events = []
+        for _, segment_path in self._list_segments():
+            events.extend(event for event in self._read_segment(segment_path) if event['lsn'] > snapshot_lsn)
+        self._next_lsn = max([snapshot_lsn] + [event['lsn'] for event in events]) + 1
+        return state, events
+
+    def append(self, event: Dict[str, Any]) -> int:
+        """
+        Queue an event for appending
+
+        Args:
+            event: JSON-serializable event
+
+        Returns:
+            LSN assigned to the event
+        """
+        lsn = self._next_lsn
+        self._next_lsn += 1
+        self.worker.submit(self._write_event, dict(event, lsn=lsn))
+        return lsn
+
+    def last_lsn(self) -> int:
+        """LSN of the most recently appended event"""
+        return self._next_lsn - 1
+
+    def snapshot(self, state: Dict[str, Any]) -> None:
+        """
+        Queue a snapshot covering every event appended so far
+
+        Args:
+            state: Monitor state (must not be mutated afterwards)
+        """
+        self.worker.submit(self._write_snapshot, dict(state, lsn=self.last_lsn()))
+
+    def write_json(self, filename: str, data: Dict[str, Any]) -> None:
+        """
+        Queue an atomic rewrite of a JSON file in the monitor directory
+
+        Args:
+            filename: File name
+            data: JSON-serializable data
+        """
+        self.worker.submit(self._write_json, filename, data)
+
+    def _write_event(self, event: Dict[str, Any]) -> None:
+        """Append an event frame (worker thread)"""
+        if self._file is None:
+            self._file = open(os.path.join(self.path, f"events-{self._next_seq:08d}.log"), 'ab')
+            self._next_seq += 1
+            self._segment_bytes = 0
+
+        payload = json.dumps(event, default=_json_default).encode('utf-8')
+        self._file.write(FRAME_HEADER.pack(len(payload), zlib.crc32(payload)))
+        self._file.write(payload)
+        self._segment_bytes += FRAME_HEADER.size + len(payload)
+        self.events_appended += 1
+
+        if self._segment_bytes >= self.segment_size:
+            self._close_segment()
+        elif self.worker.idle():
+            # Hand buffered frames to the OS once the queue drains
+            self._file.flush()
+
+    def _close_segment(self) -> None:
+        """Close the current segment so the next event starts a new one"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write_snapshot(self, state: Dict[str, Any]) -> None:
+        """Write a snapshot atomically and drop the segments it covers (worker thread)"""
+        self._close_segment()
+        snapshot_path = os.path.join(self.path, SNAPSHOT_FILENAME)
+        tmp_path = f"{snapshot_path}.tmp"
+        joblib.dump(state, tmp_path)
+        os.replace(tmp_path, snapshot_path)
+        self.snapshots_written += 1
+
+        # Every closed segment only holds events up to the snapshot LSN
+        for _, segment_path in self._list_segments():
+            os.remove(segment_path)
+
+    def _write_json(self, filename: str, data: Dict[str, Any]) -> None:
+        """Rewrite a JSON file atomically (worker thread)"""
+        file_path = os.path.join(self.path, filename)
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2, default=_json_default)
+        os.replace(tmp_path, file_path)
+
+    def flush(self) -> None:
+        """Wait for queued writes and hand buffered frames to the OS"""
+        self.worker.flush()
+        file = self._file
+        if file is not None and not file.closed:
+            file.flush()
+
+    def close(self) -> None:
+        """Write everything queued and close the current segment"""
+        self.flush()
+        self.worker.submit(self._close_segment)
+        if self._owns_worker:
+            self.worker.close()
+        else:
+            self.worker.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get log statistics
+
+        Returns:
+            Dictionary with event, snapshot and segment counts
+        """
+        return {
+            'last_lsn': self.last_lsn(),
+            'events_appended': self.events_appended,
+            'snapshots_written': self.snapshots_written,
+            'segments': len(self._list_segments())
+        }
@@ -0,0 +1,272 @@
+"""
+Prediction Log
+
+This module implements the fixed-capacity columnar log a ModelMonitor keeps of
+recent predictions. Predictions, actuals, timestamps and every numeric feature
+are held in NumPy arrays used as one ring buffer, so memory per monitored model
+is bounded and drift, baseline and performance calculations read array slices
+instead of iterating over per-prediction dicts.
+"""
+import logging
+from datetime import datetime
+from typing import Dict, Optional, Any, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_NAT = np.iinfo(np.int64).min
+
+
+def is_tracked_value(value: Any) -> bool:
+    """Whether a feature value is tracked (numeric and not missing)"""
+    return isinstance(value, (int, float, np.number)) and not pd.isna(value)
+
+
+class PredictionLog:
+    """
+    Ring buffer of the most recent predictions of one model
+
+    Predictions and actuals are float arrays (missing actuals are NaN) and
+    switch to object arrays the first time a non-numeric value is recorded,
+    e.g. class labels. Features are kept per name as float arrays with NaN
+    where a prediction did not have the feature; non-numeric features are not
+    tracked.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        """
+        Initialize the log
+
+        Args:
+            capacity: Number of predictions kept
+        """
+        self.capacity = capacity
+        self.predictions = np.full(capacity, np.nan)
+        self.actuals = np.full(capacity, np.nan)
+        self.timestamps = np.full(capacity, _NAT, dtype=np.int64)
+        self.features: Dict[str, np.ndarray] = {}
+        self.size = 0
+        self.head = 0  # Index the next prediction is written to
+        self.total = 0  # Predictions recorded since the log was created
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _set(self, name: str, index: int, value: Any) -> None:
+        """Store a prediction or actual, widening the array to object if needed"""
+        array = getattr(self, name)
+        if value is None:
+            value = np.nan if array.dtype != object else None
+        elif array.dtype != object and not is_tracked_value(value):
+            array = array.astype(object)
+            array[pd.isna(array)] = None
+            setattr(self, name, array)
+        array[index] = value
+
+    def append(
+        self,
+        prediction: Any,
+        features: Dict[str, Any],
+        actual: Any = None,
+        timestamp: Optional[datetime] = None
+    ) -> None:
+        """
+        Append a prediction, evicting the oldest one when full
+
+        Args:
+            prediction: The model's prediction
+            features: Features used for the prediction
+            actual: The actual value (if available)
+            timestamp: Timestamp of the prediction
+        """
+        index = self.head
+        self._set('predictions', index, prediction)
+        self._set('actuals', index, actual)
+        self.timestamps[index] = pd.Timestamp(timestamp).value if timestamp is not None else _NAT
+
+        for column in self.features.values():
+            column[index] = np.nan
+        for name, value in features.items():
+            if not is_tracked_value(value):
+                continue
+            column = self.features.get(name)
+            if column is None:
+                column = np.full(self.capacity, np.nan)
+                self.features[name] = column
+            column[index] = value
+
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.total += 1
+
+    def ordered(self, last: Optional[int] = None) -> np.ndarray:
+        """
+        Indices of the stored predictions from oldest to newest
+
+        Args:
+            last: Only the most recent `last` predictions
+        """
+        count = self.size if last is None else min(last, self.size)
+        return (self.head - count + np.arange(count)) % self.capacity
+
+    def set_actual(self, actual: Any, prediction_index: int = -1) -> bool:
+        """
+        Record the actual value of a stored prediction
+
+        Args:
+            actual: The actual value
+            prediction_index: Position in the stored predictions, oldest first
+                (negative values count from the newest)
+
+        Returns:
+            False if the prediction is no longer (or not yet) stored
+        """
+        if prediction_index < -self.size or prediction_index >= self.size:
+            return False
+        self._set('actuals', int(self.ordered()[prediction_index]), actual)
+        return True
+
+    def sequence(self, prediction_index: int = -1) -> Optional[int]:
+        """
+        Sequence number of a stored prediction (0 for the first one ever recorded)
+
+        Args:
+            prediction_index: Position in the stored predictions, oldest first
+                (negative values count from the newest)
+
+        Returns:
+            Sequence number, or None if the index is out of range
+        """
+        if prediction_index < -self.size or prediction_index >= self.size:
+            return None
+        return self.total - self.size + prediction_index % self.size
+
+    def set_actual_by_sequence(self, actual: Any, sequence: int) -> bool:
+        """
+        Record the actual value of a prediction given its sequence number
+
+        Args:
+            actual: The actual value
+            sequence: Sequence number returned by sequence()
+
+        Returns:
+            False if the prediction is no longer stored
+        """
+        position = sequence - (self.total - self.size)
+        return 0 <= position < self.size and self.set_actual(actual, position)
+
+    def has_actual(self) -> np.ndarray:
+        """Mask over the stored predictions, oldest first, of those with an actual"""
+        return ~pd.isna(self.actuals[self.ordered()])
+
+    def actual_count(self) -> int:
+        """Number of stored predictions with an actual"""
+        return int(self.has_actual().sum())
+
+    def feature_values(self, name: str, last: Optional[int] = None) -> np.ndarray:
+        """
+        Recorded values of a numeric feature, oldest first, missing values dropped
+
+        Args:
+            name: Feature name
+            last: Only look at the most recent `last` predictions
+
+        Returns:
+            Float array of the feature values
+        """
+        column = self.features.get(name)
+        if column is None:
+            return np.zeros(0)
+        values = column[self.ordered(last)]
+        return values[~np.isnan(values)]
+
+    def pairs(self, last: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Predictions and actuals of the stored predictions that have an actual
+
+        Args:
+            last: Only the most recent `last` pairs
+
+        Returns:
+            Tuple of (y_pred, y_true), oldest first
+        """
+        order = self.ordered()
+        order = order[self.has_actual()]
+        if last is not None:
+            order = order[-last:]
+        y_pred, y_true = self.predictions[order], self.actuals[order]
+        if y_pred.dtype == object or y_true.dtype == object:
+            # Numeric labels stored next to object arrays compare as numbers
+            try:
+                y_pred, y_true = y_pred.astype(np.float64), y_true.astype(np.float64)
+            except (TypeError, ValueError):
+                pass
+        return y_pred, y_true
+
+    def get_state(self) -> Dict[str, Any]:
+        """
+        Get the stored predictions for persistence, oldest first
+
+        Returns:
+            Dictionary of arrays
+        """
+        order = self.ordered()
+        return {
+            'capacity': self.capacity,
+            'total': self.total,
+            'predictions': self.predictions[order],
+            'actuals': self.actuals[order],
+            'timestamps': self.timestamps[order],
+            'features': {name: column[order] for name, column in self.features.items()}
+        }
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        """
+        Restore a state returned by get_state (keeping this log's capacity)
+
+        Args:
+            state: Saved log state
+        """
+        keep = min(len(state['predictions']), self.capacity)
+        self.__init__(self.capacity)
+        self.size = keep
+        self.head = keep % self.capacity
+        self.total = int(state.get('total', keep))
+        self.predictions = np.asarray(state['predictions'])[-keep:] if keep else self.predictions
+        self.actuals = np.asarray(state['actuals'])[-keep:] if keep else self.actuals
+        self.predictions = self._pad(self.predictions)
+        self.actuals = self._pad(self.actuals)
+        self.timestamps[:keep] = np.asarray(state['timestamps'], dtype=np.int64)[len(state['timestamps']) - keep:]
+        for name, values in state.get('features', {}).items():
+            column = np.full(self.capacity, np.nan)
+            column[:keep] = np.asarray(values, dtype=np.float64)[len(values) - keep:]
+            self.features[name] = column
+
+    def _pad(self, values: np.ndarray) -> np.ndarray:
+        """Grow restored values to the log capacity"""
+        if len(values) == self.capacity:
+            return values.copy()
+        padded = np.full(self.capacity, None if values.dtype == object else np.nan, dtype=values.dtype)
+        padded[:len(values)] = values
+        return padded
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get log statistics
+
+        Returns:
+            Dictionary with sizes and memory use
+        """
+        arrays = [self.predictions, self.actuals, self.timestamps] + list(self.features.values())
+        return {
+            'size': self.size,
+            'capacity': self.capacity,
+            'total': self.total,
+            'features': len(self.features),
+            'actuals': self.actual_count(),
+            'memory_bytes': int(sum(a.nbytes for a in arrays))
+        }
@@ -4,6 +4,7 @@ Multi-Task Learning Models
 This module implements models that can simultaneously predict multiple related metrics
 related to EV charging stations, sharing representations across tasks.
 """
+import shutil
 import logging
 import numpy as np
 import pandas as pd
@@ -13,6 +14,8 @@ from pathlib import Path
 import joblib
 import os
 
+from ..inference.onnx_runtime import ONNXRUNTIME_AVAILABLE, OnnxInferenceSession, export_keras_to_onnx
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -336,6 +339,8 @@ class SharedRepresentationModel:
     Multi-task model with shared representation across tasks
     
     Uses a neural network with shared layers for multiple prediction tasks.
+    After export_onnx() (or loading a model saved with one) predictions run
+    through an ONNX Runtime session, so serving does not need TensorFlow.
     """
     
     def __init__(
@@ -367,6 +372,10 @@ class SharedRepresentationModel:
         self.task_columns = None
         self.scalers = {}
         
+        # ONNX Runtime session and its output name per task
+        self.runtime = None
+        self.runtime_outputs = {}
+        
         # Create model directory
         self.model_dir.mkdir(parents=True, exist_ok=True)
         
@@ -457,6 +466,7 @@ class SharedRepresentationModel:
         
         self.feature_columns = feature_columns
         self.task_columns = task_columns
+        self.runtime = None
         
         # Scale features
         X = data[feature_columns].values
@@ -541,7 +551,7 @@ class SharedRepresentationModel:
         predict_tasks = tasks if tasks is not None else self.tasks
         
         # Generate predictions
-        raw_predictions = self.model.predict(X_scaled)
+        raw_predictions = self._run_model(X_scaled)
         
         # Inverse transform predictions
         predictions = {}
@@ -628,6 +638,91 @@ class SharedRepresentationModel:
         
         return results
     
+    def _run_model(self, X_scaled: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Run the network on scaled features
+        
+        Args:
+            X_scaled: Scaled feature matrix
+            
+        Returns:
+            Dictionary mapping task names to scaled predictions
+        """
+        if self.runtime is not None:
+            outputs = self.runtime.run(X_scaled)
+            return {task: outputs[name].reshape(-1, 1) for task, name in self.runtime_outputs.items()}
+        return self.model.predict(X_scaled)
+    
+    def export_onnx(
+        self,
+        filepath: Optional[str] = None,
+        intra_op_threads: int = 1,
+        inter_op_threads: int = 1,
+        max_batch_size: int = 4096
+    ) -> str:
+        """
+        Convert the fitted network to ONNX and serve predictions through it
+        
+        Args:
+            filepath: Path of the ONNX file (if None, uses the default path)
+            intra_op_threads: ONNX Runtime threads within an operator
+            inter_op_threads: ONNX Runtime threads across operators
+            max_batch_size: Maximum rows per runtime call
+            
+        Returns:
+            Path to the ONNX file
+        """
+        if not self.is_fitted or self.model is None:
+            raise ValueError("Model must be fitted before exporting")
+        
+        if filepath is None:
+            filepath = str(self.model_dir / f"{self.name}.onnx")
+        
+        export_keras_to_onnx(self.model, filepath, (len(self.feature_columns),))
+        self.use_onnx_runtime(filepath, intra_op_threads, inter_op_threads, max_batch_size)
+        
+        return filepath
+    
+    def use_onnx_runtime(
+        self,
+        filepath: str,
+        intra_op_threads: int = 1,
+        inter_op_threads: int = 1,
+        max_batch_size: int = 4096
+    ) -> None:
+        """
+        Serve predictions through an exported ONNX model
+        
+        Args:
+            filepath: Path to the ONNX file
+            intra_op_threads: ONNX Runtime threads within an operator
+            inter_op_threads: ONNX Runtime threads across operators
+            max_batch_size: Maximum rows per runtime call
+        """
+        runtime = OnnxInferenceSession(
+            filepath,
+            intra_op_threads=intra_op_threads,
+            inter_op_threads=inter_op_threads,
+            max_batch_size=max_batch_size
+        )
+        
+        # Outputs are named after the task output layers
+        names = {name.split(':')[0]: name for name in runtime.output_names}
+        outputs = {}
+        for task in self.tasks:
+            for candidate in (f"{task}_output", task):
+                if candidate in names:
+                    outputs[task] = names[candidate]
+                    break
+        if len(outputs) != len(self.tasks):
+            if len(runtime.output_names) != len(self.tasks):
+                raise ValueError(f"Cannot match ONNX outputs {runtime.output_names} to tasks {self.tasks}")
+            outputs = dict(zip(self.tasks, runtime.output_names))
+        
+        self.runtime = runtime
+        self.runtime_outputs = outputs
+        logger.info(f"Serving {self.name} predictions through ONNX Runtime")
+    
     def plot_training_history(
         self,
         figsize: Tuple[int, int] = (12, 6),
@@ -684,8 +779,14 @@ class SharedRepresentationModel:
         # Create directory if it doesn't exist
         filepath.mkdir(parents=True, exist_ok=True)
         
-        # Save TensorFlow model
-        self.model.save(filepath / "tf_model")
+        # Save TensorFlow model (runtime-only instances have none)
+        if self.model is not None:
+            self.model.save(filepath / "tf_model")
+        
+        # Save the exported ONNX model alongside
+        onnx_path = filepath / "model.onnx"
+        if self.runtime is not None and Path(self.runtime.model_path).resolve() != onnx_path.resolve():
+            shutil.copyfile(self.runtime.model_path, onnx_path)
         
         # Save other attributes
         config = {
@@ -709,12 +810,18 @@ class SharedRepresentationModel:
         return str(filepath)
     
     @classmethod
-    def load(cls, filepath: str) -> 'SharedRepresentationModel':
+    def load(cls, filepath: str, use_onnx: bool = True, intra_op_threads: int = 1) -> 'SharedRepresentationModel':
         """
         Load a model from disk
         
+        When the model was saved with an ONNX export and ONNX Runtime is
+        installed, predictions are served through it and TensorFlow is
+        optional (it is still loaded when available, for further training).
+        
         Args:
             filepath: Path to the saved model directory
+            use_onnx: Whether to serve through a saved ONNX export
+            intra_op_threads: ONNX Runtime threads within an operator
             
         Returns:
             Loaded model
@@ -732,9 +839,18 @@ class SharedRepresentationModel:
             task_specific_layers=config['task_specific_layers']
         )
         
+        onnx_path = filepath / "model.onnx"
+        use_onnx = use_onnx and ONNXRUNTIME_AVAILABLE and onnx_path.exists()
+        
         # Load TensorFlow model
-        from tensorflow.keras.models import load_model
-        model.model = load_model(filepath / "tf_model")
+        try:
+            from tensorflow.keras.models import load_model
+            if (filepath / "tf_model").exists() or not use_onnx:
+                model.model = load_model(filepath / "tf_model")
+        except ImportError:
+            if not use_onnx:
+                raise
+            logger.info("TensorFlow is not available, serving predictions through ONNX Runtime only")
         
         # Load other attributes
         model.feature_columns = config['feature_columns']
@@ -744,6 +860,9 @@ class SharedRepresentationModel:
         # Load scalers
         model.scalers = joblib.load(filepath / "scalers.joblib")
         
+        if use_onnx:
+            model.use_onnx_runtime(str(onnx_path), intra_op_threads=intra_op_threads)
+        
         logger.info(f"Loaded SharedRepresentationModel from {filepath}")
         
         return model 
\ No newline at end of file
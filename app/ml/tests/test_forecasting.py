@@ -0,0 +1,699 @@
+"""
+Tests for Forecasting Components
+
+This module tests forecasting building blocks in isolation, covering the
+vectorized multi-stream drift detector, incremental and background model
+updates in online learning, parallel, fault-isolated ensembles, parallel
+cross-validation with early stopping in model selection, batched
+multi-series exponential smoothing, the forecast result cache, and batched
+ONNX Runtime inference for exported deep models.
+"""
+import os
+import sys
+import pickle
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+import warnings
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Add the app directory to the path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent))
+
+from app.ml.forecasting import (
+    ARIMAForecaster,
+    BaseForecaster,
+    EnsembleForecaster,
+    ExponentialSmoothingForecaster,
+    ForecastCache,
+    ModelSelector,
+    MultiSeriesExponentialSmoothingForecaster,
+    MultiStreamDriftDetector,
+    OnlineForecaster
+)
+from app.ml.forecasting.ensemble_forecaster import _ATTACHED_FRAMES, _attach_frame, _share_frame
+from app.ml.inference.onnx_runtime import ONNXRUNTIME_AVAILABLE, OnnxInferenceSession
+from app.ml.multitask import SharedRepresentationModel
+from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+
+def make_series(n, seed=0, start='2024-01-01'):
+    """Hourly series with a daily cycle, trend and noise"""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, periods=n, freq='h')
+    t = np.arange(n)
+    values = 50 + 10 * np.sin(2 * np.pi * t / 24) + 0.05 * t + rng.normal(0, 1, n)
+    return pd.DataFrame({'value': values}, index=index)
+
+
+class SlowMeanForecaster(BaseForecaster):
+    """Mean forecaster whose fit blocks until released, for background retrain tests"""
+
+    def __init__(self, model_dir):
+        super().__init__(name='slow_mean', forecast_horizon=4, model_dir=model_dir)
+        self.release = threading.Event()
+        self.release.set()
+        self.mean = None
+        self.points = 0
+        self.fit_thread = None
+
+    def __deepcopy__(self, memo):
+        clone = SlowMeanForecaster(str(self.model_dir))
+        clone.release = self.release
+        clone.mean, clone.points = self.mean, self.points
+        return clone
+
+    def __getstate__(self):
+        return dict(self.__dict__, release=None)
+
+    def fit(self, data, target_col, **kwargs):
+        self.release.wait()
+        self.fit_thread = threading.current_thread().name
+        self.mean = float(data[target_col].mean())
+        self.points = len(data)
+        self.is_fitted = True
+        return self
+
+    def partial_fit(self, data, target_col, **kwargs):
+        total = self.mean * self.points + float(data[target_col].sum())
+        self.points += len(data)
+        self.mean = total / self.points
+        return self
+
+    def predict(self, start_date=None, n_periods=None, exogenous_data=None, **kwargs):
+        n_periods = n_periods or self.forecast_horizon
+        index = pd.date_range(start_date or '2024-01-01', periods=n_periods, freq='h')
+        return pd.DataFrame({'forecast': np.full(n_periods, self.mean)}, index=index)
+
+
+class ConstantForecaster(BaseForecaster):
+    """Forecasts a constant, optionally failing to fit, killing its process or diverging to NaN"""
+
+    def __init__(self, value, model_dir, failure=None):
+        super().__init__(name=f'constant_{value}', forecast_horizon=4, model_dir=model_dir)
+        self.value = value
+        self.failure = failure
+        self.fit_pid = None
+        self.predict_calls = 0
+
+    def fit(self, data, target_col, **kwargs):
+        if self.failure == 'fit':
+            raise np.linalg.LinAlgError("Singular matrix")
+        if self.failure == 'crash':
+            os._exit(3)
+        self.fit_pid = os.getpid()
+        self.is_fitted = True
+        return self
+
+    def predict(self, start_date=None, n_periods=None, exogenous_data=None, **kwargs):
+        self.predict_calls += 1
+        n_periods = n_periods or self.forecast_horizon
+        index = pd.date_range(start_date or '2024-01-01', periods=n_periods, freq='h')
+        value = np.nan if self.failure == 'nan' else self.value
+        return pd.DataFrame({'forecast': np.full(n_periods, value)}, index=index)
+
+
+class TestMultiStreamDriftDetector(unittest.TestCase):
+    """Tests for per-stream Page-Hinkley and ADWIN drift detection"""
+
+    def test_detects_shifted_streams(self):
+        """Test that only streams whose mean shifts are reported"""
+        rng = np.random.default_rng(0)
+        stream_ids = np.array([f"station-{i}" for i in range(2000)])
+        shifted = set(stream_ids[:20])
+        detector = MultiStreamDriftDetector()
+
+        detected_before = []
+        detected_after = set()
+        for step in range(120):
+            values = rng.normal(10, 1, len(stream_ids))
+            if step >= 80:
+                values[:20] += 5
+            detected = detector.update(stream_ids, values)
+            if step < 80:
+                detected_before.extend(detected)
+            else:
+                detected_after.update(detected)
+
+        self.assertEqual(detected_before, [])
+        self.assertEqual(detected_after, shifted)
+        status = detector.get_stream_status()
+        self.assertEqual(len(status), 2000)
+        self.assertTrue((status.loc[sorted(shifted), 'drift_count'] > 0).all())
+        self.assertEqual(detector.get_stats()['streams_with_drift'], 20)
+
+    def test_methods_and_batch_order(self):
+        """Test each method alone and several observations per stream in one batch"""
+        rng = np.random.default_rng(1)
+        for method in ('page_hinkley', 'adwin'):
+            detector = MultiStreamDriftDetector(methods=(method,), adwin_clock=1)
+            values = np.concatenate([rng.normal(0, 1, 100), rng.normal(8, 1, 100)])
+            quiet = rng.normal(0, 1, 200)
+            # Both streams interleaved in a single call
+            detected = detector.update(np.tile([1, 2], 200), np.column_stack([values, quiet]).ravel())
+            self.assertEqual(list(detected), [1], method)
+
+            single = MultiStreamDriftDetector(methods=(method,), adwin_clock=1)
+            self.assertEqual(
+                [list(single.update([1], [value])) for value in values].count([1]),
+                int(detector.drift_counts[0]),
+                method
+            )
+
+        with self.assertRaises(ValueError):
+            MultiStreamDriftDetector(methods=('cusum',))
+
+
+class TestOnlineUpdates(unittest.TestCase):
+    """Tests for warm-start updates and background retraining"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.model_dir = tempfile.mkdtemp()
+        warnings.simplefilter('ignore')
+
+    def tearDown(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.model_dir, ignore_errors=True)
+
+    def test_exponential_smoothing_state_update(self):
+        """Test that update() continues the fitted recursions exactly"""
+        data = make_series(300)
+        for trend, seasonal in [('add', 'add'), (None, 'mul')]:
+            forecaster = ExponentialSmoothingForecaster(
+                trend=trend, seasonal=seasonal, seasonal_periods=24, model_dir=self.model_dir
+            )
+            forecaster.fit(data.iloc[:250], 'value')
+            params = forecaster.model.params
+            forecaster.update(data.iloc[250:280]).update(data.iloc[280:])
+
+            # Same parameters and initial states over the whole series
+            reference = ExponentialSmoothing(
+                data['value'], trend=trend, seasonal=seasonal, seasonal_periods=24,
+                initialization_method='known', initial_level=params['initial_level'],
+                initial_trend=params['initial_trend'] if trend else None,
+                initial_seasonal=params['initial_seasons']
+            ).fit(
+                smoothing_level=params['smoothing_level'],
+                smoothing_trend=params['smoothing_trend'] if trend else None,
+                smoothing_seasonal=params['smoothing_seasonal'],
+                optimized=False
+            )
+            forecast = forecaster.predict(n_periods=24)
+            np.testing.assert_allclose(forecast['forecast'].values, reference.forecast(24).values)
+            self.assertEqual(forecast.index[0], data.index[-1] + pd.Timedelta(hours=1))
+            np.testing.assert_allclose(forecast['upper_bound'] - forecast['forecast'], 1.96 * np.std(reference.resid))
+
+            # Only the last seasonal cycle of history is kept
+            self.assertEqual(len(forecaster.training_data), 24)
+            self.assertEqual(forecaster.training_data.index[-1], data.index[-1])
+
+    def test_arima_update_extends_state(self):
+        """Test that ARIMA updates match appending to the full history without keeping it"""
+        data = make_series(300)
+        forecaster = ARIMAForecaster(order=(2, 1, 1), auto_order=False, model_dir=self.model_dir)
+        forecaster.fit(data.iloc[:200], 'value')
+        reference = forecaster.model.append(data['value'].iloc[200:], refit=False)
+        forecaster.update(data.iloc[200:250]).update(data.iloc[250:])
+
+        forecast = forecaster.predict(n_periods=12)
+        np.testing.assert_allclose(forecast['forecast'].values, reference.get_forecast(12).predicted_mean.values)
+        self.assertEqual(forecast.index[0], data.index[-1] + pd.Timedelta(hours=1))
+        self.assertEqual(forecaster.model.nobs, 50)
+        self.assertEqual(len(forecaster.training_data), 1)
+
+    def test_background_retrain_swaps_model(self):
+        """Test that retraining runs off the caller's thread and replays data that arrived meanwhile"""
+        data = make_series(200)
+        base = SlowMeanForecaster(self.model_dir)
+        online = OnlineForecaster(base, retraining_window=100, max_online_window=100)
+        online.fit(data.iloc[:100], 'value')
+        self.assertEqual(online.retrain_count, 0)
+
+        base.release.clear()
+        online._retrain_model(data.iloc[100:150])
+        self.assertTrue(online.retrain_in_progress())
+
+        # Predictions and incremental updates go to the current model meanwhile
+        self.assertIs(online.base_forecaster, base)
+        self.assertAlmostEqual(online.predict(n_periods=4)['forecast'].iloc[0], data['value'].iloc[:100].mean())
+        online.update(data.iloc[150:200], evaluate=False, force_retrain=True)
+        self.assertEqual(base.points, 150)
+
+        base.release.set()
+        self.assertTrue(online.wait_for_retrain(timeout=10))
+        self.assertIsNot(online.base_forecaster, base)
+        self.assertEqual(online.retrain_count, 1)
+        self.assertTrue(online.base_forecaster.fit_thread.startswith('online-retrain'))
+        # Fitted on the last 100 points, then the 50 that arrived during training
+        self.assertEqual(online.base_forecaster.points, 150)
+        self.assertAlmostEqual(online.base_forecaster.mean, data['value'].iloc[50:200].mean())
+
+        restored = OnlineForecaster.load(online.save(f"{self.model_dir}/online.joblib"))
+        self.assertFalse(restored.retrain_in_progress())
+
+
+class TestEnsembleForecaster(unittest.TestCase):
+    """Tests for parallel and fault-isolated ensemble members"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.model_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.model_dir, ignore_errors=True)
+
+    def make_ensemble(self, failures, **kwargs):
+        members = [ConstantForecaster(10 * (i + 1), self.model_dir, failure) for i, failure in enumerate(failures)]
+        return EnsembleForecaster(
+            forecasters=members, ensemble_method='simple', model_dir=self.model_dir, **kwargs
+        )
+
+    def test_failed_members_degrade_ensemble(self):
+        """Test that members failing to fit or diverging are dropped and reweighted"""
+        for n_jobs in (1, 2):
+            ensemble = self.make_ensemble([None, 'fit', None, 'nan'], n_jobs=n_jobs)
+            ensemble.fit(make_series(48), 'value')
+            np.testing.assert_allclose(ensemble.weights, [1 / 3, 0, 1 / 3, 1 / 3])
+
+            forecast = ensemble.predict(n_periods=6)
+            np.testing.assert_allclose(forecast['forecast'].values, 20.0)
+
+            timings = ensemble.get_member_timings()
+            self.assertEqual(list(timings['name']), ['constant_10', 'constant_20', 'constant_30', 'constant_40'])
+            self.assertEqual(list(timings['status']), ['ok', 'fit_failed', 'ok', 'predict_failed'])
+            self.assertIn('LinAlgError', timings['error'][1])
+            self.assertTrue(timings['fit_seconds'][[0, 2, 3]].notna().all())
+            self.assertTrue(np.isnan(timings['predict_seconds'][1]))
+            self.assertEqual(ensemble.get_diagnostics()['members'][3]['status'], 'predict_failed')
+            ensemble.close()
+
+        with self.assertRaises(RuntimeError):
+            self.make_ensemble(['fit', 'fit']).fit(make_series(48), 'value')
+
+    def test_process_pool_keeps_member_order(self):
+        """Test that members fit in worker processes come back fitted and in order"""
+        ensemble = self.make_ensemble([None, None, None], n_jobs=2)
+        ensemble.fit(make_series(48), 'value')
+        self.assertEqual([f.value for f in ensemble.forecasters], [10, 20, 30])
+        self.assertTrue(all(f.is_fitted for f in ensemble.forecasters))
+        self.assertNotIn(os.getpid(), [f.fit_pid for f in ensemble.forecasters])
+        np.testing.assert_allclose(ensemble.predict(n_periods=4)['forecast'].values, 20.0)
+
+        # The pool is not pickled with the model
+        restored = EnsembleForecaster.load(ensemble.save(f"{self.model_dir}/ensemble.joblib"))
+        ensemble.close()
+        self.assertIsNone(restored.executor)
+        np.testing.assert_allclose(restored.predict(n_periods=4)['forecast'].values, 20.0)
+
+    def test_unpicklable_members_run_in_process(self):
+        """Test that members holding unpicklable state fit and predict in-process"""
+        ensemble = self.make_ensemble([None, None], n_jobs=2)
+        ensemble.forecasters[1].lock = threading.Lock()
+        ensemble.fit(make_series(48), 'value')
+
+        timings = ensemble.get_member_timings()
+        self.assertEqual(list(timings['status']), ['ok', 'ok'])
+        self.assertNotEqual(ensemble.forecasters[0].fit_pid, os.getpid())
+        self.assertEqual(ensemble.forecasters[1].fit_pid, os.getpid())
+        np.testing.assert_allclose(ensemble.predict(n_periods=4)['forecast'].values, 15.0)
+        self.assertEqual(ensemble.forecasters[1].predict_calls, 1)
+        ensemble.close()
+
+    def test_member_killing_its_worker_is_recorded_as_failed(self):
+        """Test that a member crashing its worker fails alone and is never run in-process"""
+        ensemble = self.make_ensemble([None, 'crash', None], n_jobs=2)
+        ensemble.fit(make_series(48), 'value')
+
+        timings = ensemble.get_member_timings()
+        self.assertEqual(list(timings['status']), ['ok', 'fit_failed', 'ok'])
+        self.assertIn('BrokenProcessPool', timings['error'][1])
+        self.assertNotEqual(ensemble.forecasters[0].fit_pid, os.getpid())
+        self.assertNotEqual(ensemble.forecasters[2].fit_pid, os.getpid())
+        np.testing.assert_allclose(ensemble.predict(n_periods=4)['forecast'].values, 20.0)
+        ensemble.close()
+
+
+class TestModelSelector(unittest.TestCase):
+    """Tests for the parallel, early-stopping cross-validation engine"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.model_dir = tempfile.mkdtemp()
+        warnings.simplefilter('ignore')
+
+    def tearDown(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.model_dir, ignore_errors=True)
+
+    def test_shared_frame_round_trip(self):
+        """Test that a series attached from shared memory matches the original"""
+        data = make_series(100).assign(hour=lambda df: df.index.hour)
+        segment, handle = _share_frame(data)
+        try:
+            attached = _attach_frame(handle)
+            pd.testing.assert_frame_equal(attached, data.astype(float))
+            self.assertEqual(attached.index.freq, data.index.freq)
+            self.assertIs(_attach_frame(handle), attached)
+        finally:
+            segment.unlink()
+        self.assertIsNone(_share_frame(data.assign(label='x')))
+
+    def test_early_stopping_and_parallel_cv(self):
+        """Test that hopeless candidates are pruned and parallel CV selects the same model"""
+        data = make_series(400)
+        candidates = [ConstantForecaster(value, self.model_dir) for value in (55, 500, 40)]
+
+        selector = ModelSelector(cv_folds=3)
+        selector._evaluate_with_cv(candidates, data, 'value', 24, 3)
+        self.assertEqual(selector.pruned_models, ['constant_500', 'constant_40'])
+        self.assertEqual(selector.model_performances['constant_500'], float('inf'))
+        self.assertFalse(any(c.is_fitted for c in candidates))
+
+        exhaustive = ModelSelector(cv_folds=3, early_stopping=False)
+        exhaustive._evaluate_with_cv(candidates, data, 'value', 24, 3)
+        self.assertEqual(exhaustive.pruned_models, [])
+        self.assertEqual(min(exhaustive.model_performances, key=exhaustive.model_performances.get), 'constant_55')
+        self.assertAlmostEqual(exhaustive.model_performances['constant_55'], selector.model_performances['constant_55'])
+
+        parallel = ModelSelector(cv_folds=3, n_jobs=2)
+        parallel._evaluate_with_cv(candidates, data, 'value', 24, 3)
+        parallel.close()
+        self.assertAlmostEqual(parallel.model_performances['constant_55'], selector.model_performances['constant_55'])
+        self.assertEqual(min(parallel.model_performances, key=parallel.model_performances.get), 'constant_55')
+
+    def test_select_best_model_many(self):
+        """Test batch selection across series in a shared pool"""
+        series = {f"station-{i}": make_series(240, seed=i) for i in range(3)}
+        selector = ModelSelector(models_to_try=['expsm'], cv_folds=2, n_jobs=2)
+        best = selector.select_best_model_many(series, 'value', forecast_horizon=12)
+        selector.close()
+
+        self.assertEqual(list(best), list(series))
+        for series_id, model in best.items():
+            self.assertTrue(model.is_fitted)
+            self.assertEqual(model.training_data.index[-1], series[series_id].index[-1])
+            self.assertTrue(np.isfinite(selector.series_performances[series_id]['expsm']))
+
+        sequential = ModelSelector(models_to_try=['expsm'], cv_folds=2)
+        sequential.select_best_model_many(series, 'value', forecast_horizon=12)
+        for series_id in series:
+            self.assertAlmostEqual(
+                sequential.series_performances[series_id]['expsm'],
+                selector.series_performances[series_id]['expsm']
+            )
+
+
+    def test_select_best_model_many_records_failed_series(self):
+        """Test that a series whose best model fails to fit is recorded instead of raising"""
+        series = {f"station-{i}": make_series(120, seed=i) for i in range(3)}
+        for n_jobs in (1, 2):
+            selector = ModelSelector(cv_folds=2, n_jobs=n_jobs)
+            selector._create_candidates = lambda data, *args: [ConstantForecaster(
+                50, self.model_dir, 'fit' if data is series['station-1'] else None
+            )]
+            best = selector.select_best_model_many(series, 'value', forecast_horizon=12)
+            selector.close()
+
+            self.assertEqual(list(best), ['station-0', 'station-2'])
+            self.assertEqual(list(selector.failed_series), ['station-1'])
+            self.assertIn('LinAlgError', selector.failed_series['station-1'])
+            self.assertEqual(selector.series_performances['station-1']['constant_50'], float('inf'))
+
+    def test_attached_frames_are_bounded_by_bytes(self):
+        """Test that the worker cache detaches frames once it maps too many bytes"""
+        data = make_series(1000)
+        shared = [_share_frame(data) for _ in range(3)]
+        try:
+            with patch('app.ml.forecasting.ensemble_forecaster._MAX_ATTACHED_BYTES', 2 * shared[0][0].size):
+                for _, handle in shared:
+                    _attach_frame(handle)
+                self.assertNotIn(shared[0][1]['name'], _ATTACHED_FRAMES)
+                self.assertIn(shared[2][1]['name'], _ATTACHED_FRAMES)
+                self.assertLessEqual(sum(segment.size for segment, _ in _ATTACHED_FRAMES.values()),
+                                     2 * shared[0][0].size)
+        finally:
+            for segment, handle in shared:
+                _ATTACHED_FRAMES.pop(handle['name'], None)
+                segment.close()
+                segment.unlink()
+
+class TestMultiSeriesExponentialSmoothing(unittest.TestCase):
+    """Tests for batched Holt-Winters fitting across series"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.model_dir = tempfile.mkdtemp()
+        warnings.simplefilter('ignore')
+        self.long = pd.concat([
+            make_series(240, seed=i).assign(value=lambda df, i=i: df['value'] * (1 + i), station_id=f"station-{i}")
+            for i in range(4)
+        ])
+
+    def tearDown(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.model_dir, ignore_errors=True)
+
+    def test_batched_fit_matches_statsmodels_recursions(self):
+        """Test batched forecasts against statsmodels with the same parameters and initial states"""
+        forecaster = MultiSeriesExponentialSmoothingForecaster(
+            trend='add', seasonal='mul', seasonal_periods=24, series_col='station_id', model_dir=self.model_dir
+        )
+        forecaster.fit(self.long, 'value')
+        self.assertEqual(len(forecaster.batch_ids), 4)
+        forecast = forecaster.predict(n_periods=12)
+        self.assertEqual(len(forecast), 48)
+        self.assertEqual(forecast.index[0], self.long.index[-1] + pd.Timedelta(hours=1))
+
+        wide = self.long.pivot(columns='station_id', values='value')
+        level, trend, season = forecaster._initial_states(wide.to_numpy())
+        params = forecaster.get_diagnostics()['params']
+        for i, station in enumerate(wide.columns):
+            reference = ExponentialSmoothing(
+                wide[station], trend='add', seasonal='mul', seasonal_periods=24,
+                initialization_method='known', initial_level=level[i],
+                initial_trend=trend[i], initial_seasonal=season[i]
+            ).fit(
+                smoothing_level=params.loc[station, 'smoothing_level'],
+                smoothing_trend=params.loc[station, 'smoothing_trend'],
+                smoothing_seasonal=params.loc[station, 'smoothing_seasonal'],
+                optimized=False
+            )
+            station_forecast = forecast[forecast['station_id'] == station]
+            np.testing.assert_allclose(station_forecast['forecast'].values, reference.forecast(12).values)
+            self.assertLess(params.loc[station, 'sse'], 1.1 * reference.sse + 1e-9)
+
+    def test_fallback_and_failed_series(self):
+        """Test per-series statsmodels fits where the batched fit does not apply"""
+        forecaster = MultiSeriesExponentialSmoothingForecaster(
+            trend='add', seasonal='add', seasonal_periods=24, series_col='station_id',
+            max_iter=0, model_dir=self.model_dir
+        )
+        forecaster.fit(self.long, 'value')
+        self.assertEqual(forecaster.batch_ids, [])
+        forecast = forecaster.predict(n_periods=6)
+        single = ExponentialSmoothingForecaster(
+            trend='add', seasonal='add', seasonal_periods=24, model_dir=self.model_dir
+        ).fit(self.long[self.long['station_id'] == 'station-2'], 'value')
+        np.testing.assert_allclose(
+            forecast.loc[forecast['station_id'] == 'station-2', 'forecast'].values,
+            single.predict(n_periods=6)['forecast'].values
+        )
+
+        wide = self.long.pivot(columns='station_id', values='value')
+        wide['station-0'] -= wide['station-0'].max()
+        forecaster = MultiSeriesExponentialSmoothingForecaster(seasonal='mul', model_dir=self.model_dir)
+        forecast = forecaster.fit(wide, 'value').predict()
+        self.assertEqual(list(forecaster.failed_series), ['station-0'])
+        self.assertTrue(forecast.loc[forecast['series'] == 'station-0', 'forecast'].isna().all())
+        self.assertTrue(forecast.loc[forecast['series'] != 'station-0', 'forecast'].notna().all())
+
+        with self.assertRaises(ValueError):
+            forecaster.fit(self.long.iloc[1:], 'value')
+
+    def test_evaluate_aligns_by_series_and_timestamp(self):
+        """Test per-series and overall metrics for long and wide test data"""
+        cutoff = self.long.index.unique()[216]
+        train, test = self.long[self.long.index < cutoff], self.long[self.long.index >= cutoff]
+        forecaster = MultiSeriesExponentialSmoothingForecaster(
+            trend='add', seasonal='add', seasonal_periods=24, series_col='station_id', model_dir=self.model_dir
+        ).fit(train, 'value')
+
+        # Rows out of order and a series missing part of the period
+        shuffled = test.sample(frac=1, random_state=0)
+        shuffled = shuffled[~((shuffled['station_id'] == 'station-3') & (shuffled.index >= cutoff + pd.Timedelta(hours=12)))]
+        results = forecaster.evaluate(shuffled, 'value', metrics=['mae', 'rmse'])
+
+        forecast = forecaster.predict(n_periods=24)
+        errors = []
+        for station in ['station-0', 'station-1', 'station-2', 'station-3']:
+            actual = shuffled[shuffled['station_id'] == station]['value'].sort_index()
+            predicted = forecast[forecast['station_id'] == station]['forecast'].loc[actual.index]
+            error = actual.values - predicted.values
+            self.assertAlmostEqual(results['per_series'].loc[station, 'mae'], np.mean(np.abs(error)))
+            errors.append(error)
+        errors = np.concatenate(errors)
+        self.assertAlmostEqual(results['mae'], np.mean(np.abs(errors)))
+        self.assertAlmostEqual(results['rmse'], np.sqrt(np.mean(errors ** 2)))
+
+        wide = MultiSeriesExponentialSmoothingForecaster(
+            trend='add', seasonal='add', seasonal_periods=24, model_dir=self.model_dir
+        ).fit(train.pivot(columns='station_id', values='value'), 'value')
+        wide_results = wide.evaluate(test.pivot(columns='station_id', values='value'), 'value')
+        self.assertEqual(list(wide_results['per_series'].index), ['station-0', 'station-1', 'station-2', 'station-3'])
+        self.assertTrue(np.isfinite(wide_results['mape']))
+
+
+class TestForecastCache(unittest.TestCase):
+    """Tests for cached predict calls"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.model_dir = tempfile.mkdtemp()
+        self.data = make_series(48)
+
+    def tearDown(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.model_dir, ignore_errors=True)
+
+    def test_keys_eviction_and_invalidation(self):
+        """Test cache keys, LRU eviction and invalidation on fit"""
+        forecaster = ConstantForecaster(10, self.model_dir).fit(self.data, 'value')
+        cache = forecaster.enable_forecast_cache(max_entries=2)
+        start = pd.Timestamp('2024-03-01')
+
+        first = forecaster.predict(start_date=start, n_periods=6)
+        first['forecast'] = 0.0
+        self.assertEqual(forecaster.predict(start, 6)['forecast'].iloc[0], 10)
+        self.assertEqual(forecaster.predict_calls, 1)
+
+        exogenous = pd.DataFrame({'temperature': np.arange(6.0)})
+        forecaster.predict(start_date=start, n_periods=6, exogenous_data=exogenous)
+        forecaster.predict(start_date=start, n_periods=6, exogenous_data=exogenous.copy())
+        self.assertEqual(forecaster.predict_calls, 2)
+        forecaster.predict(start_date=start, n_periods=6, exogenous_data=exogenous + 1)
+        self.assertEqual(forecaster.predict_calls, 3)
+
+        # The first forecast was least recently used
+        self.assertEqual(cache.get_stats()['entries'], 2)
+        forecaster.predict(start_date=start, n_periods=6)
+        self.assertEqual(forecaster.predict_calls, 4)
+
+        forecaster.fit(self.data, 'value')
+        self.assertEqual(cache.get_stats()['entries'], 0)
+        forecaster.predict(start_date=start, n_periods=6)
+        self.assertEqual(forecaster.predict_calls, 5)
+        self.assertEqual(cache.get_stats()['hits'], 2)
+
+    def test_ensemble_and_shared_disk_tier(self):
+        """Test member refits reaching the ensemble key and forecasts shared through disk"""
+        members = [ConstantForecaster(value, self.model_dir) for value in (10, 30)]
+        ensemble = EnsembleForecaster(forecasters=members, ensemble_method='simple', model_dir=self.model_dir)
+        ensemble.fit(self.data, 'value')
+        ensemble.enable_forecast_cache(cache_dir=f"{self.model_dir}/forecast_cache")
+        ensemble.predict(n_periods=4)
+        ensemble.predict(n_periods=4)
+        self.assertEqual(members[0].predict_calls, 1)
+
+        members[0].fit(self.data, 'value')
+        ensemble.predict(n_periods=4)
+        self.assertEqual(members[0].predict_calls, 2)
+
+        # Two workers loading the same saved model share forecasts through disk
+        path = ensemble.save(f"{self.model_dir}/ensemble.joblib")
+        worker_a, worker_b = EnsembleForecaster.load(path), EnsembleForecaster.load(path)
+        self.assertIsInstance(worker_a.forecast_cache, ForecastCache)
+        forecast = worker_a.predict(n_periods=8)
+        pd.testing.assert_frame_equal(worker_b.predict(n_periods=8), forecast)
+        self.assertEqual(worker_b.forecasters[0].predict_calls, worker_a.forecasters[0].predict_calls - 1)
+        self.assertEqual(worker_b.forecast_cache.get_stats()['disk_hits'], 1)
+
+
+
+@unittest.skipUnless(ONNXRUNTIME_AVAILABLE, "ONNX Runtime is not available")
+class TestOnnxRuntime(unittest.TestCase):
+    """Tests for batched ONNX Runtime inference"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.weights = np.random.default_rng(0).normal(size=(3, 2)).astype(np.float32)
+        self.bias = np.array([1.0, -1.0], dtype=np.float32)
+        self.model_path = os.path.join(self.temp_dir, 'linear.onnx')
+        self._write_linear_model(self.model_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _write_linear_model(self, path):
+        """Two-output linear model with a variable batch dimension"""
+        try:
+            import onnx
+            from onnx import helper, numpy_helper, TensorProto
+        except ImportError:
+            self.skipTest("onnx is not available")
+
+        nodes = [helper.make_node('MatMul', ['input', 'W'], ['scores'])]
+        outputs = []
+        for i, task in enumerate(['price', 'demand']):
+            nodes.append(helper.make_node('Gather', ['scores', f'idx_{i}'], [f'col_{i}'], axis=1))
+            nodes.append(helper.make_node('Add', [f'col_{i}', f'b_{i}'], [f'{task}_output']))
+            outputs.append(helper.make_tensor_value_info(f'{task}_output', TensorProto.FLOAT, ['batch', 1]))
+        initializers = [numpy_helper.from_array(self.weights, 'W')]
+        for i in range(2):
+            initializers.append(numpy_helper.from_array(np.array([i], dtype=np.int64), f'idx_{i}'))
+            initializers.append(numpy_helper.from_array(self.bias[i:i + 1], f'b_{i}'))
+        graph = helper.make_graph(
+            nodes, 'linear',
+            [helper.make_tensor_value_info('input', TensorProto.FLOAT, ['batch', 3])],
+            outputs, initializers
+        )
+        model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)], ir_version=8)
+        onnx.save(model, path)
+
+    def test_batched_run_matches_single_call(self):
+        """Chunked execution returns the same outputs as one call"""
+        X = np.random.default_rng(1).normal(size=(50, 3))
+        expected = X.astype(np.float32) @ self.weights + self.bias
+
+        whole = OnnxInferenceSession(self.model_path, max_batch_size=1024).run(X)
+        session = OnnxInferenceSession(self.model_path, intra_op_threads=1, max_batch_size=7)
+        chunked = session.run(X)
+
+        for i, name in enumerate(['price_output', 'demand_output']):
+            np.testing.assert_allclose(chunked[name].ravel(), expected[:, i], rtol=1e-5)
+            np.testing.assert_array_equal(chunked[name], whole[name])
+        self.assertEqual(session.get_stats()['samples'], 50)
+
+        # Sessions pickle by path, for process pools
+        clone = pickle.loads(pickle.dumps(session))
+        np.testing.assert_array_equal(clone.run(X)['price_output'], chunked['price_output'])
+
+    def test_multitask_model_serves_through_runtime(self):
+        """Task outputs are matched by name and inverse-scaled"""
+        from sklearn.preprocessing import StandardScaler
+
+        features = ['f0', 'f1', 'f2']
+        data = pd.DataFrame(np.random.default_rng(2).normal(size=(20, 3)), columns=features)
+        model = SharedRepresentationModel(
+            name='onnx_multitask', tasks=['demand', 'price'], model_dir=self.temp_dir
+        )
+        model.feature_columns = features
+        model.is_fitted = True
+        model.scalers['features'] = StandardScaler(with_mean=False, with_std=False).fit(data.values)
+        for task in model.tasks:
+            model.scalers[task] = StandardScaler(with_mean=False, with_std=False).fit(np.zeros((2, 1)))
+        model.use_onnx_runtime(self.model_path, max_batch_size=8)
+
+        predictions = model.predict(data, return_dataframe=True)
+        expected = data.values.astype(np.float32) @ self.weights + self.bias
+        np.testing.assert_allclose(predictions['price'], expected[:, 0], rtol=1e-5)
+        np.testing.assert_allclose(predictions['demand'], expected[:, 1], rtol=1e-5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,370 @@
+"""
+Tests for Model Monitoring
+
+This module tests the model monitoring system, covering the bounded columnar
+prediction log behind ModelMonitor, the drift, baseline and performance
+calculations that read from it, the mergeable drift sketches, the event
+log and snapshots the monitor state is persisted with, and the aggregation of
+metrics from several worker processes.
+"""
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add the app directory to the path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent))
+
+from app.ml.monitoring.model_monitor import ModelMonitor, ModelMonitorRegistry
+from app.ml.monitoring.fleet_aggregator import MetricPublisher, MonitorAggregator
+from app.ml.monitoring.prediction_log import PredictionLog
+from app.ml.monitoring.monitor_store import MonitorLog, PersistenceWorker
+from app.ml.monitoring.drift_sketch import DriftEngine, HistogramSketch, compare_sketches, make_edges
+from scipy import stats
+
+
+def make_predictions(n, shift=0.0, seed=0, start=None):
+    """
+    Generate predictions with features and actuals
+
+    Args:
+        n: Number of predictions to generate
+        shift: Offset added to the battery_temp feature
+        seed: Random seed
+        start: Timestamp of the first prediction
+
+    Returns:
+        List of (prediction, features, actual, timestamp) tuples
+    """
+    rng = np.random.default_rng(seed)
+    start = start or datetime(2024, 1, 1)
+    records = []
+    for i in range(n):
+        features = {
+            'battery_temp': 25 + shift + rng.normal(0, 2),
+            'charge_cycles': int(rng.integers(100, 200)),
+            'chemistry': 'NMC'
+        }
+        prediction = 95 - features['battery_temp'] / 10 + rng.normal(0, 0.5)
+        records.append((prediction, features, prediction + rng.normal(0, 1), start + timedelta(minutes=i)))
+    return records
+
+
+class TestPredictionLog(unittest.TestCase):
+    """Tests for the bounded columnar prediction log"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.storage_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.storage_path, ignore_errors=True)
+
+    def test_log_is_bounded(self):
+        """Test that the log keeps the last capacity predictions in order"""
+        log = PredictionLog(capacity=100)
+        records = make_predictions(1050)
+        for prediction, features, _, timestamp in records:
+            log.append(prediction, features, None, timestamp)
+        memory = log.get_stats()['memory_bytes']
+        for prediction, features, _, timestamp in make_predictions(500, seed=1):
+            log.append(prediction, features, None, timestamp)
+        records += make_predictions(500, seed=1)
+
+        self.assertEqual(len(log), 100)
+        self.assertEqual(log.total, 1550)
+        self.assertEqual(log.get_stats()['memory_bytes'], memory)
+        self.assertEqual(set(log.features), {'battery_temp', 'charge_cycles'})
+        np.testing.assert_allclose(
+            log.feature_values('battery_temp'), [r[1]['battery_temp'] for r in records[-100:]]
+        )
+        np.testing.assert_allclose(
+            log.feature_values('charge_cycles', last=10), [r[1]['charge_cycles'] for r in records[-10:]]
+        )
+
+        self.assertTrue(log.set_actual(1.5, -3))
+        self.assertTrue(log.set_actual(2.5, 0))
+        self.assertFalse(log.set_actual(3.5, 100))
+        y_pred, y_true = log.pairs()
+        np.testing.assert_allclose(y_true, [2.5, 1.5])
+        np.testing.assert_allclose(y_pred, [records[-100][0], records[-3][0]])
+
+    def test_label_predictions(self):
+        """Test that non-numeric predictions switch the column to objects"""
+        log = PredictionLog(capacity=10)
+        for i in range(15):
+            log.append('ok' if i % 3 else 'fault', {}, 'ok')
+        log.set_actual(None, -1)
+        y_pred, y_true = log.pairs()
+        self.assertEqual(len(y_true), 9)
+        self.assertEqual(list(y_true), ['ok'] * 9)
+        self.assertEqual(log.actual_count(), 9)
+
+    def test_monitor_reads_log(self):
+        """Test drift, performance and persistence on top of the log"""
+        monitor = ModelMonitor(
+            'battery_health_test', 'battery_health_prediction',
+            storage_path=self.storage_path, drift_detection_window=200, acceptable_drift_threshold=0.2
+        )
+        for prediction, features, actual, timestamp in make_predictions(300):
+            monitor.record_prediction(prediction, features, actual, timestamp)
+        self.assertTrue(monitor.baseline_set)
+        self.assertEqual(len(monitor.prediction_log), 200)
+        self.assertEqual(monitor._check_for_drift()['status'], 'normal')
+
+        performance = monitor._calculate_performance_metrics()
+        self.assertEqual(performance['sample_size'], 200)
+        self.assertLess(performance['metrics']['mae'], 1.5)
+
+        for prediction, features, actual, timestamp in make_predictions(200, shift=10, seed=2):
+            monitor.record_prediction(prediction, features, actual, timestamp)
+        drift = monitor._check_for_drift()
+        self.assertEqual(drift['status'], 'drift_detected')
+        self.assertEqual(drift['max_drift_feature'], 'battery_temp')
+
+        monitor.save()
+        restored = ModelMonitor(
+            'battery_health_test', 'battery_health_prediction',
+            storage_path=self.storage_path, drift_detection_window=200, acceptable_drift_threshold=0.2
+        )
+        self.assertEqual(restored.prediction_log.total, 500)
+        np.testing.assert_array_equal(
+            restored.prediction_log.feature_values('battery_temp'),
+            monitor.prediction_log.feature_values('battery_temp')
+        )
+        self.assertEqual(restored.get_monitoring_summary()['actuals_tracked'], 200)
+        self.assertEqual(restored._check_for_drift()['feature_drift'], drift['feature_drift'])
+
+
+class TestDriftSketch(unittest.TestCase):
+    """Tests for the mergeable histogram sketches used for drift detection"""
+
+    def test_distances_match_exact(self):
+        """Test that sketch distances approximate the exact statistics"""
+        rng = np.random.default_rng(4)
+        baseline_values = rng.normal(0, 1, 5000)
+        current_values = rng.normal(0.5, 1.3, 2000)
+        baseline = HistogramSketch(make_edges(baseline_values))
+        baseline.update_many(baseline_values)
+        current = HistogramSketch(baseline.edges)
+        for value in current_values:
+            current.update(value)
+
+        distances = compare_sketches(baseline, current)
+        self.assertAlmostEqual(
+            distances['ks_statistic'], stats.ks_2samp(baseline_values, current_values).statistic, delta=0.02
+        )
+        self.assertAlmostEqual(
+            distances['wasserstein'], stats.wasserstein_distance(baseline_values, current_values), delta=0.05
+        )
+        self.assertGreater(distances['psi'], 0.2)
+        self.assertLess(distances['ks_pvalue'], 1e-6)
+        self.assertAlmostEqual(current.mean(), current_values.mean())
+        self.assertAlmostEqual(current.std(), current_values.std())
+
+        same = HistogramSketch(baseline.edges)
+        same.update_many(rng.normal(0, 1, 2000))
+        self.assertLess(compare_sketches(baseline, same)['psi'], 0.05)
+
+    def test_engine_window_and_merge(self):
+        """Test the sliding window and merging sketches across engines"""
+        rng = np.random.default_rng(5)
+        engines = [DriftEngine(window=100, n_blocks=10) for _ in range(2)]
+        baseline_values = rng.normal(0, 1, 500)
+        for engine in engines:
+            engine.set_baseline({'x': baseline_values})
+
+        values = rng.normal(3, 1, 230)
+        for value in values:
+            engines[0].update({'x': value, 'label': 'a'})
+        current = engines[0].current('x')
+        self.assertEqual(current.count, 100)
+        self.assertAlmostEqual(current.mean(), values[-100:].mean())
+
+        engines[1].update_many({'x': values[:50]}, 50)
+        merged = engines[0].current('x').merge(engines[1].current('x'))
+        self.assertEqual(merged.count, 150)
+        np.testing.assert_array_equal(
+            merged.counts, np.bincount(
+                np.searchsorted(merged.edges, np.concatenate([values[-100:], values[:50]]), side='right'),
+                minlength=len(merged.counts)
+            )
+        )
+
+        restored = DriftEngine()
+        restored.set_state(engines[0].get_state())
+        self.assertEqual(restored.compare('x')['ks_statistic'], engines[0].compare('x')['ks_statistic'])
+
+
+class TestMonitorPersistence(unittest.TestCase):
+    """Tests for the append-only event log and snapshots of monitor state"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.storage_path = tempfile.mkdtemp()
+        self.worker = PersistenceWorker()
+
+    def tearDown(self):
+        """Clean up test environment"""
+        self.worker.close()
+        shutil.rmtree(self.storage_path, ignore_errors=True)
+
+    def make_monitor(self, snapshot_interval=5000):
+        """Create a monitor on the test storage path"""
+        return ModelMonitor(
+            'battery_health_test', 'battery_health_prediction',
+            storage_path=self.storage_path, drift_detection_window=200, acceptable_drift_threshold=0.2,
+            persistence_worker=self.worker, snapshot_interval=snapshot_interval
+        )
+
+    def test_replay_without_snapshot(self):
+        """Test that a monitor is rebuilt from the event log alone"""
+        monitor = self.make_monitor()
+        for prediction, features, _, timestamp in make_predictions(250):
+            monitor.record_prediction(prediction, features, None, timestamp)
+        monitor.record_actual(1.25, -1)
+        monitor.record_actual(2.5, 0)
+        monitor.store.flush()
+        self.assertFalse(os.path.exists(os.path.join(monitor.model_dir, 'snapshot.joblib')))
+
+        restored = self.make_monitor()
+        self.assertEqual(restored.prediction_log.total, 250)
+        self.assertTrue(restored.baseline_set)
+        np.testing.assert_array_equal(restored.prediction_log.pairs()[1], monitor.prediction_log.pairs()[1])
+        np.testing.assert_array_equal(
+            restored.prediction_log.feature_values('battery_temp'),
+            monitor.prediction_log.feature_values('battery_temp')
+        )
+        self.assertEqual(
+            restored.drift_engine.compare('battery_temp')['psi'], monitor.drift_engine.compare('battery_temp')['psi']
+        )
+        self.assertEqual(restored.store.last_lsn(), 252)
+
+    def test_snapshot_then_tail(self):
+        """Test that snapshots drop covered segments and the tail is replayed on top"""
+        monitor = self.make_monitor(snapshot_interval=100)
+        for prediction, features, actual, timestamp in make_predictions(230):
+            monitor.record_prediction(prediction, features, actual, timestamp)
+        monitor.store.flush()
+        self.assertTrue(os.path.exists(os.path.join(monitor.model_dir, 'snapshot.joblib')))
+        self.assertEqual(monitor.store.get_stats()['segments'], 1)
+
+        restored = self.make_monitor(snapshot_interval=100)
+        self.assertEqual(restored.prediction_log.total, 230)
+        np.testing.assert_array_equal(
+            restored.prediction_log.feature_values('charge_cycles'),
+            monitor.prediction_log.feature_values('charge_cycles')
+        )
+
+        # Keep recording after the restart
+        for prediction, features, actual, timestamp in make_predictions(20, seed=3):
+            restored.record_prediction(prediction, features, actual, timestamp)
+        restored.save()
+        self.assertEqual(restored.store.get_stats()['segments'], 0)
+        self.assertEqual(self.make_monitor().prediction_log.total, 250)
+
+    def test_torn_tail(self):
+        """Test that replay stops at a partially written event"""
+        log = MonitorLog(self.storage_path, worker=self.worker)
+        for i in range(5):
+            log.append({'type': 'actual', 'sequence': i, 'actual': float(i)})
+        log.close()
+        segment_path = os.path.join(self.storage_path, 'events-00000001.log')
+        with open(segment_path, 'r+b') as f:
+            f.truncate(os.path.getsize(segment_path) - 3)
+
+        state, events = MonitorLog(self.storage_path, worker=self.worker).load()
+        self.assertIsNone(state)
+        self.assertEqual([event['lsn'] for event in events], [1, 2, 3, 4])
+
+
+class TestFleetAggregation(unittest.TestCase):
+    """Tests for merging metric deltas from several workers in an aggregator"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.storage_path = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.storage_path, 'aggregator.sock')
+        self.aggregator = MonitorAggregator(self.socket_path, window=200, acceptable_drift_threshold=0.2)
+        self.aggregator.start()
+
+    def tearDown(self):
+        """Clean up test environment"""
+        self.aggregator.close()
+        shutil.rmtree(self.storage_path, ignore_errors=True)
+
+    def make_registry(self, name):
+        """Create a registry standing in for one worker process"""
+        registry = ModelMonitorRegistry(
+            os.path.join(self.storage_path, name), aggregator_socket=self.socket_path, publish_interval=60
+        )
+        registry.publisher.worker_id = name
+        return registry
+
+    def test_workers_merge(self):
+        """Test that counts, errors and drift are merged across workers"""
+        registries = [self.make_registry('worker-a'), self.make_registry('worker-b')]
+        records = make_predictions(400)
+        for i, (prediction, features, actual, timestamp) in enumerate(records):
+            registries[i % 2].record_prediction(
+                'battery_health_v1', prediction, features, 'battery_health_prediction', actual, timestamp
+            )
+            if i == 250:
+                # Both workers have a baseline and offer it to the aggregator
+                for registry in registries:
+                    registry.publisher.publish()
+        registries[0].record_actual('battery_health_v1', 80.0, -1)
+
+        registries[1].publisher.publish()
+        status = registries[0].get_all_models_status()
+        self.assertEqual(status['models']['battery_health_v1']['predictions_tracked'], 200)
+        fleet = status['fleet']['models']['battery_health_v1']
+        self.assertEqual(fleet['workers'], 2)
+        self.assertEqual(fleet['predictions_tracked'], 400)
+        self.assertEqual(fleet['actuals_tracked'], 401)
+
+        y_true = np.array([r[2] for r in records] + [80.0])
+        y_pred = np.array([r[0] for r in records] + [records[-2][0]])
+        self.assertAlmostEqual(
+            fleet['current_performance']['mae'], np.abs(y_true - y_pred).mean(), places=6
+        )
+        self.assertAlmostEqual(
+            fleet['current_performance']['rmse'], np.sqrt(((y_true - y_pred) ** 2).mean()), places=6
+        )
+        self.assertEqual(fleet['drift_status']['status'], 'normal')
+
+        # A shift seen by only one worker shows up in the fleet view
+        for prediction, features, actual, timestamp in make_predictions(200, shift=10, seed=2):
+            registries[1].record_prediction('battery_health_v1', prediction, features, None, actual, timestamp)
+        fleet = registries[1].publisher.fleet_status()['models']['battery_health_v1']
+        self.assertEqual(fleet['drift_status']['status'], 'drift_detected')
+        self.assertEqual(fleet['drift_status']['max_drift_feature'], 'battery_temp')
+
+        for registry in registries:
+            registry.publisher.close()
+
+    def test_publisher_keeps_deltas(self):
+        """Test that deltas are kept while the aggregator is unreachable"""
+        self.aggregator.close()
+        publisher = MetricPublisher(self.socket_path, worker_id='worker-a')
+        for prediction, features, actual, _ in make_predictions(20):
+            publisher.record_prediction('model', 'battery_health_prediction', prediction, features, actual)
+        self.assertFalse(publisher.publish())
+        self.assertIsNone(publisher.fleet_status())
+
+        self.aggregator.start()
+        self.assertTrue(publisher.publish())
+        status = publisher.fleet_status()['models']['model']
+        self.assertEqual(status['predictions_tracked'], 20)
+        self.assertEqual(status['actuals_tracked'], 20)
+        self.assertEqual(publisher.get_stats()['failed_publishes'], 2)
+        publisher.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,1071 @@
+"""
+Tests for the Telemetry Data Pipeline
+
+This module tests the telemetry ingestion pipeline, covering the batch ingestion
+path and its agreement with the per-record validation path, the
+partitioned Parquet dataset used for storage and its query engine, the
+database sink, the sharded asynchronous processor and the write-ahead log.
+"""
+import sys
+import os
+import json
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+import pandas as pd
+import numpy as np
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add the app directory to the path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent))
+
+from app.ml.data_pipeline.telemetry_ingestion import TelemetryProcessor, AsyncTelemetryProcessor
+from app.ml.data_pipeline.telemetry_dataset import DatasetManifest, TelemetryDatasetWriter, vehicle_bucket
+from app.ml.data_pipeline.telemetry_db_sink import TelemetryDatabaseSink
+from app.ml.data_pipeline.telemetry_wal import TelemetryWAL
+from app.ml.data_pipeline.telemetry_store import TelemetryStore
+from app.ml.data_pipeline.telemetry_rollup import TelemetryRollup, aggregate_raw
+from app.ml.data_pipeline.telemetry_codec import encode_frame, decode_frame, read_encoded
+from app.ml.data_pipeline.vehicle_buffer import VehicleRingBuffer
+from app.ml.data_pipeline.anomaly_detection import AnomalyDetectionPipeline
+from app.ml.data_pipeline.anomaly_store import AnomalyStore
+from app.ml.anomaly_detection.battery_anomaly_detector import BatteryAnomalyDetector
+
+
+def make_battery_records(n, vehicle_count=3, start=None):
+    """
+    Generate valid battery telemetry records
+
+    Args:
+        n: Number of records to generate
+        vehicle_count: Number of distinct vehicles
+        start: Timestamp of the first record
+
+    Returns:
+        List of battery telemetry dicts
+    """
+    start = start or datetime(2024, 1, 1)
+    return [
+        {
+            'vehicle_id': f"TEST-{i % vehicle_count + 1}",
+            'timestamp': start + timedelta(seconds=10 * i),
+            'state_of_charge': 80 - (i % 10),
+            'battery_temp': 25 + (i % 5),
+            'voltage': 400 - (i % 20),
+            'current': 10.0 if i % 2 == 0 else -5.0,
+            'charging_status': 1 if i % 2 == 0 else 0
+        }
+        for i in range(n)
+    ]
+
+
+class TestBatchIngestion(unittest.TestCase):
+    """Tests for the columnar batch ingestion API"""
+
+    def setUp(self):
+        """Create a processor writing to a temporary directory"""
+        self.storage_path = tempfile.mkdtemp()
+        self.processor = TelemetryProcessor(
+            batch_size=1000,
+            buffer_timeout=3600,
+            storage_path=self.storage_path,
+            enable_anomaly_detection=False,
+            partitioned_storage=True
+        )
+
+    def tearDown(self):
+        """Remove the temporary directory"""
+        shutil.rmtree(self.storage_path, ignore_errors=True)
+
+    def test_batch_rejections_match_record_path(self):
+        """Test that the batch path rejects the same rows as pydantic"""
+        records = make_battery_records(6)
+        records[1]['state_of_charge'] = 120
+        records[3]['voltage'] = -1
+        records[4]['battery_temp'] = 'hot'
+        del records[5]['charging_status']
+
+        result = self.processor.process_battery_batch([dict(r) for r in records])
+
+        record_processor = TelemetryProcessor(
+            storage_path=self.storage_path, enable_anomaly_detection=False
+        )
+        record_rejected = [
+            i for i, r in enumerate(records)
+            if record_processor.process_battery_telemetry(dict(r)) is None
+        ]
+
+        self.assertEqual(result.rejected_rows, record_rejected)
+        self.assertEqual(result.accepted, 2)
+        self.assertIn('state_of_charge', result.rejected[0]['errors'][0])
+        self.assertEqual(self.processor.error_count, 4)
+
+    def test_column_dict_and_dataframe_inputs(self):
+        """Test that column dicts and DataFrames are accepted"""
+        df = pd.DataFrame(make_battery_records(50))
+
+        result_df = self.processor.process_battery_batch(df)
+        result_cols = self.processor.process_battery_batch({c: df[c].tolist() for c in df.columns})
+
+        self.assertEqual(result_df.accepted, 50)
+        self.assertEqual(result_cols.accepted, 50)
+        self.assertEqual(self.processor.get_stats()['battery_buffer_size'], 100)
+
+    def test_batch_flush_combines_buffers(self):
+        """Test that a flush writes rows from both ingestion paths"""
+        records = make_battery_records(5)
+        self.processor.process_battery_telemetry(dict(records[0]))
+        self.processor.process_battery_batch(records[1:])
+        self.processor.close()
+
+        files = self.processor.dataset_writer.manifest.select('battery')
+        stored = pd.concat(pd.read_parquet(os.path.join(self.storage_path, f)) for f, _ in files)
+        self.assertEqual(len(stored), 5)
+        self.assertTrue(pd.api.types.is_datetime64_dtype(stored['timestamp']))
+
+    def test_batch_anomaly_detection(self):
+        """Test that anomalies are raised for rows in a batch"""
+        self.processor.enable_anomaly_detection = True
+        anomalies = []
+        self.processor.register_anomaly_callback(anomalies.append)
+
+        records = make_battery_records(10)
+        records[7]['battery_temp'] = 65
+        self.processor.process_battery_batch(records)
+
+        high_temp = [a for a in anomalies if a['anomaly_type'] == 'high_temperature']
+        self.assertEqual(len(high_temp), 1)
+        self.assertEqual(high_temp[0]['severity'], 'high')
+
+    def test_batch_and_record_anomalies_agree(self):
+        """Test that the batch rules raise the same anomalies as the record path"""
+        records = make_battery_records(40)
+        for i in range(0, 40, 3):
+            records[i]['battery_temp'] = -15 + i * 2
+            records[i]['voltage'] = 280 + i
+
+        batch_processor = TelemetryProcessor(storage_path=self.storage_path)
+        batches = []
+        batch_processor.register_anomaly_batch_callback(batches.append)
+        batch_processor.process_battery_batch([dict(r) for r in records])
+
+        record_anomalies = []
+        self.processor.enable_anomaly_detection = True
+        self.processor.register_anomaly_callback(record_anomalies.append)
+        for record in records:
+            self.processor.process_battery_telemetry(dict(record))
+
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(batches[0], record_anomalies)
+
+    def test_failing_anomaly_callback_sees_every_anomaly(self):
+        """Test that a callback failing on one anomaly still receives the rest"""
+        seen = []
+
+        def callback(anomaly):
+            seen.append(anomaly)
+            if len(seen) == 1:
+                raise RuntimeError("callback failed")
+
+        self.processor.enable_anomaly_detection = True
+        self.processor.register_anomaly_callback(callback)
+        records = make_battery_records(10)
+        for i in (2, 5, 7):
+            records[i]['battery_temp'] = 65
+        self.processor.process_battery_batch(records)
+
+        self.assertEqual(len([a for a in seen if a['anomaly_type'] == 'high_temperature']), 3)
+
+    def test_configured_rules_and_log_rate_limit(self):
+        """Test rules loaded from config and capped anomaly logging"""
+        rules_path = os.path.join(self.storage_path, 'rules.json')
+        with open(rules_path, 'w') as f:
+            json.dump({'rules': [{'anomaly_type': 'hot', 'column': 'battery_temp', 'op': '>=', 'threshold': 27}]}, f)
+
+        processor = TelemetryProcessor(
+            storage_path=self.storage_path,
+            anomaly_rules=rules_path,
+            anomaly_log_options={'max_logs_per_interval': 3}
+        )
+        anomalies = []
+        processor.register_anomaly_callback(anomalies.append)
+        with self.assertLogs('app.ml.data_pipeline.anomaly_rules', level='WARNING') as logs:
+            processor.process_battery_batch(make_battery_records(100))
+
+        self.assertEqual(len(anomalies), 60)
+        self.assertEqual({a['anomaly_type'] for a in anomalies}, {'hot'})
+        self.assertEqual(len(logs.records), 3)
+        self.assertEqual(processor.get_stats()['anomalies']['suppressed_logs'], 57)
+
+
+class TestTelemetryDataset(unittest.TestCase):
+    """Tests for the partitioned telemetry dataset writer"""
+
+    def setUp(self):
+        """Create a temporary dataset root"""
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary dataset root"""
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_flushes_append_to_same_file(self):
+        """Test that repeated writes append row groups instead of new files"""
+        writer = TelemetryDatasetWriter(self.root, num_buckets=1)
+        records = make_battery_records(30, vehicle_count=1)
+        for i in range(3):
+            writer.write('battery', pd.DataFrame(records[i * 10:(i + 1) * 10]))
+        writer.close()
+
+        files = writer.manifest.select('battery')
+        self.assertEqual(len(files), 1)
+        rel_path, entry = files[0]
+        self.assertEqual(entry['rows'], 30)
+        self.assertEqual(entry['min_timestamp'], records[0]['timestamp'].isoformat())
+        self.assertEqual(entry['max_timestamp'], records[-1]['timestamp'].isoformat())
+        self.assertEqual(len(pd.read_parquet(os.path.join(self.root, rel_path))), 30)
+
+    def test_appends_do_not_rewrite_manifest(self):
+        """Test that the manifest is saved when files open or close, and open files are deleted on restart"""
+        writer = TelemetryDatasetWriter(self.root, num_buckets=1)
+        records = make_battery_records(30, vehicle_count=1)
+        saves = []
+        original_save = writer.manifest.save
+
+        def save(sync=False):
+            saves.append(sync)
+            original_save(sync)
+
+        writer.manifest.save = save
+        for i in range(3):
+            writer.write('battery', pd.DataFrame(records[i * 10:(i + 1) * 10]))
+        self.assertEqual(saves, [False])
+
+        # Simulate a crash: the open file has no footer and is deleted on restart
+        (rel_path, _), = writer.manifest.select('battery', include_open=True)
+        restarted = TelemetryDatasetWriter(self.root, num_buckets=1)
+        self.assertFalse(os.path.exists(os.path.join(self.root, rel_path)))
+        self.assertEqual(restarted.manifest.files, {})
+        self.assertEqual(DatasetManifest(self.root).files, {})
+
+    def test_partitioning_and_rollover(self):
+        """Test partitioning by date and bucket, and rollover at the target size"""
+        writer = TelemetryDatasetWriter(self.root, num_buckets=4, target_file_size=1)
+        day_one = make_battery_records(20, vehicle_count=5, start=datetime(2024, 1, 1))
+        day_two = make_battery_records(20, vehicle_count=5, start=datetime(2024, 1, 2))
+        writer.write('battery', pd.DataFrame(day_one + day_two))
+        writer.write('battery', pd.DataFrame(day_two))
+        writer.close()
+
+        dates = {entry['date'] for _, entry in writer.manifest.select('battery')}
+        self.assertEqual(dates, {'2024-01-01', '2024-01-02'})
+
+        # Every write rolled over, so no file holds more than one write
+        day_two_files = writer.manifest.select('battery', start=datetime(2024, 1, 2))
+        expected_buckets = len(set(vehicle_bucket([r['vehicle_id'] for r in day_two], 4)))
+        self.assertEqual(len(day_two_files), 2 * expected_buckets)
+
+        # Manifest survives a restart
+        reopened = TelemetryDatasetWriter(self.root, num_buckets=4)
+        self.assertEqual(reopened.get_stats()['total_rows'], 60)
+
+
+class TestTelemetryStore(unittest.TestCase):
+    """Tests for the telemetry query engine"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Write three days of telemetry for ten vehicles"""
+        cls.root = tempfile.mkdtemp()
+        records = make_battery_records(3 * 8640, vehicle_count=10)
+        cls.df = pd.DataFrame(records)
+        writer = TelemetryDatasetWriter(cls.root, num_buckets=4)
+        for start in range(0, len(cls.df), 2000):
+            writer.write('battery', cls.df.iloc[start:start + 2000])
+        writer.close()
+        cls.store = TelemetryStore(cls.root)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the dataset"""
+        shutil.rmtree(cls.root, ignore_errors=True)
+
+    def test_scan_matches_pandas_filter(self):
+        """Test that a scan returns exactly the rows of a pandas filter"""
+        start, end = datetime(2024, 1, 2, 6), datetime(2024, 1, 2, 18)
+        result = self.store.scan(['TEST-2', 'TEST-7'], start, end, columns=['timestamp', 'voltage'])
+
+        df = self.df
+        expected = df[df['vehicle_id'].isin(['TEST-2', 'TEST-7']) &
+                      (df['timestamp'] >= start) & (df['timestamp'] <= end)]
+        self.assertEqual(list(result.columns), ['timestamp', 'voltage'])
+        self.assertEqual(len(result), len(expected))
+        self.assertTrue(result['timestamp'].is_monotonic_increasing)
+        np.testing.assert_allclose(result['voltage'].to_numpy(), expected['voltage'].to_numpy())
+
+    def test_manifest_prunes_files(self):
+        """Test that files outside the window or bucket are skipped"""
+        all_files = self.store._select_files('battery', None, None, None)
+        day_files = self.store._select_files(
+            'battery', ['TEST-1'], pd.Timestamp('2024-01-02'), pd.Timestamp('2024-01-02 12:00')
+        )
+        self.assertLess(len(day_files), len(all_files) / 4)
+
+    def test_iter_scan_streams_batches(self):
+        """Test that the streaming scan yields bounded batches covering the window"""
+        batches = list(self.store.iter_scan(['TEST-3'], '2024-01-01', '2024-01-03', batch_size=100))
+        self.assertTrue(all(len(b) <= 100 for b in batches))
+        expected = self.store.scan(['TEST-3'], '2024-01-01', '2024-01-03')
+        self.assertEqual(sum(len(b) for b in batches), len(expected))
+
+
+class TestDatabaseSink(unittest.TestCase):
+    """Tests for the pooled background database sink"""
+
+    def setUp(self):
+        """Create a temporary SQLite database"""
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, 'telemetry.db')
+
+    def tearDown(self):
+        """Remove the temporary database"""
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_processor_writes_through_sink(self):
+        """Test that flushes are written by the sink and reported in stats"""
+        processor = TelemetryProcessor(
+            batch_size=10,
+            storage_path=os.path.join(self.tmpdir, 'files'),
+            db_connection_string=f"sqlite:///{self.db_path}",
+            enable_anomaly_detection=False
+        )
+        processor.process_battery_batch(make_battery_records(25))
+        processor.db_sink.flush(timeout=10)
+
+        stats = processor.get_stats()['database']
+        self.assertEqual(stats['rows_written'], 25)
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(stats['error_count'], 0)
+
+        processor.close()
+        with sqlite3.connect(self.db_path) as conn:
+            count = conn.execute("SELECT COUNT(*) FROM battery_telemetry").fetchone()[0]
+            timestamp = conn.execute("SELECT MIN(timestamp) FROM battery_telemetry").fetchone()[0]
+        self.assertEqual(count, 25)
+        self.assertTrue(timestamp.startswith('2024-01-01 00:00:00'))
+
+    def test_processor_counts_batches_the_sink_drops(self):
+        """Test that flushes the sink cannot queue are counted and still stored to files"""
+        processor = TelemetryProcessor(
+            batch_size=10,
+            storage_path=os.path.join(self.tmpdir, 'files'),
+            enable_anomaly_detection=False
+        )
+        processor.db_sink = TelemetryDatabaseSink(f"sqlite:///{self.db_path}", max_queue_size=1, block_when_full=False)
+        processor.db_sink._thread = threading.Thread()  # Pretend a worker exists but never drains
+        records = make_battery_records(20)
+        processor.process_battery_batch(records[:10])
+        with self.assertLogs('app.ml.data_pipeline.telemetry_ingestion', level='WARNING'):
+            processor.process_battery_batch(records[10:])
+
+        stats = processor.get_stats()
+        self.assertEqual(stats['db_dropped_batches'], 1)
+        self.assertEqual(stats['db_dropped_records'], 10)
+        files = [f for f in os.listdir(os.path.join(self.tmpdir, 'files')) if f.endswith('.parquet')]
+        self.assertEqual(sum(len(pd.read_parquet(os.path.join(self.tmpdir, 'files', f))) for f in files), 20)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """Test that submit() can be made not to block when the queue is full"""
+        sink = TelemetryDatabaseSink(f"sqlite:///{self.db_path}", max_queue_size=1, block_when_full=False)
+        sink._thread = threading.Thread()  # Pretend a worker exists but never drains
+        df = pd.DataFrame(make_battery_records(5))
+
+        self.assertTrue(sink.submit('battery', df))
+        self.assertFalse(sink.submit('battery', df))
+        self.assertEqual(sink.get_stats()['batches_dropped'], 1)
+
+    def test_full_queue_waits_for_room_by_default(self):
+        """Test that submit() waits for the worker instead of dropping batches"""
+        sink = TelemetryDatabaseSink(f"sqlite:///{self.db_path}", max_queue_size=1)
+        df = pd.DataFrame(make_battery_records(5))
+
+        for _ in range(5):
+            self.assertTrue(sink.submit('battery', df))
+        self.assertTrue(sink.flush(timeout=10))
+        sink.close()
+
+        stats = sink.get_stats()
+        self.assertEqual(stats['batches_dropped'], 0)
+        self.assertEqual(stats['rows_written'], 25)
+
+        # A bounded wait still drops, and reports it, once the queue stays full
+        sink = TelemetryDatabaseSink(f"sqlite:///{self.db_path}", max_queue_size=1, submit_timeout=0.05)
+        sink._thread = threading.Thread()  # Pretend a worker exists but never drains
+        self.assertTrue(sink.submit('battery', df))
+        self.assertFalse(sink.submit('battery', df))
+        self.assertEqual(sink.get_stats()['batches_dropped'], 1)
+
+
+class TestAsyncTelemetryProcessor(unittest.IsolatedAsyncioTestCase):
+    """Tests for the sharded asynchronous telemetry processor"""
+
+    def setUp(self):
+        """Create a temporary storage directory"""
+        self.storage_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary storage directory"""
+        shutil.rmtree(self.storage_path, ignore_errors=True)
+
+    def _make_processor(self, **kwargs):
+        processor = AsyncTelemetryProcessor(
+            batch_size=10000,
+            buffer_timeout=3600,
+            storage_path=self.storage_path,
+            enable_anomaly_detection=False,
+            **kwargs
+        )
+        seen = []
+        processor.register_processing_callback(lambda data_type, record: seen.append(record))
+        return processor, seen
+
+    async def test_per_vehicle_order_is_kept(self):
+        """Test that records of a vehicle are processed in arrival order"""
+        processor, seen = self._make_processor(num_shards=4, max_queue_size=8)
+        await processor.start_processing()
+        records = make_battery_records(200, vehicle_count=7)
+        for record in records:
+            await processor.process_battery_telemetry_async(record)
+        await processor.stop_processing()
+
+        self.assertEqual(len(seen), 200)
+        for vehicle_id in {r['vehicle_id'] for r in records}:
+            timestamps = [r['timestamp'] for r in seen if r['vehicle_id'] == vehicle_id]
+            self.assertEqual(timestamps, sorted(timestamps))
+
+    async def test_flushes_are_written_outside_the_buffer_lock(self):
+        """Test that flush writes do not block buffering and keep their order"""
+        processor, seen = self._make_processor(num_shards=4, max_queue_size=8)
+        processor.batch_size = 20
+        stored = []
+        original_store = processor._store_data
+        failures = [1]
+
+        def store(data_type, df, wal_lsn=None, notify=True):
+            # Other threads can take the buffer lock while a flush is written
+            acquired = []
+
+            def probe():
+                if processor._lock.acquire(timeout=5):
+                    acquired.append(True)
+                    processor._lock.release()
+
+            thread = threading.Thread(target=probe)
+            thread.start()
+            thread.join()
+            self.assertEqual(acquired, [True])
+            if failures[0]:
+                failures[0] -= 1
+                raise OSError("disk full")
+            stored.append(df)
+            original_store(data_type, df, wal_lsn, notify)
+
+        processor._store_data = store
+        await processor.start_processing()
+        records = make_battery_records(200, vehicle_count=7)
+        for record in records:
+            await processor.process_battery_telemetry_async(record)
+        await processor.stop_processing()
+
+        # The failed flush was retried, in order, by the next one
+        flushed = pd.concat(stored, ignore_index=True)
+        self.assertEqual(len(flushed), 200)
+        for vehicle_id, group in flushed.groupby('vehicle_id'):
+            self.assertTrue(group['timestamp'].is_monotonic_increasing)
+
+    async def test_wal_is_synced_outside_the_buffer_lock(self):
+        """Test that shards wait for write-ahead log fsyncs without holding the buffer lock"""
+        processor, seen = self._make_processor(num_shards=4, max_queue_size=8, enable_wal=True)
+        original_wait = processor.wal.wait_durable
+        waits = []
+
+        def wait_durable(lsn):
+            waits.append(lsn)
+            acquired = processor._lock.acquire(blocking=False)
+            if acquired:
+                processor._lock.release()
+            else:
+                # The lock may be held by another shard; it must not be held by this one
+                self.assertFalse(processor._lock._is_owned())
+            original_wait(lsn)
+
+        processor.wal.wait_durable = wait_durable
+        await processor.start_processing()
+        for record in make_battery_records(100, vehicle_count=7):
+            await processor.process_battery_telemetry_async(record)
+        await processor.stop_processing()
+
+        self.assertEqual(len(seen), 100)
+        self.assertTrue(waits)
+        self.assertEqual(max(waits), processor.wal.get_stats()['last_lsn'])
+
+    async def test_drop_oldest_bounds_queue(self):
+        """Test that drop_oldest keeps queues bounded without blocking"""
+        processor, seen = self._make_processor(
+            num_shards=1, max_queue_size=10, overflow_policy='drop_oldest'
+        )
+        for record in make_battery_records(50):
+            await processor.process_battery_telemetry_async(record)
+
+        self.assertEqual(processor.get_stats()['queue_depths'], [10])
+        self.assertEqual(processor.dropped_count, 40)
+
+        await processor.start_processing()
+        await processor.stop_processing()
+        self.assertEqual(len(seen), 10)
+
+    async def test_spill_replays_in_order(self):
+        """Test that spilled records are replayed after the queue drains"""
+        processor, seen = self._make_processor(
+            num_shards=1, max_queue_size=5, overflow_policy='spill'
+        )
+        records = make_battery_records(30, vehicle_count=1)
+        for record in records:
+            await processor.process_battery_telemetry_async(record)
+        self.assertEqual(processor.get_stats()['spilled_count'], 25)
+
+        await processor.start_processing()
+        await processor.stop_processing()
+
+        self.assertEqual([r['timestamp'] for r in seen], [r['timestamp'] for r in records])
+        self.assertEqual(processor.get_stats()['spilled_count'], 0)
+
+
+class TestWriteAheadLog(unittest.TestCase):
+    """Tests for the telemetry write-ahead log"""
+
+    def setUp(self):
+        """Create a temporary storage directory"""
+        self.storage_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary storage directory"""
+        shutil.rmtree(self.storage_path, ignore_errors=True)
+
+    def _make_processor(self, batch_size=100):
+        return TelemetryProcessor(
+            batch_size=batch_size,
+            buffer_timeout=3600,
+            storage_path=self.storage_path,
+            enable_anomaly_detection=False,
+            partitioned_storage=True,
+            enable_wal=True
+        )
+
+    def _stored_rows(self, processor):
+        files = processor.dataset_writer.manifest.select('battery')
+        return sum(len(pd.read_parquet(os.path.join(self.storage_path, f))) for f, _ in files)
+
+    def test_unflushed_records_are_replayed(self):
+        """Test that buffered records survive a restart"""
+        crashed = self._make_processor()
+        records = make_battery_records(30)
+        crashed.process_battery_telemetry(dict(records[0]))
+        crashed.process_battery_batch(records[1:])
+        self.assertEqual(self._stored_rows(crashed), 0)
+
+        # Simulate a crash: the processor is never flushed or closed
+        restarted = self._make_processor()
+        restarted.close()
+        self.assertEqual(self._stored_rows(restarted), 30)
+
+        # Replayed records are not replayed a second time
+        again = self._make_processor()
+        again.close()
+        self.assertEqual(self._stored_rows(again), 30)
+
+    def test_flushed_records_in_open_files_are_replayed(self):
+        """Test that records flushed to a dataset file that was never closed survive a crash"""
+        crashed = self._make_processor(batch_size=10)
+        for record in make_battery_records(25):
+            crashed.process_battery_telemetry(record)
+        self.assertGreater(crashed.dataset_writer.get_stats()['open_files'], 0)
+
+        # Records are synced in the background rather than once per record
+        stats = crashed.get_stats()['wal']
+        self.assertEqual(stats['appended_frames'], 25)
+        self.assertLess(stats['sync_count'], 25)
+
+        # Simulate a crash: the open file has no footer and is dropped on restart
+        restarted = self._make_processor(batch_size=10)
+        restarted.close()
+        self.assertEqual(self._stored_rows(restarted), 25)
+
+        again = self._make_processor(batch_size=10)
+        again.close()
+        self.assertEqual(self._stored_rows(again), 25)
+
+    def test_segments_truncated_after_files_close(self):
+        """Test that segments are only removed once their rows are in closed files"""
+        processor = self._make_processor()
+        processor.process_battery_batch(make_battery_records(150))
+        stats = processor.get_stats()['wal']
+        self.assertGreater(stats['bytes'], 0)
+        self.assertNotIn('battery', stats['flushed_lsn'])
+
+        processor.dataset_writer.close()
+        stats = processor.get_stats()['wal']
+        self.assertEqual(stats['bytes'], 0)
+        self.assertEqual(stats['flushed_lsn']['battery'], stats['last_lsn'])
+        processor.close()
+
+    def test_torn_frame_stops_replay(self):
+        """Test that a partially written frame is ignored on replay"""
+        wal_path = os.path.join(self.storage_path, 'wal')
+        wal = TelemetryWAL(wal_path, sync_mode='none')
+        wal.append('battery', {'vehicle_id': ['A'], 'timestamp': ['2024-01-01T00:00:00']})
+        wal.append('battery', {'vehicle_id': ['B'], 'timestamp': ['2024-01-01T00:00:01']})
+        wal.close()
+        segment = sorted(f for f in os.listdir(wal_path) if f.endswith('.log'))[-1]
+        with open(os.path.join(wal_path, segment), 'r+b') as f:
+            f.truncate(os.path.getsize(os.path.join(wal_path, segment)) - 3)
+
+        reopened = TelemetryWAL(wal_path, sync_mode='none')
+        pending = list(reopened.pending())
+        self.assertEqual(len(pending), 1)
+        self.assertEqual(pending[0][2]['vehicle_id'], ['A'])
+        reopened.close()
+
+
+class TestTelemetryRollup(unittest.TestCase):
+    """Tests for incremental telemetry rollups"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.storage_path = tempfile.mkdtemp()
+        self.df = pd.DataFrame(make_battery_records(2000, vehicle_count=4))
+
+    def tearDown(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.storage_path, ignore_errors=True)
+
+    def assert_frames_match(self, result, expected):
+        self.assertEqual(len(result), len(expected))
+        self.assertEqual(result['count'].tolist(), expected['count'].tolist())
+        for column in ['state_of_charge_min', 'battery_temp_max', 'voltage_mean', 'current_mean']:
+            np.testing.assert_allclose(result[column].to_numpy(), expected[column].to_numpy())
+
+    def test_incremental_matches_raw_aggregation(self):
+        """Test that out-of-order updates give the same aggregates as one pass"""
+        rollup = TelemetryRollup()
+        shuffled = self.df.sample(frac=1.0, random_state=0)
+        for start in range(0, len(shuffled), 300):
+            rollup.update(shuffled.iloc[start:start + 300])
+
+        for interval in ['1min', '1h', '1d', '15min']:
+            result = rollup.query(interval=interval)
+            self.assert_frames_match(result, aggregate_raw(self.df, interval))
+        self.assertGreater(rollup.get_stats()['late_records'], 0)
+
+    def test_chooses_coarsest_resolution(self):
+        """Test resolution selection and the retention limit"""
+        rollup = TelemetryRollup(retention={'1min': 3600})
+        rollup.update(self.df)
+        self.assertEqual(rollup.choose_resolution('2h', '2024-01-01'), '1h')
+        self.assertEqual(rollup.choose_resolution('15min', '2024-01-01 05:00'), '1min')
+        # The window start is older than the 1-minute retention
+        self.assertIsNone(rollup.choose_resolution('15min', '2024-01-01'))
+        self.assertIsNone(rollup.choose_resolution(30, '2024-01-01 05:00'))
+
+    def test_processor_flush_feeds_rollup_and_store(self):
+        """Test that flushes update persisted rollups used by store aggregates"""
+        processor = TelemetryProcessor(storage_path=self.storage_path, batch_size=500, partitioned_storage=True)
+        rollup = TelemetryRollup(os.path.join(self.storage_path, 'rollups'))
+        rollup.connect_to_telemetry_processor(processor)
+        processor.process_battery_batch(self.df)
+        processor.close()
+        rollup.save()
+
+        reloaded = TelemetryRollup(os.path.join(self.storage_path, 'rollups'))
+        store = TelemetryStore(self.storage_path, rollup=reloaded)
+        result = store.aggregate(['TEST-1'], '2024-01-01', '2024-01-02', interval='1h')
+        expected = aggregate_raw(self.df[self.df['vehicle_id'] == 'TEST-1'], '1h')
+        self.assert_frames_match(result, expected)
+
+        raw_result = TelemetryStore(self.storage_path).aggregate(['TEST-1'], '2024-01-01', '2024-01-02', '1h')
+        self.assert_frames_match(raw_result, expected)
+
+    def test_updates_persist_without_save(self):
+        """Test that every update is persisted and compacted after max_deltas updates"""
+        rollup_path = os.path.join(self.storage_path, 'rollups')
+        rollup = TelemetryRollup(rollup_path, max_deltas=4)
+        for start in range(0, len(self.df), 300):
+            rollup.update(self.df.iloc[start:start + 300])
+        stats = rollup.get_stats()
+        self.assertEqual(stats['pending_deltas'], 7 % 4)
+        self.assertLessEqual(stats['open_buckets']['1min'], 4)
+
+        # No save(): the compacted files and later deltas are loaded
+        reloaded = TelemetryRollup(rollup_path)
+        for interval in ['1min', '1h', '1d']:
+            result = reloaded.query(start='2024-01-01', interval=interval)
+            self.assert_frames_match(result, aggregate_raw(self.df, interval))
+
+        # New records merge into the reopened buckets
+        extra = pd.DataFrame(make_battery_records(100, vehicle_count=4, start=datetime(2024, 1, 1, 5, 33)))
+        reloaded.update(extra)
+        reloaded.close()
+        self.assertEqual(reloaded.get_stats()['pending_deltas'], 0)
+        expected = aggregate_raw(pd.concat([self.df, extra]), '1h')
+        self.assert_frames_match(TelemetryRollup(rollup_path).query(start='2024-01-01', interval='1h'), expected)
+
+    def test_replayed_records_are_rolled_up_once(self):
+        """Test that records replayed from the write-ahead log reach the rollup exactly once"""
+        rollup_path = os.path.join(self.storage_path, 'rollups')
+        records = make_battery_records(25)
+
+        def make_processor(rollup):
+            return TelemetryProcessor(
+                batch_size=10,
+                buffer_timeout=3600,
+                storage_path=self.storage_path,
+                enable_anomaly_detection=False,
+                partitioned_storage=True,
+                enable_wal=True,
+                flush_callbacks=[rollup.handle_flush]
+            )
+
+        # Two flushes reach the rollup but stay in open dataset files, and five
+        # records are still buffered when the process dies
+        crashed = make_processor(TelemetryRollup(rollup_path))
+        for record in records:
+            crashed.process_battery_telemetry(dict(record))
+
+        rollup = TelemetryRollup(rollup_path)
+        make_processor(rollup).close()
+        result = rollup.query(interval='1d')
+        self.assertEqual(result['count'].sum(), 25)
+        self.assert_frames_match(result, aggregate_raw(pd.DataFrame(records), '1d'))
+
+
+class TestTelemetryCodec(unittest.TestCase):
+    """Tests for the compact telemetry codec"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.storage_path = tempfile.mkdtemp()
+        self.df = pd.DataFrame(make_battery_records(20000, vehicle_count=10))
+
+    def tearDown(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.storage_path, ignore_errors=True)
+
+    def test_round_trip_is_lossless(self):
+        """Test that every column decodes exactly, including odd values"""
+        df = self.df.copy()
+        df['noise'] = np.random.default_rng(0).normal(size=len(df))
+        df.loc[5, 'noise'] = np.nan
+        df['dtcs'] = [['P0A80'] if i % 7 == 0 else [] for i in range(len(df))]
+
+        decoded = decode_frame(encode_frame(df))
+        expected = df.sort_values(['vehicle_id', 'timestamp'], kind='stable').reset_index(drop=True)
+        pd.testing.assert_frame_equal(decoded, expected, check_exact=True)
+
+        projected = decode_frame(encode_frame(df), columns=['timestamp', 'voltage'])
+        self.assertEqual(list(projected.columns), ['timestamp', 'voltage'])
+
+    def test_regular_series_compress(self):
+        """Test that regular telemetry is far smaller than its raw arrays"""
+        raw_bytes = len(self.df) * 8 * (len(self.df.columns) - 1)
+        self.assertLess(len(encode_frame(self.df)), raw_bytes / 10)
+
+    def test_store_reads_encoded_files(self):
+        """Test that scans over codec files match scans over Parquet files"""
+        parquet_root = os.path.join(self.storage_path, 'parquet')
+        encoded_root = os.path.join(self.storage_path, 'tsc')
+        for root, codec in [(parquet_root, None), (encoded_root, 'tsc')]:
+            writer = TelemetryDatasetWriter(root, num_buckets=4, codec=codec)
+            for start in range(0, len(self.df), 5000):
+                writer.write('battery', self.df.iloc[start:start + 5000])
+            writer.close()
+
+        entries = TelemetryStore(encoded_root).manifest.files
+        self.assertTrue(all(path.endswith('.tsc') for path in entries))
+        read_encoded(os.path.join(encoded_root, next(iter(entries))))
+
+        args = (['TEST-2', 'TEST-5'], '2024-01-01 06:00', '2024-01-02')
+        expected = TelemetryStore(parquet_root).scan(*args)
+        result = TelemetryStore(encoded_root).scan(*args)
+        pd.testing.assert_frame_equal(result, expected)
+        batches = list(TelemetryStore(encoded_root).iter_scan(*args, columns=['voltage'], batch_size=500))
+        self.assertEqual(sum(len(b) for b in batches), len(expected))
+
+
+class TestStreamingAnomalyDetection(unittest.TestCase):
+    """Tests for per-vehicle ring buffers and incremental detection"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.storage_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.storage_path, ignore_errors=True)
+
+    def test_ring_buffer_window_statistics(self):
+        """Test that running statistics match the last capacity points"""
+        values = np.random.default_rng(0).normal(50, 5, size=(1000, 2))
+        buffer = VehicleRingBuffer(64, ['a', 'b'])
+        for i, row in enumerate(values):
+            buffer.append(i, row)
+
+        window = values[-64:]
+        self.assertEqual(len(buffer), 64)
+        np.testing.assert_allclose(buffer.mean(), window.mean(axis=0))
+        np.testing.assert_allclose(buffer.std(), window.std(axis=0, ddof=1))
+        np.testing.assert_allclose(buffer.to_frame()[['a', 'b']].to_numpy(), window)
+
+    def test_ring_buffer_keeps_missing_values(self):
+        """Test that missing values stay NaN and are left out of the statistics"""
+        values = np.random.default_rng(3).normal(50, 5, size=(200, 2))
+        values[::7, 1] = np.nan
+        buffer = VehicleRingBuffer(64, ['a', 'b'])
+        for i, row in enumerate(values):
+            buffer.append(i, row)
+
+        window = values[-64:]
+        np.testing.assert_allclose(buffer.mean(), np.nanmean(window, axis=0))
+        np.testing.assert_allclose(buffer.std(), np.nanstd(window, axis=0, ddof=1))
+        np.testing.assert_array_equal(np.isnan(buffer.to_frame()['b'].to_numpy()), np.isnan(window[:, 1]))
+
+    def test_each_record_is_scored_once(self):
+        """Test that a spike is reported once and buffers stay bounded"""
+        pipeline = AnomalyDetectionPipeline(
+            detection_methods=['statistical', 'threshold'],
+            buffer_size=50,
+            storage_path=self.storage_path
+        )
+        rng = np.random.default_rng(1)
+        for i, record in enumerate(make_battery_records(900, vehicle_count=3)):
+            record['battery_temp'] = 25 + rng.normal(0, 0.2)
+            record['state_of_charge'] = 80 + rng.normal(0, 0.2)
+            record['voltage'] = 380 + rng.normal(0, 0.5)
+            record['current'] = 10.0 if record['charging_status'] == 1 else -5.0
+            if i == 600:
+                record['battery_temp'] = 55
+            pipeline._process_telemetry('battery', record)
+
+        anomalies = pipeline.get_vehicle_anomalies('TEST-1')
+        self.assertEqual(len(anomalies), 1)
+        self.assertEqual(anomalies[0]['metrics']['battery_temp'], 55)
+        self.assertEqual(set(anomalies[0]['detection_methods']), {'statistical', 'threshold'})
+        self.assertTrue(all(len(b) == 50 for b in pipeline.telemetry_buffer.values()))
+
+    def test_streaming_flags_need_two_methods(self):
+        """Test that streaming scoring keeps the batch agreement and severity cut points"""
+        pipeline = AnomalyDetectionPipeline(buffer_size=50, storage_path=self.storage_path)
+        rng = np.random.default_rng(4)
+        for i, record in enumerate(make_battery_records(300, vehicle_count=1)):
+            record['voltage'] = 380 + rng.uniform(-1, 1)
+            record['current'] = 10.0 if record['charging_status'] == 1 else -5.0
+            if i == 200:
+                # Within the domain thresholds, but far outside the window
+                record['voltage'] = 400
+            if i == 260:
+                # Outside both the window and the domain thresholds
+                record['voltage'] = 430
+            pipeline._process_telemetry('battery', record)
+
+        # A single statistical hit is not enough, two agreeing methods are
+        anomalies = pipeline.get_vehicle_anomalies('TEST-1')
+        self.assertEqual(len(anomalies), 1)
+        self.assertEqual(anomalies[0]['metrics']['voltage'], 430)
+        self.assertEqual(anomalies[0]['detection_methods'], ['statistical', 'threshold'])
+        self.assertEqual(anomalies[0]['severity'], 'medium')
+
+    def test_online_statistics_survive_restart(self):
+        """Test streaming detection and that saved state avoids a cold start"""
+        pipeline = AnomalyDetectionPipeline(
+            detection_methods=['statistical', 'threshold'],
+            storage_path=self.storage_path,
+            online_statistics=True
+        )
+        rng = np.random.default_rng(2)
+        records = make_battery_records(600, vehicle_count=2)
+        for record in records:
+            record['battery_temp'] = 25 + rng.normal(0, 0.2)
+            record['current'] = 10.0 if record['charging_status'] == 1 else -5.0
+            pipeline._process_telemetry('battery', record)
+        self.assertEqual(pipeline.telemetry_buffer, {})
+        self.assertEqual(pipeline.get_anomaly_stats()['total_anomalies'], 0)
+
+        model_path = os.path.join(self.storage_path, 'models', 'detector.joblib')
+        pipeline.detector.save_model(model_path)
+        restarted = AnomalyDetectionPipeline(
+            model_path=model_path,
+            storage_path=self.storage_path,
+            online_statistics=True
+        )
+        spike = dict(records[-2], battery_temp=55, timestamp=datetime(2024, 1, 2))
+        restarted._process_telemetry('battery', spike)
+
+        anomalies = restarted.get_vehicle_anomalies(spike['vehicle_id'])
+        self.assertEqual(len(anomalies), 1)
+        self.assertIn('statistical', anomalies[0]['detection_methods'])
+        moments = restarted.detector.online_detector.vehicles[spike['vehicle_id']]['moments']
+        self.assertEqual(int(moments.count[0]), 301)
+
+
+class TestFleetAnomalyModel(unittest.TestCase):
+    """Tests for the fit-once, score-many fleet anomaly model"""
+
+    def setUp(self):
+        """Build fleet telemetry with one injected spike"""
+        self.storage_path = tempfile.mkdtemp()
+        rng = np.random.default_rng(3)
+        n = 4000
+        self.telemetry = pd.DataFrame({
+            'vehicle_id': [f"TEST-{i % 20}" for i in range(n)],
+            'timestamp': pd.date_range('2024-01-01', periods=n, freq='10s'),
+            'state_of_charge': rng.uniform(40, 80, n),
+            'battery_temp': rng.normal(25, 1, n),
+            'voltage': rng.normal(380, 2, n),
+            'current': rng.normal(10, 1, n),
+            'charging_status': 1
+        })
+        self.telemetry.loc[1234, ['battery_temp', 'voltage']] = [58, 420]
+
+    def tearDown(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.storage_path, ignore_errors=True)
+
+    def test_fit_once_score_many(self):
+        """Test chunked and parallel scoring agree and the spike is flagged"""
+        detector = BatteryAnomalyDetector(detection_methods=['isolation_forest', 'lof', 'dbscan', 'threshold'])
+        with self.assertRaises(ValueError):
+            detector.score_fleet(self.telemetry)
+        detector.fit_fleet(self.telemetry, sample_size=2000)
+
+        serial = detector.score_fleet(self.telemetry, chunk_size=1000, n_jobs=1)
+        parallel = detector.score_fleet(self.telemetry, chunk_size=1000, n_jobs=2)
+        pd.testing.assert_frame_equal(serial, parallel)
+        self.assertEqual(len(serial), len(self.telemetry))
+
+        spike = serial.loc[1234]
+        self.assertEqual(spike['anomaly_count'], 4)
+        self.assertTrue(spike['is_anomaly'])
+        self.assertEqual(spike['anomaly_severity'], 'high')
+        self.assertLess(serial['is_anomaly'].mean(), 0.1)
+
+        # Batch detection reuses the fleet model instead of refitting
+        fleet_if = detector.fleet_model.models['isolation_forest']
+        batch = detector.detect_anomalies(self.telemetry.iloc[1200:1300].reset_index(drop=True))
+        self.assertIs(detector.fleet_model.models['isolation_forest'], fleet_if)
+        np.testing.assert_array_equal(
+            batch['anomaly_lof'].to_numpy(), serial['anomaly_lof'].iloc[1200:1300].to_numpy()
+        )
+
+    def test_fleet_model_persists(self):
+        """Test that a saved fleet model scores identically after loading"""
+        detector = BatteryAnomalyDetector(detection_methods=['isolation_forest', 'lof', 'threshold'])
+        detector.fit_fleet(self.telemetry)
+        model_path = os.path.join(self.storage_path, 'detector.joblib')
+        detector.save_model(model_path)
+
+        restored = BatteryAnomalyDetector(model_path=model_path)
+        pd.testing.assert_frame_equal(detector.score_fleet(self.telemetry), restored.score_fleet(self.telemetry))
+
+
+class TestAnomalyStore(unittest.TestCase):
+    """Tests for the indexed anomaly store behind the detection pipeline"""
+
+    def setUp(self):
+        """Create a pipeline writing to a temporary directory"""
+        self.storage_path = tempfile.mkdtemp()
+        self.pipeline = AnomalyDetectionPipeline(
+            detection_methods=['statistical', 'threshold'],
+            storage_path=self.storage_path
+        )
+        start = datetime.now() - timedelta(days=10, minutes=-30)
+        self.anomalies = [
+            {
+                'vehicle_id': f"TEST-{i % 3 + 1}",
+                'timestamp': (start + timedelta(hours=i)).isoformat(),
+                'anomaly_type': 'battery_anomaly' if i % 4 else 'high_temperature',
+                'severity': ['high', 'medium', 'low'][i % 3 if i % 2 else 0],
+                'detection_methods': ['threshold'],
+                'detection_source': 'battery_anomaly_detector',
+                'detection_time': datetime.now().isoformat(),
+                'metrics': {'battery_temp': float(40 + i % 7), 'voltage': 380.0}
+            }
+            for i in range(240)
+        ]
+        self.pipeline.anomaly_store.add_many(self.anomalies)
+
+    def tearDown(self):
+        """Clean up test environment"""
+        self.pipeline.anomaly_store.close()
+        shutil.rmtree(self.storage_path, ignore_errors=True)
+
+    def test_queries_match_records(self):
+        """Test filtered queries, precomputed stats and analysis"""
+        vehicle = [a for a in self.anomalies if a['vehicle_id'] == 'TEST-2']
+        start = datetime.fromisoformat(vehicle[10]['timestamp'])
+        end = datetime.fromisoformat(vehicle[40]['timestamp'])
+
+        result = self.pipeline.get_vehicle_anomalies('TEST-2', time_range=(start, end), severity='medium', limit=5)
+        expected = sorted(
+            [a for a in vehicle[10:41] if a['severity'] == 'medium'], key=lambda a: a['timestamp'], reverse=True
+        )[:5]
+        self.assertEqual(result, expected)
+
+        stats = self.pipeline.get_anomaly_stats()
+        self.assertEqual(stats['total_anomalies'], 240)
+        self.assertEqual(stats['by_vehicle'], {'TEST-1': 80, 'TEST-2': 80, 'TEST-3': 80})
+        self.assertEqual(
+            stats['by_severity']['high'], len([a for a in self.anomalies if a['severity'] == 'high'])
+        )
+        self.assertEqual(stats['recent_24h'], 24)
+
+        analysis = self.pipeline.analyze_vehicle_anomalies('TEST-2')
+        temps = [a['metrics']['battery_temp'] for a in vehicle]
+        self.assertEqual(analysis['anomaly_count'], 80)
+        self.assertAlmostEqual(analysis['metric_stats']['battery_temp']['std'], np.std(temps))
+        self.assertEqual(analysis['metric_stats']['voltage']['max'], 380.0)
+        self.assertEqual(sum(analysis['by_type'].values()), 80)
+
+    def test_retention_and_reopen(self):
+        """Test that pruning updates counts and the store survives a restart"""
+        cleared = self.pipeline.clear_old_anomalies(days_to_keep=5)
+        cutoff = datetime.now() - timedelta(days=5)
+        kept = [a for a in self.anomalies if datetime.fromisoformat(a['timestamp']) >= cutoff]
+        self.assertEqual(cleared, 240 - len(kept))
+
+        self.pipeline.anomaly_store.close()
+        store = AnomalyStore(os.path.join(self.storage_path, 'anomalies.db'))
+        self.pipeline.anomaly_store = store
+        self.assertEqual(store.count(), len(kept))
+        self.assertEqual(self.pipeline.get_anomaly_stats()['total_anomalies'], len(kept))
+        self.assertEqual(len(store.query(limit=None)), len(kept))
+
+    def test_telemetry_processor_anomalies(self):
+        """Test that ingestion rule anomalies with datetime timestamps are stored"""
+        self.pipeline._handle_telemetry_anomaly({
+            'vehicle_id': 'TEST-9',
+            'timestamp': datetime(2024, 1, 1, 12),
+            'anomaly_type': 'high_temperature',
+            'value': np.float64(65.0),
+            'threshold': 50,
+            'severity': 'high'
+        })
+        stored = self.pipeline.get_vehicle_anomalies('TEST-9')
+        self.assertEqual(len(stored), 1)
+        self.assertEqual(stored[0]['timestamp'], '2024-01-01T12:00:00')
+        self.assertEqual(stored[0]['value'], 65.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""
+Tests for Vehicle Usage Prediction
+
+This module tests the fleet-batch inference path of VehicleUsagePredictor
+against the per-vehicle predictions it replaces.
+"""
+import sys
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+
+# Add the app directory to the path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent))
+
+from app.ml.inference.usage_predictor import VehicleUsagePredictor
+from sklearn.linear_model import LinearRegression
+
+
+def make_usage_history(n_vehicles, trips_per_vehicle, seed=0):
+    """
+    Generate shuffled trip records for a fleet
+
+    Args:
+        n_vehicles: Number of vehicles
+        trips_per_vehicle: Number of trips per vehicle
+        seed: Random seed
+
+    Returns:
+        DataFrame with vehicle_id, start_time, end_time and trip_distance
+    """
+    rng = np.random.default_rng(seed)
+    n = n_vehicles * trips_per_vehicle
+    start = pd.Timestamp('2024-03-01') + pd.to_timedelta(rng.uniform(0, 24 * 14, n), unit='h')
+    history = pd.DataFrame({
+        'vehicle_id': np.repeat([f"v{i}" for i in range(n_vehicles)], trips_per_vehicle),
+        'start_time': start,
+        'end_time': start + pd.to_timedelta(rng.uniform(10, 180, n), unit='m'),
+        'trip_distance': rng.uniform(1, 50, n)
+    })
+    return history.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+class TestPredictFleet(unittest.TestCase):
+    """Tests for VehicleUsagePredictor.predict_fleet"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.predictor = VehicleUsagePredictor(models_dir=self.temp_dir)
+        self.history = make_usage_history(25, 8)
+
+        # Fit simple models on features of the history itself
+        rng = np.random.default_rng(1)
+        for target in ['next_usage_time', 'trip_duration', 'trip_distance']:
+            features = self.predictor._prepare_features(self.history.copy(), target)
+            model = LinearRegression().fit(features, rng.uniform(1, 48, len(features)))
+            self.predictor.models[target] = model
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_matches_per_vehicle_predictions(self):
+        """Fleet predictions equal the single-vehicle methods"""
+        at_time = datetime(2024, 3, 16, 9, 30)
+        window_end = datetime(2024, 3, 16, 21, 0)
+        vehicle_ids = ['v3', 'unknown', 'v0'] + [f"v{i}" for i in range(5, 25)] + ['v3']
+
+        fleet = self.predictor.predict_fleet(self.history, vehicle_ids, at_time, window_end=window_end)
+
+        self.assertEqual(list(fleet.index), vehicle_ids)
+        self.assertEqual(fleet.loc['unknown', 'error'], "No usage history for vehicle unknown")
+        self.assertFalse(fleet.loc['unknown', 'is_available'])
+        self.assertTrue(np.isnan(fleet.loc['unknown', 'hours_until_next_usage']))
+
+        for vehicle_id in dict.fromkeys(vehicle_ids):
+            if vehicle_id == 'unknown':
+                continue
+            row = fleet.loc[vehicle_id]
+            if isinstance(row, pd.DataFrame):
+                row = row.iloc[0]
+            self.assertIsNone(row['error'])
+
+            next_usage = self.predictor.predict_next_usage(vehicle_id, self.history, current_time=at_time)
+            self.assertAlmostEqual(row['hours_until_next_usage'], next_usage['hours_until_next_usage'])
+            self.assertEqual(row['next_usage_time'].strftime('%Y-%m-%d %H:%M:%S'), next_usage['next_usage_time'])
+            self.assertEqual(row['confidence'], next_usage['confidence'])
+
+            trip_start = datetime.strptime(next_usage['next_usage_time'], '%Y-%m-%d %H:%M:%S')
+            duration = self.predictor.predict_trip_duration(vehicle_id, trip_start, self.history)
+            distance = self.predictor.predict_trip_distance(vehicle_id, trip_start, self.history)
+            self.assertAlmostEqual(row['predicted_duration_minutes'], duration['predicted_duration_minutes'], places=3)
+            self.assertAlmostEqual(row['predicted_distance'], distance['predicted_distance'], places=3)
+
+            availability = self.predictor.predict_vehicle_availability(
+                vehicle_id, at_time, window_end, self.history
+            )
+            self.assertEqual(bool(row['is_available']), availability['is_available'])
+
+    def test_missing_trip_models(self):
+        """Only the next usage model is required"""
+        del self.predictor.models['trip_duration']
+        del self.predictor.models['trip_distance']
+
+        fleet = self.predictor.predict_fleet(self.history, ['v1', 'v2'], datetime(2024, 3, 16, 9, 30))
+
+        self.assertTrue(fleet['hours_until_next_usage'].notna().all())
+        self.assertTrue(fleet['predicted_duration_minutes'].isna().all())
+        self.assertTrue(fleet['predicted_end_time'].isna().all())
+
+        del self.predictor.models['next_usage_time']
+        with self.assertRaises(ValueError):
+            self.predictor.predict_fleet(self.history, ['v1'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -44,6 +44,9 @@ class TelemetryDataProcessor:
             }
         }
         
+        # Partitioned telemetry dataset written by the ingestion pipeline
+        self._telemetry_store = None
+        
         # Data validation rules
         self._validation_rules = {
             "voltage": {
@@ -236,6 +239,12 @@ class TelemetryDataProcessor:
         """
         Retrieve historical telemetry data for analysis
         
+        Stored telemetry is returned as one row per day (daily means), the
+        granularity callers such as the health predictor expect. Rows the
+        ingestion pipeline still holds in open dataset files are not visible
+        until the file is closed (after at most the writer's max_file_age,
+        one hour by default).
+        
         Args:
             vehicle_id: The vehicle identifier
             start_date: Start date for data retrieval
@@ -246,8 +255,12 @@ class TelemetryDataProcessor:
             DataFrame containing historical telemetry data
         """
         try:
-            # In production, this would query the database
-            # For this demo, we'll generate synthetic data
+            # Read stored telemetry from the ingestion pipeline's dataset
+            stored = self._scan_stored_telemetry(vehicle_id, start_date, end_date)
+            if stored is not None and not stored.empty:
+                return stored
+            
+            # No stored data yet, so generate synthetic data
             
             # Calculate number of days in range
             days = (end_date - start_date).days + 1
@@ -280,6 +293,43 @@ class TelemetryDataProcessor:
             logger.exception(f"Error retrieving historical telemetry: {str(e)}")
             return pd.DataFrame()
 
+    def _scan_stored_telemetry(self, vehicle_id: str, start_date: datetime,
+                               end_date: datetime) -> Optional[pd.DataFrame]:
+        """
+        Read a vehicle's daily battery telemetry from the partitioned dataset
+        
+        Args:
+            vehicle_id: The vehicle identifier
+            start_date: Start date for data retrieval
+            end_date: End date for data retrieval
+            
+        Returns:
+            DataFrame in the historical telemetry layout with one row per day
+            and the number of raw samples behind it, or None if unavailable
+        """
+        if self._telemetry_store is None:
+            if not os.path.exists(os.path.join(settings.TELEMETRY_STORAGE_PATH, '_manifest.json')):
+                return None
+            try:
+                from app.ml.data_pipeline.telemetry_store import TelemetryStore
+                self._telemetry_store = TelemetryStore(settings.TELEMETRY_STORAGE_PATH)
+            except ImportError as e:
+                logger.warning(f"Telemetry store unavailable: {str(e)}")
+                return None
+        
+        daily = self._telemetry_store.aggregate([vehicle_id], start_date, end_date, interval='1d')
+        if daily.empty:
+            return daily
+        return pd.DataFrame({
+            'vehicle_id': daily['vehicle_id'],
+            'timestamp': daily['timestamp'],
+            'voltage': daily['voltage_mean'],
+            'current': daily['current_mean'],
+            'soc': daily['state_of_charge_mean'],
+            'temperature': daily['battery_temp_mean'],
+            'sample_count': daily['count']
+        })
+
 # Singleton instance
 _telemetry_processor = None
 